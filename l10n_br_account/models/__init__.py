@@ -15,3 +15,4 @@ from . import fiscal_document_line
 from . import account_move
 from . import account_incoterms
 from . import account_payment_mode
+from . import tax_recompute
@@ -560,3 +560,22 @@ class AccountMoveLine(models.Model):
         user must be able to set a custom value.
         '''
         return super()._onchange_mark_recompute_taxes()
+
+    @api.model
+    def _get_fiscal_recompute_fields(self):
+        return super()._get_fiscal_recompute_fields() + ["tax_ids"]
+
+    def _write_recomputed_fiscal_taxes(self, vals_by_line):
+        """Write the recomputed lines through their invoice, so its tax
+        and payment term lines are recomputed too"""
+        lines = self.browse(list(vals_by_line))
+        for move in lines.mapped("move_id"):
+            move.write(
+                {
+                    "invoice_line_ids": [
+                        (1, line.id, vals_by_line[line.id])
+                        for line in lines
+                        if line.move_id == move
+                    ]
+                }
+            )
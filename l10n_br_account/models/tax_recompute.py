@@ -0,0 +1,21 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+from odoo import api, models
+
+
+class TaxRecompute(models.Model):
+    _inherit = "l10n_br_fiscal.tax.recompute"
+
+    @api.model
+    def _get_recompute_targets(self):
+        targets = super()._get_recompute_targets()
+        # the fiscal lines of the invoices are recomputed with them
+        targets["l10n_br_fiscal.document.line"].append(
+            ("account_line_ids", "=", False)
+        )
+        targets["account.move.line"] = [
+            ("move_id.state", "=", "draft"),
+            ("move_id.move_type", "!=", "entry"),
+            ("exclude_from_invoice_tab", "=", False),
+        ]
+        return targets
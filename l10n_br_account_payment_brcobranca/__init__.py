@@ -4,5 +4,6 @@
 
 from . import models
 from . import parser
+from . import remessa
 from . import wizard
 from . import tests
@@ -6,7 +6,6 @@
 
 import json
 import logging
-import tempfile
 
 import requests
 
@@ -18,6 +17,7 @@ from ..constants.br_cobranca import (
     get_brcobranca_api_url,
     get_brcobranca_bank,
 )
+from ..remessa import get_remessa_writer
 
 logger = logging.getLogger(__name__)
 
@@ -151,19 +151,25 @@ class PaymentOrder(models.Model):
         except Exception:
             pass
 
-        remessa = self._get_brcobranca_remessa(
-            bank_brcobranca, remessa_values, cnab_type
-        )
+        writer = self._get_remessa_writer(bank_brcobranca, cnab_type)
+        if writer:
+            remessa = writer(remessa_values).generate()
+        else:
+            remessa = self._get_brcobranca_remessa(
+                bank_brcobranca, remessa_values, cnab_type
+            )
 
         return remessa, self.get_file_name(cnab_type)
 
+    def _get_remessa_writer(self, bank_brcobranca, cnab_type):
+        """Native writer of the bank CNAB layout, the remessa is generated
+        locally without calling the BRCobranca API."""
+        return get_remessa_writer(bank_brcobranca.name, cnab_type)
+
     def _get_brcobranca_remessa(self, bank_brcobranca, remessa_values, cnab_type):
 
         content = json.dumps(remessa_values)
-        f = open(tempfile.mktemp(), "w")
-        f.write(content)
-        f.close()
-        files = {"data": open(f.name, "rb")}
+        files = {"data": ("remessa.json", content.encode("utf-8"))}
 
         brcobranca_api_url = get_brcobranca_api_url()
         # EX.: "http://boleto_cnab_api:9292/api/remessa"
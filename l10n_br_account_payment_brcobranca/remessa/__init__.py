@@ -0,0 +1,10 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from .base import get_remessa_writer
+from . import banco_brasil_400
+from . import bradesco_400
+from . import caixa_240
+from . import itau_400
+from . import sicredi_240
+from . import unicred_400
@@ -0,0 +1,165 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+"""Banco do Brasil CNAB 400 remessa, same layout as BRCobranca
+lib/brcobranca/remessa/cnab400/banco_brasil.rb"""
+
+from .base import (
+    RecordSpec,
+    RemessaWriter,
+    field,
+    format_amount,
+    format_date,
+    format_numeric,
+    register_remessa_writer,
+    tipo_inscricao,
+)
+
+HEADER = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "0"),
+        field("operacao", 1, "9", "1"),
+        field("literal_remessa", 7, "X", "REMESSA"),
+        field("codigo_servico", 2, "9", "01"),
+        field("literal_servico", 15, "X", "COBRANCA"),
+        field("agencia", 4, "9"),
+        field("digito_agencia", 1, "X"),
+        field("conta_corrente", 8, "9"),
+        field("digito_conta", 1, "X"),
+        field("zeros", 6, "9"),
+        field("empresa_mae", 30, "X"),
+        field("codigo_banco", 3, "9", "001"),
+        field("nome_banco", 15, "X", "BANCODOBRASIL"),
+        field("data_geracao", 6, "9"),
+        field("sequencial_remessa", 7, "9"),
+        field("brancos_1", 22, "X"),
+        field("convenio_lider", 7, "9"),
+        field("brancos_2", 258, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+DETAIL = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "7"),
+        field("tipo_inscricao", 2, "9"),
+        field("documento_cedente", 14, "9"),
+        field("agencia", 4, "9"),
+        field("digito_agencia", 1, "X"),
+        field("conta_corrente", 8, "9"),
+        field("digito_conta", 1, "X"),
+        field("convenio", 7, "9"),
+        field("documento", 25, "X"),
+        field("nosso_numero", 17, "9"),
+        field("numero_prestacao", 2, "9"),
+        field("grupo_valor", 2, "9"),
+        field("brancos_1", 3, "X"),
+        field("indicativo_mensagem", 1, "X"),
+        field("prefixo_titulo", 3, "X"),
+        field("variacao_carteira", 3, "9"),
+        field("conta_caucao", 1, "9"),
+        field("numero_bordero", 6, "9"),
+        field("tipo_cobranca", 5, "X", "04DSC"),
+        field("carteira", 2, "9"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("numero", 10, "X"),
+        field("data_vencimento", 6, "9"),
+        field("valor", 13, "9"),
+        field("codigo_banco", 3, "9", "001"),
+        field("agencia_cobradora", 4, "9"),
+        field("digito_agencia_cobradora", 1, "X"),
+        field("especie_titulo", 2, "9", "01"),
+        field("aceite", 1, "X", "N"),
+        field("data_emissao", 6, "9"),
+        field("cod_primeira_instrucao", 2, "9", "00"),
+        field("cod_segunda_instrucao", 2, "9", "00"),
+        field("valor_mora", 13, "9"),
+        field("data_desconto", 6, "9"),
+        field("valor_desconto", 13, "9"),
+        field("valor_iof", 13, "9"),
+        field("valor_abatimento", 13, "9"),
+        field("identificacao_sacado", 2, "9"),
+        field("documento_sacado", 14, "9"),
+        field("nome_sacado", 37, "X"),
+        field("brancos_2", 3, "X"),
+        field("endereco_sacado", 40, "X"),
+        field("bairro_sacado", 12, "X"),
+        field("cep_sacado", 8, "9"),
+        field("cidade_sacado", 15, "X"),
+        field("uf_sacado", 2, "X"),
+        field("observacao", 40, "X"),
+        field("dias_protesto", 2, "9"),
+        field("brancos_3", 1, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+TRAILER = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "9"),
+        field("brancos", 393, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+
+@register_remessa_writer("banco_brasil", "400")
+class BancoBrasil400(RemessaWriter):
+    record_specs = {"0": HEADER, "7": DETAIL, "9": TRAILER}
+    detail_record_type = "7"
+
+    def header_records(self):
+        values = self.values
+        yield HEADER.format(
+            {
+                "agencia": values.get("agencia"),
+                "digito_agencia": values.get("digito_agencia"),
+                "conta_corrente": values.get("conta_corrente"),
+                "digito_conta": values.get("digito_conta"),
+                "empresa_mae": values.get("empresa_mae"),
+                "data_geracao": format_date(self.generation_date),
+                "sequencial_remessa": values.get("sequencial_remessa"),
+                "convenio_lider": values.get("convenio_lider")
+                or values.get("convenio"),
+                "sequencial": self._next_sequence(),
+            }
+        )
+
+    def detail_records(self, pagamento):
+        remessa = self.values
+        documento_sacado = pagamento.get("documento_sacado")
+        values = dict(
+            pagamento,
+            tipo_inscricao=tipo_inscricao(remessa.get("documento_cedente")),
+            documento_cedente=remessa.get("documento_cedente"),
+            agencia=remessa.get("agencia"),
+            digito_agencia=remessa.get("digito_agencia"),
+            conta_corrente=remessa.get("conta_corrente"),
+            digito_conta=remessa.get("digito_conta"),
+            convenio=remessa.get("convenio"),
+            nosso_numero=format_numeric(remessa.get("convenio"), 7)
+            + format_numeric(pagamento.get("nosso_numero"), 10),
+            variacao_carteira=remessa.get("variacao_carteira"),
+            carteira=remessa.get("carteira"),
+            numero=str(pagamento.get("numero") or "").rjust(10, "0"),
+            data_vencimento=format_date(pagamento.get("data_vencimento")),
+            valor=format_amount(pagamento.get("valor")),
+            data_emissao=format_date(
+                pagamento.get("data_emissao") or self.generation_date
+            ),
+            valor_mora=format_amount(pagamento.get("valor_mora")),
+            data_desconto=format_date(pagamento.get("data_desconto")),
+            valor_desconto=format_amount(pagamento.get("valor_desconto")),
+            valor_iof=format_amount(pagamento.get("valor_iof")),
+            valor_abatimento=format_amount(pagamento.get("valor_abatimento")),
+            identificacao_sacado=tipo_inscricao(documento_sacado),
+            documento_sacado=documento_sacado,
+            sequencial=self._next_sequence(),
+        )
+        yield DETAIL.format(values)
+
+    def trailer_records(self):
+        yield TRAILER.format({"sequencial": self._next_sequence()})
@@ -0,0 +1,342 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+"""Native CNAB remessa writers.
+
+The remessa is built from the same remessa_values dict sent to the
+BRCobranca API, so a bank/layout with a native writer doesn't need the
+BRCobranca service anymore. Each record is described by a list of fixed
+width fields and the file is written record by record to a stream; the
+written records are read back to check the payment count, the total
+amount and the record sequence.
+
+Only the layouts registered with register_remessa_writer are native, so
+far Banco do Brasil, Bradesco, Itau and Unicred CNAB 400 and Caixa and
+Sicredi CNAB 240. The other bank/layout pairs of constants/br_cobranca.py
+are still generated by BRCobranca.
+"""
+
+import io
+import unicodedata
+from collections import namedtuple
+from datetime import date, datetime
+
+from odoo import _
+from odoo.exceptions import Warning as ValidationError
+
+# kind: "9" numeric (right aligned, zero filled)
+#       "X" alphanumeric (left aligned, space filled)
+RecordField = namedtuple("RecordField", "name, size, kind, default")
+
+REMESSA_WRITERS = {}
+
+
+def register_remessa_writer(bank_name, cnab_type):
+    def decorator(writer_class):
+        REMESSA_WRITERS[(bank_name, cnab_type)] = writer_class
+        return writer_class
+
+    return decorator
+
+
+def get_remessa_writer(bank_name, cnab_type):
+    """Return the native writer class of the bank and CNAB layout,
+    or None when the remessa must be generated by BRCobranca."""
+    return REMESSA_WRITERS.get((bank_name, cnab_type))
+
+
+def field(name, size, kind="X", default=None):
+    return RecordField(name, size, kind, default)
+
+
+def remove_accents(value):
+    return (
+        unicodedata.normalize("NFKD", str(value))
+        .encode("ascii", "ignore")
+        .decode("ascii")
+    )
+
+
+def only_digits(value):
+    return "".join(c for c in str(value or "") if c.isdigit())
+
+
+def format_numeric(value, size):
+    value = "".join(c for c in str(value or 0) if c.isdigit()) or "0"
+    return value.rjust(size, "0")[-size:]
+
+
+def format_alpha(value, size):
+    value = remove_accents(value or "")
+    return value.ljust(size, " ")[:size]
+
+
+def format_amount(value, size=13):
+    """Amount in cents, 0000000030000 for 300.00"""
+    return format_numeric(int(round(float(value or 0.0) * 100)), size)
+
+
+def tipo_inscricao(documento, size=2):
+    """Document type of the CNAB records, 1 for a CPF and 2 for a CNPJ"""
+    return format_numeric(1 if len(only_digits(documento)) == 11 else 2, size)
+
+
+def format_date(value, date_format="%d%m%y", empty="000000"):
+    if not value:
+        return empty
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%Y/%m/%d").date()
+    return value.strftime(date_format)
+
+
+def format_long_date(value):
+    """Date of the CNAB 240 records, 16062021"""
+    return format_date(value, "%d%m%Y", "00000000")
+
+
+class RecordSpec(object):
+    """Fixed width record layout"""
+
+    def __init__(self, fields, size):
+        self.fields = fields
+        self.size = size
+        self.positions = {}
+        start = 0
+        for record_field in fields:
+            self.positions[record_field.name] = slice(
+                start, start + record_field.size
+            )
+            start += record_field.size
+        if start != size:
+            raise ValueError(
+                "Record layout has {} positions instead of {}".format(start, size)
+            )
+
+    def read(self, record, name):
+        """Raw value of the field name in a formatted record"""
+        return record[self.positions[name]]
+
+    def format(self, values):
+        parts = []
+        for record_field in self.fields:
+            value = values.get(record_field.name, record_field.default)
+            if record_field.kind == "9":
+                parts.append(format_numeric(value, record_field.size))
+            else:
+                parts.append(format_alpha(value, record_field.size))
+        return "".join(parts)
+
+
+class RemessaWriter(object):
+    """Base class of the native remessa writers.
+
+    Subclasses implement header_records, detail_records and
+    trailer_records; detail_records may yield several records
+    (segments) for one payment. record_specs maps the record types to
+    their layout, the written file is checked with the detail amount and
+    the sequence fields of these layouts.
+    """
+
+    record_size = 400
+    line_separator = "\r\n"
+    encoding = "ascii"
+
+    record_specs = {}
+    detail_record_type = "1"
+    trailer_record_type = "9"
+    amount_field = "valor"
+    sequence_field = "sequencial"
+
+    def __init__(self, remessa_values):
+        self.values = remessa_values
+        self.pagamentos = remessa_values.get("pagamentos", [])
+        self.generation_date = remessa_values.get("data_geracao") or date.today()
+        self.sequence = 0
+
+    def validate_values(self):
+        if not self.pagamentos:
+            raise ValidationError(_("The payment order has no payment lines."))
+
+    def header_records(self):
+        return []
+
+    def detail_records(self, pagamento):
+        return []
+
+    def trailer_records(self):
+        return []
+
+    def _next_sequence(self):
+        self.sequence += 1
+        return self.sequence
+
+    def iter_records(self):
+        """Yield the file lines one by one"""
+        self.validate_values()
+        self.sequence = 0
+
+        for record in self.header_records():
+            yield record
+
+        for pagamento in self.pagamentos:
+            for record in self.detail_records(pagamento):
+                yield record
+
+        for record in self.trailer_records():
+            yield record
+
+    def record_type(self, record):
+        return record[:1]
+
+    def _new_summary(self):
+        return {"records": 0, "details": 0, "amount": 0, "trailer_sequence": 0}
+
+    def _check_record_size(self, record):
+        if len(record) != self.record_size:
+            raise ValidationError(
+                _("Invalid CNAB record size %s, expected %s:\n%s")
+                % (len(record), self.record_size, record)
+            )
+
+    def read_record(self, record, summary):
+        """Add a written record to the summary of the file"""
+        self._check_record_size(record)
+        summary["records"] += 1
+        record_type = self.record_type(record)
+        spec = self.record_specs.get(record_type)
+        if spec is None:
+            return
+        if self.sequence_field in spec.positions:
+            sequence = int(spec.read(record, self.sequence_field))
+            if sequence != summary["records"]:
+                raise ValidationError(
+                    _("CNAB remessa record %s has the sequence %s.")
+                    % (summary["records"], sequence)
+                )
+            if record_type == self.trailer_record_type:
+                summary["trailer_sequence"] = sequence
+        if record_type == self.detail_record_type:
+            summary["details"] += 1
+            summary["amount"] += int(spec.read(record, self.amount_field))
+
+    def write(self, stream):
+        """Write the remessa to a binary stream, record by record"""
+        summary = self._new_summary()
+        for record in self.iter_records():
+            self.read_record(record, summary)
+            stream.write(
+                (record + self.line_separator).encode(self.encoding, "replace")
+            )
+        self.validate_file(summary)
+        return summary["records"]
+
+    def validate_file(self, summary):
+        """Check the records written against the payments"""
+        if summary["details"] != len(self.pagamentos):
+            raise ValidationError(
+                _("CNAB remessa has %s payments instead of %s.")
+                % (summary["details"], len(self.pagamentos))
+            )
+        expected_amount = sum(
+            int(round(float(p.get("valor") or 0.0) * 100)) for p in self.pagamentos
+        )
+        if summary["amount"] != expected_amount:
+            raise ValidationError(
+                _("CNAB remessa total %s doesn't match the payments total %s.")
+                % (summary["amount"] / 100.0, expected_amount / 100.0)
+            )
+        if summary["trailer_sequence"] != summary["records"]:
+            raise ValidationError(
+                _("CNAB remessa has %s records but the trailer sequence is %s.")
+                % (summary["records"], summary["trailer_sequence"])
+            )
+
+    def generate(self):
+        """Return the remessa file content"""
+        stream = io.BytesIO()
+        self.write(stream)
+        return stream.getvalue()
+
+
+class Cnab240RemessaWriter(RemessaWriter):
+    """Base class of the CNAB 240 writers.
+
+    The remessa has a single lot: the file header, the lot header, the
+    segments of each payment, the lot trailer and the file trailer. The
+    record type is at position 8 and the segment letter of the detail
+    records at position 14, so record_specs uses "3P", "3Q", ... for the
+    segments. The sequence of the segments restarts in each lot and the
+    trailers hold the record and lot counts instead of a sequence.
+    """
+
+    record_size = 240
+    detail_record_type = "3P"
+    lot_header_record_type = "1"
+    lot_trailer_record_type = "5"
+    trailer_record_type = "9"
+
+    def __init__(self, remessa_values):
+        super().__init__(remessa_values)
+        self.generation_time = (
+            remessa_values.get("hora_geracao") or datetime.now().strftime("%H%M%S")
+        )
+        self.lot_sequence = 0
+
+    def _next_lot_sequence(self):
+        self.lot_sequence += 1
+        return self.lot_sequence
+
+    def iter_records(self):
+        """Count the yielded records, the sequence is only written in the
+        file trailer"""
+        self.lot_sequence = 0
+        for record in super().iter_records():
+            self.sequence += 1
+            yield record
+
+    def record_type(self, record):
+        if record[7:8] == "3":
+            return record[7:8] + record[13:14]
+        return record[7:8]
+
+    def _new_summary(self):
+        summary = super()._new_summary()
+        summary.update({"lots": 0, "lot_records": 0})
+        return summary
+
+    def _check_count(self, record, spec, name, expected, summary):
+        count = int(spec.read(record, name))
+        if count != expected:
+            raise ValidationError(
+                _("CNAB remessa record %s has %s %s instead of %s.")
+                % (summary["records"], count, name, expected)
+            )
+
+    def read_record(self, record, summary):
+        """Add a written record to the summary of the file"""
+        self._check_record_size(record)
+        summary["records"] += 1
+        record_type = self.record_type(record)
+        if record_type == self.lot_header_record_type:
+            summary["lots"] += 1
+            summary["lot_records"] = 0
+        summary["lot_records"] += 1
+        spec = self.record_specs.get(record_type)
+        if spec is None:
+            return
+        if record_type[:1] == "3":
+            self._check_count(
+                record, spec, self.sequence_field, summary["lot_records"] - 1, summary
+            )
+        elif record_type == self.lot_trailer_record_type:
+            self._check_count(
+                record, spec, "quantidade_registros", summary["lot_records"], summary
+            )
+        elif record_type == self.trailer_record_type:
+            self._check_count(
+                record, spec, "quantidade_lotes", summary["lots"], summary
+            )
+            summary["trailer_sequence"] = int(spec.read(record, "quantidade_registros"))
+        if record_type == self.detail_record_type:
+            summary["details"] += 1
+            summary["amount"] += int(spec.read(record, self.amount_field))
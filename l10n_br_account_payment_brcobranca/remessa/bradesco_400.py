@@ -0,0 +1,176 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+"""Bradesco CNAB 400 remessa, same layout as BRCobranca
+lib/brcobranca/remessa/cnab400/bradesco.rb"""
+
+from .base import (
+    RecordSpec,
+    RemessaWriter,
+    field,
+    format_amount,
+    format_date,
+    format_numeric,
+    register_remessa_writer,
+)
+
+HEADER = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "0"),
+        field("operacao", 1, "9", "1"),
+        field("literal_remessa", 7, "X", "REMESSA"),
+        field("codigo_servico", 2, "9", "01"),
+        field("literal_servico", 15, "X", "COBRANCA"),
+        field("codigo_empresa", 20, "9"),
+        field("empresa_mae", 30, "X"),
+        field("codigo_banco", 3, "9", "237"),
+        field("nome_banco", 15, "X", "BRADESCO"),
+        field("data_geracao", 6, "9"),
+        field("brancos_1", 8, "X"),
+        field("identificacao_sistema", 2, "X", "MX"),
+        field("sequencial_remessa", 7, "9"),
+        field("brancos_2", 277, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+DETAIL = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "1"),
+        field("agencia_debito", 5, "9"),
+        field("digito_agencia_debito", 1, "9"),
+        field("razao_conta_debito", 5, "9"),
+        field("conta_debito", 7, "9"),
+        field("digito_conta_debito", 1, "9"),
+        field("identificacao_empresa", 17, "9"),
+        field("documento_ou_numero", 25, "X"),
+        field("codigo_banco_debito", 3, "9"),
+        field("codigo_multa", 1, "9", "0"),
+        field("percentual_multa", 4, "9"),
+        field("nosso_numero", 11, "9"),
+        field("digito_nosso_numero", 1, "X"),
+        field("desconto_dia", 10, "9"),
+        field("condicao_emissao", 1, "9", "2"),
+        field("emite_debito", 1, "X", "N"),
+        field("operacao_banco", 10, "X"),
+        field("indicador_rateio", 1, "X"),
+        field("endereco_aviso", 1, "9", "2"),
+        field("quantidade_pagamentos", 2, "X"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("numero", 10, "X"),
+        field("data_vencimento", 6, "9"),
+        field("valor", 13, "9"),
+        field("banco_cobrador", 3, "9"),
+        field("agencia_depositaria", 5, "9"),
+        field("especie_titulo", 2, "9", "01"),
+        field("aceite", 1, "X", "N"),
+        field("data_emissao", 6, "9"),
+        field("cod_primeira_instrucao", 2, "9", "00"),
+        field("cod_segunda_instrucao", 2, "9", "00"),
+        field("valor_mora", 13, "9"),
+        field("data_desconto", 6, "9"),
+        field("valor_desconto", 13, "9"),
+        field("valor_iof", 13, "9"),
+        field("valor_abatimento", 13, "9"),
+        field("identificacao_sacado", 2, "9"),
+        field("documento_sacado", 14, "9"),
+        field("nome_sacado", 40, "X"),
+        field("endereco_sacado", 40, "X"),
+        field("primeira_mensagem", 12, "X"),
+        field("cep_sacado", 5, "9"),
+        field("sufixo_cep_sacado", 3, "9"),
+        field("segunda_mensagem", 60, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+TRAILER = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "9"),
+        field("brancos", 393, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+
+def digito_nosso_numero(carteira, nosso_numero):
+    """Modulo 11 base 7 check digit of the carteira + nosso numero"""
+    digits = format_numeric(carteira, 2) + format_numeric(nosso_numero, 11)
+    total = 0
+    weight = 2
+    for digit in reversed(digits):
+        total += int(digit) * weight
+        weight = 2 if weight == 7 else weight + 1
+    rest = total % 11
+    if rest == 0:
+        return "0"
+    if rest == 1:
+        return "P"
+    return str(11 - rest)
+
+
+@register_remessa_writer("bradesco", "400")
+class Bradesco400(RemessaWriter):
+    record_specs = {"0": HEADER, "1": DETAIL, "9": TRAILER}
+
+    def header_records(self):
+        values = self.values
+        yield HEADER.format(
+            {
+                "codigo_empresa": values.get("codigo_empresa"),
+                "empresa_mae": values.get("empresa_mae"),
+                "data_geracao": format_date(self.generation_date),
+                "sequencial_remessa": values.get("sequencial_remessa"),
+                "sequencial": self._next_sequence(),
+            }
+        )
+
+    def _identificacao_empresa(self):
+        values = self.values
+        return "0{}{}{}{}".format(
+            format_numeric(values.get("carteira"), 3),
+            format_numeric(values.get("agencia"), 5),
+            format_numeric(values.get("conta_corrente"), 7),
+            format_numeric(values.get("digito_conta"), 1),
+        )
+
+    def detail_records(self, pagamento):
+        cep = format_numeric(pagamento.get("cep_sacado"), 8)
+        documento_sacado = "".join(
+            c for c in str(pagamento.get("documento_sacado") or "") if c.isdigit()
+        )
+        numero = pagamento.get("numero") or ""
+        values = dict(
+            pagamento,
+            identificacao_empresa=self._identificacao_empresa(),
+            documento_ou_numero=pagamento.get("documento") or numero,
+            percentual_multa=int(
+                round(float(pagamento.get("percentual_multa") or 0.0) * 100)
+            ),
+            digito_nosso_numero=digito_nosso_numero(
+                self.values.get("carteira"), pagamento.get("nosso_numero")
+            ),
+            numero=numero,
+            data_vencimento=format_date(pagamento.get("data_vencimento")),
+            valor=format_amount(pagamento.get("valor")),
+            data_emissao=format_date(
+                pagamento.get("data_emissao") or self.generation_date
+            ),
+            valor_mora=format_amount(pagamento.get("valor_mora")),
+            data_desconto=format_date(pagamento.get("data_desconto")),
+            valor_desconto=format_amount(pagamento.get("valor_desconto")),
+            valor_iof=format_amount(pagamento.get("valor_iof")),
+            valor_abatimento=format_amount(pagamento.get("valor_abatimento")),
+            identificacao_sacado="01" if len(documento_sacado) == 11 else "02",
+            documento_sacado=documento_sacado,
+            cep_sacado=cep[:5],
+            sufixo_cep_sacado=cep[5:],
+            sequencial=self._next_sequence(),
+        )
+        yield DETAIL.format(values)
+
+    def trailer_records(self):
+        yield TRAILER.format({"sequencial": self._next_sequence()})
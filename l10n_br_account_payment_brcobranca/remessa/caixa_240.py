@@ -0,0 +1,286 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+"""Caixa Economica Federal CNAB 240 remessa, same layout as BRCobranca
+lib/brcobranca/remessa/cnab240/caixa.rb"""
+
+from .base import (
+    Cnab240RemessaWriter,
+    RecordSpec,
+    field,
+    format_amount,
+    format_long_date,
+    format_numeric,
+    register_remessa_writer,
+    tipo_inscricao,
+)
+
+HEADER = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "104"),
+        field("lote", 4, "9", "0000"),
+        field("tipo_registro", 1, "9", "0"),
+        field("brancos_1", 9, "X"),
+        field("tipo_inscricao", 1, "9"),
+        field("documento_cedente", 14, "9"),
+        field("uso_caixa_1", 20, "9"),
+        field("agencia", 5, "9"),
+        field("digito_agencia", 1, "X"),
+        field("convenio", 6, "9"),
+        field("uso_caixa_2", 7, "9"),
+        field("uso_caixa_3", 1, "9"),
+        field("empresa_mae", 30, "X"),
+        field("nome_banco", 30, "X", "CAIXA ECONOMICA FEDERAL"),
+        field("brancos_2", 10, "X"),
+        field("codigo_remessa", 1, "9", "1"),
+        field("data_geracao", 8, "9"),
+        field("hora_geracao", 6, "9"),
+        field("sequencial_remessa", 6, "9"),
+        field("versao_layout", 3, "9", "050"),
+        field("densidade", 5, "9"),
+        field("reservado_banco", 20, "X"),
+        field("reservado_empresa", 20, "X", "REMESSA-PRODUCAO"),
+        field("versao_aplicativo", 4, "X"),
+        field("brancos_3", 25, "X"),
+    ],
+    240,
+)
+
+LOT_HEADER = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "104"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "1"),
+        field("operacao", 1, "X", "R"),
+        field("servico", 2, "9", "01"),
+        field("zeros_1", 2, "9"),
+        field("versao_layout", 3, "9", "030"),
+        field("brancos_1", 1, "X"),
+        field("tipo_inscricao", 1, "9"),
+        field("documento_cedente", 15, "9"),
+        field("convenio", 6, "9"),
+        field("uso_caixa_1", 14, "9"),
+        field("agencia", 5, "9"),
+        field("digito_agencia", 1, "X"),
+        field("convenio_2", 6, "9"),
+        field("modelo_personalizado", 7, "9"),
+        field("uso_caixa_2", 1, "9"),
+        field("empresa_mae", 30, "X"),
+        field("mensagem_1", 40, "X"),
+        field("mensagem_2", 40, "X"),
+        field("sequencial_remessa", 8, "9"),
+        field("data_gravacao", 8, "9"),
+        field("data_credito", 8, "9"),
+        field("brancos_2", 33, "X"),
+    ],
+    240,
+)
+
+SEGMENT_P = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "104"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "3"),
+        field("sequencial", 5, "9"),
+        field("segmento", 1, "X", "P"),
+        field("brancos_1", 1, "X"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("agencia", 5, "9"),
+        field("digito_agencia", 1, "X"),
+        field("convenio", 6, "9"),
+        field("uso_caixa_1", 11, "9"),
+        field("modalidade_carteira", 2, "9", "14"),
+        field("nosso_numero", 15, "9"),
+        field("carteira", 1, "9", "1"),
+        field("forma_cadastramento", 1, "9", "1"),
+        field("tipo_documento", 1, "X", "2"),
+        field("emissao_boleto", 1, "9", "2"),
+        field("distribuicao_boleto", 1, "X", "0"),
+        field("numero", 11, "9"),
+        field("brancos_2", 4, "X"),
+        field("data_vencimento", 8, "9"),
+        field("valor", 15, "9"),
+        field("agencia_cobradora", 5, "9"),
+        field("digito_agencia_cobradora", 1, "9"),
+        field("especie_titulo", 2, "9", "99"),
+        field("aceite", 1, "X", "N"),
+        field("data_emissao", 8, "9"),
+        field("tipo_mora", 1, "9", "3"),
+        field("data_mora", 8, "9"),
+        field("valor_mora", 15, "9"),
+        field("cod_desconto", 1, "9", "0"),
+        field("data_desconto", 8, "9"),
+        field("valor_desconto", 15, "9"),
+        field("valor_iof", 15, "9"),
+        field("valor_abatimento", 15, "9"),
+        field("uso_empresa", 25, "X"),
+        field("codigo_protesto", 1, "9", "3"),
+        field("dias_protesto", 2, "9"),
+        field("codigo_baixa", 1, "9", "1"),
+        field("dias_baixa", 3, "9", "120"),
+        field("codigo_moeda", 2, "9", "09"),
+        field("uso_caixa_2", 10, "9"),
+        field("brancos_3", 1, "X"),
+    ],
+    240,
+)
+
+SEGMENT_Q = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "104"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "3"),
+        field("sequencial", 5, "9"),
+        field("segmento", 1, "X", "Q"),
+        field("brancos_1", 1, "X"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("identificacao_sacado", 1, "9"),
+        field("documento_sacado", 15, "9"),
+        field("nome_sacado", 40, "X"),
+        field("endereco_sacado", 40, "X"),
+        field("bairro_sacado", 15, "X"),
+        field("cep_sacado", 8, "9"),
+        field("cidade_sacado", 15, "X"),
+        field("uf_sacado", 2, "X"),
+        field("tipo_inscricao_avalista", 1, "9"),
+        field("documento_avalista", 15, "9"),
+        field("nome_avalista", 40, "X"),
+        field("banco_correspondente", 3, "9"),
+        field("nosso_numero_correspondente", 20, "X"),
+        field("brancos_2", 8, "X"),
+    ],
+    240,
+)
+
+SEGMENT_R = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "104"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "3"),
+        field("sequencial", 5, "9"),
+        field("segmento", 1, "X", "R"),
+        field("brancos_1", 1, "X"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("cod_desconto_2", 1, "9"),
+        field("data_desconto_2", 8, "9"),
+        field("valor_desconto_2", 15, "9"),
+        field("cod_desconto_3", 1, "9"),
+        field("data_desconto_3", 8, "9"),
+        field("valor_desconto_3", 15, "9"),
+        field("codigo_multa", 1, "9", "0"),
+        field("data_multa", 8, "9"),
+        field("valor_multa", 15, "9"),
+        field("brancos_2", 151, "X"),
+    ],
+    240,
+)
+
+LOT_TRAILER = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "104"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "5"),
+        field("brancos_1", 9, "X"),
+        field("quantidade_registros", 6, "9"),
+        field("quantidade_simples", 6, "9"),
+        field("valor_simples", 17, "9"),
+        field("quantidade_caucionada", 6, "9"),
+        field("valor_caucionada", 17, "9"),
+        field("quantidade_descontada", 6, "9"),
+        field("valor_descontada", 17, "9"),
+        field("brancos_2", 148, "X"),
+    ],
+    240,
+)
+
+TRAILER = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "104"),
+        field("lote", 4, "9", "9999"),
+        field("tipo_registro", 1, "9", "9"),
+        field("brancos_1", 9, "X"),
+        field("quantidade_lotes", 6, "9"),
+        field("quantidade_registros", 6, "9"),
+        field("brancos_2", 211, "X"),
+    ],
+    240,
+)
+
+
+@register_remessa_writer("caixa", "240")
+class Caixa240(Cnab240RemessaWriter):
+    record_specs = {
+        "0": HEADER,
+        "1": LOT_HEADER,
+        "3P": SEGMENT_P,
+        "3Q": SEGMENT_Q,
+        "3R": SEGMENT_R,
+        "5": LOT_TRAILER,
+        "9": TRAILER,
+    }
+
+    def _account_values(self):
+        values = self.values
+        return {
+            "tipo_inscricao": tipo_inscricao(values.get("documento_cedente"), 1),
+            "documento_cedente": values.get("documento_cedente"),
+            "agencia": values.get("agencia"),
+            "digito_agencia": values.get("digito_agencia"),
+            "convenio": values.get("convenio"),
+            "empresa_mae": values.get("empresa_mae"),
+        }
+
+    def header_records(self):
+        values = self.values
+        generation_date = format_long_date(self.generation_date)
+        yield HEADER.format(
+            dict(
+                self._account_values(),
+                data_geracao=generation_date,
+                hora_geracao=self.generation_time,
+                sequencial_remessa=values.get("sequencial_remessa"),
+            )
+        )
+        yield LOT_HEADER.format(
+            dict(
+                self._account_values(),
+                convenio_2=values.get("convenio"),
+                sequencial_remessa=values.get("sequencial_remessa"),
+                data_gravacao=generation_date,
+            )
+        )
+
+    def detail_records(self, pagamento):
+        remessa = self.values
+        numero = format_numeric(pagamento.get("numero"), 11)
+        values = dict(
+            pagamento,
+            agencia=remessa.get("agencia"),
+            digito_agencia=remessa.get("digito_agencia"),
+            convenio=remessa.get("convenio"),
+            numero=numero,
+            data_vencimento=format_long_date(pagamento.get("data_vencimento")),
+            valor=format_amount(pagamento.get("valor"), 15),
+            data_emissao=format_long_date(
+                pagamento.get("data_emissao") or self.generation_date
+            ),
+            data_mora=format_long_date(pagamento.get("data_mora")),
+            valor_mora=format_amount(pagamento.get("valor_mora"), 15),
+            data_desconto=format_long_date(pagamento.get("data_desconto")),
+            valor_desconto=format_amount(pagamento.get("valor_desconto"), 15),
+            valor_iof=format_amount(pagamento.get("valor_iof"), 15),
+            valor_abatimento=format_amount(pagamento.get("valor_abatimento"), 15),
+            uso_empresa=numero,
+            identificacao_sacado=tipo_inscricao(pagamento.get("documento_sacado"), 1),
+            data_multa=format_long_date(pagamento.get("data_multa")),
+            valor_multa=format_amount(pagamento.get("percentual_multa"), 15),
+        )
+        for spec in (SEGMENT_P, SEGMENT_Q, SEGMENT_R):
+            values["sequencial"] = self._next_lot_sequence()
+            yield spec.format(values)
+
+    def trailer_records(self):
+        yield LOT_TRAILER.format({"quantidade_registros": self.lot_sequence + 2})
+        yield TRAILER.format(
+            {"quantidade_lotes": 1, "quantidade_registros": self.sequence + 1}
+        )
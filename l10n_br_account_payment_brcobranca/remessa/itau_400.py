@@ -0,0 +1,150 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+"""Itau CNAB 400 remessa, same layout as BRCobranca
+lib/brcobranca/remessa/cnab400/itau.rb"""
+
+from .base import (
+    RecordSpec,
+    RemessaWriter,
+    field,
+    format_amount,
+    format_date,
+    register_remessa_writer,
+    tipo_inscricao,
+)
+
+HEADER = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "0"),
+        field("operacao", 1, "9", "1"),
+        field("literal_remessa", 7, "X", "REMESSA"),
+        field("codigo_servico", 2, "9", "01"),
+        field("literal_servico", 15, "X", "COBRANCA"),
+        field("agencia", 4, "9"),
+        field("zeros", 2, "9"),
+        field("conta_corrente", 5, "9"),
+        field("digito_conta", 1, "9"),
+        field("brancos_1", 8, "X"),
+        field("empresa_mae", 30, "X"),
+        field("codigo_banco", 3, "9", "341"),
+        field("nome_banco", 15, "X", "BANCO ITAU SA"),
+        field("data_geracao", 6, "9"),
+        field("brancos_2", 294, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+DETAIL = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "1"),
+        field("tipo_inscricao", 2, "9"),
+        field("documento_cedente", 14, "9"),
+        field("agencia", 4, "9"),
+        field("zeros_1", 2, "9"),
+        field("conta_corrente", 5, "9"),
+        field("digito_conta", 1, "9"),
+        field("brancos_1", 4, "X"),
+        field("codigo_instrucao", 4, "9"),
+        field("documento_ou_numero", 25, "X"),
+        field("nosso_numero", 8, "9"),
+        field("quantidade_moeda", 13, "9"),
+        field("carteira", 3, "9"),
+        field("uso_banco", 21, "X"),
+        field("codigo_carteira", 1, "X", "I"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("numero", 10, "X"),
+        field("data_vencimento", 6, "9"),
+        field("valor", 13, "9"),
+        field("codigo_banco", 3, "9", "341"),
+        field("agencia_cobradora", 5, "9"),
+        field("especie_titulo", 2, "9", "99"),
+        field("aceite", 1, "X", "N"),
+        field("data_emissao", 6, "9"),
+        field("cod_primeira_instrucao", 2, "9", "00"),
+        field("cod_segunda_instrucao", 2, "9", "00"),
+        field("valor_mora", 13, "9"),
+        field("data_desconto", 6, "9"),
+        field("valor_desconto", 13, "9"),
+        field("valor_iof", 13, "9"),
+        field("valor_abatimento", 13, "9"),
+        field("identificacao_sacado", 2, "9"),
+        field("documento_sacado", 14, "9"),
+        field("nome_sacado", 30, "X"),
+        field("brancos_2", 10, "X"),
+        field("endereco_sacado", 40, "X"),
+        field("bairro_sacado", 12, "X"),
+        field("cep_sacado", 8, "9"),
+        field("cidade_sacado", 15, "X"),
+        field("uf_sacado", 2, "X"),
+        field("nome_avalista", 30, "X"),
+        field("brancos_3", 4, "X"),
+        field("data_mora", 6, "9"),
+        field("dias_protesto", 2, "9"),
+        field("brancos_4", 1, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+TRAILER = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "9"),
+        field("brancos", 393, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+
+@register_remessa_writer("itau", "400")
+class Itau400(RemessaWriter):
+    record_specs = {"0": HEADER, "1": DETAIL, "9": TRAILER}
+
+    def header_records(self):
+        values = self.values
+        yield HEADER.format(
+            {
+                "agencia": values.get("agencia"),
+                "conta_corrente": values.get("conta_corrente"),
+                "digito_conta": values.get("digito_conta"),
+                "empresa_mae": values.get("empresa_mae"),
+                "data_geracao": format_date(self.generation_date),
+                "sequencial": self._next_sequence(),
+            }
+        )
+
+    def detail_records(self, pagamento):
+        remessa = self.values
+        documento_sacado = pagamento.get("documento_sacado")
+        numero = pagamento.get("numero") or ""
+        values = dict(
+            pagamento,
+            tipo_inscricao=tipo_inscricao(remessa.get("documento_cedente")),
+            documento_cedente=remessa.get("documento_cedente"),
+            agencia=remessa.get("agencia"),
+            conta_corrente=remessa.get("conta_corrente"),
+            digito_conta=remessa.get("digito_conta"),
+            documento_ou_numero=pagamento.get("documento") or numero,
+            carteira=remessa.get("carteira"),
+            numero=numero,
+            data_vencimento=format_date(pagamento.get("data_vencimento")),
+            valor=format_amount(pagamento.get("valor")),
+            data_emissao=format_date(
+                pagamento.get("data_emissao") or self.generation_date
+            ),
+            valor_mora=format_amount(pagamento.get("valor_mora")),
+            data_desconto=format_date(pagamento.get("data_desconto")),
+            valor_desconto=format_amount(pagamento.get("valor_desconto")),
+            valor_iof=format_amount(pagamento.get("valor_iof")),
+            valor_abatimento=format_amount(pagamento.get("valor_abatimento")),
+            identificacao_sacado=tipo_inscricao(documento_sacado),
+            documento_sacado=documento_sacado,
+            data_mora=format_date(pagamento.get("data_mora")),
+            sequencial=self._next_sequence(),
+        )
+        yield DETAIL.format(values)
+
+    def trailer_records(self):
+        yield TRAILER.format({"sequencial": self._next_sequence()})
@@ -0,0 +1,298 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+"""Sicredi CNAB 240 remessa, same layout as BRCobranca
+lib/brcobranca/remessa/cnab240/sicredi.rb"""
+
+from .base import (
+    Cnab240RemessaWriter,
+    RecordSpec,
+    field,
+    format_amount,
+    format_long_date,
+    only_digits,
+    register_remessa_writer,
+    tipo_inscricao,
+)
+
+HEADER = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "748"),
+        field("lote", 4, "9", "0000"),
+        field("tipo_registro", 1, "9", "0"),
+        field("brancos_1", 9, "X"),
+        field("tipo_inscricao", 1, "9"),
+        field("documento_cedente", 14, "9"),
+        field("convenio", 20, "X"),
+        field("agencia", 5, "9"),
+        field("digito_agencia", 1, "X"),
+        field("conta_corrente", 12, "9"),
+        field("digito_conta", 1, "X"),
+        field("digito_agencia_conta", 1, "X"),
+        field("empresa_mae", 30, "X"),
+        field("nome_banco", 30, "X", "SICREDI"),
+        field("brancos_2", 10, "X"),
+        field("codigo_remessa", 1, "9", "1"),
+        field("data_geracao", 8, "9"),
+        field("hora_geracao", 6, "9"),
+        field("sequencial_remessa", 6, "9"),
+        field("versao_layout", 3, "9", "081"),
+        field("densidade", 5, "9", "01600"),
+        field("reservado_banco", 20, "X"),
+        field("reservado_empresa", 20, "X"),
+        field("brancos_3", 29, "X"),
+    ],
+    240,
+)
+
+LOT_HEADER = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "748"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "1"),
+        field("operacao", 1, "X", "R"),
+        field("servico", 2, "9", "01"),
+        field("brancos_1", 2, "X"),
+        field("versao_layout", 3, "9", "040"),
+        field("brancos_2", 1, "X"),
+        field("tipo_inscricao", 1, "9"),
+        field("documento_cedente", 15, "9"),
+        field("convenio", 20, "X"),
+        field("agencia", 5, "9"),
+        field("digito_agencia", 1, "X"),
+        field("conta_corrente", 12, "9"),
+        field("digito_conta", 1, "X"),
+        field("digito_agencia_conta", 1, "X"),
+        field("empresa_mae", 30, "X"),
+        field("mensagem_1", 40, "X"),
+        field("mensagem_2", 40, "X"),
+        field("sequencial_remessa", 8, "9"),
+        field("data_gravacao", 8, "9"),
+        field("data_credito", 8, "9"),
+        field("brancos_3", 33, "X"),
+    ],
+    240,
+)
+
+SEGMENT_P = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "748"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "3"),
+        field("sequencial", 5, "9"),
+        field("segmento", 1, "X", "P"),
+        field("brancos_1", 1, "X"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("agencia", 5, "9"),
+        field("digito_agencia", 1, "X"),
+        field("conta_corrente", 12, "9"),
+        field("digito_conta", 1, "X"),
+        field("digito_agencia_conta", 1, "X"),
+        field("nosso_numero", 20, "X"),
+        field("carteira", 1, "9", "1"),
+        field("forma_cadastramento", 1, "9", "1"),
+        field("tipo_documento", 1, "X", "1"),
+        field("emissao_boleto", 1, "9", "2"),
+        field("distribuicao_boleto", 1, "X", "2"),
+        field("numero", 15, "9"),
+        field("data_vencimento", 8, "9"),
+        field("valor", 15, "9"),
+        field("agencia_cobradora", 5, "9"),
+        field("digito_agencia_cobradora", 1, "X"),
+        field("especie_titulo", 2, "9", "03"),
+        field("aceite", 1, "X", "N"),
+        field("data_emissao", 8, "9"),
+        field("tipo_mora", 1, "9", "3"),
+        field("data_mora", 8, "9"),
+        field("valor_mora", 15, "9"),
+        field("cod_desconto", 1, "9", "1"),
+        field("data_desconto", 8, "9"),
+        field("valor_desconto", 15, "9"),
+        field("valor_iof", 15, "9"),
+        field("valor_abatimento", 15, "9"),
+        field("uso_empresa", 25, "X"),
+        field("codigo_protesto", 1, "9", "0"),
+        field("dias_protesto", 2, "9"),
+        field("codigo_baixa", 1, "9", "1"),
+        field("dias_baixa", 3, "9", "060"),
+        field("codigo_moeda", 2, "9", "09"),
+        field("contrato", 10, "9"),
+        field("uso_livre", 1, "X"),
+    ],
+    240,
+)
+
+SEGMENT_Q = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "748"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "3"),
+        field("sequencial", 5, "9"),
+        field("segmento", 1, "X", "Q"),
+        field("brancos_1", 1, "X"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("identificacao_sacado", 1, "9"),
+        field("documento_sacado", 15, "9"),
+        field("nome_sacado", 40, "X"),
+        field("endereco_sacado", 40, "X"),
+        field("bairro_sacado", 15, "X"),
+        field("cep_sacado", 8, "9"),
+        field("cidade_sacado", 15, "X"),
+        field("uf_sacado", 2, "X"),
+        field("tipo_inscricao_avalista", 1, "9"),
+        field("documento_avalista", 15, "9"),
+        field("nome_avalista", 40, "X"),
+        field("banco_correspondente", 3, "9"),
+        field("nosso_numero_correspondente", 20, "X"),
+        field("brancos_2", 8, "X"),
+    ],
+    240,
+)
+
+SEGMENT_R = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "748"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "3"),
+        field("sequencial", 5, "9"),
+        field("segmento", 1, "X", "R"),
+        field("brancos_1", 1, "X"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("cod_desconto_2", 1, "9"),
+        field("data_desconto_2", 8, "9"),
+        field("valor_desconto_2", 15, "9"),
+        field("cod_desconto_3", 1, "9"),
+        field("data_desconto_3", 8, "9"),
+        field("valor_desconto_3", 15, "9"),
+        field("codigo_multa", 1, "9", "0"),
+        field("data_multa", 8, "9"),
+        field("valor_multa", 15, "9"),
+        field("informacao_sacado", 10, "X"),
+        field("mensagem_3", 40, "X"),
+        field("mensagem_4", 40, "X"),
+        field("brancos_2", 20, "X"),
+        field("ocorrencia_sacado", 8, "9"),
+        field("banco_debito", 3, "9"),
+        field("agencia_debito", 5, "9"),
+        field("digito_agencia_debito", 1, "X"),
+        field("conta_debito", 12, "9"),
+        field("digito_conta_debito", 1, "X"),
+        field("digito_agencia_conta_debito", 1, "X"),
+        field("aviso_debito", 1, "9"),
+        field("brancos_3", 9, "X"),
+    ],
+    240,
+)
+
+LOT_TRAILER = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "748"),
+        field("lote", 4, "9", "0001"),
+        field("tipo_registro", 1, "9", "5"),
+        field("brancos_1", 9, "X"),
+        field("quantidade_registros", 6, "9"),
+        field("quantidade_simples", 6, "9"),
+        field("valor_simples", 17, "9"),
+        field("quantidade_vinculada", 6, "9"),
+        field("valor_vinculada", 17, "9"),
+        field("quantidade_caucionada", 6, "9"),
+        field("valor_caucionada", 17, "9"),
+        field("quantidade_descontada", 6, "9"),
+        field("valor_descontada", 17, "9"),
+        field("aviso_lancamento", 8, "X"),
+        field("brancos_2", 117, "X"),
+    ],
+    240,
+)
+
+TRAILER = RecordSpec(
+    [
+        field("codigo_banco", 3, "9", "748"),
+        field("lote", 4, "9", "9999"),
+        field("tipo_registro", 1, "9", "9"),
+        field("brancos_1", 9, "X"),
+        field("quantidade_lotes", 6, "9"),
+        field("quantidade_registros", 6, "9"),
+        field("quantidade_contas", 6, "9"),
+        field("brancos_2", 205, "X"),
+    ],
+    240,
+)
+
+
+@register_remessa_writer("sicredi", "240")
+class Sicredi240(Cnab240RemessaWriter):
+    record_specs = {
+        "0": HEADER,
+        "1": LOT_HEADER,
+        "3P": SEGMENT_P,
+        "3Q": SEGMENT_Q,
+        "3R": SEGMENT_R,
+        "5": LOT_TRAILER,
+        "9": TRAILER,
+    }
+
+    def _account_values(self):
+        values = self.values
+        return {
+            "tipo_inscricao": tipo_inscricao(values.get("documento_cedente"), 1),
+            "documento_cedente": values.get("documento_cedente"),
+            "agencia": values.get("agencia"),
+            "conta_corrente": values.get("conta_corrente"),
+            "digito_conta": values.get("digito_conta"),
+            "empresa_mae": values.get("empresa_mae"),
+        }
+
+    def header_records(self):
+        values = self.values
+        generation_date = format_long_date(self.generation_date)
+        yield HEADER.format(
+            dict(
+                self._account_values(),
+                data_geracao=generation_date,
+                hora_geracao=self.generation_time,
+                sequencial_remessa=values.get("sequencial_remessa"),
+            )
+        )
+        yield LOT_HEADER.format(
+            dict(
+                self._account_values(),
+                sequencial_remessa=values.get("sequencial_remessa"),
+                data_gravacao=generation_date,
+            )
+        )
+
+    def detail_records(self, pagamento):
+        remessa = self.values
+        numero = only_digits(pagamento.get("numero"))
+        values = dict(
+            pagamento,
+            agencia=remessa.get("agencia"),
+            conta_corrente=remessa.get("conta_corrente"),
+            digito_conta=remessa.get("digito_conta"),
+            numero=numero,
+            data_vencimento=format_long_date(pagamento.get("data_vencimento")),
+            valor=format_amount(pagamento.get("valor"), 15),
+            data_emissao=format_long_date(
+                pagamento.get("data_emissao") or self.generation_date
+            ),
+            data_mora=format_long_date(pagamento.get("data_mora")),
+            valor_mora=format_amount(pagamento.get("valor_mora"), 15),
+            data_desconto=format_long_date(pagamento.get("data_desconto")),
+            valor_desconto=format_amount(pagamento.get("valor_desconto"), 15),
+            valor_iof=format_amount(pagamento.get("valor_iof"), 15),
+            valor_abatimento=format_amount(pagamento.get("valor_abatimento"), 15),
+            uso_empresa=numero.rjust(25),
+            identificacao_sacado=tipo_inscricao(pagamento.get("documento_sacado"), 1),
+            data_multa=format_long_date(pagamento.get("data_multa")),
+            valor_multa=format_amount(pagamento.get("percentual_multa"), 15),
+        )
+        for spec in (SEGMENT_P, SEGMENT_Q, SEGMENT_R):
+            values["sequencial"] = self._next_lot_sequence()
+            yield spec.format(values)
+
+    def trailer_records(self):
+        yield LOT_TRAILER.format({"quantidade_registros": self.lot_sequence + 2})
+        yield TRAILER.format(
+            {"quantidade_lotes": 1, "quantidade_registros": self.sequence + 1}
+        )
@@ -0,0 +1,155 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+"""Unicred CNAB 400 remessa, same layout as BRCobranca
+lib/brcobranca/remessa/cnab400/unicred.rb"""
+
+from .base import (
+    RecordSpec,
+    RemessaWriter,
+    field,
+    format_amount,
+    format_date,
+    format_numeric,
+    register_remessa_writer,
+    tipo_inscricao,
+)
+
+HEADER = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "0"),
+        field("operacao", 1, "9", "1"),
+        field("literal_remessa", 7, "X", "REMESSA"),
+        field("codigo_servico", 2, "9", "01"),
+        field("literal_servico", 15, "X", "COBRANCA"),
+        field("codigo_beneficiario", 20, "9"),
+        field("empresa_mae", 30, "X"),
+        field("codigo_banco", 3, "9", "136"),
+        field("nome_banco", 15, "X", "UNICRED"),
+        field("data_geracao", 6, "9"),
+        field("brancos_1", 7, "X"),
+        field("codigo_variacao", 3, "9"),
+        field("sequencial_remessa", 7, "9"),
+        field("brancos_2", 277, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+DETAIL = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "1"),
+        field("agencia", 5, "9"),
+        field("digito_agencia", 1, "X"),
+        field("conta_corrente", 12, "9"),
+        field("digito_conta", 1, "X"),
+        field("zero_1", 1, "9"),
+        field("carteira", 3, "9"),
+        field("zeros_1", 13, "9"),
+        field("documento", 25, "X"),
+        field("codigo_banco", 3, "9", "136"),
+        field("zeros_2", 2, "9"),
+        field("brancos_1", 25, "X"),
+        field("zero_2", 1, "9"),
+        field("codigo_multa", 1, "9", "3"),
+        field("valor_multa", 10, "9"),
+        field("tipo_mora", 1, "9", "5"),
+        field("indicador_rateio", 1, "X", "N"),
+        field("brancos_2", 2, "X"),
+        field("identificacao_ocorrencia", 2, "9", "01"),
+        field("numero", 10, "X"),
+        field("data_vencimento", 6, "9"),
+        field("valor", 13, "9"),
+        field("zeros_3", 10, "9"),
+        field("cod_desconto", 1, "9", "0"),
+        field("data_emissao", 6, "9"),
+        field("zero_3", 1, "9"),
+        field("codigo_protesto", 1, "9", "3"),
+        field("dias_protesto", 2, "9"),
+        field("valor_mora", 13, "9"),
+        field("data_desconto", 6, "9"),
+        field("valor_desconto", 13, "9"),
+        field("nosso_numero", 10, "9"),
+        field("digito_nosso_numero", 1, "9"),
+        field("zeros_4", 2, "9"),
+        field("valor_abatimento", 13, "9"),
+        field("identificacao_sacado", 2, "9"),
+        field("documento_sacado", 14, "9"),
+        field("nome_sacado", 40, "X"),
+        field("endereco_sacado", 40, "X"),
+        field("bairro_sacado", 12, "X"),
+        field("cep_sacado", 8, "9"),
+        field("cidade_sacado", 20, "X"),
+        field("uf_sacado", 2, "X"),
+        field("nome_avalista", 38, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+TRAILER = RecordSpec(
+    [
+        field("tipo_registro", 1, "9", "9"),
+        field("brancos", 393, "X"),
+        field("sequencial", 6, "9"),
+    ],
+    400,
+)
+
+
+def digito_nosso_numero(nosso_numero):
+    """Modulo 11 check digit of the nosso numero, weights 2 to 9"""
+    total = 0
+    weight = 2
+    for digit in reversed(format_numeric(nosso_numero, 10)):
+        total += int(digit) * weight
+        weight = 2 if weight == 9 else weight + 1
+    digit = 11 - total % 11
+    return "0" if digit > 9 else str(digit)
+
+
+@register_remessa_writer("unicred", "400")
+class Unicred400(RemessaWriter):
+    record_specs = {"0": HEADER, "1": DETAIL, "9": TRAILER}
+
+    def header_records(self):
+        values = self.values
+        yield HEADER.format(
+            {
+                "codigo_beneficiario": values.get("codigo_beneficiario"),
+                "empresa_mae": values.get("empresa_mae"),
+                "data_geracao": format_date(self.generation_date),
+                "sequencial_remessa": values.get("sequencial_remessa"),
+                "sequencial": self._next_sequence(),
+            }
+        )
+
+    def detail_records(self, pagamento):
+        remessa = self.values
+        documento_sacado = pagamento.get("documento_sacado")
+        values = dict(
+            pagamento,
+            agencia=remessa.get("agencia"),
+            digito_agencia=remessa.get("digito_agencia"),
+            conta_corrente=remessa.get("conta_corrente"),
+            digito_conta=remessa.get("digito_conta"),
+            carteira=remessa.get("carteira"),
+            valor_multa=format_amount(pagamento.get("percentual_multa"), 10),
+            data_vencimento=format_date(pagamento.get("data_vencimento")),
+            valor=format_amount(pagamento.get("valor")),
+            data_emissao=format_date(
+                pagamento.get("data_emissao") or self.generation_date
+            ),
+            valor_mora=format_amount(pagamento.get("valor_mora")),
+            data_desconto=format_date(pagamento.get("data_desconto")),
+            valor_desconto=format_amount(pagamento.get("valor_desconto")),
+            digito_nosso_numero=digito_nosso_numero(pagamento.get("nosso_numero")),
+            valor_abatimento=format_amount(pagamento.get("valor_abatimento")),
+            identificacao_sacado=tipo_inscricao(documento_sacado),
+            documento_sacado=documento_sacado,
+            sequencial=self._next_sequence(),
+        )
+        yield DETAIL.format(values)
+
+    def trailer_records(self):
+        yield TRAILER.format({"sequencial": self._next_sequence()})
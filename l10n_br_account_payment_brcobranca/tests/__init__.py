@@ -1,2 +1,3 @@
 from . import test_payment_order
 from . import test_return_import
+from . import test_remessa_writer
@@ -0,0 +1,388 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html)
+
+import logging
+import time
+from datetime import date
+
+from odoo.exceptions import Warning as ValidationError
+from odoo.modules import get_resource_path
+from odoo.tests import SavepointCase, tagged
+
+from ..remessa import get_remessa_writer
+from ..remessa import sicredi_240
+from ..remessa.bradesco_400 import TRAILER
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("post_install", "-at_install")
+class TestRemessaWriter(SavepointCase):
+    def _get_bradesco_400_values(self, pagamentos=None):
+        pagamento = {
+            "documento_sacado": "11034414000158",
+            "nome_sacado": "AKRETION LTDA",
+            "endereco_sacado": "AVENIDA PAULISTA, 807, SAO PAULO/SP",
+            "cep_sacado": "01311915",
+            "numero": "00000005/0",
+            "identificacao_ocorrencia": "01",
+            "data_emissao": "2021/08/06",
+        }
+        if pagamentos is None:
+            pagamentos = [
+                dict(
+                    pagamento,
+                    valor=300.0,
+                    data_vencimento="2021/08/06",
+                    nosso_numero=1,
+                ),
+                dict(
+                    pagamento,
+                    valor=700.0,
+                    data_vencimento="2021/09/30",
+                    nosso_numero=2,
+                ),
+            ]
+        return {
+            "carteira": "3",
+            "agencia": "01611",
+            "conta_corrente": 395,
+            "digito_conta": "0",
+            "empresa_mae": "SUA EMPRESA LTDA",
+            "codigo_empresa": 1222130126,
+            "sequencial_remessa": 1,
+            "data_geracao": date(2021, 8, 6),
+            "pagamentos": pagamentos,
+        }
+
+    def _get_sacado(self, **values):
+        sacado = {
+            "documento_sacado": "11034414000158",
+            "nome_sacado": "AKRETION LTDA",
+            "endereco_sacado": "AVENIDA PAULISTA 807",
+            "bairro_sacado": "CENTRO",
+            "cep_sacado": "01311915",
+            "cidade_sacado": "SAO PAULO",
+            "uf_sacado": "SP",
+            "identificacao_ocorrencia": "01",
+        }
+        sacado.update(values)
+        return sacado
+
+    def _read_remessa_file(self, file_name):
+        file_name = get_resource_path(
+            "l10n_br_account_payment_brcobranca", "tests", "data", file_name
+        )
+        with open(file_name, "rb") as f:
+            return f.read()
+
+    def test_bradesco_400(self):
+        """The native writer generates the same file as BRCobranca"""
+        writer = get_remessa_writer("bradesco", "400")
+        self.assertTrue(writer)
+        self.assertEqual(
+            writer(self._get_bradesco_400_values()).generate(),
+            self._read_remessa_file("teste_remessa_bradesco400.REM"),
+        )
+
+    def test_banco_brasil_400(self):
+        writer = get_remessa_writer("banco_brasil", "400")
+        pagamento = self._get_sacado(data_emissao="2021/08/06")
+        values = {
+            "carteira": "18",
+            "variacao_carteira": "019",
+            "agencia": "7030",
+            "digito_agencia": "0",
+            "conta_corrente": 5384,
+            "digito_conta": "8",
+            "convenio": 1234,
+            "convenio_lider": 7654321,
+            "empresa_mae": "SUA EMPRESA LTDA",
+            "documento_cedente": "97231608000169",
+            "sequencial_remessa": 1,
+            "data_geracao": date(2021, 8, 6),
+            "pagamentos": [
+                dict(
+                    pagamento,
+                    valor=300.0,
+                    data_vencimento="2021/08/06",
+                    nosso_numero=1,
+                    numero="1",
+                ),
+                dict(
+                    pagamento,
+                    valor=700.0,
+                    data_vencimento="2021/09/30",
+                    nosso_numero=2,
+                    numero="2",
+                ),
+            ],
+        }
+        self.assertEqual(
+            writer(values).generate(),
+            self._read_remessa_file("teste_remessa_bb400.REM"),
+        )
+
+    def test_itau_400(self):
+        writer = get_remessa_writer("itau", "400")
+        pagamento = self._get_sacado(
+            data_emissao="2021/08/06", numero="00000003/0", dias_protesto="3"
+        )
+        values = {
+            "carteira": "175",
+            "agencia": "8515",
+            "conta_corrente": 15016,
+            "digito_conta": "0",
+            "empresa_mae": "SUA EMPRESA LTDA",
+            "documento_cedente": "97231608000169",
+            "sequencial_remessa": 1,
+            "data_geracao": date(2021, 8, 6),
+            "pagamentos": [
+                dict(
+                    pagamento,
+                    valor=300.0,
+                    data_vencimento="2021/08/06",
+                    nosso_numero=1,
+                ),
+                dict(
+                    pagamento,
+                    valor=700.0,
+                    data_vencimento="2021/09/30",
+                    nosso_numero=2,
+                ),
+            ],
+        }
+        # The test file was generated with a 10 digits nosso numero, its
+        # detail records have 402 positions: the 2 extra zeros at positions
+        # 63 and 64, before the 8 positions nosso numero, are dropped.
+        remessa_file = self._read_remessa_file("teste_remessa_itau400.REM")
+        expected = [
+            line[:62] + line[64:] if len(line) == 402 else line
+            for line in remessa_file.decode("ascii").split("\r\n")
+        ]
+        self.assertEqual(
+            writer(values).generate().decode("ascii").split("\r\n"), expected
+        )
+
+    def test_unicred_400(self):
+        writer = get_remessa_writer("unicred", "400")
+        pagamento = self._get_sacado(
+            data_emissao="2021/06/16",
+            codigo_multa="2",
+            percentual_multa=2.0,
+            tipo_mora="2",
+            valor_mora=2.0,
+            codigo_protesto="2",
+            dias_protesto="5",
+            cod_desconto="0",
+        )
+        values = {
+            "carteira": "21",
+            "agencia": "01234",
+            "digito_agencia": "3",
+            "conta_corrente": 371,
+            "digito_conta": "9",
+            "codigo_beneficiario": 92035760,
+            "empresa_mae": "SUA EMPRESA LTDA",
+            "documento_cedente": "97231608000169",
+            "sequencial_remessa": 1,
+            "data_geracao": date(2021, 6, 16),
+            "pagamentos": [
+                dict(
+                    pagamento,
+                    valor=300.0,
+                    data_vencimento="2021/06/16",
+                    nosso_numero=1,
+                    numero="0000003/01",
+                ),
+                dict(
+                    pagamento,
+                    valor=700.0,
+                    data_vencimento="2021/07/31",
+                    nosso_numero=2,
+                    numero="0000003/02",
+                ),
+            ],
+        }
+        # The test file uses \n as line separator and has a CODIGO_BENEFICIARIO
+        # placeholder in the blank positions 376 to 394 of the header.
+        remessa_file = self._read_remessa_file("teste_remessa-unicred_400-1.REM")
+        remessa_file = remessa_file.replace(b"CODIGO_BENEFICIARIO", b" " * 19)
+        expected = remessa_file.decode("ascii").splitlines()
+        self.assertEqual(
+            writer(values).generate().decode("ascii").splitlines(), expected
+        )
+
+    def _get_sicredi_240_values(self):
+        pagamento = self._get_sacado(numero="00000003/0")
+        return {
+            "carteira": "1",
+            "agencia": "01234",
+            "conta_corrente": "331",
+            "digito_conta": "0",
+            "empresa_mae": "SUA EMPRESA LTDA",
+            "documento_cedente": "97231608000169",
+            "sequencial_remessa": 1,
+            "posto": "01",
+            "byte_idt": "2",
+            "data_geracao": date(2021, 8, 11),
+            "hora_geracao": "223018",
+            "pagamentos": [
+                dict(
+                    pagamento,
+                    valor=300.0,
+                    data_vencimento="2021/08/12",
+                    nosso_numero="0000000001",
+                ),
+                dict(
+                    pagamento,
+                    valor=700.0,
+                    data_vencimento="2021/09/30",
+                    nosso_numero="0000000002",
+                ),
+            ],
+        }
+
+    def test_sicredi_240(self):
+        writer = get_remessa_writer("sicredi", "240")
+        self.assertEqual(
+            writer(self._get_sicredi_240_values()).generate(),
+            self._read_remessa_file("teste_remessa_sicredi240.REM"),
+        )
+
+    def test_caixa_240(self):
+        writer = get_remessa_writer("caixa", "240")
+        pagamento = self._get_sacado(numero="00000004/0", nosso_numero=1)
+        values = {
+            "carteira": "14",
+            "agencia": "01565",
+            "digito_agencia": "1",
+            "conta_corrente": 0,
+            "digito_conta": "0",
+            "convenio": 122,
+            "empresa_mae": "SUA EMPRESA LTDA",
+            "documento_cedente": "97231608000169",
+            "data_geracao": date(2021, 6, 16),
+        }
+        first = dict(pagamento, codigo_protesto="0", codigo_baixa="2", dias_baixa="0")
+        remessas = [
+            (
+                "teste_remessa-cef_240-1.REM",
+                "190820",
+                [
+                    dict(first, valor=300.0, data_vencimento="2021/06/16"),
+                    dict(
+                        first,
+                        valor=700.0,
+                        data_vencimento="2021/07/31",
+                        nosso_numero=2,
+                    ),
+                ],
+            ),
+        ]
+        # One remessa for each movement code of the same payment
+        for sequence, file_name, ocorrencia, valor, hora_geracao in (
+            (2, "data_venc", "06", 300.0, "191750"),
+            (3, "protesto", "09", 300.0, "192058"),
+            (4, "sust_prot_mant_carteira", "11", 300.0, "192412"),
+            (5, "conceder_abatimento", "04", 300.0, "192645"),
+            (6, "cancelar_abatimento", "05", 300.0, "193101"),
+            (7, "conceder_desconto", "07", 300.0, "193239"),
+            (8, "cancelar_desconto", "08", 300.0, "193445"),
+            (9, "alt_valor_titulo", "47", 200.0, "193916"),
+            (10, "alt_valor_titulo", "47", 150.0, "194229"),
+        ):
+            remessas.append(
+                (
+                    "teste_remessa-cef_240-{}-{}.REM".format(sequence, file_name),
+                    hora_geracao,
+                    [
+                        dict(
+                            pagamento,
+                            identificacao_ocorrencia=ocorrencia,
+                            valor=valor,
+                            data_vencimento="2021/07/07",
+                        )
+                    ],
+                )
+            )
+        for sequence, (file_name, hora_geracao, pagamentos) in enumerate(remessas):
+            remessa = writer(
+                dict(
+                    values,
+                    sequencial_remessa=sequence + 1,
+                    hora_geracao=hora_geracao,
+                    pagamentos=pagamentos,
+                )
+            ).generate()
+            # The test files use \n as line separator and their trailing
+            # blanks were removed.
+            self.assertEqual(
+                [line.rstrip() for line in remessa.decode("ascii").splitlines()],
+                self._read_remessa_file(file_name).decode("ascii").splitlines(),
+                file_name,
+            )
+
+    def test_cnab_240_invalid_file(self):
+        """The lot and file trailers are checked against the records"""
+        writer = get_remessa_writer("sicredi", "240")
+
+        class WrongLotTrailer(writer):
+            def trailer_records(self):
+                yield sicredi_240.LOT_TRAILER.format({"quantidade_registros": 3})
+                yield sicredi_240.TRAILER.format(
+                    {"quantidade_lotes": 1, "quantidade_registros": self.sequence + 1}
+                )
+
+        class WrongTrailer(writer):
+            def trailer_records(self):
+                yield sicredi_240.LOT_TRAILER.format(
+                    {"quantidade_registros": self.lot_sequence + 2}
+                )
+                yield sicredi_240.TRAILER.format(
+                    {"quantidade_lotes": 1, "quantidade_registros": 3}
+                )
+
+        for wrong_writer in (WrongLotTrailer, WrongTrailer):
+            with self.assertRaises(ValidationError):
+                wrong_writer(self._get_sicredi_240_values()).generate()
+
+    def test_no_native_writer(self):
+        """Banks without native writer still use BRCobranca"""
+        self.assertIsNone(get_remessa_writer("santander", "400"))
+
+    def test_empty_remessa(self):
+        writer = get_remessa_writer("bradesco", "400")
+        with self.assertRaises(ValidationError):
+            writer(self._get_bradesco_400_values(pagamentos=[])).generate()
+
+    def test_bradesco_400_invalid_file(self):
+        """The written records are checked against the payments"""
+        writer = get_remessa_writer("bradesco", "400")
+
+        class WrongAmount(writer):
+            def detail_records(self, pagamento):
+                return super().detail_records(dict(pagamento, valor=1.0))
+
+        class WrongTrailer(writer):
+            def trailer_records(self):
+                yield TRAILER.format({"sequencial": 1})
+
+        for wrong_writer in (WrongAmount, WrongTrailer):
+            with self.assertRaises(ValidationError):
+                wrong_writer(self._get_bradesco_400_values()).generate()
+
+    def test_bradesco_400_benchmark(self):
+        writer = get_remessa_writer("bradesco", "400")
+        values = self._get_bradesco_400_values()
+        pagamento = values["pagamentos"][0]
+        values["pagamentos"] = [
+            dict(pagamento, nosso_numero=i + 1) for i in range(5000)
+        ]
+        start = time.perf_counter()
+        remessa = writer(values).generate()
+        _logger.info(
+            "Bradesco CNAB 400 remessa with 5000 payments generated in %.3fs",
+            time.perf_counter() - start,
+        )
+        self.assertEqual(len(remessa.splitlines()), 5002)
@@ -0,0 +1,34 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+from erpbrasil.base.misc import punctuation_rm
+
+
+def migrate(cr, version):
+    """Fill the new res_partner.cnpj_cpf_stripped column with a single
+    UPDATE, so the ORM doesn't need to compute it partner by partner during
+    the update. The values are stripped with the same function as the
+    field compute method."""
+    cr.execute(
+        """
+        ALTER TABLE res_partner
+        ADD COLUMN IF NOT EXISTS cnpj_cpf_stripped VARCHAR
+        """
+    )
+    cr.execute(
+        """
+        SELECT DISTINCT cnpj_cpf FROM res_partner
+        WHERE cnpj_cpf IS NOT NULL AND cnpj_cpf != ''
+        """
+    )
+    cnpj_cpfs = [row[0] for row in cr.fetchall()]
+    if not cnpj_cpfs:
+        return
+    cr.execute(
+        """
+        UPDATE res_partner p
+        SET cnpj_cpf_stripped = v.stripped
+        FROM unnest(%s, %s) AS v(cnpj_cpf, stripped)
+        WHERE p.cnpj_cpf = v.cnpj_cpf
+        """,
+        (cnpj_cpfs, [punctuation_rm(value) or None for value in cnpj_cpfs]),
+    )
@@ -5,6 +5,7 @@
 
 import logging
 import re
+from collections import defaultdict
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
@@ -12,6 +13,7 @@ from odoo.exceptions import UserError, ValidationError
 _logger = logging.getLogger(__name__)
 
 try:
+    from erpbrasil.base import misc
     from erpbrasil.base.fiscal import cnpj_cpf, ie
 except ImportError:
     _logger.error("Biblioteca erpbrasil.base não instalada")
@@ -35,37 +37,68 @@ class Partner(models.Model):
 
     union_entity_code = fields.Char(string="Union Entity code")
 
+    cnpj_cpf_stripped = fields.Char(
+        string="CNPJ/CPF Stripped",
+        compute="_compute_cnpj_cpf_stripped",
+        store=True,
+        index=True,
+        help="CNPJ/CPF without punctuation, used to search duplicated partners",
+    )
+
+    @api.depends("cnpj_cpf")
+    def _compute_cnpj_cpf_stripped(self):
+        for record in self:
+            record.cnpj_cpf_stripped = (
+                misc.punctuation_rm(record.cnpj_cpf) or False
+                if record.cnpj_cpf
+                else False
+            )
+
+    def _get_partners_by_cnpj_cpf(self):
+        """Return a dict with the partners sharing the CNPJ/CPF of the
+        records in self, grouped by the stripped CNPJ/CPF, with a single
+        query for the whole recordset."""
+        partners_by_cnpj_cpf = defaultdict(lambda: self.browse())
+        cnpj_cpfs = set(self.mapped("cnpj_cpf_stripped"))
+        if not cnpj_cpfs:
+            return partners_by_cnpj_cpf
+
+        partners = self.search([("cnpj_cpf_stripped", "in", list(cnpj_cpfs))])
+        for partner in partners:
+            partners_by_cnpj_cpf[partner.cnpj_cpf_stripped] |= partner
+        return partners_by_cnpj_cpf
+
     @api.constrains("cnpj_cpf", "inscr_est")
     def _check_cnpj_inscr_est(self):
-        for record in self:
-            domain = []
+        if self.env.context.get("disable_allow_cnpj_multi_ie"):
+            return
 
-            # permite cnpj vazio
-            if not record.cnpj_cpf:
-                return
+        # permite cnpj vazio
+        records = self.filtered("cnpj_cpf")
+        if not records:
+            return
 
-            if self.env.context.get("disable_allow_cnpj_multi_ie"):
-                return
+        allow_cnpj_multi_ie = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_br_base.allow_cnpj_multi_ie", default=True)
+        )
 
-            allow_cnpj_multi_ie = (
-                record.env["ir.config_parameter"]
-                .sudo()
-                .get_param("l10n_br_base.allow_cnpj_multi_ie", default=True)
-            )
+        partners_by_cnpj_cpf = records._get_partners_by_cnpj_cpf()
 
-            if record.parent_id:
-                domain += [
-                    ("id", "not in", record.parent_id.ids),
-                    ("parent_id", "not in", record.parent_id.ids),
-                ]
+        for record in records:
+            partners = partners_by_cnpj_cpf[record.cnpj_cpf_stripped] - record
 
-            domain += [("cnpj_cpf", "=", record.cnpj_cpf), ("id", "!=", record.id)]
+            if record.parent_id:
+                partners = partners.filtered(
+                    lambda p: p != record.parent_id and p.parent_id != record.parent_id
+                )
 
             # se encontrar CNPJ iguais
-            if record.env["res.partner"].search(domain):
+            if partners:
                 if cnpj_cpf.validar_cnpj(record.cnpj_cpf):
                     if allow_cnpj_multi_ie == "True":
-                        for partner in record.env["res.partner"].search(domain):
+                        for partner in partners:
                             if (
                                 partner.inscr_est == record.inscr_est
                                 and not record.inscr_est
@@ -143,6 +176,7 @@ class Partner(models.Model):
         this method call others methods because this validation is State wise
         :Return: True or False.
         """
+        inscr_est_lines = self.mapped("state_tax_number_ids")
         for record in self:
             for inscr_est_line in record.state_tax_number_ids:
                 state_code = inscr_est_line.state_id.code or ""
@@ -157,16 +191,28 @@ class Partner(models.Model):
                             " number per state for each partner!"
                         )
                     )
-                duplicate_ie = record.search(
-                    [
-                        ("state_id", "=", inscr_est_line.state_id.id),
-                        ("inscr_est", "=", inscr_est_line.inscr_est),
-                    ]
+
+        if not inscr_est_lines:
+            return
+
+        partners_by_state_ie = defaultdict(lambda: self.browse())
+        partners = self.search(
+            [
+                ("state_id", "in", inscr_est_lines.mapped("state_id").ids),
+                ("inscr_est", "in", list(set(inscr_est_lines.mapped("inscr_est")))),
+            ]
+        )
+        for partner in partners:
+            partners_by_state_ie[(partner.state_id.id, partner.inscr_est)] |= partner
+
+        for inscr_est_line in inscr_est_lines:
+            duplicate_ie = partners_by_state_ie[
+                (inscr_est_line.state_id.id, inscr_est_line.inscr_est)
+            ]
+            if duplicate_ie:
+                raise ValidationError(
+                    _("State Tax Number already used" " %s" % duplicate_ie[0].name)
                 )
-                if duplicate_ie:
-                    raise ValidationError(
-                        _("State Tax Number already used" " %s" % duplicate_ie.name)
-                    )
 
     @api.model
     def _address_fields(self):
@@ -164,6 +164,36 @@ class ValidCreateIdTest(SavepointCase):
                 self.partner_invalid_cpf
             )
 
+    def test_part_duplicated_cpf_batch(self):
+        """Test if ValidationError raised when creating several partners
+        with the same CPF in a single .create()"""
+        partner_duplicated = dict(self.partner_valid, cnpj_cpf="73441962206")
+        with self.assertRaises(ValidationError):
+            self.env["res.partner"].with_context(tracking_disable=True).create(
+                [self.partner_valid, partner_duplicated]
+            )
+
+    def test_part_cnpj_cpf_stripped(self):
+        """Test the stripped CNPJ/CPF used to search duplicated partners"""
+        partner = (
+            self.env["res.partner"]
+            .with_context(tracking_disable=True)
+            .create(self.partner_valid)
+        )
+        self.assertEqual(partner.cnpj_cpf_stripped, "73441962206")
+
+    def test_part_duplicated_cpf_formatted(self):
+        """Test if ValidationError raised when the same CPF is created
+        formatted and unformatted"""
+        partner_unformatted = dict(self.partner_valid, cnpj_cpf="73441962206")
+        self.env["res.partner"].with_context(tracking_disable=True).create(
+            self.partner_valid
+        )
+        with self.assertRaises(ValidationError):
+            self.env["res.partner"].with_context(tracking_disable=True).create(
+                partner_unformatted
+            )
+
 
 # No test on Inscricao Estadual for partners with CPF
 # because they haven't Inscricao Estadual
@@ -2,5 +2,6 @@
 
 from .hooks import post_init_hook
 
+from . import controllers
 from . import models
 from . import wizards
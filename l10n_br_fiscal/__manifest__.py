@@ -10,7 +10,7 @@
     "maintainers": ["crsilveira"],
     "website": "https://github.com/it-brasil/it_brasil",
     "development_status": "Production/Stable",
-    "version": "14.0.4.6.0",
+    "version": "14.0.4.7.0",
     "depends": [
         "uom",
         "product",
@@ -35,7 +35,6 @@
         "data/l10n_br_fiscal.cst.csv",
         "data/l10n_br_fiscal.tax.csv",
         "data/l10n_br_fiscal.tax.pis.cofins.csv",
-        "data/l10n_br_fiscal.ncm.csv",
         "data/l10n_br_fiscal_server_action.xml",
         "data/ir_cron.xml",
         "data/l10n_br_fiscal_comment_data.xml",
@@ -90,11 +89,14 @@
         #        "views/dfe/dfe_views.xml",
         "views/operation_dashboard_view.xml",
         "views/document_event_view.xml",
+        "views/tax_recompute_view.xml",
         # Wizards
         "wizards/document_cancel_wizard.xml",
         "wizards/document_correction_wizard.xml",
         "wizards/document_status_wizard.xml",
         "wizards/invalidate_number_wizard.xml",
+        "wizards/ibpt_table_wizard.xml",
+        "wizards/document_mass_process_wizard.xml",
         # Actions
         "views/l10n_br_fiscal_action.xml",
         # Menus
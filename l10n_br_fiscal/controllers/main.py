@@ -0,0 +1,42 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+import os
+
+from odoo import http
+from odoo.http import content_disposition, request
+
+from ..models.xml_blob import XML_BLOB_URL
+
+
+class FiscalXmlController(http.Controller):
+    @http.route(XML_BLOB_URL + "<string:checksum>/<string:filename>", auth="user")
+    def fiscal_xml(self, checksum, filename, **kwargs):
+        """Serve the fiscal XML of an attachment the user can read"""
+        attachment = request.env["ir.attachment"].search(
+            [("type", "=", "url"), ("url", "=", request.httprequest.path)], limit=1
+        )
+        blob = request.env["l10n_br_fiscal.xml.blob"]._from_attachment(attachment)
+        if not blob:
+            return request.not_found()
+        return request.make_response(
+            blob.get_content(),
+            [
+                ("Content-Type", attachment.mimetype or "application/xml"),
+                ("Content-Disposition", content_disposition(filename)),
+            ],
+        )
+
+    @http.route("/l10n_br_fiscal/closing/<int:closing_id>/sped_efd", auth="user")
+    def closing_sped_efd(self, closing_id, **kwargs):
+        """Stream the SPED EFD ICMS/IPI file of a fiscal closing"""
+        closing = request.env["l10n_br_fiscal.closing"].browse(closing_id).exists()
+        if not closing:
+            return request.not_found()
+        closing.check_access_rights("read")
+        closing.check_access_rule("read")
+        file_path = closing.sudo().sped_efd_file_path
+        if not file_path or not os.path.exists(file_path):
+            return request.not_found()
+        return http.send_file(
+            file_path, filename=closing.sped_efd_file_name, as_attachment=True
+        )
@@ -4,15 +4,44 @@
 
 import logging
 
-from odoo import _, tools
+from odoo import SUPERUSER_ID, _, api, tools
+
+from .tools.data_loader import bulk_load_csv
 
 _logger = logging.getLogger(__name__)
 
+# Big reference tables loaded with COPY instead of the ORM load()
+BULK_FILES = (
+    "data/l10n_br_fiscal.cnae.csv",
+    "data/l10n_br_fiscal.cfop.csv",
+    "data/l10n_br_fiscal.ncm.csv",
+    "data/l10n_br_fiscal.nbm.csv",
+    "data/l10n_br_fiscal.nbs.csv",
+    "data/l10n_br_fiscal.cest.csv",
+)
+
+
+def _load_file(cr, file, kind="init"):
+    if file in BULK_FILES:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        bulk_load_csv(env, "l10n_br_fiscal", file)
+    else:
+        tools.convert_file(
+            cr,
+            "l10n_br_fiscal",
+            file,
+            None,
+            mode="init",
+            noupdate=True,
+            kind=kind,
+        )
+
 
 def post_init_hook(cr, registry):
     """Import XML data to change core data"""
 
     files = [
+        "data/l10n_br_fiscal.ncm.csv",
         "data/l10n_br_fiscal.cnae.csv",
         "data/l10n_br_fiscal.cfop.csv",
         "data/l10n_br_fiscal_cfop_data.xml",
@@ -30,15 +59,7 @@ def post_init_hook(cr, registry):
     _logger.info(_("Loading l10n_br_fiscal fiscal files. It may take a minute..."))
 
     for file in files:
-        tools.convert_file(
-            cr,
-            "l10n_br_fiscal",
-            file,
-            None,
-            mode="init",
-            noupdate=True,
-            kind="init",
-        )
+        _load_file(cr, file)
 
     if not tools.config["without_demo"]:
         """ import pudb;pu.db
@@ -107,7 +128,6 @@ def post_init_hook(cr, registry):
         # Load full CSV files with few lines unless a flag
         # mention the contrary
         skip_prodfiles = {
-            "skip_ncm": "data/l10n_br_fiscal.ncm.csv",
             "skip_nbm": "data/l10n_br_fiscal.nbm.csv",
             "skip_nbs": "data/l10n_br_fiscal.nbs.csv",
             "skip_cest": "data/l10n_br_fiscal.cest.csv",
@@ -125,15 +145,7 @@ def post_init_hook(cr, registry):
         )
 
         for f in prodfiles:
-            tools.convert_file(
-                cr,
-                "l10n_br_fiscal",
-                f,
-                None,
-                mode="init",
-                noupdate=True,
-                kind="init",
-            )
+            _load_file(cr, f)
 
     # Load post files
     posloadfiles = [
@@ -143,15 +155,7 @@ def post_init_hook(cr, registry):
     _logger.info(_("Loading l10n_br_fiscal post init files. It may take a minute..."))
 
     for file in posloadfiles:
-        tools.convert_file(
-            cr,
-            "l10n_br_fiscal",
-            file,
-            None,
-            mode="init",
-            noupdate=True,
-            kind="init",
-        )
+        _load_file(cr, file)
 
     # Load post demo files
     # if not tools.config["without_demo"]:
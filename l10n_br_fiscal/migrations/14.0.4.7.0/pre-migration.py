@@ -0,0 +1,14 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+
+def migrate(cr, version):
+    """The NCM table is no longer loaded from the manifest but by the
+    bulk loader of the post_init_hook, so its XML ids must be kept when
+    the module is updated."""
+    cr.execute(
+        """
+        UPDATE ir_model_data
+        SET noupdate = TRUE
+        WHERE module = 'l10n_br_fiscal' AND model = 'l10n_br_fiscal.ncm'
+        """
+    )
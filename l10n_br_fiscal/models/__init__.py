@@ -10,6 +10,7 @@ from . import document_fiscal_invoice_mixin
 from . import document_fiscal_line_mixin_methods
 from . import document_fiscal_line_mixin
 from . import document_event
+from . import xml_blob
 from . import document_eletronic
 from . import invalidate_number
 from . import comment
@@ -44,6 +45,7 @@ from . import icms_regulation
 from . import icms_relief
 from . import document_type
 from . import document_serie
+from . import document_serie_block
 from . import payment
 from . import product_genre
 from . import certificate
@@ -71,6 +73,7 @@ from . import subsequent_operation
 from . import subsequent_document
 from . import document_email
 from . import city_taxation_code
+from . import tax_recompute
 
 from . import dfe
 from . import mdfe
@@ -9,11 +9,12 @@ import io
 import logging
 import os
 import tempfile
+import threading
 import zipfile
 from datetime import datetime
 
 from odoo import _, api, fields, models
-from odoo.exceptions import RedirectWarning
+from odoo.exceptions import RedirectWarning, UserError
 
 from ..constants.fiscal import (
     MODELO_FISCAL_CFE,
@@ -29,6 +30,8 @@ from ..constants.fiscal import (
     SITUACAO_EDOC_DENEGADA,
     SITUACAO_EDOC_INUTILIZADA,
 )
+from ..tools.misc import path_edoc_company
+from ..tools.sped_efd import generate_efd_icms_ipi
 
 _logger = logging.getLogger(__name__)
 
@@ -176,6 +179,42 @@ class FiscalClosing(models.Model):
 
     notes = fields.Text(string="Accountant notes")
 
+    icms_due_date = fields.Date(
+        string="ICMS Due Date",
+        help="Due date of the ICMS to pay of the period (SPED EFD E116)",
+    )
+
+    icms_revenue_code = fields.Char(
+        string="ICMS Revenue Code",
+        help="State revenue code of the ICMS to pay of the period "
+        "(SPED EFD E116)",
+    )
+
+    sped_efd_pending = fields.Boolean(
+        string="SPED EFD Pending",
+        readonly=True,
+        copy=False,
+        help="The SPED EFD ICMS/IPI file will be generated in background",
+    )
+
+    sped_efd_file_path = fields.Char(
+        string="SPED EFD File Path",
+        readonly=True,
+        copy=False,
+    )
+
+    sped_efd_file_name = fields.Char(
+        string="SPED EFD File",
+        readonly=True,
+        copy=False,
+    )
+
+    sped_efd_date = fields.Datetime(
+        string="SPED EFD Date",
+        readonly=True,
+        copy=False,
+    )
+
     _sql_constraints = [
         (
             "fiscal_closing_unique",
@@ -218,7 +257,9 @@ class FiscalClosing(models.Model):
             os.makedirs(os.path.dirname(filename))
 
         with open(filename, "wb") as file:
-            file.write(base64.b64decode(anexo.datas))
+            file.write(
+                self.env["l10n_br_fiscal.xml.blob"].get_attachment_content(anexo)
+            )
 
     def _document_domain(self):
         domain = [
@@ -324,6 +365,71 @@ class FiscalClosing(models.Model):
 
         self.write({"zip_file": base64.b64encode(archive.getbuffer()), "state": "open"})
 
+    def action_sped_efd(self):
+        """Queue the generation of the SPED EFD ICMS/IPI file"""
+        for record in self:
+            if record.export_type != "period" or not record.company_id:
+                raise UserError(
+                    _(
+                        "The SPED EFD ICMS/IPI file is generated for a company "
+                        "and a period."
+                    )
+                )
+        self.write({"sped_efd_pending": True})
+
+    def action_sped_efd_download(self):
+        self.ensure_one()
+        if not self.sped_efd_file_path:
+            raise UserError(_("No SPED EFD ICMS/IPI file generated!"))
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/l10n_br_fiscal/closing/%s/sped_efd" % self.id,
+            "target": "self",
+        }
+
+    def _generate_sped_efd(self):
+        self.ensure_one()
+        date_min, date_max = self._date_range()
+        file_path = generate_efd_icms_ipi(
+            self.env,
+            self.company_id,
+            date_min,
+            date_max,
+            os.path.join(path_edoc_company(self.company_id), "sped"),
+            icms_due_date=self.icms_due_date,
+            icms_revenue_code=self.icms_revenue_code,
+        )
+        self.write(
+            {
+                "sped_efd_pending": False,
+                "sped_efd_file_path": file_path,
+                "sped_efd_file_name": os.path.basename(file_path),
+                "sped_efd_date": fields.Datetime.now(),
+            }
+        )
+        self.message_post(
+            body=_("SPED EFD ICMS/IPI file generated: %s") % self.sped_efd_file_name
+        )
+
+    @api.model
+    def _cron_generate_sped_efd(self, auto_commit=None):
+        """Generate the queued SPED EFD ICMS/IPI files, one company and
+        period at a time"""
+        if auto_commit is None:
+            auto_commit = not getattr(threading.currentThread(), "testing", False)
+        for closing in self.search([("sped_efd_pending", "=", True)]):
+            try:
+                with self.env.cr.savepoint():
+                    closing._generate_sped_efd()
+            except Exception as e:
+                _logger.error("SPED EFD error of %s: %s", closing.display_name, e)
+                closing.write({"sped_efd_pending": False})
+                closing.message_post(
+                    body=_("SPED EFD ICMS/IPI file generation failed: %s") % e
+                )
+            if auto_commit:
+                self.env.cr.commit()
+
     def action_close(self):
         """Sobrescrever este método para, notificar seguidores,
         processar documentos anexos, criar contas a pagar"""
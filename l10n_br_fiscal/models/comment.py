@@ -14,6 +14,7 @@ from ..constants.fiscal import (
     COMMENT_TYPE_COMMERCIAL,
     FISCAL_COMMENT_OBJECTS,
 )
+from ..tools.misc import cached_ref
 
 
 class Comment(models.Model):
@@ -154,7 +155,7 @@ class Comment(models.Model):
                 # now we can format values like currency on fiscal observation
                 "format_amount": (
                     lambda amount, context=self._context: self.format_amount(
-                        self.env, amount, self.env.ref("base.BRL")
+                        self.env, amount, cached_ref(self.env, "base.BRL")
                     )
                 ),
             }
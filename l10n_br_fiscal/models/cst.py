@@ -1,7 +1,7 @@
 # Copyright (C) 2018  Renato Lima - Akretion
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
-from odoo import _, fields, models
+from odoo import _, api, fields, models
 
 from ..constants.fiscal import FISCAL_IN_OUT_ALL
 
@@ -31,6 +31,8 @@ class CST(models.Model):
         store=True,
     )
 
+    _code_map_fields = ("code", "active", "tax_group_id")
+
     _sql_constraints = [
         (
             "l10n_br_fiscal_cst_code_tax_group_id_uniq",
@@ -38,3 +40,10 @@ class CST(models.Model):
             _("CST already exists with this code !"),
         )
     ]
+
+    @api.model
+    def get_by_domain_code(self, tax_domain, code):
+        """CST of a tax domain (icms, ipi, pis, cofins...) by its code"""
+        return self.get_by_code(
+            code, field="code", group_field="tax_domain", group=tax_domain
+        )
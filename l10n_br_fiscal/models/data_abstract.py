@@ -6,7 +6,7 @@ import json
 from erpbrasil.base import misc
 from lxml import etree
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 from odoo.osv import expression
 
 
@@ -23,12 +23,67 @@ class DataAbstract(models.AbstractModel):
         string="Unmasked Code", compute="_compute_code_unmasked", store=True, index=True
     )
 
+    # fields whose changes invalidate the code maps (see _get_code_map)
+    _code_map_fields = ("code", "active")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.clear_caches()
+        return records
+
+    def write(self, values):
+        result = super().write(values)
+        if set(self._code_map_fields) & set(values):
+            self.clear_caches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.clear_caches()
+        return result
+
     @api.depends("code")
     def _compute_code_unmasked(self):
         for r in self:
             # TODO mask code and unmasck
             r.code_unmasked = misc.punctuation_rm(r.code)
 
+    @api.model
+    @tools.ormcache("arch")
+    def _get_data_search_arch(self, arch):
+        doc = etree.XML(arch)
+        for node in doc.xpath("//field[@name='code']"):
+            modifiers = json.loads(node.get("modifiers", "{}"))
+            modifiers["filter_domain"] = (
+                "['|', '|', ('code', 'ilike', self), "
+                "('code_unmasked', 'ilike', self + '%'),"
+                "('name', 'ilike', self + '%')]"
+            )
+            node.set("modifiers", json.dumps(modifiers))
+        return etree.tostring(doc)
+
+    @api.model
+    @tools.ormcache("field", "group_field")
+    def _get_code_map(self, field="code_unmasked", group_field=None):
+        """Ids of the records by code, or by (group, code) when group_field
+        is given. The fiscal reference data rarely changes, so the map is
+        kept in the registry cache and cleared when the codes change."""
+        code_map = {}
+        fnames = [field, group_field] if group_field else [field]
+        for values in self.sudo().search_read([(field, "!=", False)], fnames):
+            key = values[field]
+            if group_field:
+                key = (values[group_field], key)
+            code_map.setdefault(key, values["id"])
+        return code_map
+
+    @api.model
+    def get_by_code(self, code, field="code_unmasked", group_field=None, group=None):
+        """Record with the given code, read from the cached code map"""
+        key = (group, code) if group_field else code
+        return self.browse(self._get_code_map(field, group_field).get(key))
+
     @api.model
     def fields_view_get(
         self, view_id=None, view_type="form", toolbar=False, submenu=False
@@ -36,16 +91,7 @@ class DataAbstract(models.AbstractModel):
         model_view = super().fields_view_get(view_id, view_type, toolbar, submenu)
 
         if view_type == "search":
-            doc = etree.XML(model_view["arch"])
-            for node in doc.xpath("//field[@name='code']"):
-                modifiers = json.loads(node.get("modifiers", "{}"))
-                modifiers["filter_domain"] = (
-                    "['|', '|', ('code', 'ilike', self), "
-                    "('code_unmasked', 'ilike', self + '%'),"
-                    "('name', 'ilike', self + '%')]"
-                )
-                node.set("modifiers", json.dumps(modifiers))
-            model_view["arch"] = etree.tostring(doc)
+            model_view["arch"] = self._get_data_search_arch(model_view["arch"])
 
         return model_view
 
@@ -3,12 +3,13 @@
 
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 from erpbrasil.base import misc
 from lxml import etree
 
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 
 from .ibpt.taxes import DeOlhoNoImposto
 
@@ -48,53 +49,102 @@ class DataNcmNbsAbstract(models.AbstractModel):
 
     @api.depends("tax_estimate_ids")
     def _compute_amount(self):
-        for record in self:
-            object_field = OBJECT_FIELDS.get(record._name)
-            last_estimated = record.env["l10n_br_fiscal.tax.estimate"].search(
+        object_field = OBJECT_FIELDS.get(self._name)
+        records = self.filtered("id")
+        last_estimates = {}
+        if records:
+            self.env["l10n_br_fiscal.tax.estimate"].flush(
                 [
-                    (object_field, "=", record.id),
-                    ("company_id", "=", record.env.company.id),
-                ],
-                order="create_date DESC",
-                limit=1,
+                    "ncm_id",
+                    "nbs_id",
+                    "company_id",
+                    "federal_taxes_national",
+                    "federal_taxes_import",
+                    "state_taxes",
+                    "municipal_taxes",
+                ]
+            )
+            # last estimate of each record with a single query
+            self.env.cr.execute(
+                """
+                SELECT DISTINCT ON ({0})
+                    {0}, federal_taxes_national, federal_taxes_import,
+                    state_taxes, municipal_taxes
+                FROM l10n_br_fiscal_tax_estimate
+                WHERE {0} IN %s AND company_id = %s
+                ORDER BY {0}, create_date DESC, id DESC
+                """.format(
+                    object_field
+                ),
+                (tuple(records.ids), self.env.company.id),
             )
+            last_estimates = {row[0]: row[1:] for row in self.env.cr.fetchall()}
 
+        for record in self:
+            last_estimated = last_estimates.get(record.id)
             if last_estimated:
-                record.estimate_tax_imported = (
-                    last_estimated.federal_taxes_import
-                    + last_estimated.state_taxes
-                    + last_estimated.municipal_taxes
-                )
-
-                record.estimate_tax_national = (
-                    last_estimated.federal_taxes_national
-                    + last_estimated.state_taxes
-                    + last_estimated.municipal_taxes
+                national, imported, state, municipal = (
+                    value or 0.0 for value in last_estimated
                 )
+                record.estimate_tax_imported = imported + state + municipal
+                record.estimate_tax_national = national + state + municipal
 
     def _get_ibpt(self, config, code_unmasked):
         return False
 
-    def action_ibpt_inquiry(self):
+    def _ibpt_inquiry_values(self, config):
+        """Query the IBPT web service for each record, in a thread pool of
+        l10n_br_fiscal.ibpt_workers threads, returns {record: result or
+        exception}"""
+        workers = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_br_fiscal.ibpt_workers", 1)
+        )
+
+        def inquiry(code_unmasked):
+            try:
+                return self._get_ibpt(config, code_unmasked)
+            except Exception as e:
+                return e
+
+        codes = self.mapped("code_unmasked")
+        if workers > 1 and len(self) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(inquiry, codes))
+        else:
+            results = [inquiry(code) for code in codes]
+        return dict(zip(self, results))
+
+    def action_ibpt_inquiry(self, post_message=True):
         if not self.env.company.ibpt_api:
             return False
 
         object_name = OBJECT_NAMES.get(self._name)
         object_field = OBJECT_FIELDS.get(self._name)
+        company = self.env.company
 
-        for record in self:
-            try:
-                company = self.env.company
+        config = DeOlhoNoImposto(
+            company.ibpt_token,
+            misc.punctuation_rm(company.cnpj_cpf),
+            company.state_id.code,
+        )
 
-                config = DeOlhoNoImposto(
-                    company.ibpt_token,
-                    misc.punctuation_rm(company.cnpj_cpf),
-                    company.state_id.code,
+        values_list = []
+        for record, result in self._ibpt_inquiry_values(config).items():
+            if isinstance(result, Exception) or not result:
+                _logger.warning(
+                    _("{0} Tax Estimate Failure: {1}").format(object_name, result)
                 )
+                if post_message:
+                    record.message_post(
+                        body=str(result),
+                        subject=_("{} Tax Estimate Failure").format(object_name),
+                    )
+                continue
 
-                result = self._get_ibpt(config, record.code_unmasked)
-
-                values = {
+            values_list.append(
+                {
                     object_field: record.id,
                     "key": result.chave,
                     "origin": result.fonte,
@@ -103,23 +153,41 @@ class DataNcmNbsAbstract(models.AbstractModel):
                     "federal_taxes_national": result.nacional,
                     "federal_taxes_import": result.importado,
                 }
-
-                self.env["l10n_br_fiscal.tax.estimate"].create(values)
-
+            )
+            if post_message:
                 record.message_post(
                     body=_("{} Tax Estimate Updated").format(object_name),
                     subject=_("{} Tax Estimate Updated").format(object_name),
                 )
 
-            except Exception as e:
-                _logger.warning(
-                    _("{0} Tax Estimate Failure: {1}").format(object_name, e)
-                )
-                record.message_post(
-                    body=str(e),
-                    subject=_("{} Tax Estimate Failure").format(object_name),
+        self.env["l10n_br_fiscal.tax.estimate"].create(values_list)
+        return len(values_list)
+
+    def _get_records_to_estimate(self, data_max):
+        """Records used by products without estimate or whose last
+        estimate is older than data_max"""
+        object_field = OBJECT_FIELDS.get(self._name)
+        self.env.cr.execute(
+            """
+            SELECT t.id
+            FROM {table} t
+            LEFT JOIN (
+                SELECT {field}, max(create_date) AS max_date
+                FROM l10n_br_fiscal_tax_estimate
+                WHERE {field} IS NOT NULL
+                GROUP BY {field}
+            ) e ON e.{field} = t.id
+            WHERE (
+                e.max_date IS NULL AND EXISTS (
+                    SELECT 1 FROM product_template p WHERE p.{field} = t.id
                 )
-                continue
+            ) OR e.max_date < %(create_date)s
+            """.format(
+                table=self._table, field=object_field
+            ),
+            {"create_date": data_max.strftime("%Y-%m-%d")},
+        )
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
 
     @api.model
     def _scheduled_update(self):
@@ -132,46 +200,27 @@ class DataNcmNbsAbstract(models.AbstractModel):
         today = fields.date.today()
         data_max = today - timedelta(days=config_date)
 
-        all_records = self.env[self._name].search([])
-
-        not_estimated = all_records.filtered(
-            lambda r: r.product_tmpl_qty > 0 and not r.tax_estimate_ids
-        )
-
-        query = """
-            WITH {0}_max_date AS (
-               SELECT
-                   {0}_id,
-                   max(create_date)
-               FROM
-                   l10n_br_fiscal_tax_estimate
-               GROUP BY {0}_id)
-               SELECT {0}_id
-               FROM {0}_max_date
-            WHERE max < %(create_date)s
-            """.format(
-            object_name.lower()
-        )
-
-        query_params = {"create_date": data_max.strftime("%Y-%m-%d")}
-
-        self.env.cr.execute(self.env.cr.mogrify(query, query_params))
-        past_estimated = self.env.cr.fetchall()
-
-        ids = [estimate[0] for estimate in past_estimated]
-
-        record_past_estimated = self.env[self._name].browse(ids)
-
-        for record in not_estimated + record_past_estimated:
-            try:
-                record.action_ibpt_inquiry()
-            except Exception:
-                continue
+        records = self._get_records_to_estimate(data_max)
+        updated = records.action_ibpt_inquiry(post_message=False)
 
         _logger.info(
-            _("Scheduled {} estimate taxes update complete.").format(object_name)
+            _("Scheduled {} estimate taxes update complete: {}/{} updated.").format(
+                object_name, updated or 0, len(records)
+            )
         )
 
+    @api.model
+    @tools.ormcache("arch")
+    def _get_ibpt_hidden_form_arch(self, arch):
+        xml = etree.XML(arch)
+        xml_button = xml.xpath("//button[@name='action_ibpt_inquiry']")
+        if not xml_button:
+            return arch
+        modifiers = json.loads(xml_button[0].get("modifiers", "{}"))
+        modifiers["invisible"] = 1
+        xml_button[0].set("modifiers", json.dumps(modifiers))
+        return etree.tostring(xml, pretty_print=True)
+
     @api.model
     def fields_view_get(
         self, view_id=None, view_type="form", toolbar=False, submenu=False
@@ -180,14 +229,8 @@ class DataNcmNbsAbstract(models.AbstractModel):
             view_id, view_type, toolbar, submenu
         )
 
-        if view_type == "form":
-            xml = etree.XML(res["arch"])
-            xml_button = xml.xpath("//button[@name='action_ibpt_inquiry']")
-            if xml_button and not self.env.company.ibpt_api:
-                modifiers = json.loads(xml_button[0].get("modifiers", "{}"))
-                modifiers["invisible"] = 1
-                xml_button[0].set("modifiers", json.dumps(modifiers))
-                res["arch"] = etree.tostring(xml, pretty_print=True)
+        if view_type == "form" and not self.env.company.ibpt_api:
+            res["arch"] = self._get_ibpt_hidden_form_arch(res["arch"])
         if res.get("toolbar") and not self.env.company.ibpt_api:
             res["toolbar"]["action"] = []
         return res
@@ -4,8 +4,6 @@
 
 from ast import literal_eval
 
-from erpbrasil.base.fiscal.edoc import ChaveEdoc
-
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
@@ -23,6 +21,7 @@ from ..constants.fiscal import (
     SITUACAO_EDOC_DENEGADA,
     SITUACAO_EDOC_INUTILIZADA,
 )
+from ..tools.edoc_key import check_keys
 
 
 class Document(models.Model):
@@ -227,39 +226,56 @@ class Document(models.Model):
 
     @api.constrains("document_key")
     def _check_key(self):
-        for record in self:
-            if not record.document_key:
-                return
-
-            documents = record.env["l10n_br_fiscal.document"].search_count(
-                [
-                    ("id", "!=", record.id),
-                    ("active", "=", True),
-                    ("company_id", "=", record.company_id.id),
-                    ("issuer", "=", record.issuer),
-                    ("document_key", "=", record.document_key),
+        """Check the keys are valid and not used by another document, for
+        all the documents at once"""
+        if self.env.context.get("skip_document_key_check"):
+            return
+        documents = self.filtered("document_key")
+        if not documents:
+            return
+
+        keys = set(documents.mapped("document_key"))
+        same_keys = {}
+        for document in self.search(
+            [
+                ("active", "=", True),
+                ("document_key", "in", list(keys)),
+                (
+                    "document_type",
+                    "in",
                     (
-                        "document_type",
-                        "in",
-                        (
-                            MODELO_FISCAL_CTE,
-                            MODELO_FISCAL_NFCE,
-                            MODELO_FISCAL_NFE,
-                            MODELO_FISCAL_NFSE,
-                        ),
+                        MODELO_FISCAL_CTE,
+                        MODELO_FISCAL_NFCE,
+                        MODELO_FISCAL_NFE,
+                        MODELO_FISCAL_NFSE,
                     ),
-                ]
-            )
-
-            if documents:
+                ),
+            ]
+        ):
+            same_keys.setdefault(
+                (document.company_id.id, document.issuer, document.document_key),
+                set(),
+            ).add(document.id)
+
+        for record in documents:
+            if same_keys.get(
+                (record.company_id.id, record.issuer, record.document_key), set()
+            ) - {record.id}:
                 raise ValidationError(
                     _(
                         "There is already a fiscal document with this "
                         "key: {} !".format(record.document_key)
                     )
                 )
-            else:
-                ChaveEdoc(chave=record.document_key, validar=True)
+
+        errors = check_keys(keys)
+        if errors:
+            raise ValidationError(
+                "\n".join(
+                    _("Invalid key {}: {}").format(key, error)
+                    for key, error in sorted(errors.items())
+                )
+            )
 
     @api.constrains("document_number")
     def _check_number(self):
@@ -402,37 +418,102 @@ class Document(models.Model):
         if self.company_id:
             self.currency_id = self.company_id.currency_id
 
-    def _create_return(self):
-        return_docs = self.env[self._name]
+    def _check_return_operations(self):
         for record in self:
-            fsc_op = record.fiscal_operation_id.return_fiscal_operation_id
-            if not fsc_op:
+            if not record.fiscal_operation_id.return_fiscal_operation_id:
                 raise ValidationError(
                     _(
                         "The fiscal operation {} has no return Fiscal "
                         "Operation defined".format(record.fiscal_operation_id)
                     )
                 )
-
-            new_doc = record.copy()
-            new_doc.fiscal_operation_id = fsc_op
-            new_doc._onchange_fiscal_operation_id()
-
-            for line in new_doc.fiscal_line_ids:
-                fsc_op_line = line.fiscal_operation_id.return_fiscal_operation_id
-                if not fsc_op_line:
+            for line in record.fiscal_line_ids:
+                if not line.fiscal_operation_id.return_fiscal_operation_id:
                     raise ValidationError(
                         _(
                             "The fiscal operation {} has no return Fiscal "
                             "Operation defined".format(line.fiscal_operation_id)
                         )
                     )
-                line.fiscal_operation_id = fsc_op_line
-                line._onchange_fiscal_operation_id()
-                line._onchange_fiscal_operation_line_id()
 
-            return_docs |= new_doc
-        return return_docs
+    def _prepare_return_line_values(self):
+        """Values of the return of the document lines by line id.
+
+        The return operation lines are resolved by return operation and
+        company in a single call to line_definitions, and the taxes are
+        mapped once per operation line, partner and product.
+        """
+        lines_by_operation = {}
+        for line in self.mapped("fiscal_line_ids"):
+            key = (line.fiscal_operation_id.return_fiscal_operation_id, line.company_id)
+            lines_by_operation.setdefault(key, []).append(line)
+        mappings = {}
+        result = {}
+        for (operation, company), lines in lines_by_operation.items():
+            definitions = operation.line_definitions(
+                company, [(line.partner_id, line.product_id) for line in lines]
+            )
+            for line, (operation_line, _cfop) in zip(lines, definitions):
+                mapping_result = {"taxes": {}, "cfop": False, "ipi_guideline": False}
+                if operation_line:
+                    key = (
+                        operation_line,
+                        company,
+                        line.partner_id,
+                        line.product_id,
+                        line.ncm_id,
+                        line.nbm_id,
+                        line.nbs_id,
+                        line.cest_id,
+                    )
+                    if key not in mappings:
+                        mappings[key] = line._get_fiscal_mapping(operation_line)
+                    mapping_result = mappings[key]
+                result[line.id] = line._prepare_return_values(
+                    operation, operation_line, mapping_result
+                )
+        return result
+
+    def _prepare_return_values(self, line_values):
+        """Values of the return of the document, as its copy with the
+        values of the onchange of the return operation"""
+        self.ensure_one()
+        operation = self.fiscal_operation_id.return_fiscal_operation_id
+        default = {
+            "fiscal_operation_id": operation.id,
+            "fiscal_operation_type": operation.fiscal_operation_type,
+            "operation_name": operation.name,
+            "comment_ids": [(6, 0, operation.comment_ids.ids)],
+            "document_subsequent_ids": [
+                (
+                    0,
+                    0,
+                    {
+                        "subsequent_operation_id": subsequent.id,
+                        "fiscal_operation_id": subsequent.subsequent_operation_id.id,
+                    },
+                )
+                for subsequent in operation.operation_subsequent_ids
+            ],
+            "fiscal_line_ids": [(0, 0, vals) for vals in line_values],
+        }
+        if self.issuer == DOCUMENT_ISSUER_COMPANY and not self.document_type_id:
+            default["document_type_id"] = self.company_id.document_type_id.id
+        return self.copy_data(default)[0]
+
+    def _create_return(self):
+        """Create the return documents of the documents in one batch, from
+        precomputed values instead of copies whose onchanges are replayed"""
+        self._check_return_operations()
+        line_values = self._prepare_return_line_values()
+        return self.env[self._name].create(
+            [
+                record._prepare_return_values(
+                    [line_values[line.id] for line in record.fiscal_line_ids]
+                )
+                for record in self
+            ]
+        )
 
     def action_create_return(self):
         action = self.env.ref("l10n_br_fiscal.document_all_action").read()[0]
@@ -2,6 +2,9 @@
 # Copyright (C) 2019  KMEE INFORMATICA LTDA
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
+import logging
+import threading
+
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 
@@ -12,6 +15,8 @@ from ..constants.fiscal import (
     SITUACAO_EDOC_AUTORIZADA,
 )
 
+_logger = logging.getLogger(__name__)
+
 
 def filter_processador(record):
     if record.document_electronic and record.processador_edoc == PROCESSADOR_NENHUM:
@@ -149,6 +154,13 @@ class DocumentEletronic(models.AbstractModel):
         copy=False,
     )
 
+    pdf_pending = fields.Boolean(
+        string="PDF Pending",
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+
     @api.depends("status_code", "status_name")
     def _compute_status_description(self):
         for record in self:
@@ -215,9 +227,77 @@ class DocumentEletronic(models.AbstractModel):
     def make_pdf(self):
         pass
 
+    def _save_pdf(self, pdf, file_name):
+        """Store the PDF in the filestore, reusing the report attachment"""
+        self.ensure_one()
+        vals = {
+            "name": file_name,
+            "res_model": self._name,
+            "res_id": self.id,
+            "raw": pdf,
+            "mimetype": "application/pdf",
+            "type": "binary",
+        }
+        if self.file_report_id:
+            self.file_report_id.write(vals)
+        else:
+            self.file_report_id = self.env["ir.attachment"].create(vals)
+        self.pdf_pending = False
+
+    def _queue_pdf(self):
+        """Have the PDF rendered by the scheduled renderer instead of in
+        the current transaction"""
+        self.write({"pdf_pending": True})
+
+    def _render_pdf_batch(self):
+        """Render the PDF of many documents, override it to render them
+        together"""
+        for record in self:
+            record.make_pdf()
+
+    @api.model
+    def _cron_render_pdf(self, batch_size=None, auto_commit=None):
+        """Render the queued PDFs by batches"""
+        if batch_size is None:
+            batch_size = int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("l10n_br_fiscal.pdf_batch_size", 100)
+            )
+        if auto_commit is None:
+            auto_commit = not getattr(threading.currentThread(), "testing", False)
+        failed = self.browse()
+        while True:
+            documents = self.search(
+                [("pdf_pending", "=", True), ("id", "not in", failed.ids)],
+                limit=batch_size,
+            )
+            if not documents:
+                break
+            try:
+                with self.env.cr.savepoint():
+                    documents._render_pdf_batch()
+            except Exception:
+                # render them one by one to isolate the failing ones
+                for document in documents:
+                    try:
+                        with self.env.cr.savepoint():
+                            document._render_pdf_batch()
+                    except Exception as e:
+                        _logger.error("PDF error of %s: %s", document.display_name, e)
+                        failed |= document
+            # documents without PDF (no processor) must leave the queue too
+            (documents - failed).write({"pdf_pending": False})
+            if auto_commit:
+                self.env.cr.commit()
+
     def view_pdf(self):
         self.ensure_one()
-        if not self.file_report_id or not self.authorization_file_id:
+        if (
+            not self.file_report_id
+            or not self.authorization_file_id
+            or self.pdf_pending
+        ):
             self.make_pdf()
         if not self.file_report_id:
             raise UserError(_("No PDF file generated!"))
@@ -2,7 +2,6 @@
 # Copyright (C) 2014  KMEE - www.kmee.com.br
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
-import base64
 import logging
 import os
 
@@ -171,6 +170,13 @@ class Event(models.Model):
         readonly=True,
     )
 
+    disk_pending = fields.Boolean(
+        string="Pending Disk Copy",
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+
     status_code = fields.Char(
         string="Status Code",
         readonly=True,
@@ -242,24 +248,39 @@ class Event(models.Model):
             numero=numero,
         )
         file_path = os.path.join(save_dir, file_name)
+        if isinstance(arquivo, str):
+            arquivo = arquivo.encode("utf-8")
         try:
             if not os.path.exists(save_dir):
                 os.makedirs(save_dir)
-            f = open(file_path, "w")
+            with open(file_path, "wb") as f:
+                f.write(arquivo)
         except IOError:
             raise UserError(
-                _("Erro!"),
                 _(
                     """Não foi possível salvar o arquivo
                     em disco, verifique as permissões de escrita
                     e o caminho da pasta"""
-                ),
+                )
             )
-        else:
-            f.write(arquivo)
-            f.close()
         return save_dir
 
+    def _save_event_files_2disk(self):
+        """Mirror the XML files of the events on disk"""
+        blob_model = self.env["l10n_br_fiscal.xml.blob"]
+        for record in self:
+            for attachment in record.file_request_id | record.file_response_id:
+                record.file_path = record._save_event_2disk(
+                    blob_model.get_attachment_content(attachment), attachment.name
+                )
+            record.disk_pending = False
+
+    @api.model
+    def _cron_save_event_2disk(self, limit=500):
+        self.search(
+            [("disk_pending", "=", True)], limit=limit
+        )._save_event_files_2disk()
+
     def _compute_file_name(self):
         self.ensure_one()
         if (
@@ -296,17 +317,21 @@ class Event(models.Model):
             file_name += "." + file_extension
 
         if self.company_id.document_save_disk:
-            file_path = self._save_event_2disk(file, file_name)
-            self.file_path = file_path
+            # mirrored on disk by _cron_save_event_2disk
+            self.disk_pending = True
 
+        # the content is stored once in the fiscal XML store, the
+        # attachment only links to it
+        blob_model = self.env["l10n_br_fiscal.xml.blob"]
+        blob = blob_model.store(file)
         attachment_id = self.env["ir.attachment"].create(
             {
                 "name": file_name,
                 "res_model": self._name,
                 "res_id": self.id,
-                "datas": base64.b64encode(file.encode("utf-8")),
+                "type": "url",
+                "url": blob_model._url(blob, file_name),
                 "mimetype": "application/" + file_extension,
-                "type": "binary",
             }
         )
 
@@ -320,6 +345,47 @@ class Event(models.Model):
             self.file_request_id = attachment_id
         return attachment_id
 
+    def _get_file_content(self, response=False):
+        """XML of the request (or response) file of the event as a string"""
+        self.ensure_one()
+        attachment = self.file_response_id if response else self.file_request_id
+        if not attachment:
+            return False
+        content = self.env["l10n_br_fiscal.xml.blob"].get_attachment_content(
+            attachment
+        )
+        return content.decode("utf-8")
+
+    @api.model
+    def _migrate_xml_attachments(self, limit=1000, auto_commit=False):
+        """Move the XML files of the events saved as regular attachments to
+        the fiscal XML store, returns the number of migrated attachments.
+        Run it until it returns 0 to migrate all the events."""
+        blob_model = self.env["l10n_br_fiscal.xml.blob"]
+        events = self.search(
+            [
+                "|",
+                ("file_request_id.type", "=", "binary"),
+                ("file_response_id.type", "=", "binary"),
+            ],
+            limit=limit,
+        )
+        attachments = (
+            events.mapped("file_request_id") | events.mapped("file_response_id")
+        ).filtered(lambda a: a.type == "binary")
+        for attachment in attachments:
+            blob = blob_model.store(attachment.raw)
+            attachment.write(
+                {
+                    "raw": False,
+                    "type": "url",
+                    "url": blob_model._url(blob, attachment.name),
+                }
+            )
+        if auto_commit:
+            self.env.cr.commit()
+        return len(attachments)
+
     def set_done(
         self, status_code, response, protocol_date, protocol_number, file_response_xml
     ):
@@ -45,6 +45,7 @@ from ..constants.issqn import (
     ISSQN_INCENTIVE,
     ISSQN_INCENTIVE_DEFAULT,
 )
+from ..tools.misc import cached_ref
 
 
 class FiscalDocumentLineMixin(models.AbstractModel):
@@ -79,7 +80,7 @@ class FiscalDocumentLineMixin(models.AbstractModel):
     currency_id = fields.Many2one(
         comodel_name="res.currency",
         string="Currency",
-        default=lambda self: self.env.ref("base.BRL"),
+        default=lambda self: cached_ref(self.env, "base.BRL"),
     )
 
     product_id = fields.Many2one(
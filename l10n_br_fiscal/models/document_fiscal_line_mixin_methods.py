@@ -8,6 +8,7 @@ from lxml import etree
 from odoo import api, models
 
 from ..constants.icms import ICMS_BASE_TYPE_DEFAULT, ICMS_ST_BASE_TYPE_DEFAULT
+from ..tools.misc import cached_ref
 from .tax import TAX_DICT_VALUES
 
 FISCAL_TAX_ID_FIELDS = [
@@ -136,7 +137,7 @@ class FiscalDocumentLineMixinMethods(models.AbstractModel):
     )
     def _compute_amounts(self):
         for record in self:
-            round_curr = record.currency_id or self.env.ref("base.BRL")
+            round_curr = record.currency_id or cached_ref(self.env, "base.BRL")
             # Valor dos produtos
             record.price_gross = round_curr.round(record.price_unit * record.quantity)
 
@@ -325,28 +326,35 @@ class FiscalDocumentLineMixinMethods(models.AbstractModel):
         # Reset Taxes
         self._remove_all_fiscal_tax_ids()
         if self.fiscal_operation_line_id:
-            mapping_result = self.fiscal_operation_line_id.map_fiscal_taxes(
-                company=self.company_id,
-                partner=self.partner_id,
-                product=self.product_id,
-                ncm=self.ncm_id,
-                nbm=self.nbm_id,
-                nbs=self.nbs_id,
-                cest=self.cest_id,
-            )
-
-            self.ipi_guideline_id = mapping_result["ipi_guideline"]
-            self.cfop_id = mapping_result["cfop"]
-            taxes = self.env["l10n_br_fiscal.tax"]
-            for tax in mapping_result["taxes"].values():
-                taxes |= tax
-            self.fiscal_tax_ids = taxes
-            self._update_taxes()
-            self.comment_ids = self.fiscal_operation_line_id.comment_ids
+            self._apply_fiscal_mapping(self._get_fiscal_mapping())
 
         if not self.fiscal_operation_line_id:
             self.cfop_id = False
 
+    def _get_fiscal_mapping(self, operation_line=None):
+        """Taxes, CFOP and IPI guideline mapped for the line by the
+        operation line, the one of the line by default"""
+        operation_line = operation_line or self.fiscal_operation_line_id
+        return operation_line.map_fiscal_taxes(
+            company=self.company_id,
+            partner=self.partner_id,
+            product=self.product_id,
+            ncm=self.ncm_id,
+            nbm=self.nbm_id,
+            nbs=self.nbs_id,
+            cest=self.cest_id,
+        )
+
+    def _apply_fiscal_mapping(self, mapping_result):
+        self.ipi_guideline_id = mapping_result["ipi_guideline"]
+        self.cfop_id = mapping_result["cfop"]
+        taxes = self.env["l10n_br_fiscal.tax"]
+        for tax in mapping_result["taxes"].values():
+            taxes |= tax
+        self.fiscal_tax_ids = taxes
+        self._update_taxes()
+        self.comment_ids = self.fiscal_operation_line_id.comment_ids
+
     @api.onchange("product_id")
     def _onchange_product_id_fiscal(self):
         if self.product_id:
@@ -805,3 +813,130 @@ class FiscalDocumentLineMixinMethods(models.AbstractModel):
     @api.model
     def _rm_fields_to_amount(self):
         return ["icms_relief_value"]
+
+    @api.model
+    def _get_fiscal_recompute_fields(self):
+        """Fields written back by _recompute_fiscal_taxes"""
+        mixin = self.env["l10n_br_fiscal.document.line.mixin"]
+        return [
+            name
+            for name, field in mixin._fields.items()
+            if name in self._fields
+            and name not in models.MAGIC_COLUMNS
+            and not field.compute
+            and field.type != "one2many"
+            # the fields related to the document are not written
+            and (not self._fields[name].compute or self._fields[name].inherited)
+        ]
+
+    @api.model
+    def _fiscal_recompute_value(self, field, value):
+        if field.type == "many2one":
+            return value._origin.id
+        if field.type == "many2many":
+            return [(6, 0, sorted(value._origin.ids))]
+        return value
+
+    def _get_operation_line_definitions(self):
+        """Operation line of each line with a fiscal operation, resolved by
+        operation and company in a single call to line_definitions
+
+        :return: dict of the operation lines by line id
+        """
+        lines_by_operation = {}
+        for line in self.filtered("fiscal_operation_id"):
+            key = (line.fiscal_operation_id, line.company_id)
+            lines_by_operation.setdefault(key, []).append(line)
+        result = {}
+        for (operation, company), lines in lines_by_operation.items():
+            definitions = operation.line_definitions(
+                company, [(line.partner_id, line.product_id) for line in lines]
+            )
+            for line, (operation_line, _cfop) in zip(lines, definitions):
+                result[line.id] = operation_line
+        return result
+
+    def _recompute_fiscal_taxes(self):
+        """Remap the fiscal operation line of the lines and recompute their
+        taxes as the onchanges do, then write the changed values.
+
+        The onchanges run on new records, so only the changed fields of
+        each line are written, with one write per set of identical values.
+
+        :return: dict of the written values by line id
+        """
+        fnames = self._get_fiscal_recompute_fields()
+        operation_lines = self._get_operation_line_definitions()
+        result = {}
+        for line in self:
+            new_line = line.new(origin=line)
+            if line.id in operation_lines:
+                new_line.fiscal_operation_line_id = operation_lines[line.id]
+            new_line._onchange_fiscal_operation_line_id()
+            # as in the form view, the taxes set trigger their onchange
+            new_line._onchange_fiscal_tax_ids()
+            vals = {}
+            for fname in fnames:
+                field = self._fields[fname]
+                value = self._fiscal_recompute_value(field, new_line[fname])
+                if value != self._fiscal_recompute_value(field, line[fname]):
+                    vals[fname] = value
+            if vals:
+                result[line.id] = vals
+        self._write_recomputed_fiscal_taxes(result)
+        return result
+
+    def _prepare_return_values(self, return_operation, operation_line, mapping_result):
+        """Values of the return of the line with the return operation.
+
+        The tax values of the line are kept when the operation line maps
+        the same taxes in the same direction (same CSTs), otherwise the
+        taxes are computed from mapping_result as the onchanges do.
+        """
+        self.ensure_one()
+        default = {
+            "fiscal_operation_id": return_operation.id,
+            "fiscal_operation_line_id": operation_line.id,
+            "cfop_id": False,
+        }
+        if operation_line:
+            default.update(
+                cfop_id=mapping_result["cfop"].id,
+                comment_ids=[(6, 0, operation_line.comment_ids.ids)],
+            )
+        vals = self.copy_data(default)[0]
+        taxes = self.env["l10n_br_fiscal.tax"]
+        for tax in mapping_result["taxes"].values():
+            taxes |= tax
+        ipi_guideline = mapping_result["ipi_guideline"]
+        if (
+            operation_line
+            and taxes == self.fiscal_tax_ids
+            and (ipi_guideline and ipi_guideline.id) == self.ipi_guideline_id.id
+            and operation_line.fiscal_operation_type
+            == self.fiscal_operation_line_id.fiscal_operation_type
+        ):
+            return vals
+        new_line = self.new(origin=self)
+        new_line.fiscal_operation_id = return_operation
+        new_line.fiscal_operation_line_id = operation_line
+        new_line._remove_all_fiscal_tax_ids()
+        if operation_line:
+            new_line._apply_fiscal_mapping(mapping_result)
+        else:
+            new_line.cfop_id = False
+        for fname in self._get_fiscal_recompute_fields():
+            vals[fname] = self._fiscal_recompute_value(
+                self._fields[fname], new_line[fname]
+            )
+        return vals
+
+    def _write_recomputed_fiscal_taxes(self, vals_by_line):
+        """Write the values of _recompute_fiscal_taxes, lines with identical
+        values are written together"""
+        lines_by_vals = {}
+        for line_id, vals in vals_by_line.items():
+            key = repr(sorted(vals.items()))
+            lines_by_vals.setdefault(key, (vals, []))[1].append(line_id)
+        for vals, line_ids in lines_by_vals.values():
+            self.browse(line_ids).write(vals)
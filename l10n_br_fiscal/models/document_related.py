@@ -2,7 +2,6 @@
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
 from erpbrasil.base import fiscal
-from erpbrasil.base.fiscal.edoc import ChaveEdoc
 
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
@@ -13,6 +12,7 @@ from ..constants.fiscal import (
     MODELO_FISCAL_NFE,
     MODELO_FISCAL_NFSE,
 )
+from ..tools.edoc_key import check_keys
 
 
 class DocumentRelated(models.Model):
@@ -61,16 +61,25 @@ class DocumentRelated(models.Model):
 
     @api.constrains("document_key")
     def _check_key(self):
-        for record in self:
-            if not record.document_key:
-                return
-            if record.document_type_id.code in (
-                MODELO_FISCAL_CTE,
-                MODELO_FISCAL_NFCE,
-                MODELO_FISCAL_NFE,
-                MODELO_FISCAL_NFSE,
-            ):
-                ChaveEdoc(chave=record.document_key, validar=True)
+        errors = check_keys(
+            self.filtered(
+                lambda r: r.document_key
+                and r.document_type_id.code
+                in (
+                    MODELO_FISCAL_CTE,
+                    MODELO_FISCAL_NFCE,
+                    MODELO_FISCAL_NFE,
+                    MODELO_FISCAL_NFSE,
+                )
+            ).mapped("document_key")
+        )
+        if errors:
+            raise ValidationError(
+                "\n".join(
+                    _("Invalid key {}: {}").format(key, error)
+                    for key, error in sorted(errors.items())
+                )
+            )
 
     @api.constrains("cnpj_cpf")
     def _check_cnpj_cpf(self):
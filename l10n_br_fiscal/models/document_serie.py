@@ -2,10 +2,20 @@
 # Copyright (C) 2014  KMEE - www.kmee.com.br
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
+import logging
+import threading
+
+import psycopg2
+
 from odoo import _, api, fields, models
 
 from ..constants.fiscal import FISCAL_IN_OUT, FISCAL_IN_OUT_DEFAULT
 
+_logger = logging.getLogger(__name__)
+
+# reservations of a block tried while the sequence is locked by others
+RESERVE_ATTEMPTS = 3
+
 
 class DocumentSerie(models.Model):
     _name = "l10n_br_fiscal.document.serie"
@@ -45,6 +55,13 @@ class DocumentSerie(models.Model):
         related="internal_sequence_id.number_next",
     )
 
+    block_ids = fields.One2many(
+        comodel_name="l10n_br_fiscal.document.serie.block",
+        inverse_name="document_serie_id",
+        string="Number Blocks",
+        readonly=True,
+    )
+
     invalidate_number_id = fields.One2many(
         comodel_name="l10n_br_fiscal.invalidate.number",
         inverse_name="document_serie_id",
@@ -90,9 +107,117 @@ class DocumentSerie(models.Model):
             is_invalid_number = False
         return is_invalid_number
 
+    def _reserve_numbers(self, cr, count):
+        self.ensure_one()
+        env = self.env(cr=cr)
+        sequence = self.internal_sequence_id
+        # the same row lock as the no_gap sequence, held only until the
+        # block is created
+        cr.execute(
+            "SELECT number_next FROM ir_sequence WHERE id = %s FOR UPDATE",
+            (sequence.id,),
+        )
+        number_start = cr.fetchone()[0]
+        increment = sequence.number_increment
+        cr.execute(
+            "UPDATE ir_sequence SET number_next = number_next + %s WHERE id = %s",
+            (count * increment, sequence.id),
+        )
+        block = (
+            env["l10n_br_fiscal.document.serie.block"]
+            .sudo()
+            .create(
+                {
+                    "document_serie_id": self.id,
+                    "number_start": number_start,
+                    "number_end": number_start + (count - 1) * increment,
+                    "number_next": number_start,
+                    "number_increment": increment,
+                }
+            )
+        )
+        return block.id
+
+    def _sequence_locked_by_transaction(self):
+        """Whether the current transaction holds the row lock of the serie
+        sequence, taken by FOR UPDATE (xmax) or by an update (xmin)"""
+        self.ensure_one()
+        self.env.cr.execute(
+            """
+            SELECT 1
+            FROM ir_sequence s
+            JOIN pg_locks l
+                ON l.locktype = 'transactionid'
+                AND l.transactionid IN (s.xmin, s.xmax)
+            WHERE s.id = %s AND l.pid = pg_backend_pid()
+            """,
+            (self.internal_sequence_id.id,),
+        )
+        return bool(self.env.cr.fetchone())
+
+    def reserve_numbers(self, count):
+        """Reserve a block of count numbers of the serie.
+
+        The block is taken and committed in a separate transaction, so the
+        sequence is not locked during the confirmation of the documents.
+        Give the block to next_seq_number with the document_serie_blocks
+        context key ({serie id: block id}) and close it at the end of the
+        confirmation to give back or record the numbers left unused.
+
+        The separate transaction waits for the sequence lock at most
+        l10n_br_fiscal.serie_lock_timeout milliseconds and the reservation
+        is tried RESERVE_ATTEMPTS times before raising the lock error.
+
+        No block is reserved, and the numbers are taken one by one by
+        next_seq_number, for the sequences with date ranges or when the
+        current transaction holds the sequence lock already.
+
+        :return: l10n_br_fiscal.document.serie.block record
+        """
+        self.ensure_one()
+        block_model = self.env["l10n_br_fiscal.document.serie.block"]
+        sequence = self.internal_sequence_id
+        if sequence.implementation != "no_gap" or sequence.use_date_range:
+            # standard sequences do not lock, their numbers are taken one
+            # by one by next_seq_number
+            return block_model
+        if getattr(threading.currentThread(), "testing", False):
+            with self.env.cr.savepoint():
+                block_id = self._reserve_numbers(self.env.cr, count)
+        elif self._sequence_locked_by_transaction():
+            # the separate transaction would wait for the current one
+            return block_model
+        else:
+            lock_timeout = int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("l10n_br_fiscal.serie_lock_timeout", 2000)
+            )
+            for attempt in range(1, RESERVE_ATTEMPTS + 1):
+                try:
+                    with self.pool.cursor() as cr:
+                        cr.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+                        block_id = self._reserve_numbers(cr, count)
+                    break
+                except psycopg2.OperationalError as e:
+                    if e.pgcode != "55P03" or attempt == RESERVE_ATTEMPTS:
+                        raise
+                    _logger.info(
+                        "Serie %s locked, number reservation attempt %s failed",
+                        self.display_name,
+                        attempt,
+                    )
+        sequence.invalidate_cache(["number_next"])
+        return block_model.browse(block_id)
+
     def next_seq_number(self):
         self.ensure_one()
-        document_number = self.internal_sequence_id._next()
+        block = self.env["l10n_br_fiscal.document.serie.block"].browse(
+            self.env.context.get("document_serie_blocks", {}).get(self.id)
+        )
+        document_number = (
+            block and block._take_number() or self.internal_sequence_id._next()
+        )
         if self._is_invalid_number(document_number):
             document_number = self.next_seq_number()
         return document_number
@@ -0,0 +1,241 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+import logging
+import threading
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import _, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class DocumentSerieBlock(models.Model):
+    """Block of numbers of a document serie reserved for a confirmation.
+
+    The block is taken from the serie sequence in its own short
+    transaction, so the workers confirming documents in parallel do not
+    wait for each other on the sequence row until they commit. When a
+    block is closed, its unused numbers at the end go back to the sequence
+    if no other block was reserved after it, the others are recorded as an
+    invalidate number range (inutilização).
+    """
+
+    _name = "l10n_br_fiscal.document.serie.block"
+    _description = "Fiscal Document Serie Number Block"
+    _order = "id desc"
+
+    document_serie_id = fields.Many2one(
+        comodel_name="l10n_br_fiscal.document.serie",
+        string="Serie",
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+    )
+
+    company_id = fields.Many2one(
+        related="document_serie_id.company_id",
+        store=True,
+    )
+
+    number_start = fields.Integer(
+        string="Initial Number",
+        required=True,
+        readonly=True,
+    )
+
+    number_end = fields.Integer(
+        string="End Number",
+        required=True,
+        readonly=True,
+    )
+
+    number_next = fields.Integer(
+        string="Next Number",
+        required=True,
+        readonly=True,
+    )
+
+    number_increment = fields.Integer(
+        string="Increment",
+        required=True,
+        readonly=True,
+        default=1,
+    )
+
+    state = fields.Selection(
+        selection=[
+            ("open", _("Open")),
+            ("done", _("Done")),
+        ],
+        string="Status",
+        readonly=True,
+        default="open",
+        index=True,
+    )
+
+    invalidate_number_ids = fields.Many2many(
+        comodel_name="l10n_br_fiscal.invalidate.number",
+        string="Invalidate Number Ranges",
+        readonly=True,
+    )
+
+    def _take_number(self):
+        """Next number of the block, formatted by the serie sequence, False
+        when the block is exhausted"""
+        self.ensure_one()
+        if self.state != "open" or self.number_next > self.number_end:
+            return False
+        number = self.number_next
+        self.number_next = number + self.number_increment
+        return self.document_serie_id.internal_sequence_id.get_next_char(number)
+
+    def _get_block_numbers(self):
+        """{formatted number: number} of the numbers of the block"""
+        self.ensure_one()
+        sequence = self.document_serie_id.internal_sequence_id
+        return {
+            sequence.get_next_char(number): number
+            for number in range(
+                self.number_start, self.number_end + 1, self.number_increment
+            )
+        }
+
+    def _get_used_numbers(self):
+        self.ensure_one()
+        numbers = self._get_block_numbers()
+        used_numbers = set()
+        for document in self.env["l10n_br_fiscal.document"].search_read(
+            [
+                ("document_serie_id", "=", self.document_serie_id.id),
+                "|",
+                ("document_number", "in", list(numbers)),
+                ("rps_number", "in", list(numbers)),
+            ],
+            ["document_number", "rps_number"],
+        ):
+            for number in (document["document_number"], document["rps_number"]):
+                if number in numbers:
+                    used_numbers.add(numbers[number])
+        return used_numbers
+
+    def _get_unused_ranges(self):
+        """Ranges (start, end) of the numbers of the block not used by any
+        document of the serie"""
+        self.ensure_one()
+        used_numbers = self._get_used_numbers()
+        ranges = []
+        for number in range(
+            self.number_start, self.number_end + 1, self.number_increment
+        ):
+            if number in used_numbers:
+                continue
+            if ranges and ranges[-1][1] == number - 1:
+                ranges[-1][1] = number
+            else:
+                ranges.append([number, number])
+        return [tuple(r) for r in ranges]
+
+    def _give_back_numbers(self, number_start):
+        """Give the numbers of the block from number_start back to the
+        serie sequence when no number was reserved after the block.
+
+        The sequence row is locked with NOWAIT: when another transaction
+        holds it the numbers are invalidated instead of waiting for it.
+        """
+        self.ensure_one()
+        sequence = self.document_serie_id.internal_sequence_id
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute(
+                    "SELECT number_next FROM ir_sequence WHERE id = %s "
+                    "FOR UPDATE NOWAIT",
+                    (sequence.id,),
+                )
+                if self.env.cr.fetchone()[0] != self.number_end + self.number_increment:
+                    return False
+                self.env.cr.execute(
+                    "UPDATE ir_sequence SET number_next = %s WHERE id = %s",
+                    (number_start, sequence.id),
+                )
+        except psycopg2.OperationalError as e:
+            if e.pgcode != "55P03":
+                raise
+            return False
+        sequence.invalidate_cache(["number_next"])
+        self.number_end = number_start - self.number_increment
+        return True
+
+    def _close(self):
+        """Close the blocks and record their unused numbers to invalidate"""
+        auto_invalidate = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_br_fiscal.auto_invalidate_numbers")
+        )
+        invalidate_model = self.env["l10n_br_fiscal.invalidate.number"].sudo()
+        for block in self.filtered(lambda b: b.state == "open"):
+            serie = block.document_serie_id
+            invalidations = invalidate_model.browse()
+            unused_ranges = block._get_unused_ranges()
+            if (
+                unused_ranges
+                and unused_ranges[-1][1] == block.number_end
+                and block._give_back_numbers(unused_ranges[-1][0])
+            ):
+                unused_ranges.pop()
+            for number_start, number_end in unused_ranges:
+                invalidations |= invalidate_model.create(
+                    {
+                        "company_id": serie.company_id.id,
+                        "document_type_id": serie.document_type_id.id,
+                        "document_serie_id": serie.id,
+                        "number_start": number_start,
+                        "number_end": number_end,
+                        "justification": _(
+                            "Number reserved for a document confirmation "
+                            "and not used"
+                        ),
+                    }
+                )
+            block.write(
+                {
+                    "state": "done",
+                    "invalidate_number_ids": [(6, 0, invalidations.ids)],
+                }
+            )
+            if invalidations:
+                _logger.info(
+                    "Unused numbers of the serie %s: %s",
+                    serie.name,
+                    invalidations.mapped("name"),
+                )
+                if auto_invalidate:
+                    invalidations.action_invalidate()
+
+    def _close_failed(self):
+        """Close the blocks of a failed confirmation from a separate
+        transaction, which sees none of the numbers it took, so they can go
+        back to the sequence even when the failed transaction is rolled
+        back."""
+        if getattr(threading.currentThread(), "testing", False):
+            self._close()
+            return
+        with self.pool.cursor() as cr:
+            self.with_env(self.env(cr=cr, su=True))._close()
+
+    @api.model
+    def _cron_close_stale_blocks(self, minutes=60):
+        """Close the blocks left open by the confirmations that failed"""
+        self.search(
+            [
+                ("state", "=", "open"),
+                (
+                    "create_date",
+                    "<",
+                    fields.Datetime.now() - timedelta(minutes=minutes),
+                ),
+            ]
+        )._close()
@@ -26,11 +26,12 @@ from ..constants.fiscal import (
     WORKFLOW_DOCUMENTO_NAO_ELETRONICO,
     WORKFLOW_EDOC,
 )
+from ..tools.edoc_key import build_keys
 
 _logger = logging.getLogger(__name__)
 
 try:
-    from erpbrasil.base.fiscal.edoc import ChaveEdoc
+    from erpbrasil.base.misc import punctuation_rm
 except ImportError:
     _logger.error("Biblioteca erpbrasil.base não instalada")
 
@@ -249,30 +250,45 @@ class DocumentWorkflow(models.AbstractModel):
         return True
 
     def _generate_key(self):
-        for record in self:
-            if record.document_type_id.code in (
+        """Generate the access keys of the documents in one batch, the
+        company attributes are read once per company"""
+        documents = self.filtered(
+            lambda d: d.document_type_id.code
+            in (
                 MODELO_FISCAL_NFE,
                 MODELO_FISCAL_NFCE,
                 MODELO_FISCAL_CTE,
-            ):
-                chave_edoc = ChaveEdoc(
-                    ano_mes=record.document_date.strftime("%y%m").zfill(4),
-                    cnpj_emitente=record.company_cnpj_cpf,
-                    codigo_uf=(
-                        record.company_state_id
-                        and record.company_state_id.ibge_code
-                        or ""
-                    ),
-                    forma_emissao=1,  # TODO: Implementar campo no Odoo
-                    modelo_documento=record.document_type_id.code or "",
-                    numero_documento=record.document_number or "",
-                    numero_serie=record.document_serie or "",
-                    validar=False,
+            )
+        )
+        issuers = {
+            company.id: (
+                company.state_id.ibge_code or "",
+                punctuation_rm(company.cnpj_cpf or "").upper(),
+            )
+            for company in documents.mapped("company_id")
+        }
+        values = []
+        for record in documents:
+            state_code, cnpj_cpf = issuers[record.company_id.id]
+            value = (
+                state_code,
+                record.document_date and record.document_date.strftime("%y%m"),
+                cnpj_cpf,
+                record.document_type_id.code,
+                record.document_serie,
+                record.document_number,
+                1,  # TODO: Implementar campo forma de emissão no Odoo
+            )
+            if not all(value):
+                raise UserError(
+                    _("Impossible to generate the key of the document {}.").format(
+                        record.display_name
+                    )
                 )
-                # TODO: Implementar campos no Odoo
-                # record.key_number = chave_edoc.campos
-                # record.key_formated = ' '.joint(chave_edoc.partes())
-                record.document_key = chave_edoc.chave
+            values.append(value)
+        for record, key in zip(documents, build_keys(values)):
+            record.with_context(skip_document_key_check=True).document_key = key
+        documents._check_key()
 
     def _document_number(self):
         self.ensure_one()
@@ -294,17 +310,72 @@ class DocumentWorkflow(models.AbstractModel):
                     [line.name for line in self.fiscal_line_ids.mapped("fiscal_operation_id")]
                 )
 
-            if self.document_electronic and not self.document_key:
+            if (
+                self.document_electronic
+                and not self.document_key
+                and not self.env.context.get("document_key_deferred")
+            ):
                 self._generate_key()
 
     def _document_confirm(self):
-        if self.issuer == DOCUMENT_ISSUER_COMPANY:
-            self._change_state(SITUACAO_EDOC_A_ENVIAR)
+        documents = self.filtered(lambda d: d.issuer == DOCUMENT_ISSUER_COMPANY)
+        # number the documents first to generate their keys in one batch
+        # before the per document export of the confirmation
+        to_key = documents.filtered(
+            lambda d: d.document_electronic
+            and not d.document_key
+            and d._avaliable_transition(d.state_edoc, SITUACAO_EDOC_A_ENVIAR)
+        )
+        for record in to_key.with_context(document_key_deferred=True):
+            record._document_date()
+            record._document_number()
+        to_key._generate_key()
+        documents._change_state(SITUACAO_EDOC_A_ENVIAR)
+
+    def _reserve_document_numbers(self):
+        """Reserve one block of numbers per serie for the documents that
+        will be numbered by their confirmation, a single document takes
+        its number from the sequence. The series with a block given by the
+        caller in the document_serie_blocks context key are skipped."""
+        given_blocks = self.env.context.get("document_serie_blocks", {})
+        counts = {}
+        for record in self:
+            if record.issuer != DOCUMENT_ISSUER_COMPANY or not record.document_serie_id:
+                continue
+            if record.document_type == MODELO_FISCAL_NFSE:
+                if record.rps_number:
+                    continue
+            elif record.document_number:
+                continue
+            serie = record.document_serie_id
+            counts[serie] = counts.get(serie, 0) + 1
+        blocks = self.env["l10n_br_fiscal.document.serie.block"]
+        for serie, count in counts.items():
+            if count > 1 and serie.id not in given_blocks:
+                blocks |= serie.reserve_numbers(count)
+        return blocks
 
     def action_document_confirm(self):
         to_confirm = self.filtered(lambda inv: inv.state_edoc != SITUACAO_EDOC_A_ENVIAR)
-        if to_confirm:
+        if not to_confirm:
+            return
+        blocks = to_confirm._reserve_document_numbers()
+        if not blocks:
             to_confirm._document_confirm()
+            return
+        serie_blocks = dict(self.env.context.get("document_serie_blocks", {}))
+        serie_blocks.update({block.document_serie_id.id: block.id for block in blocks})
+        try:
+            # the numbers taken from the blocks are rolled back with the
+            # savepoint when the confirmation fails
+            with self.env.cr.savepoint():
+                to_confirm.with_context(
+                    document_serie_blocks=serie_blocks
+                )._document_confirm()
+        except Exception:
+            blocks._close_failed()
+            raise
+        blocks._close()
 
     def _no_eletronic_document_send(self):
         self._change_state(SITUACAO_EDOC_AUTORIZADA)
@@ -3,7 +3,7 @@
 
 from lxml import etree
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 
 from ..constants.fiscal import (
     FISCAL_OUT,
@@ -12,6 +12,7 @@ from ..constants.fiscal import (
     TAX_DOMAIN_ICMS_ST,
 )
 from ..constants.icms import ICMS_ORIGIN_TAX_IMPORTED
+from ..tools.misc import cached_ref
 
 VIEW = """
 <page name="uf_{0}" string="{1}">
@@ -1231,6 +1232,39 @@ class ICMSRegulation(models.Model):
         ],
     )
 
+    @api.model
+    @tools.ormcache("view_id", "arch", "self.env.lang")
+    def _get_icms_regulation_form_arch(self, view_id, arch):
+        """Build the ICMS Regulation form with one notebook page per
+        brazilian state. The result is cached and the cache is cleared
+        when the res.country.state records are changed."""
+        doc = etree.fromstring(arch)
+
+        br_states = self.env["res.country.state"].search(
+            [("country_id", "=", self.env.ref("base.br").id)], order="code"
+        )
+        tax_group_icms_id = self.env.ref("l10n_br_fiscal.tax_group_icms").id
+        tax_group_icmsst_id = self.env.ref("l10n_br_fiscal.tax_group_icmsst").id
+        tax_group_icmsfcp_id = self.env.ref("l10n_br_fiscal.tax_group_icmsfcp").id
+
+        state_pages = [
+            VIEW.format(
+                state.code.lower(),
+                state.name,
+                tax_group_icms_id,
+                tax_group_icmsst_id,
+                tax_group_icmsfcp_id,
+                state.id,
+            )
+            for state in br_states
+        ]
+
+        for node in doc.xpath("//notebook"):
+            for i, state_page in enumerate(state_pages, start=1):
+                node.insert(i, etree.fromstring(state_page))
+
+        return etree.tostring(doc, encoding="unicode")
+
     @api.model
     def fields_view_get(
         self, view_id=None, view_type="form", toolbar=False, submenu=False
@@ -1241,29 +1275,9 @@ class ICMSRegulation(models.Model):
         )
 
         if view_type == "form":
-            doc = etree.fromstring(view_super.get("arch"))
-
-            for node in doc.xpath("//notebook"):
-
-                br_states = self.env["res.country.state"].search(
-                    [("country_id", "=", self.env.ref("base.br").id)], order="code"
-                )
-
-                i = 0
-                for state in br_states:
-                    i += 1
-                    state_page = VIEW.format(
-                        state.code.lower(),
-                        state.name,
-                        self.env.ref("l10n_br_fiscal.tax_group_icms").id,
-                        self.env.ref("l10n_br_fiscal.tax_group_icmsst").id,
-                        self.env.ref("l10n_br_fiscal.tax_group_icmsfcp").id,
-                        state.id,
-                    )
-                    node_page = etree.fromstring(state_page)
-                    node.insert(i, node_page)
-
-            view_super["arch"] = etree.tostring(doc, encoding="unicode")
+            view_super["arch"] = self._get_icms_regulation_form_arch(
+                view_super.get("view_id"), view_super.get("arch")
+            )
 
         return view_super
 
@@ -1280,7 +1294,7 @@ class ICMSRegulation(models.Model):
         self.ensure_one()
         tax_definitions = self.env["l10n_br_fiscal.tax.definition"]
         icms_taxes = self.env["l10n_br_fiscal.tax"]
-        tax_group_icms = self.env.ref("l10n_br_fiscal.tax_group_icms")
+        tax_group_icms = cached_ref(self.env, "l10n_br_fiscal.tax_group_icms")
 
         # ICMS
         # ICMS tax imported
@@ -1346,7 +1360,7 @@ class ICMSRegulation(models.Model):
         self.ensure_one()
         tax_definitions = self.env["l10n_br_fiscal.tax.definition"]
         icms_taxes = self.env["l10n_br_fiscal.tax"]
-        tax_group_icmsst = self.env.ref("l10n_br_fiscal.tax_group_icmsst")
+        tax_group_icmsst = cached_ref(self.env, "l10n_br_fiscal.tax_group_icmsst")
 
         if not ncm:
             ncm = product.ncm_id
@@ -1396,7 +1410,7 @@ class ICMSRegulation(models.Model):
         self.ensure_one()
         tax_definitions = self.env["l10n_br_fiscal.tax.definition"]
         icms_taxes = self.env["l10n_br_fiscal.tax"]
-        tax_group_icmsfcp = self.env.ref("l10n_br_fiscal.tax_group_icmsfcp")
+        tax_group_icmsfcp = cached_ref(self.env, "l10n_br_fiscal.tax_group_icmsfcp")
 
         # ICMS FCP for DIFAL
         if (
@@ -1463,7 +1477,7 @@ class ICMSRegulation(models.Model):
         self.ensure_one()
         tax_definitions = self.env["l10n_br_fiscal.tax.definition"]
         icms_taxes = self.env["l10n_br_fiscal.tax"]
-        tax_group_icms = self.env.ref("l10n_br_fiscal.tax_group_icms")
+        tax_group_icms = cached_ref(self.env, "l10n_br_fiscal.tax_group_icms")
 
         # ICMS
         if not ncm:
@@ -1,7 +1,7 @@
 # Copyright (C) 2013  Renato Lima - Akretion
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError
 
 from ..constants.fiscal import (
@@ -12,6 +12,7 @@ from ..constants.fiscal import (
     OPERATION_STATE,
     OPERATION_STATE_DEFAULT,
 )
+from .operation_line import LINE_MATCH_FIELDS
 
 
 class Operation(models.Model):
@@ -223,16 +224,114 @@ class Operation(models.Model):
 
         return domain
 
-    def line_definition(self, company, partner, product):
+    def write(self, values):
+        result = super().write(values)
+        if "fiscal_operation_type" in values:
+            self.clear_caches()
+        return result
+
+    @api.model
+    def _line_match_key(self, company, partner, product):
+        """Values of the company, partner and product matched against the
+        LINE_MATCH_FIELDS of the operation lines"""
+        return (
+            company.tax_framework or False,
+            partner.ind_ie_dest or False,
+            partner.tax_framework or False,
+            partner.property_account_position_id.id or False,
+            product.fiscal_type or False,
+            product.tax_icms_or_issqn or False,
+        )
+
+    @api.model
+    @tools.ormcache("operation_id")
+    def _get_line_matcher(self, operation_id):
+        """Approved lines of the operation as (id, match values, date start,
+        date end, CFOP ids) tuples in the line_definition search order"""
+        operation = self.sudo().browse(operation_id)
+        lines = (
+            self.env["l10n_br_fiscal.operation.line"]
+            .sudo()
+            .search(
+                [
+                    ("fiscal_operation_id", "=", operation_id),
+                    ("fiscal_operation_type", "=", operation.fiscal_operation_type),
+                    ("state", "=", "approved"),
+                ]
+            )
+        )
+        return tuple(
+            (
+                line.id,
+                tuple(
+                    line[fname].id if fname == "fiscal_position_id" else line[fname]
+                    for fname in LINE_MATCH_FIELDS
+                ),
+                line.date_start,
+                line.date_end,
+                (
+                    line.cfop_internal_id.id,
+                    line.cfop_external_id.id,
+                    line.cfop_export_id.id,
+                ),
+            )
+            for line in lines
+        )
+
+    @api.model
+    @tools.ormcache("operation_id", "key")
+    def _match_lines(self, operation_id, key):
+        """Lines of the operation matching the key, whatever their dates"""
+        return tuple(
+            (line_id, date_start, date_end, cfop_ids)
+            for line_id, values, date_start, date_end, cfop_ids in (
+                self._get_line_matcher(operation_id)
+            )
+            if all(not value or value == k for value, k in zip(values, key))
+        )
+
+    def line_definitions(self, company, partner_products):
+        """Operation lines and CFOPs of many (partner, product) pairs.
+
+        The lines are matched from a cache of the operation lines, so the
+        same partner and product values are resolved once.
+
+        :param company: res.company of the documents
+        :param partner_products: list of (partner, product) pairs
+        :return: list of (operation line, CFOP) in the order of the pairs
+        """
         self.ensure_one()
         if not company:
             company = self.env.company
+        line_model = self.env["l10n_br_fiscal.operation.line"]
+        cfop_model = self.env["l10n_br_fiscal.cfop"]
+        now = fields.Datetime.now()
+        matches = {}
+        result = []
+        for partner, product in partner_products:
+            key = (
+                self._line_match_key(company, partner, product),
+                line_model._get_cfop_destination(company, partner),
+            )
+            if key not in matches:
+                matches[key] = (line_model, cfop_model)
+                for line_id, date_start, date_end, cfop_ids in self._match_lines(
+                    self.id, key[0]
+                ):
+                    if (not date_start or date_start <= now) and (
+                        not date_end or date_end >= now
+                    ):
+                        matches[key] = (
+                            line_model.browse(line_id),
+                            cfop_model.browse(cfop_ids[key[1]]),
+                        )
+                        break
+            result.append(matches[key])
+        return result
 
-        line = self.line_ids.search(
-            self._line_domain(company, partner, product), limit=1
-        )
-
-        return line
+    def line_definition(self, company, partner, product):
+        self.ensure_one()
+        return self.line_definitions(company, [(partner, product)])[0][0]
 
     @api.onchange("operation_subsequent_ids")
     def _onchange_operation_subsequent_ids(self):
@@ -2,8 +2,10 @@
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
 import json
+import time
 
 from odoo import _, fields, models
+from odoo.tools.misc import formatLang
 
 from ..constants.fiscal import (
     SITUACAO_EDOC_A_ENVIAR,
@@ -30,19 +32,24 @@ EDOC_CANCELED = (
 )
 
 
+EDOC_DASHBOARD_STATES = dict(
+    [(state, "2confirm") for state in EDOC_2_CONFIRM]
+    + [(SITUACAO_EDOC_AUTORIZADA, "authorized")]
+    + [(state, "cancelled") for state in EDOC_CANCELED]
+)
+
+# Short-lived cache of the dashboard data, the cache lifetime in seconds is
+# set by the l10n_br_fiscal.dashboard_cache_ttl parameter (disabled by default)
+_dashboard_cache = {}
+
+
 class Operation(models.Model):
     _inherit = "l10n_br_fiscal.operation"
 
-    # TODO: Implementar no dashboard o valor total das operações, isso pode requer o
-    #   uso de querys sql diretamente, não esquecer de aplicar as regras de acesso
-    #   de forma manual ou usando o ORM:
-    #         query = self._where_calc(args)
-    #         self._apply_ir_rules(query, 'read')
     def _compute_kanban_dashboard(self):
+        dashboard_data = self._get_operation_dashboard_data_cached()
         for operation in self:
-            operation.kanban_dashboard = json.dumps(
-                operation.get_operation_dashboard_data()
-            )
+            operation.kanban_dashboard = json.dumps(dashboard_data[operation.id])
 
     kanban_dashboard = fields.Text(compute="_compute_kanban_dashboard")
 
@@ -50,54 +57,103 @@ class Operation(models.Model):
 
     def get_operation_dashboard_data(self):
         self.ensure_one()
-        title = ""
-        if self.fiscal_type in ("sale", "purchase"):
-            title = (
-                _("Bills to pay")
-                if self.fiscal_type == "purchase"
-                else _("Invoices owed to you")
-            )
-
-        number_2confirm = self._get_number_2confirm_documents()
-        number_authorized = self._get_authorized_documents()
-        number_cancelled = self._get_cancelled_documents()
+        return self._get_operation_dashboard_data()[self.id]
 
-        return {
-            "number_2confirm": number_2confirm,
-            "number_authorized": number_authorized,
-            "number_cancelled": number_cancelled,
-            "title": title,
+    def _get_operation_dashboard_data_cached(self):
+        cache_ttl = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_br_fiscal.dashboard_cache_ttl", default=0)
+        )
+        if not cache_ttl:
+            return self._get_operation_dashboard_data()
+
+        cache_key = (
+            self.env.cr.dbname,
+            self.env.uid,
+            self.env.lang,
+            tuple(self.env.companies.ids),
+            self._fiscal_document_object()._name,
+            tuple(sorted(self.ids)),
+        )
+        now = time.time()
+        cached = _dashboard_cache.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        for key in [k for k, v in _dashboard_cache.items() if v[0] <= now]:
+            _dashboard_cache.pop(key, None)
+
+        dashboard_data = self._get_operation_dashboard_data()
+        _dashboard_cache[cache_key] = (now + cache_ttl, dashboard_data)
+        return dashboard_data
+
+    def _get_operation_dashboard_data(self):
+        """Compute the dashboard data of all operations in self with a
+        single grouped query on the fiscal documents, the access rules
+        are applied by read_group."""
+        document_object = self._fiscal_document_object()
+        amount_field = document_object._fields.get("amount_total")
+        with_amount = bool(amount_field and amount_field.store)
+        currency = self.env.company.currency_id
+
+        counters = {
+            operation.id: {
+                "number_2confirm": 0,
+                "number_authorized": 0,
+                "number_cancelled": 0,
+                "amount_2confirm": 0.0,
+                "amount_authorized": 0.0,
+                "amount_cancelled": 0.0,
+            }
+            for operation in self
         }
 
-    def _fiscal_document_object(self):
-        return self.env["l10n_br_fiscal.document"]
+        if self.ids:
+            group_fields = ["fiscal_operation_id", "state_edoc"]
+            if with_amount:
+                group_fields.append("amount_total")
+
+            groups = document_object.read_group(
+                domain=[
+                    ("fiscal_operation_id", "in", self.ids),
+                    ("state_edoc", "in", list(EDOC_DASHBOARD_STATES)),
+                ],
+                fields=group_fields,
+                groupby=["fiscal_operation_id", "state_edoc"],
+                lazy=False,
+            )
 
-    def _get_number_2confirm_documents(self):
-        return self._fiscal_document_object().search_count(
-            [
-                ("fiscal_operation_id.fiscal_type", "=", self.fiscal_type),
-                ("fiscal_operation_id", "=", self.id),
-                ("state_edoc", "in", EDOC_2_CONFIRM),
-            ]
-        )
+            for group in groups:
+                operation_id = group["fiscal_operation_id"][0]
+                status = EDOC_DASHBOARD_STATES[group["state_edoc"]]
+                counters[operation_id]["number_" + status] += group["__count"]
+                if with_amount:
+                    counters[operation_id]["amount_" + status] += (
+                        group["amount_total"] or 0.0
+                    )
 
-    def _get_authorized_documents(self):
-        return self._fiscal_document_object().search_count(
-            [
-                ("fiscal_operation_id.fiscal_type", "=", self.fiscal_type),
-                ("fiscal_operation_id", "=", self.id),
-                ("state_edoc", "=", SITUACAO_EDOC_AUTORIZADA),
-            ]
-        )
+        result = {}
+        for operation in self:
+            title = ""
+            if operation.fiscal_type in ("sale", "purchase"):
+                title = (
+                    _("Bills to pay")
+                    if operation.fiscal_type == "purchase"
+                    else _("Invoices owed to you")
+                )
+
+            values = dict(counters[operation.id], title=title, with_amount=with_amount)
+            for status in ("2confirm", "authorized", "cancelled"):
+                values["amount_%s_formatted" % status] = formatLang(
+                    self.env, values["amount_" + status], currency_obj=currency
+                )
+            result[operation.id] = values
+
+        return result
 
-    def _get_cancelled_documents(self):
-        return self._fiscal_document_object().search_count(
-            [
-                ("fiscal_operation_id.fiscal_type", "=", self.fiscal_type),
-                ("fiscal_operation_id", "=", self.id),
-                ("state_edoc", "in", EDOC_CANCELED),
-            ]
-        )
+    def _fiscal_document_object(self):
+        return self.env["l10n_br_fiscal.document"]
 
     def action_create_new(self):
         ctx = self._context.copy()
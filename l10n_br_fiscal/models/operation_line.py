@@ -19,6 +19,28 @@ from ..constants.fiscal import (
 )
 from ..constants.icms import ICMS_ORIGIN
 
+# Fields of the operation lines matched against the company, partner and
+# product values of Operation._line_match_key, False matches any value
+LINE_MATCH_FIELDS = (
+    "company_tax_framework",
+    "ind_ie_dest",
+    "partner_tax_framework",
+    "fiscal_position_id",
+    "product_type",
+    "tax_icms_or_issqn",
+)
+
+# Operation line fields that change the result of Operation.line_definition
+LINE_DEFINITION_FIELDS = LINE_MATCH_FIELDS + (
+    "fiscal_operation_id",
+    "state",
+    "date_start",
+    "date_end",
+    "cfop_internal_id",
+    "cfop_external_id",
+    "cfop_export_id",
+)
+
 
 class OperationLine(models.Model):
     _name = "l10n_br_fiscal.operation.line"
@@ -165,15 +187,20 @@ class OperationLine(models.Model):
 
         return document_type
 
-    def _get_cfop(self, company, partner):
-        cfop = False
-        if partner.state_id == company.state_id:
-            cfop = self.cfop_internal_id
-        if partner.state_id != company.state_id:
-            cfop = self.cfop_external_id
+    @api.model
+    def _get_cfop_destination(self, company, partner):
+        """Index of the CFOP of the partner: 0 internal, 1 external
+        (interstate) or 2 export"""
         if partner.country_id != company.country_id:
-            cfop = self.cfop_export_id
-        return cfop
+            return 2
+        if partner.state_id != company.state_id:
+            return 1
+        return 0
+
+    def _get_cfop(self, company, partner):
+        return (self.cfop_internal_id, self.cfop_external_id, self.cfop_export_id)[
+            self._get_cfop_destination(company, partner)
+        ]
 
     def _build_mapping_result(self, mapping_result, tax_definition):
         mapping_result["taxes"][tax_definition.tax_domain] = tax_definition.tax_id
@@ -272,13 +299,27 @@ class OperationLine(models.Model):
     def action_review(self):
         self.write({"state": "review"})
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        self.clear_caches()
+        return lines
+
+    def write(self, values):
+        result = super().write(values)
+        if set(LINE_DEFINITION_FIELDS) & set(values):
+            self.clear_caches()
+        return result
+
     def unlink(self):
         lines = self.filtered(lambda l: l.state == "approved")
         if lines:
             raise UserError(
                 _("You cannot delete an Operation Line which is not draft !")
             )
-        return super(OperationLine, self).unlink()
+        result = super(OperationLine, self).unlink()
+        self.clear_caches()
+        return result
 
     @api.onchange("fiscal_operation_id")
     def _onchange_fiscal_operation_id(self):
@@ -103,48 +103,28 @@ class ResCompany(models.Model):
     def _compute_simplifed_tax(self):
         for record in self:
             record.coefficient_r = False
+            record.coefficient_r_percent = 0.0
             if record.payroll_amount and record.annual_revenue:
                 coefficient_r_percent = record.payroll_amount / record.annual_revenue
                 if coefficient_r_percent > COEFFICIENT_R:
                     record.coefficient_r = True
                 record.coefficient_r_percent = coefficient_r_percent
 
-            simplified_tax_id = self.env["l10n_br_fiscal.simplified.tax"].search(
-                [
-                    ("cnae_ids", "=", record.cnae_main_id.id),
-                    ("coefficient_r", "=", record.coefficient_r),
-                ]
-            )
-            record.simplifed_tax_id = simplified_tax_id
-
-            if simplified_tax_id:
-                tax_range = record.env["l10n_br_fiscal.simplified.tax.range"].search(
-                    [
-                        ("simplified_tax_id", "=", simplified_tax_id.id),
-                        ("inital_revenue", "<=", record.annual_revenue),
-                        ("final_revenue", ">=", record.annual_revenue),
-                        ("simplified_tax_id.coefficient_r", "=", record.coefficient_r),
-                    ],
-                    limit=1,
+        simplified_taxes = self.env[
+            "l10n_br_fiscal.simplified.tax"
+        ]._get_simplified_tax_ranges(
+            [(r.cnae_main_id.id, r.annual_revenue, r.coefficient_r) for r in self]
+        )
+
+        for record, simplified_tax in zip(self, simplified_taxes):
+            record.simplifed_tax_id = simplified_tax["simplified_tax_id"]
+            record.simplifed_tax_range_id = simplified_tax["simplified_tax_range_id"]
+            record.simplifed_tax_percent = 0.0
+            if record.simplifed_tax_range_id and record.annual_revenue:
+                record.simplifed_tax_percent = round(
+                    simplified_tax["tax_percent"],
+                    record.currency_id.decimal_places,
                 )
-                record.simplifed_tax_range_id = tax_range
-
-                if record.simplifed_tax_range_id and record.annual_revenue:
-                    record.simplifed_tax_percent = round(
-                        (
-                            (
-                                (
-                                    record.annual_revenue
-                                    * record.simplifed_tax_range_id.total_tax_percent
-                                    / 100
-                                )
-                                - record.simplifed_tax_range_id.amount_deduced
-                            )
-                            / record.annual_revenue
-                        )
-                        * 100,
-                        record.currency_id.decimal_places,
-                    )
 
     cnae_main_id = fields.Many2one(
         comodel_name="l10n_br_fiscal.cnae",
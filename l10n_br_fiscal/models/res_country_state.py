@@ -2,7 +2,7 @@
 # Copyright (C) 2016  Renato Lima - Akretion
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class ResCountryState(models.Model):
@@ -13,3 +13,21 @@ class ResCountryState(models.Model):
         string="Tax Definitions",
         domain="['|', ('state_from_ids', '=', id), ('state_to_ids', '=', id)]",
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        states = super().create(vals_list)
+        # The ICMS Regulation form view is cached and built from the states
+        self.clear_caches()
+        return states
+
+    def write(self, values):
+        result = super().write(values)
+        if {"code", "name", "country_id"} & set(values):
+            self.clear_caches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.clear_caches()
+        return result
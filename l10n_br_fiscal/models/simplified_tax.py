@@ -2,7 +2,9 @@
 # Copyright (C) 2020  Luis Felipe Mileo - KMEE
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
-from odoo import fields, models
+from bisect import bisect_right
+
+from odoo import api, fields, models, tools
 
 
 class SimplifiedTax(models.Model):
@@ -31,3 +33,97 @@ class SimplifiedTax(models.Model):
         string="Coefficient R",
         readonly=True,
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        simplified_taxes = super().create(vals_list)
+        self.clear_caches()
+        return simplified_taxes
+
+    def write(self, values):
+        result = super().write(values)
+        self.clear_caches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.clear_caches()
+        return result
+
+    @api.model
+    @tools.ormcache()
+    def _get_simplified_tax_table(self):
+        """Build the Simples Nacional annexes lookup table.
+
+        :return: dict {(cnae_id, coefficient_r): (simplified_tax_id,
+            inital_revenues, ranges)} where ranges is a tuple of
+            (inital_revenue, final_revenue, range_id, total_tax_percent,
+            amount_deduced) sorted by inital_revenue and inital_revenues
+            the sorted initial revenues used by the bisect lookup.
+        """
+        table = {}
+        simplified_taxes = self.sudo().with_context(active_test=False).search([])
+        for simplified_tax in simplified_taxes:
+            ranges = tuple(
+                sorted(
+                    (
+                        tax_range.inital_revenue,
+                        tax_range.final_revenue,
+                        tax_range.id,
+                        tax_range.total_tax_percent,
+                        tax_range.amount_deduced,
+                    )
+                    for tax_range in simplified_tax.simplified_tax_range_ids
+                )
+            )
+            inital_revenues = tuple(r[0] for r in ranges)
+            for cnae in simplified_tax.cnae_ids:
+                table.setdefault(
+                    (cnae.id, simplified_tax.coefficient_r),
+                    (simplified_tax.id, inital_revenues, ranges),
+                )
+        return table
+
+    @api.model
+    def _get_simplified_tax_ranges(self, values):
+        """Resolve the Simples Nacional annex, revenue range and effective
+        tax percent for many companies at once.
+
+        :param values: list of (cnae_id, annual_revenue, coefficient_r)
+        :return: list of dicts with the keys simplified_tax_id,
+            simplified_tax_range_id and tax_percent, in the same order as
+            values.
+        """
+        table = self._get_simplified_tax_table()
+        result = []
+        for cnae_id, revenue, coefficient_r in values:
+            simplified_tax_id, inital_revenues, ranges = table.get(
+                (cnae_id, bool(coefficient_r)), (False, (), ())
+            )
+            tax_range_id = False
+            tax_percent = 0.0
+
+            index = bisect_right(inital_revenues, revenue or 0.0) - 1
+            if index >= 0 and ranges[index][1] >= (revenue or 0.0):
+                (
+                    _inital,
+                    _final,
+                    tax_range_id,
+                    total_tax_percent,
+                    amount_deduced,
+                ) = ranges[index]
+                if revenue:
+                    tax_percent = (
+                        ((revenue * total_tax_percent / 100) - amount_deduced)
+                        / revenue
+                        * 100
+                    )
+
+            result.append(
+                {
+                    "simplified_tax_id": simplified_tax_id,
+                    "simplified_tax_range_id": tax_range_id,
+                    "tax_percent": tax_percent,
+                }
+            )
+        return result
@@ -1,7 +1,7 @@
 # Copyright (C) 2019  Renato Lima - Akretion
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class SimplifiedTaxRange(models.Model):
@@ -68,3 +68,19 @@ class SimplifiedTaxRange(models.Model):
     tax_pis_percent = fields.Float(
         string="Tax PIS Percent", digits="Fiscal Tax Percent"
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        tax_ranges = super().create(vals_list)
+        self.clear_caches()
+        return tax_ranges
+
+    def write(self, values):
+        result = super().write(values)
+        self.clear_caches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.clear_caches()
+        return result
@@ -28,6 +28,7 @@ from ..constants.icms import (
     ICMS_ST_BASE_TYPE_DEFAULT,
     ICSM_CST_CSOSN_ST_BASE,
 )
+from ..tools.misc import cached_ref
 
 TAX_DICT_VALUES = {
     "name": False,
@@ -101,7 +102,7 @@ class Tax(models.Model):
 
     currency_id = fields.Many2one(
         comodel_name="res.currency",
-        default=lambda self: self.env.ref("base.BRL"),
+        default=lambda self: cached_ref(self.env, "base.BRL"),
         string="Currency",
     )
 
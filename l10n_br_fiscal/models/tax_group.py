@@ -1,7 +1,7 @@
 # Copyright (C) 2019  Renato Lima - Akretion <renato.lima@akretion.com.br>
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
-from odoo import _, fields, models
+from odoo import _, api, fields, models
 
 from ..constants.fiscal import TAX_DOMAIN
 
@@ -78,3 +78,21 @@ class TaxGroup(models.Model):
             _("Tax Group already exists with this name !"),
         )
     ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        tax_groups = super().create(vals_list)
+        self.clear_caches()
+        return tax_groups
+
+    def write(self, values):
+        result = super().write(values)
+        # the CST code maps are grouped by tax domain
+        if "tax_domain" in values:
+            self.clear_caches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.clear_caches()
+        return result
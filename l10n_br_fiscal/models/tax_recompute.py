@@ -0,0 +1,371 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+import logging
+import threading
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+from ..constants.fiscal import SITUACAO_EDOC_EM_DIGITACAO
+
+_logger = logging.getLogger(__name__)
+
+RECOMPUTE_STATE = [
+    ("draft", "Draft"),
+    ("queued", "Queued"),
+    ("done", "Done"),
+]
+
+RECOMPUTE_LINE_STATE = [
+    ("todo", "To Do"),
+    ("done", "Done"),
+    ("error", "Error"),
+]
+
+
+class TaxRecompute(models.Model):
+    """Recompute the fiscal taxes of the open documents after a change of
+    the tax rules (NCM, ICMS regulation, operation line...).
+
+    Queuing a recompute stores one line per document line to recompute,
+    then the cron processes them by chunks. A line is claimed with
+    FOR UPDATE SKIP LOCKED, so an interrupted recompute resumes where it
+    stopped and several workers can process the same recompute.
+    """
+
+    _name = "l10n_br_fiscal.tax.recompute"
+    _description = "Fiscal Tax Recompute"
+    _order = "id desc"
+
+    name = fields.Char(
+        required=True,
+        readonly=True,
+        states={"draft": [("readonly", False)]},
+    )
+
+    company_id = fields.Many2one(
+        comodel_name="res.company",
+        string="Company",
+        required=True,
+        readonly=True,
+        states={"draft": [("readonly", False)]},
+        default=lambda self: self.env.company,
+    )
+
+    currency_id = fields.Many2one(
+        comodel_name="res.currency",
+        related="company_id.currency_id",
+    )
+
+    ncm_ids = fields.Many2many(
+        comodel_name="l10n_br_fiscal.ncm",
+        string="NCMs",
+        readonly=True,
+        states={"draft": [("readonly", False)]},
+    )
+
+    fiscal_operation_line_ids = fields.Many2many(
+        comodel_name="l10n_br_fiscal.operation.line",
+        string="Operation Lines",
+        readonly=True,
+        states={"draft": [("readonly", False)]},
+    )
+
+    cfop_ids = fields.Many2many(
+        comodel_name="l10n_br_fiscal.cfop",
+        string="CFOPs",
+        readonly=True,
+        states={"draft": [("readonly", False)]},
+    )
+
+    partner_state_ids = fields.Many2many(
+        comodel_name="res.country.state",
+        string="Partner States",
+        readonly=True,
+        states={"draft": [("readonly", False)]},
+    )
+
+    state = fields.Selection(
+        selection=RECOMPUTE_STATE,
+        string="Status",
+        readonly=True,
+        default="draft",
+    )
+
+    line_ids = fields.One2many(
+        comodel_name="l10n_br_fiscal.tax.recompute.line",
+        inverse_name="recompute_id",
+        string="Lines",
+        readonly=True,
+    )
+
+    line_count = fields.Integer(compute="_compute_line_count")
+
+    todo_count = fields.Integer(compute="_compute_line_count")
+
+    changed_count = fields.Integer(compute="_compute_line_count")
+
+    error_count = fields.Integer(compute="_compute_line_count")
+
+    def _compute_line_count(self):
+        counts = {}
+        for group in self.env["l10n_br_fiscal.tax.recompute.line"].read_group(
+            [("recompute_id", "in", self.ids)],
+            ["recompute_id", "state", "changed"],
+            ["recompute_id", "state", "changed"],
+            lazy=False,
+        ):
+            count = counts.setdefault(group["recompute_id"][0], {})
+            keys = ["all", group["state"]] + (["changed"] if group["changed"] else [])
+            for key in keys:
+                count[key] = count.get(key, 0) + group["__count"]
+        for record in self:
+            count = counts.get(record.id, {})
+            record.line_count = count.get("all", 0)
+            record.todo_count = count.get("todo", 0)
+            record.changed_count = count.get("changed", 0)
+            record.error_count = count.get("error", 0)
+
+    @api.model
+    def _get_recompute_targets(self):
+        """Line models to recompute with the domain of their open lines,
+        override it to add the lines of other documents"""
+        return {
+            "l10n_br_fiscal.document.line": [
+                ("document_id.state_edoc", "=", SITUACAO_EDOC_EM_DIGITACAO)
+            ],
+        }
+
+    def _get_recompute_domain(self):
+        self.ensure_one()
+        domain = [("company_id", "=", self.company_id.id)]
+        if self.ncm_ids:
+            domain.append(("ncm_id", "in", self.ncm_ids.ids))
+        if self.fiscal_operation_line_ids:
+            domain.append(
+                ("fiscal_operation_line_id", "in", self.fiscal_operation_line_ids.ids)
+            )
+        if self.cfop_ids:
+            domain.append(("cfop_id", "in", self.cfop_ids.ids))
+        if self.partner_state_ids:
+            domain.append(("partner_id.state_id", "in", self.partner_state_ids.ids))
+        return domain
+
+    def action_queue(self):
+        """Select the lines to recompute and queue them"""
+        line_model = self.env["l10n_br_fiscal.tax.recompute.line"]
+        for record in self.filtered(lambda r: r.state == "draft"):
+            domain = record._get_recompute_domain()
+            for res_model, target_domain in record._get_recompute_targets().items():
+                res_ids = self.env[res_model].search(domain + target_domain).ids
+                if not res_ids:
+                    continue
+                line_model.flush()
+                self.env.cr.execute(
+                    """
+                    INSERT INTO l10n_br_fiscal_tax_recompute_line (
+                        recompute_id, res_model, res_id, state, changed,
+                        create_uid, create_date, write_uid, write_date)
+                    SELECT %(recompute_id)s, %(res_model)s, res_id, 'todo', false,
+                        %(uid)s, now() at time zone 'UTC',
+                        %(uid)s, now() at time zone 'UTC'
+                    FROM unnest(%(res_ids)s) AS res_id
+                    """,
+                    {
+                        "recompute_id": record.id,
+                        "res_model": res_model,
+                        "res_ids": res_ids,
+                        "uid": self.env.uid,
+                    },
+                )
+            line_model.invalidate_cache()
+            if not record.line_ids:
+                raise UserError(_("No open document line matches the filters."))
+            record.state = "queued"
+
+    def action_retry(self):
+        """Queue the lines in error again"""
+        for record in self:
+            error_lines = record.line_ids.filtered(lambda line: line.state == "error")
+            if error_lines:
+                error_lines.write({"state": "todo", "error": False})
+                record.state = "queued"
+
+    def action_draft(self):
+        self.mapped("line_ids").unlink()
+        self.write({"state": "draft"})
+
+    def _claim_lines(self, limit):
+        """Lock a chunk of lines to recompute, skipping the ones already
+        locked by another worker"""
+        self.ensure_one()
+        self.env["l10n_br_fiscal.tax.recompute.line"].flush(["state"])
+        self.env.cr.execute(
+            """
+            SELECT id FROM l10n_br_fiscal_tax_recompute_line
+            WHERE recompute_id = %s AND state = 'todo'
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (self.id, limit),
+        )
+        return self.env["l10n_br_fiscal.tax.recompute.line"].browse(
+            [row[0] for row in self.env.cr.fetchall()]
+        )
+
+    def _process(self, chunk_size=None, auto_commit=None):
+        if chunk_size is None:
+            chunk_size = int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("l10n_br_fiscal.tax_recompute_chunk_size", 100)
+            )
+        if auto_commit is None:
+            auto_commit = not getattr(threading.currentThread(), "testing", False)
+        for record in self:
+            while True:
+                lines = record._claim_lines(chunk_size)
+                if not lines:
+                    break
+                lines._recompute()
+                if auto_commit:
+                    self.env.cr.commit()
+            record.invalidate_cache(
+                ["line_count", "todo_count", "changed_count", "error_count"]
+            )
+            if not record.todo_count:
+                record.state = "done"
+                _logger.info(
+                    "Fiscal tax recompute %s done: %s lines, %s changed, %s errors",
+                    record.name,
+                    record.line_count,
+                    record.changed_count,
+                    record.error_count,
+                )
+            if auto_commit:
+                self.env.cr.commit()
+
+    @api.model
+    def _cron_process(self, chunk_size=None, auto_commit=None):
+        self.search([("state", "=", "queued")], order="id")._process(
+            chunk_size, auto_commit
+        )
+
+
+class TaxRecomputeLine(models.Model):
+    _name = "l10n_br_fiscal.tax.recompute.line"
+    _description = "Fiscal Tax Recompute Line"
+    _order = "id"
+
+    recompute_id = fields.Many2one(
+        comodel_name="l10n_br_fiscal.tax.recompute",
+        string="Recompute",
+        required=True,
+        index=True,
+        ondelete="cascade",
+    )
+
+    currency_id = fields.Many2one(
+        comodel_name="res.currency",
+        related="recompute_id.currency_id",
+    )
+
+    res_model = fields.Char(
+        string="Model",
+        required=True,
+    )
+
+    res_id = fields.Many2oneReference(
+        string="Record",
+        model_field="res_model",
+        required=True,
+    )
+
+    name = fields.Char(
+        string="Document",
+        help="Document of the line when it was recomputed",
+    )
+
+    state = fields.Selection(
+        selection=RECOMPUTE_LINE_STATE,
+        string="Status",
+        default="todo",
+        required=True,
+        index=True,
+    )
+
+    changed = fields.Boolean()
+
+    amount_tax_before = fields.Monetary(string="Amount Tax Before")
+
+    amount_tax_after = fields.Monetary(string="Amount Tax After")
+
+    amount_total_before = fields.Monetary(string="Amount Total Before")
+
+    amount_total_after = fields.Monetary(string="Amount Total After")
+
+    error = fields.Text()
+
+    @api.model
+    def _get_document_name(self, line):
+        document = line["document_id"] if "document_id" in line else None
+        return (document or line).display_name
+
+    def _recompute(self):
+        """Recompute the document lines of the recompute lines and store
+        their amounts before and after"""
+        for res_model in set(self.mapped("res_model")):
+            recompute_lines = self.filtered(lambda r: r.res_model == res_model)
+            document_lines = (
+                self.env[res_model].browse(recompute_lines.mapped("res_id")).exists()
+            )
+            before = {
+                line.id: (line.amount_tax, line.amount_total) for line in document_lines
+            }
+            errors = {}
+            try:
+                with self.env.cr.savepoint():
+                    document_lines._recompute_fiscal_taxes()
+            except Exception:
+                # recompute them one by one to isolate the failing ones
+                for line in document_lines:
+                    try:
+                        with self.env.cr.savepoint():
+                            line._recompute_fiscal_taxes()
+                    except Exception as e:
+                        _logger.error("Tax recompute error of %s: %s", line, e)
+                        errors[line.id] = str(e)
+            document_lines.invalidate_cache()
+            document_lines = document_lines.exists()
+            for recompute_line in recompute_lines:
+                currency = recompute_line.currency_id
+                line = document_lines.filtered(
+                    lambda dl: dl.id == recompute_line.res_id
+                )
+                vals = {"state": "done"}
+                if recompute_line.res_id in errors:
+                    vals.update(state="error", error=errors[recompute_line.res_id])
+                elif line:
+                    tax_before, total_before = before[line.id]
+                    vals.update(
+                        name=self._get_document_name(line),
+                        amount_tax_before=tax_before,
+                        amount_tax_after=line.amount_tax,
+                        amount_total_before=total_before,
+                        amount_total_after=line.amount_total,
+                        changed=bool(
+                            currency.compare_amounts(tax_before, line.amount_tax)
+                            or currency.compare_amounts(total_before, line.amount_total)
+                        ),
+                    )
+                recompute_line.write(vals)
+
+    def action_open_record(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self.res_model,
+            "res_id": self.res_id,
+            "view_mode": "form",
+        }
@@ -19,14 +19,20 @@ class Uom(models.Model):
     def _get_code_domain(self, sub_domain, domain):
         code_operator = sub_domain[1]
         code_value = sub_domain[2]
-        alternative = (
-            self.env["uom.uom.alternative"]
-            .search([("code", code_operator, code_value)])
-            .mapped("uom_id")
-        )
+        if code_operator == "=":
+            alternative_ids = self.env["uom.uom.alternative"]._get_code_map().get(
+                code_value, ()
+            )
+        else:
+            alternative_ids = (
+                self.env["uom.uom.alternative"]
+                .search([("code", code_operator, code_value)])
+                .mapped("uom_id")
+                .ids
+            )
         domain = [
-            ("id", "in", alternative.ids)
-            if x[0] == "code" and x[2] == code_value and alternative.ids
+            ("id", "in", list(alternative_ids))
+            if x[0] == "code" and x[2] == code_value and alternative_ids
             else x
             for x in domain
         ]
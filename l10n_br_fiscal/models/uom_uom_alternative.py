@@ -1,7 +1,7 @@
 # Copyright 2019 KMEE INFORMATICA LTDA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models
+from odoo import api, fields, models, tools
 
 
 class UomUomAlternative(models.Model):
@@ -20,3 +20,32 @@ class UomUomAlternative(models.Model):
             "You can note repeat the alternative name",
         )
     ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        alternatives = super().create(vals_list)
+        self.clear_caches()
+        return alternatives
+
+    def write(self, values):
+        result = super().write(values)
+        self.clear_caches()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.clear_caches()
+        return result
+
+    @api.model
+    @tools.ormcache()
+    def _get_code_map(self):
+        """UoM ids by alternative code, kept in the registry cache since
+        uom.uom searches by code look it up on every call"""
+        code_map = {}
+        for alternative in self.sudo().search_read([], ["code", "uom_id"]):
+            if alternative["code"] and alternative["uom_id"]:
+                code_map.setdefault(alternative["code"], []).append(
+                    alternative["uom_id"][0]
+                )
+        return {code: tuple(uom_ids) for code, uom_ids in code_map.items()}
@@ -0,0 +1,165 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+import gzip
+import hashlib
+import logging
+
+import psycopg2
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+    _logger.debug("zstandard not installed, fiscal XML zstd compression disabled")
+
+XML_BLOB_URL = "/l10n_br_fiscal/xml/"
+
+COMPRESSION = [
+    ("none", "None"),
+    ("gzip", "gzip"),
+    ("zstd", "Zstandard"),
+]
+
+
+class XmlBlob(models.Model):
+    """Fiscal XML files stored once by their SHA-256, optionally compressed.
+
+    Events reference the blobs through lightweight url attachments
+    (see XML_BLOB_URL), so the same XML saved again is not duplicated.
+    """
+
+    _name = "l10n_br_fiscal.xml.blob"
+    _description = "Fiscal XML Blob"
+    _rec_name = "checksum"
+
+    checksum = fields.Char(
+        string="SHA-256",
+        required=True,
+        readonly=True,
+        index=True,
+    )
+
+    compression = fields.Selection(
+        selection=COMPRESSION,
+        required=True,
+        readonly=True,
+        default="none",
+    )
+
+    size = fields.Integer(
+        string="Size",
+        readonly=True,
+        help="Size of the uncompressed XML in bytes",
+    )
+
+    attachment_id = fields.Many2one(
+        comodel_name="ir.attachment",
+        string="Stored File",
+        readonly=True,
+        ondelete="restrict",
+    )
+
+    _sql_constraints = [
+        (
+            "xml_blob_checksum_unique",
+            "unique (checksum)",
+            "A fiscal XML blob with the same checksum already exists.",
+        )
+    ]
+
+    @api.model
+    def _get_compression(self):
+        compression = (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_br_fiscal.xml_compression", "gzip")
+        )
+        if compression == "zstd" and zstandard is None:
+            compression = "gzip"
+        return compression
+
+    @api.model
+    def _compress(self, content, compression):
+        if compression == "gzip":
+            return gzip.compress(content, mtime=0)
+        if compression == "zstd":
+            return zstandard.ZstdCompressor().compress(content)
+        return content
+
+    def _decompress(self, content):
+        self.ensure_one()
+        if self.compression == "gzip":
+            return gzip.decompress(content)
+        if self.compression == "zstd":
+            return zstandard.ZstdDecompressor().decompress(content)
+        return content
+
+    @api.model
+    def store(self, content):
+        """Return the blob of the content (str or bytes), creating it if
+        no identical content was stored before"""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        checksum = hashlib.sha256(content).hexdigest()
+        blob = self.sudo().search([("checksum", "=", checksum)], limit=1)
+        if blob:
+            return blob
+        compression = self._get_compression()
+        try:
+            with self.env.cr.savepoint():
+                blob = self.sudo().create(
+                    {
+                        "checksum": checksum,
+                        "compression": compression,
+                        "size": len(content),
+                    }
+                )
+                blob.attachment_id = self.env["ir.attachment"].sudo().create(
+                    {
+                        "name": checksum + {"gzip": ".gz", "zstd": ".zst"}.get(
+                            compression, ".xml"
+                        ),
+                        "res_model": self._name,
+                        "res_id": blob.id,
+                        "raw": self._compress(content, compression),
+                        "type": "binary",
+                    }
+                )
+        except psycopg2.IntegrityError:
+            # stored meanwhile by a concurrent transaction, which is not
+            # visible when it committed after the snapshot of this one
+            blob = self.sudo().search([("checksum", "=", checksum)], limit=1)
+            if not blob:
+                raise
+        return blob
+
+    def get_content(self):
+        """Uncompressed content of the blob as bytes"""
+        self.ensure_one()
+        return self._decompress(self.sudo().attachment_id.raw)
+
+    @api.model
+    def _url(self, blob, file_name):
+        return "%s%s/%s" % (XML_BLOB_URL, blob.checksum, file_name)
+
+    @api.model
+    def _from_attachment(self, attachment):
+        if attachment.type == "url" and (attachment.url or "").startswith(
+            XML_BLOB_URL
+        ):
+            checksum = attachment.url[len(XML_BLOB_URL) :].split("/")[0]
+            return self.sudo().search([("checksum", "=", checksum)], limit=1)
+        return self.browse()
+
+    @api.model
+    def get_attachment_content(self, attachment):
+        """Content of a fiscal XML attachment, whether it is stored as a
+        blob or as a regular binary attachment"""
+        blob = self._from_attachment(attachment)
+        if blob:
+            return blob.get_content()
+        return attachment.raw
@@ -12,3 +12,18 @@ from . import test_fiscal_closing
 from . import test_subsequent_operation
 from . import test_uom_uom
 from . import test_fiscal_document_nfse
+from . import test_icms_regulation_view
+from . import test_operation_dashboard
+from . import test_simplified_tax
+from . import test_data_loader
+from . import test_document_pdf_queue
+from . import test_xml_blob
+from . import test_ibpt_table
+from . import test_reference_cache
+from . import test_sped_efd
+from . import test_tax_recompute
+from . import test_operation_line_matcher
+from . import test_document_serie_block
+from . import test_document_mass_process
+from . import test_edoc_key
+from . import test_document_return
@@ -0,0 +1,119 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+import time
+
+from odoo.tests import SavepointCase
+from odoo.tools.convert import convert_csv_import
+
+from ..tools.data_loader import bulk_load_csv
+
+_logger = logging.getLogger(__name__)
+
+NCM_HEADER = '"id","code","exception","name","tax_ipi_id:id","tax_ii_id:id","uoe_id:id"'
+
+
+def _ncm_csv(chapter, quantity, name="Produto teste"):
+    lines = [NCM_HEADER]
+    for i in range(quantity):
+        code = "{}{:02d}{:04d}".format(chapter, i // 10000, i % 10000)
+        lines.append(
+            '"test_ncm_{0}","{1}.{2}.{3}",,"{4} {0}","tax_ipi_nt","tax_ii_0",'
+            '"uom.product_uom_unit"'.format(code, code[:4], code[4:6], code[6:], name)
+        )
+    return "\n".join(lines) + "\n"
+
+
+class TestDataLoader(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ncm_model = cls.env["l10n_br_fiscal.ncm"]
+
+    def test_bulk_load_ncm(self):
+        """Test NCM bulk load and incremental update"""
+        content = _ncm_csv("98", 50)
+        result = bulk_load_csv(
+            self.env, "l10n_br_fiscal", "l10n_br_fiscal.ncm.csv", content=content
+        )
+        self.assertEqual(result["created"], 50)
+        self.assertEqual(result["updated"], 0)
+
+        ncm = self.env.ref("l10n_br_fiscal.test_ncm_98000001")
+        self.assertEqual(ncm.code, "9800.00.01")
+        self.assertEqual(ncm.code_unmasked, "98000001")
+        self.assertEqual(ncm.tax_ipi_id, self.env.ref("l10n_br_fiscal.tax_ipi_nt"))
+        self.assertEqual(ncm.uoe_id, self.env.ref("uom.product_uom_unit"))
+
+        # New version of the table, one changed and one new NCM
+        content = _ncm_csv("98", 51).replace(
+            '"Produto teste 98000002"', '"Produto alterado 98000002"'
+        )
+        result = bulk_load_csv(
+            self.env, "l10n_br_fiscal", "l10n_br_fiscal.ncm.csv", content=content
+        )
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(result["unchanged"], 49)
+        self.assertEqual(
+            self.env.ref("l10n_br_fiscal.test_ncm_98000002").name,
+            "Produto alterado 98000002",
+        )
+
+    def test_bulk_load_nbm_ncms(self):
+        """Test the NCMs of NBM are linked by the bulk loader"""
+        bulk_load_csv(
+            self.env,
+            "l10n_br_fiscal",
+            "l10n_br_fiscal.ncm.csv",
+            content=_ncm_csv("98", 20),
+        )
+        content = (
+            "id,code,name,ncms\n"
+            'test_nbm_9800000100,9800.00.0100,NBM TESTE,"98000001,980000"\n'
+        )
+        bulk_load_csv(
+            self.env, "l10n_br_fiscal", "l10n_br_fiscal.nbm.csv", content=content
+        )
+        nbm = self.env.ref("l10n_br_fiscal.test_nbm_9800000100")
+        self.assertEqual(
+            nbm.ncm_ids,
+            self.ncm_model.search([("code_unmasked", "=like", "980000%")]),
+        )
+
+    def test_bulk_load_benchmark(self):
+        """Benchmark the bulk loader against the ORM CSV import"""
+        quantity = 2000
+
+        start = time.perf_counter()
+        convert_csv_import(
+            self.env.cr,
+            "l10n_br_fiscal",
+            "l10n_br_fiscal.ncm.csv",
+            _ncm_csv("98", quantity).encode("utf-8"),
+            mode="init",
+            noupdate=True,
+        )
+        orm_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk_load_csv(
+            self.env,
+            "l10n_br_fiscal",
+            "l10n_br_fiscal.ncm.csv",
+            content=_ncm_csv("99", quantity).replace(
+                '"test_ncm_', '"test_bulk_ncm_'
+            ),
+        )
+        bulk_time = time.perf_counter() - start
+
+        _logger.info(
+            "Loading %s NCMs: %.2fs with the ORM, %.2fs with the bulk loader",
+            quantity,
+            orm_time,
+            bulk_time,
+        )
+        self.assertEqual(
+            self.ncm_model.search_count([("code", "=like", "99%")]),
+            self.ncm_model.search_count([("code", "=like", "98%")]),
+        )
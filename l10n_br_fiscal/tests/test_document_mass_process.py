@@ -0,0 +1,102 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from unittest import mock
+
+from odoo.exceptions import UserError
+from odoo.tests import SavepointCase
+
+from ..constants.fiscal import (
+    DOCUMENT_ISSUER_COMPANY,
+    SITUACAO_EDOC_A_ENVIAR,
+    SITUACAO_EDOC_AUTORIZADA,
+    SITUACAO_EDOC_EM_DIGITACAO,
+)
+
+
+class TestDocumentMassProcess(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.serie = serie = cls.env.ref("l10n_br_fiscal.document_55_serie_1")
+        cls.documents = cls.env["l10n_br_fiscal.document"].create(
+            [
+                {
+                    "document_type_id": serie.document_type_id.id,
+                    "document_serie_id": serie.id,
+                    "company_id": serie.company_id.id,
+                    "issuer": DOCUMENT_ISSUER_COMPANY,
+                    "fiscal_operation_type": "out",
+                }
+                for _i in range(4)
+            ]
+        )
+        cls.documents.write({"document_electronic": False})
+        cls.document_class = type(cls.env["l10n_br_fiscal.document"])
+
+    def _create_wizard(self, operation):
+        return (
+            self.env["l10n_br_fiscal.document.mass.process.wizard"]
+            .with_context(
+                active_model="l10n_br_fiscal.document", active_ids=self.documents.ids
+            )
+            .create({"operation": operation, "chunk_size": 3, "max_workers": 2})
+        )
+
+    def test_mass_confirm_send(self):
+        """Check the documents are confirmed and sent by chunks"""
+        wizard = self._create_wizard("confirm_send")
+        self.assertEqual(wizard.document_ids, self.documents)
+        wizard.action_process()
+        self.assertEqual(wizard.state, "done")
+        self.assertEqual((wizard.done_count, wizard.error_count), (4, 0))
+        self.assertEqual(
+            set(self.documents.mapped("state_edoc")), {SITUACAO_EDOC_AUTORIZADA}
+        )
+        self.assertTrue(all(self.documents.mapped("document_number")))
+
+    def _process_with_failing_document(self, wizard, failing):
+        document_check = self.document_class._document_check
+
+        def _document_check(documents):
+            if failing in documents:
+                raise UserError("Invalid document")
+            return document_check(documents)
+
+        with mock.patch.object(self.document_class, "_document_check", _document_check):
+            wizard.action_process()
+
+    def test_mass_confirm_errors(self):
+        """Check a failing document does not stop the others"""
+        failing = self.documents[1]
+        wizard = self._create_wizard("confirm")
+        self._process_with_failing_document(wizard, failing)
+        self.assertEqual((wizard.done_count, wizard.error_count), (3, 1))
+        error_line = wizard.line_ids.filtered(lambda line: line.state == "error")
+        self.assertEqual(error_line.document_id, failing)
+        self.assertIn("Invalid document", error_line.error)
+        self.assertEqual(failing.state_edoc, SITUACAO_EDOC_EM_DIGITACAO)
+        self.assertEqual(
+            set((self.documents - failing).mapped("state_edoc")),
+            {SITUACAO_EDOC_A_ENVIAR},
+        )
+
+    def test_mass_confirm_errors_numbers(self):
+        """Check the one by one retry of a chunk takes its numbers from the
+        block of the chunk and no number is lost"""
+        sequence = self.serie.internal_sequence_id
+        number_next = sequence.number_next
+        failing = self.documents[1]
+        wizard = self._create_wizard("confirm")
+        self._process_with_failing_document(wizard, failing)
+        self.assertFalse(failing.document_number)
+        numbers = (self.documents - failing).mapped("document_number")
+        self.assertEqual(
+            sorted(int(n) for n in numbers), list(range(number_next, number_next + 3))
+        )
+        self.serie.invalidate_cache()
+        blocks = self.serie.block_ids.filtered(
+            lambda block: block.number_start >= number_next
+        )
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(blocks.state, "done")
+        self.assertFalse(blocks.invalidate_number_ids)
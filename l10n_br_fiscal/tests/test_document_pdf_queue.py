@@ -0,0 +1,69 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from unittest import mock
+
+from odoo.tests import SavepointCase
+
+
+def _fake_render(document_id):
+    return b"%PDF " + str(document_id).encode()
+
+
+def _make_pdf(documents):
+    for document in documents:
+        document._save_pdf(_fake_render(document.id), "%s.pdf" % document.id)
+
+
+class TestDocumentPdfQueue(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.documents = cls.env["l10n_br_fiscal.document"].create(
+            [
+                {
+                    "document_type_id": cls.env.ref(
+                        "l10n_br_fiscal.document_55_serie_1"
+                    ).id,
+                    "fiscal_operation_type": "out",
+                }
+                for _i in range(3)
+            ]
+        )
+        cls.document_class = type(cls.env["l10n_br_fiscal.document"])
+
+    def test_cron_render_pdf(self):
+        self.documents._queue_pdf()
+        self.assertTrue(all(self.documents.mapped("pdf_pending")))
+        with mock.patch.object(
+            self.document_class, "_render_pdf_batch", _make_pdf
+        ), mock.patch.object(self.document_class, "make_pdf", _make_pdf):
+            self.env["l10n_br_fiscal.document"]._cron_render_pdf(batch_size=2)
+            for document in self.documents:
+                self.assertFalse(document.pdf_pending)
+                self.assertEqual(document.file_report_id.raw, _fake_render(document.id))
+
+            # the PDF of a document not authorized yet is rendered again on
+            # demand, as a queued one, reusing its attachment
+            attachment = self.documents[0].file_report_id
+            self.documents[0].view_pdf()
+            self.assertEqual(self.documents[0].file_report_id, attachment)
+            self.documents[0]._queue_pdf()
+            self.documents[0].view_pdf()
+            self.assertFalse(self.documents[0].pdf_pending)
+            self.assertEqual(self.documents[0].file_report_id, attachment)
+
+    def test_cron_render_pdf_error(self):
+        self.documents._queue_pdf()
+        failing = self.documents[1]
+
+        def render_pdf_batch(documents):
+            if failing in documents:
+                raise ValueError("DANFE error")
+            _make_pdf(documents)
+
+        with mock.patch.object(
+            self.document_class, "_render_pdf_batch", render_pdf_batch
+        ):
+            self.env["l10n_br_fiscal.document"]._cron_render_pdf(batch_size=2)
+        self.assertTrue(failing.pdf_pending)
+        self.assertFalse((self.documents - failing).filtered("pdf_pending"))
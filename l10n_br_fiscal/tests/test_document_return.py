@@ -0,0 +1,42 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.exceptions import ValidationError
+from odoo.tests import SavepointCase
+
+
+class TestDocumentReturn(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.documents = cls.env.ref("l10n_br_fiscal.demo_nfe_same_state")
+        cls.documents |= cls.env.ref("l10n_br_fiscal.demo_nfe_other_state")
+
+    def test_create_return(self):
+        """Check the returns are the ones of the onchanges of their copies"""
+        returns = self.documents._create_return()
+        self.assertEqual(len(returns), 2)
+        for document, return_document in zip(self.documents, returns):
+            self.assertEqual(
+                return_document.fiscal_operation_id,
+                document.fiscal_operation_id.return_fiscal_operation_id,
+            )
+            self.assertEqual(
+                len(return_document.fiscal_line_ids), len(document.fiscal_line_ids)
+            )
+            for line in return_document.fiscal_line_ids:
+                new_line = line.new(origin=line)
+                new_line._onchange_fiscal_operation_id()
+                self.assertTrue(line.fiscal_operation_line_id)
+                self.assertEqual(
+                    line.fiscal_operation_line_id,
+                    new_line.fiscal_operation_line_id._origin,
+                )
+                self.assertEqual(line.cfop_id, new_line.cfop_id._origin)
+                self.assertEqual(line.fiscal_tax_ids, new_line.fiscal_tax_ids._origin)
+                self.assertEqual(line.amount_tax, new_line.amount_tax)
+
+    def test_create_return_without_operation(self):
+        """Check the return needs the return operation of the document"""
+        self.documents[0].fiscal_operation_id.return_fiscal_operation_id = False
+        with self.assertRaises(ValidationError):
+            self.documents._create_return()
@@ -0,0 +1,134 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from unittest import mock
+
+from odoo.exceptions import UserError
+from odoo.tests import SavepointCase
+
+from ..constants.fiscal import DOCUMENT_ISSUER_COMPANY, SITUACAO_EDOC_A_ENVIAR
+
+
+class TestDocumentSerieBlock(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.serie = cls.env.ref("l10n_br_fiscal.document_55_serie_1")
+        cls.sequence = cls.serie.internal_sequence_id
+        cls.documents = cls.env["l10n_br_fiscal.document"].create(
+            [
+                {
+                    "document_type_id": cls.serie.document_type_id.id,
+                    "document_serie_id": cls.serie.id,
+                    "company_id": cls.serie.company_id.id,
+                    "issuer": DOCUMENT_ISSUER_COMPANY,
+                    "fiscal_operation_type": "out",
+                }
+                for _i in range(3)
+            ]
+        )
+        cls.documents.write({"document_electronic": False})
+
+    def test_reserve_numbers(self):
+        """Check the numbers are taken from the block, then the sequence"""
+        number_next = self.sequence.number_next
+        block = self.serie.reserve_numbers(2)
+        self.assertEqual(
+            (block.number_start, block.number_end), (number_next, number_next + 1)
+        )
+        self.assertEqual(self.sequence.number_next, number_next + 2)
+
+        serie = self.serie.with_context(document_serie_blocks={self.serie.id: block.id})
+        self.assertEqual(serie.next_seq_number(), str(number_next))
+        self.assertEqual(serie.next_seq_number(), str(number_next + 1))
+        self.assertEqual(serie.next_seq_number(), str(number_next + 2))
+        self.sequence.invalidate_cache()
+        self.assertEqual(self.sequence.number_next, number_next + 3)
+
+    def test_close_unused_numbers(self):
+        """Check the unused numbers of a block are recorded to invalidate,
+        the unused numbers at its end go back to the sequence"""
+        block = self.serie.reserve_numbers(3)
+        self.documents[0].document_number = str(block.number_start + 1)
+        number_end = block.number_end
+        block._close()
+        self.assertEqual(block.state, "done")
+        self.assertEqual(
+            [(i.number_start, i.number_end) for i in block.invalidate_number_ids],
+            [(block.number_start, block.number_start)],
+        )
+        self.assertEqual(set(block.invalidate_number_ids.mapped("state")), {"draft"})
+        self.assertEqual(block.number_end, number_end - 1)
+        self.sequence.invalidate_cache()
+        self.assertEqual(self.sequence.number_next, number_end)
+
+    def test_close_unused_numbers_reserved_after(self):
+        """Check the unused numbers are invalidated when a block was
+        reserved after the closed one"""
+        block = self.serie.reserve_numbers(2)
+        self.serie.reserve_numbers(2)
+        block._close()
+        self.assertEqual(
+            [(i.number_start, i.number_end) for i in block.invalidate_number_ids],
+            [(block.number_start, block.number_end)],
+        )
+
+    def test_reserve_numbers_sequence_format(self):
+        """Check the block numbers follow the sequence format and increment"""
+        self.sequence.write({"padding": 6, "number_increment": 2})
+        number_next = self.sequence.number_next
+        block = self.serie.reserve_numbers(2)
+        self.assertEqual(block.number_end, number_next + 2)
+        self.sequence.invalidate_cache()
+        self.assertEqual(self.sequence.number_next, number_next + 4)
+        serie = self.serie.with_context(document_serie_blocks={self.serie.id: block.id})
+        self.assertEqual(serie.next_seq_number(), "%06d" % number_next)
+        self.assertEqual(serie.next_seq_number(), "%06d" % (number_next + 2))
+
+    def test_sequence_locked_by_transaction(self):
+        """Check the lock of the sequence by the current transaction is
+        detected, no block is then reserved in a separate transaction"""
+        self.sequence._next()
+        self.assertTrue(self.serie._sequence_locked_by_transaction())
+
+    def test_reserve_numbers_date_range(self):
+        """Check no block is reserved for a sequence with date ranges"""
+        self.sequence.use_date_range = True
+        self.assertFalse(self.serie.reserve_numbers(2))
+
+    def test_confirm_documents_failed(self):
+        """Check the numbers of a failed confirmation go back to the
+        sequence"""
+        number_next = self.sequence.number_next
+        document_class = type(self.documents)
+        document_confirm = document_class._document_confirm
+
+        def _document_confirm(documents):
+            document_confirm(documents)
+            raise UserError("Confirmation error")
+
+        with mock.patch.object(document_class, "_document_confirm", _document_confirm):
+            with self.assertRaises(UserError):
+                self.documents.action_document_confirm()
+        self.assertFalse(any(self.documents.mapped("document_number")))
+        self.sequence.invalidate_cache()
+        self.assertEqual(self.sequence.number_next, number_next)
+        self.serie.invalidate_cache()
+        block = self.serie.block_ids[0]
+        self.assertEqual(block.state, "done")
+        self.assertFalse(block.invalidate_number_ids)
+
+    def test_confirm_documents(self):
+        """Check a confirmation numbers its documents from one block"""
+        number_next = self.sequence.number_next
+        self.documents.action_document_confirm()
+        self.assertEqual(
+            set(self.documents.mapped("state_edoc")), {SITUACAO_EDOC_A_ENVIAR}
+        )
+        self.assertEqual(
+            sorted(int(n) for n in self.documents.mapped("document_number")),
+            list(range(number_next, number_next + 3)),
+        )
+        self.serie.invalidate_cache()
+        block = self.serie.block_ids[0]
+        self.assertEqual(block.state, "done")
+        self.assertFalse(block.invalidate_number_ids)
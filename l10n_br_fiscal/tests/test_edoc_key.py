@@ -0,0 +1,72 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.exceptions import ValidationError
+from odoo.tests import SavepointCase
+
+from ..constants.fiscal import DOCUMENT_ISSUER_COMPANY, SITUACAO_EDOC_A_ENVIAR
+from ..tools.edoc_key import build_keys, check_keys, key_check_digit
+
+NFE_KEY = "26180812984794000154550010000016871192213339"
+
+
+class TestEdocKey(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        serie = cls.env.ref("l10n_br_fiscal.document_55_serie_1")
+        cls.documents = cls.env["l10n_br_fiscal.document"].create(
+            [
+                {
+                    "document_type_id": serie.document_type_id.id,
+                    "document_serie_id": serie.id,
+                    "company_id": serie.company_id.id,
+                    "issuer": DOCUMENT_ISSUER_COMPANY,
+                    "fiscal_operation_type": "out",
+                }
+                for _i in range(3)
+            ]
+        )
+        cls.documents.write({"document_electronic": True})
+
+    def test_build_keys(self):
+        """Check the keys are the ones of ChaveEdoc"""
+        self.assertEqual(
+            build_keys([("26", "1808", "12984794000154", "55", "1", "1687", 1)]),
+            [NFE_KEY],
+        )
+        self.assertEqual(key_check_digit(NFE_KEY[:-1]), int(NFE_KEY[-1]))
+
+    def test_check_keys(self):
+        """Check the invalid keys are reported with their error"""
+        invalid_digit = NFE_KEY[:-1] + "0"
+        invalid_state = "99" + NFE_KEY[2:]
+        invalid_cnpj = NFE_KEY[:6] + "12984794000155" + NFE_KEY[20:]
+        errors = check_keys(
+            [NFE_KEY, invalid_digit, invalid_state, invalid_cnpj, "123"]
+        )
+        self.assertEqual(
+            set(errors), {invalid_digit, invalid_state, invalid_cnpj, "123"}
+        )
+        self.assertIn("check digit", errors[invalid_digit])
+
+    def test_generate_keys(self):
+        """Check a confirmation generates valid keys for its documents"""
+        self.documents.action_document_confirm()
+        self.assertEqual(
+            set(self.documents.mapped("state_edoc")), {SITUACAO_EDOC_A_ENVIAR}
+        )
+        keys = self.documents.mapped("document_key")
+        self.assertEqual(len(set(keys)), 3)
+        self.assertFalse(check_keys(keys))
+        for document in self.documents:
+            self.assertEqual(
+                int(document.document_key[25:34]), int(document.document_number)
+            )
+
+    def test_duplicated_key(self):
+        """Check a key can not be used by two documents"""
+        self.documents[0].document_key = NFE_KEY
+        with self.assertRaises(ValidationError):
+            self.documents[1].document_key = NFE_KEY
+        with self.assertRaises(ValidationError):
+            self.documents[2].document_key = NFE_KEY[:-1] + "0"
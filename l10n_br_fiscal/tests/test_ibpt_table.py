@@ -0,0 +1,99 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import base64
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import SavepointCase
+
+from ..tools.ibpt_loader import load_ibpt_table
+
+IBPT_TABLE = (
+    "codigo;ex;tipo;descricao;nacionalfederal;importadosfederal;estadual;"
+    "municipal;vigenciainicio;vigenciafim;chave;versao;fonte\n"
+    "85030010;;0;Coletores;13,45;15,45;17,00;0,00;01/01/2021;31/03/2021;"
+    "A1B2C3;21.1.A;IBPT/empresometro.com.br\n"
+    "85030010;01;0;Coletores Ex;10,00;10,00;10,00;0,00;01/01/2021;31/03/2021;"
+    "A1B2C3;21.1.A;IBPT/empresometro.com.br\n"
+    "85014029;;0;Outros motores;12,00;14,00;18,00;0,00;01/01/2021;31/03/2021;"
+    "A1B2C3;21.1.A;IBPT/empresometro.com.br\n"
+    "99999999;;0;Inexistente;1,00;1,00;1,00;0,00;01/01/2021;31/03/2021;"
+    "A1B2C3;21.1.A;IBPT/empresometro.com.br\n"
+)
+
+
+class TestIbptTable(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.state = cls.env.ref("base.state_br_es")
+        cls.ncm_85030010 = cls.env.ref("l10n_br_fiscal.ncm_85030010")
+        cls.ncm_85014029 = cls.env.ref("l10n_br_fiscal.ncm_85014029")
+        cls.ncms = cls.ncm_85030010 | cls.ncm_85014029
+        cls.tax_estimate_model = cls.env["l10n_br_fiscal.tax.estimate"]
+
+    def _estimates(self):
+        return self.tax_estimate_model.search(
+            [
+                ("ncm_id", "in", self.ncms.ids),
+                ("state_id", "=", self.state.id),
+                ("company_id", "=", self.env.company.id),
+            ]
+        )
+
+    def test_load_ibpt_table(self):
+        """Check the estimates loaded from an IBPT table"""
+        result = load_ibpt_table(self.env, IBPT_TABLE.encode(), self.state)
+        self.assertEqual(result["l10n_br_fiscal.ncm"], 2)
+        self.assertEqual(result["l10n_br_fiscal.nbs"], 0)
+
+        estimates = self._estimates()
+        self.assertEqual(len(estimates), 2)
+        estimate = estimates.filtered(lambda e: e.ncm_id == self.ncm_85030010)
+        self.assertEqual(estimate.federal_taxes_national, 13.45)
+        self.assertEqual(estimate.federal_taxes_import, 15.45)
+        self.assertEqual(estimate.state_taxes, 17.0)
+        self.assertEqual(estimate.key, "A1B2C3")
+
+        self.assertAlmostEqual(self.ncm_85030010.estimate_tax_national, 30.45)
+        self.assertAlmostEqual(self.ncm_85030010.estimate_tax_imported, 32.45)
+        self.assertAlmostEqual(self.ncm_85014029.estimate_tax_national, 30.0)
+        self.assertAlmostEqual(self.ncm_85014029.estimate_tax_imported, 32.0)
+
+    def test_reload_ibpt_table(self):
+        """Check loading the same table again replaces the estimates"""
+        load_ibpt_table(self.env, IBPT_TABLE.encode(), self.state)
+        load_ibpt_table(
+            self.env, IBPT_TABLE.replace("13,45", "14,45").encode(), self.state
+        )
+        estimates = self._estimates()
+        self.assertEqual(len(estimates), 2)
+        self.assertAlmostEqual(self.ncm_85030010.estimate_tax_national, 31.45)
+
+    def test_ibpt_table_wizard(self):
+        """Check the IBPT table wizard"""
+        wizard = self.env["l10n_br_fiscal.ibpt.table.wizard"].create(
+            {
+                "file": base64.b64encode(IBPT_TABLE.encode("iso-8859-1")),
+                "state_id": self.state.id,
+            }
+        )
+        wizard.action_load()
+        self.assertTrue(wizard.result)
+        self.assertEqual(len(self._estimates()), 2)
+
+    def test_records_to_estimate(self):
+        """Check the records selected by the scheduled update"""
+        ncm_model = self.env["l10n_br_fiscal.ncm"]
+        yesterday = fields.Date.today() - timedelta(days=1)
+        self.env["product.template"].create(
+            {"name": "Product Test IBPT Table", "ncm_id": self.ncm_85030010.id}
+        )
+        self.tax_estimate_model.search([("ncm_id", "in", self.ncms.ids)]).unlink()
+        self.assertIn(self.ncm_85030010, ncm_model._get_records_to_estimate(yesterday))
+
+        load_ibpt_table(self.env, IBPT_TABLE.encode(), self.state)
+        self.assertNotIn(
+            self.ncm_85030010, ncm_model._get_records_to_estimate(yesterday)
+        )
+
@@ -0,0 +1,52 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+import time
+
+from odoo.tests.common import TransactionCase
+
+_logger = logging.getLogger(__name__)
+
+
+class TestICMSRegulationView(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.icms_regulation = self.env["l10n_br_fiscal.icms.regulation"]
+        self.icms_regulation.clear_caches()
+
+    def _form_load_time(self, loads=10):
+        start = time.perf_counter()
+        for _i in range(loads):
+            self.icms_regulation.fields_view_get(view_type="form")
+        return (time.perf_counter() - start) / loads
+
+    def test_form_view_cache(self):
+        """Test ICMS Regulation form view is cached and invalidated"""
+        arch = self.icms_regulation.fields_view_get(view_type="form")["arch"]
+        self.assertIn('name="uf_sp"', arch)
+        self.assertEqual(
+            arch, self.icms_regulation.fields_view_get(view_type="form")["arch"]
+        )
+
+        self.env["res.country.state"].create(
+            {
+                "name": "Estado Teste",
+                "code": "ZZ",
+                "country_id": self.env.ref("base.br").id,
+            }
+        )
+        arch = self.icms_regulation.fields_view_get(view_type="form")["arch"]
+        self.assertIn('name="uf_zz"', arch)
+
+    def test_form_view_load_benchmark(self):
+        """Benchmark ICMS Regulation form load with and without cache"""
+        self.icms_regulation.clear_caches()
+        start = time.perf_counter()
+        self.icms_regulation.fields_view_get(view_type="form")
+        uncached = time.perf_counter() - start
+        cached = self._form_load_time()
+        _logger.info(
+            "ICMS Regulation form load: %.2f ms uncached, %.2f ms cached",
+            uncached * 1000,
+            cached * 1000,
+        )
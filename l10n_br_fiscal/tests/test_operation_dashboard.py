@@ -0,0 +1,53 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import json
+
+from odoo.tests import SavepointCase
+
+from ..constants.fiscal import SITUACAO_EDOC_AUTORIZADA
+from ..models.operation_dashboard import EDOC_2_CONFIRM, EDOC_CANCELED
+
+
+class TestOperationDashboard(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.operations = cls.env["l10n_br_fiscal.operation"].search([])
+        cls.documents = cls.env["l10n_br_fiscal.document"]
+
+    def _search_count(self, operation, states):
+        return self.documents.search_count(
+            [("fiscal_operation_id", "=", operation.id), ("state_edoc", "in", states)]
+        )
+
+    def test_dashboard_data(self):
+        """Test the grouped dashboard data matches the documents count"""
+        dashboard_data = self.operations._get_operation_dashboard_data()
+        for operation in self.operations:
+            data = dashboard_data[operation.id]
+            self.assertEqual(
+                data["number_2confirm"],
+                self._search_count(operation, list(EDOC_2_CONFIRM)),
+            )
+            self.assertEqual(
+                data["number_authorized"],
+                self._search_count(operation, [SITUACAO_EDOC_AUTORIZADA]),
+            )
+            self.assertEqual(
+                data["number_cancelled"],
+                self._search_count(operation, list(EDOC_CANCELED)),
+            )
+            self.assertEqual(
+                json.loads(operation.kanban_dashboard)["number_authorized"],
+                data["number_authorized"],
+            )
+
+    def test_dashboard_data_cache(self):
+        """Test the dashboard data short-lived cache"""
+        self.env["ir.config_parameter"].sudo().set_param(
+            "l10n_br_fiscal.dashboard_cache_ttl", 60
+        )
+        dashboard_data = self.operations._get_operation_dashboard_data_cached()
+        self.assertIs(
+            dashboard_data, self.operations._get_operation_dashboard_data_cached()
+        )
@@ -0,0 +1,57 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.tests import SavepointCase
+
+
+class TestOperationLineMatcher(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company = cls.env.ref("l10n_br_base.empresa_lucro_presumido")
+        cls.operation = cls.env.ref("l10n_br_fiscal.fo_venda")
+        cls.partner_sp = cls.env.ref("l10n_br_base.res_partner_cliente1_sp")
+        cls.partner_pe = cls.env.ref("l10n_br_base.res_partner_cliente5_pe")
+        cls.product = cls.env.ref("product.product_product_6")
+
+    def _search_line(self, partner, product):
+        return self.operation.line_ids.search(
+            self.operation._line_domain(self.company, partner, product), limit=1
+        )
+
+    def test_line_definitions(self):
+        """Check the cached matcher gives the lines of the domain search"""
+        definitions = self.operation.line_definitions(
+            self.company,
+            [
+                (self.partner_sp, self.product),
+                (self.partner_pe, self.product),
+                (self.partner_sp, self.product),
+            ],
+        )
+        self.assertEqual(len(definitions), 3)
+        line, cfop = definitions[0]
+        self.assertEqual(line, self._search_line(self.partner_sp, self.product))
+        self.assertEqual(cfop, line._get_cfop(self.company, self.partner_sp))
+        line_pe, cfop_pe = definitions[1]
+        self.assertEqual(line_pe, self._search_line(self.partner_pe, self.product))
+        self.assertEqual(cfop_pe, line_pe._get_cfop(self.company, self.partner_pe))
+        self.assertEqual(definitions[2], definitions[0])
+
+    def test_line_definition_cache(self):
+        """Check the matcher follows the changes of the operation lines"""
+        line = self.operation.line_definition(
+            self.company, self.partner_sp, self.product
+        )
+        self.assertTrue(line)
+        line.date_end = "2000-01-01 00:00:00"
+        self.assertNotEqual(
+            self.operation.line_definition(self.company, self.partner_sp, self.product),
+            line,
+        )
+        line.date_end = False
+        line.product_type = "00" if self.product.fiscal_type != "00" else "01"
+        other_line = self.operation.line_definition(
+            self.company, self.partner_sp, self.product
+        )
+        self.assertNotEqual(other_line, line)
+        self.assertEqual(other_line, self._search_line(self.partner_sp, self.product))
@@ -0,0 +1,66 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo.tests import SavepointCase
+
+from ..tools.misc import cached_ref
+
+
+class TestReferenceCache(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ncm_model = cls.env["l10n_br_fiscal.ncm"]
+        cls.cst_model = cls.env["l10n_br_fiscal.cst"]
+        cls.ncm_85030010 = cls.env.ref("l10n_br_fiscal.ncm_85030010")
+
+    def test_get_by_code(self):
+        """Check the records read from the code maps"""
+        self.assertEqual(self.ncm_model.get_by_code("85030010"), self.ncm_85030010)
+        self.assertEqual(
+            self.ncm_model.get_by_code("8503.00.10", field="code"), self.ncm_85030010
+        )
+        self.assertFalse(self.ncm_model.get_by_code("99999998"))
+        self.assertEqual(
+            self.env["l10n_br_fiscal.cfop"].get_by_code("5102"),
+            self.env.ref("l10n_br_fiscal.cfop_5102"),
+        )
+
+    def test_get_cst_by_domain_code(self):
+        """Check the CST code map grouped by tax domain"""
+        self.assertEqual(
+            self.cst_model.get_by_domain_code("icms", "00"),
+            self.env.ref("l10n_br_fiscal.cst_icms_00"),
+        )
+        self.assertEqual(
+            self.cst_model.get_by_domain_code("pis", "01"),
+            self.env.ref("l10n_br_fiscal.cst_pis_01"),
+        )
+        self.assertFalse(self.cst_model.get_by_domain_code("pis", "00"))
+
+    def test_code_map_invalidation(self):
+        """Check the code maps follow the changes of the codes"""
+        self.assertFalse(self.ncm_model.get_by_code("99999998"))
+        ncm = self.ncm_model.create({"code": "9999.99.98", "name": "Test NCM"})
+        self.assertEqual(self.ncm_model.get_by_code("99999998"), ncm)
+        ncm.code = "9999.99.97"
+        self.assertFalse(self.ncm_model.get_by_code("99999998"))
+        self.assertEqual(self.ncm_model.get_by_code("99999997"), ncm)
+        ncm.unlink()
+        self.assertFalse(self.ncm_model.get_by_code("99999997"))
+
+    def test_uom_alternative_code_map(self):
+        """Check the uom search by an alternative code"""
+        uom_kg = self.env.ref("uom.product_uom_kgm")
+        self.env["uom.uom.alternative"].create({"code": "QUILOS", "uom_id": uom_kg.id})
+        self.assertEqual(
+            self.env["uom.uom.alternative"]._get_code_map()["QUILOS"], (uom_kg.id,)
+        )
+        self.assertEqual(self.env["uom.uom"].search([("code", "=", "QUILOS")]), uom_kg)
+
+    def test_cached_ref(self):
+        """Check the reference data read by xml id"""
+        self.assertEqual(
+            cached_ref(self.env, "l10n_br_fiscal.tax_group_icms"),
+            self.env.ref("l10n_br_fiscal.tax_group_icms"),
+        )
+        self.assertEqual(cached_ref(self.env, "base.BRL"), self.env.ref("base.BRL"))
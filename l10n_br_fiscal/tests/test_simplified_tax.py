@@ -0,0 +1,60 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.tests import SavepointCase
+
+
+class TestSimplifiedTax(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.simplified_tax = cls.env["l10n_br_fiscal.simplified.tax"]
+        cls.anexo1 = cls.env.ref("l10n_br_fiscal.simplefied_tax_anexo1")
+        cls.cnae = cls.env.ref("l10n_br_fiscal.cnae_4711301")
+
+    def _search_tax_range(self, simplified_tax, revenue):
+        return self.env["l10n_br_fiscal.simplified.tax.range"].search(
+            [
+                ("simplified_tax_id", "=", simplified_tax.id),
+                ("inital_revenue", "<=", revenue),
+                ("final_revenue", ">=", revenue),
+            ],
+            limit=1,
+        )
+
+    def test_simplified_tax_ranges(self):
+        """Test the Simples Nacional lookup table against the ORM search"""
+        revenues = [0.0, 150000.0, 180000.0, 500000.0, 2000000.0, 4800000.0]
+        results = self.simplified_tax._get_simplified_tax_ranges(
+            [(self.cnae.id, revenue, False) for revenue in revenues]
+        )
+        for revenue, result in zip(revenues, results):
+            tax_range = self._search_tax_range(self.anexo1, revenue)
+            self.assertEqual(result["simplified_tax_id"], self.anexo1.id)
+            self.assertEqual(result["simplified_tax_range_id"], tax_range.id)
+            if revenue:
+                self.assertAlmostEqual(
+                    result["tax_percent"],
+                    (
+                        (revenue * tax_range.total_tax_percent / 100)
+                        - tax_range.amount_deduced
+                    )
+                    / revenue
+                    * 100,
+                )
+
+    def test_simplified_tax_ranges_invalidation(self):
+        """Test the lookup table is rebuilt when a range changes"""
+        tax_range = self._search_tax_range(self.anexo1, 100000.0)
+        tax_range.total_tax_percent = 5.0
+        result = self.simplified_tax._get_simplified_tax_ranges(
+            [(self.cnae.id, 100000.0, False)]
+        )
+        self.assertAlmostEqual(result[0]["tax_percent"], 5.0)
+
+    def test_simplified_tax_ranges_not_found(self):
+        """Test the lookup of a CNAE without Simples Nacional annex"""
+        result = self.simplified_tax._get_simplified_tax_ranges(
+            [(False, 100000.0, False)]
+        )
+        self.assertFalse(result[0]["simplified_tax_id"])
+        self.assertFalse(result[0]["simplified_tax_range_id"])
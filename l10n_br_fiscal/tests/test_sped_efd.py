@@ -0,0 +1,148 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import io
+import os
+from datetime import date
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import SavepointCase
+
+from ..constants.fiscal import SITUACAO_EDOC_AUTORIZADA, SITUACAO_EDOC_CANCELADA
+from ..tools.sped_efd import EfdIcmsIpi, EfdWriter, efd_value
+
+
+class TestSpedEfd(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.nfe_export = cls.env.ref("l10n_br_fiscal.demo_nfe_export")
+        cls.nfe_export.write(
+            {
+                "document_date": fields.Datetime.now(),
+                "date_in_out": fields.Datetime.now(),
+                "state_edoc": SITUACAO_EDOC_AUTORIZADA,
+            }
+        )
+        cls.closing = cls.env["l10n_br_fiscal.closing"].create(
+            {
+                "export_type": "period",
+                "year": str(cls.nfe_export.document_date.year),
+                "month": "%02d" % cls.nfe_export.document_date.month,
+                "company_id": cls.nfe_export.company_id.id,
+            }
+        )
+
+    def _read_sped_efd(self):
+        self.assertTrue(self.closing.sped_efd_file_path)
+        with open(self.closing.sped_efd_file_path, encoding="iso-8859-1") as f:
+            lines = f.read().split("\r\n")
+        os.remove(self.closing.sped_efd_file_path)
+        self.assertEqual(lines.pop(), "")
+        return [line.split("|")[1:-1] for line in lines]
+
+    def _registers(self, registers, register):
+        return [r for r in registers if r[0] == register]
+
+    def test_efd_value(self):
+        """Check the format of the register fields"""
+        self.assertEqual(efd_value(1234.5), "1234,50")
+        self.assertEqual(efd_value(1.5, 5), "1,50000")
+        self.assertEqual(efd_value(fields.Date.to_date("2021-03-01")), "01032021")
+        self.assertEqual(efd_value(None), "")
+        self.assertEqual(efd_value("a|b\nc"), "a b c")
+
+    def test_efd_writer(self):
+        """Check the counters of the closing registers"""
+        stream = io.StringIO()
+        writer = EfdWriter(stream)
+        writer.write("0000", "017")
+        writer.open_block("0", True)
+        writer.close_block("0")
+        writer.write_block_9()
+        registers = [
+            line.split("|")[1:-1] for line in stream.getvalue().split("\r\n")[:-1]
+        ]
+        self.assertEqual(registers[2], ["0990", "3"])
+        self.assertIn(["9900", "9900", "7"], registers)
+        self.assertEqual(registers[-2], ["9990", "10"])
+        self.assertEqual(registers[-1], ["9999", str(len(registers))])
+
+    def test_generate_sped_efd(self):
+        """Check the SPED EFD ICMS/IPI file of a period"""
+        self.closing.action_sped_efd()
+        self.assertTrue(self.closing.sped_efd_pending)
+        self.closing._cron_generate_sped_efd(auto_commit=False)
+        self.assertFalse(self.closing.sped_efd_pending)
+        registers = self._read_sped_efd()
+
+        self.assertEqual(registers[0][0], "0000")
+        self.assertEqual(registers[-1], ["9999", str(len(registers))])
+
+        c100 = [
+            r
+            for r in self._registers(registers, "C100")
+            if r[7] == self.nfe_export.document_number
+        ]
+        self.assertEqual(len(c100), 1)
+        self.assertEqual(c100[0][1:3], ["1", "0"])
+        self.assertEqual(c100[0][5], "00")
+        self.assertTrue(self._registers(registers, "C190"))
+        self.assertEqual(len(self._registers(registers, "E110")), 1)
+
+        # the 9900 registers count every register of the file
+        counts = {r[1]: int(r[2]) for r in self._registers(registers, "9900")}
+        for register, count in counts.items():
+            self.assertEqual(len(self._registers(registers, register)), count)
+        self.assertEqual(sum(counts.values()), len(registers))
+
+    def test_generate_sped_efd_cancelled(self):
+        """Check a cancelled document is informed without its items"""
+        self.nfe_export.state_edoc = SITUACAO_EDOC_CANCELADA
+        self.closing._generate_sped_efd()
+        registers = self._read_sped_efd()
+        c100 = [
+            r
+            for r in self._registers(registers, "C100")
+            if r[7] == self.nfe_export.document_number
+        ]
+        self.assertEqual(c100[0][5], "02")
+        self.assertFalse(c100[0][9])
+
+    def test_sped_efd_period(self):
+        """Check the SPED EFD is generated only for a company and a period"""
+        closing_all = self.env["l10n_br_fiscal.closing"].create(
+            {"export_type": "all", "company_id": self.nfe_export.company_id.id}
+        )
+        with self.assertRaises(UserError):
+            closing_all.action_sped_efd()
+
+    def test_sped_efd_e116(self):
+        """Check the ICMS to pay of the E110 is informed in an E116"""
+        stream = io.StringIO()
+        efd = EfdIcmsIpi(
+            self.env, self.closing.company_id, date(2021, 3, 1), date(2021, 3, 31)
+        )
+        with self.assertRaises(UserError):
+            efd._write_e116(EfdWriter(stream), 100.0)
+        efd.icms_due_date = date(2021, 4, 9)
+        efd.icms_revenue_code = "046-2"
+        efd._write_e116(EfdWriter(stream), 100.0)
+        self.assertEqual(
+            stream.getvalue(), "|E116|000|100,00|09042021|046-2|||||032021|\r\n"
+        )
+
+    def test_sped_efd_accountant_crc(self):
+        """Check the CRC of the accountant is informed in the 0100"""
+        accountant = self.env["res.partner"].create(
+            {"name": "Accountant", "is_accountant": True}
+        )
+        efd = EfdIcmsIpi(
+            self.env, self.closing.company_id, date(2021, 3, 1), date(2021, 3, 31)
+        )
+        stream = io.StringIO()
+        with self.assertRaises(UserError):
+            efd._write_0100(EfdWriter(stream), accountant)
+        accountant.crc_code = "SP123456O7"
+        efd._write_0100(EfdWriter(stream), accountant)
+        self.assertEqual(stream.getvalue().split("|")[4], "SP123456O7")
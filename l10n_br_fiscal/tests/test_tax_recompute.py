@@ -0,0 +1,54 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo.exceptions import UserError
+from odoo.tests import SavepointCase
+
+
+class TestTaxRecompute(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.document = cls.env.ref("l10n_br_fiscal.demo_nfe_same_state")
+        cls.line = cls.document.fiscal_line_ids[0]
+        cls.icms_tax = cls.line.icms_tax_id
+        cls.amount_tax = cls.line.amount_tax
+        # taxes of the line left behind by a change of the tax rules
+        cls.line.write({"icms_tax_id": False, "icms_value": 0.0})
+        cls.recompute = cls.env["l10n_br_fiscal.tax.recompute"].create(
+            {
+                "name": "Test",
+                "company_id": cls.document.company_id.id,
+                "ncm_ids": [(6, 0, cls.line.ncm_id.ids)],
+            }
+        )
+
+    def test_recompute_fiscal_taxes(self):
+        """Check the lines get the taxes of the onchanges back"""
+        result = self.line._recompute_fiscal_taxes()
+        self.assertIn("icms_tax_id", result[self.line.id])
+        self.assertEqual(self.line.icms_tax_id, self.icms_tax)
+        self.assertFalse(self.line._recompute_fiscal_taxes())
+
+    def test_tax_recompute(self):
+        """Check the queued lines are recomputed by chunks"""
+        self.recompute.action_queue()
+        self.assertEqual(self.recompute.state, "queued")
+        recompute_line = self.recompute.line_ids.filtered(
+            lambda r: r.res_id == self.line.id
+        )
+        self.assertEqual(recompute_line.state, "todo")
+
+        self.recompute._cron_process(chunk_size=1, auto_commit=False)
+        self.assertEqual(self.recompute.state, "done")
+        self.assertFalse(self.recompute.todo_count)
+        self.assertEqual(recompute_line.state, "done")
+        self.assertEqual(self.line.icms_tax_id, self.icms_tax)
+        self.assertAlmostEqual(recompute_line.amount_tax_after, self.amount_tax)
+
+    def test_tax_recompute_no_line(self):
+        """Check a recompute without open lines is not queued"""
+        self.recompute.ncm_ids = self.env["l10n_br_fiscal.ncm"].create(
+            {"code": "9999.99.96", "name": "Test NCM"}
+        )
+        with self.assertRaises(UserError):
+            self.recompute.action_queue()
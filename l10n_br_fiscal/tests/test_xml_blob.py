@@ -0,0 +1,80 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import os
+
+from odoo.tests import SavepointCase
+
+from ..constants.fiscal import EVENT_ENV_HML
+
+XML = "<NFe><infNFe>%s</infNFe></NFe>"
+
+
+class TestXmlBlob(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.blob_model = cls.env["l10n_br_fiscal.xml.blob"]
+        cls.document = cls.env.ref("l10n_br_fiscal.demo_nfe_same_state")
+        cls.document.document_number = "123"
+        cls.document.document_date = "2026-01-05 10:00:00"
+
+    def _create_event(self, xml):
+        return self.env["l10n_br_fiscal.event"].create_event_save_xml(
+            company_id=self.document.company_id,
+            environment=EVENT_ENV_HML,
+            event_type="0",
+            xml_file=xml,
+            document_id=self.document,
+        )
+
+    def test_store_deduplicates(self):
+        for compression in ("none", "gzip"):
+            self.env["ir.config_parameter"].set_param(
+                "l10n_br_fiscal.xml_compression", compression
+            )
+            xml = XML % (compression,)
+            blob = self.blob_model.store(xml)
+            self.assertEqual(blob.compression, compression)
+            self.assertEqual(blob.size, len(xml))
+            self.assertEqual(blob.get_content(), xml.encode())
+            self.assertEqual(self.blob_model.store(xml.encode()), blob)
+        self.assertLess(
+            len(self.blob_model.store(XML % ("x" * 1000,)).attachment_id.raw), 1000
+        )
+
+    def test_event_files(self):
+        event_1 = self._create_event(XML % ("event",))
+        event_2 = self._create_event(XML % ("event",))
+        self.assertEqual(event_1.file_request_id.type, "url")
+        self.assertEqual(
+            self.blob_model._from_attachment(event_1.file_request_id),
+            self.blob_model._from_attachment(event_2.file_request_id),
+        )
+        self.assertEqual(event_2._get_file_content(), XML % ("event",))
+        self.assertFalse(event_2._get_file_content(response=True))
+
+    def test_migrate_attachments(self):
+        event = self._create_event(XML % ("migration",))
+        legacy = self.env["ir.attachment"].create(
+            {
+                "name": "legacy.xml",
+                "res_model": event._name,
+                "res_id": event.id,
+                "raw": (XML % ("legacy",)).encode(),
+                "type": "binary",
+            }
+        )
+        event.file_response_id = legacy
+        self.assertTrue(self.env["l10n_br_fiscal.event"]._migrate_xml_attachments())
+        self.assertEqual(legacy.type, "url")
+        self.assertEqual(event._get_file_content(response=True), XML % ("legacy",))
+
+    def test_save_disk(self):
+        self.document.company_id.document_save_disk = True
+        event = self._create_event(XML % ("disk",))
+        self.assertTrue(event.disk_pending)
+        self.env["l10n_br_fiscal.event"]._cron_save_event_2disk()
+        self.assertFalse(event.disk_pending)
+        file_name = os.path.join(event.file_path, event.file_request_id.name)
+        with open(file_name) as xml_file:
+            self.assertEqual(xml_file.read(), XML % ("disk",))
@@ -0,0 +1,429 @@
+# Copyright (C) 2022  Renato Lima - Akretion
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+"""Bulk loader for the big fiscal reference tables (NCM, NBM, NBS, CEST,
+CNAE and CFOP).
+
+The CSV files are streamed into a temporary staging table with COPY and
+then merged into the model table with set based SQL, instead of going
+through the ORM load() row by row. The merge is done by XML id, so the
+same function is used to load the tables on install and to update them
+with a new version of the file (only new and changed rows are written).
+"""
+
+import csv
+import io
+import logging
+import time
+
+from odoo import fields
+from odoo.models import MAGIC_COLUMNS, BaseModel
+from odoo.modules.module import get_module_resource
+
+_logger = logging.getLogger(__name__)
+
+# Types which can be loaded from a CSV column
+LOADABLE_TYPES = (
+    "char",
+    "text",
+    "selection",
+    "boolean",
+    "integer",
+    "float",
+    "monetary",
+    "date",
+    "datetime",
+    "many2one",
+)
+
+
+def _quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _cast_expression(field, column):
+    """SQL expression converting the text staging column to the field type"""
+    value = "NULLIF(TRIM(s.{}), '')".format(_quote(column))
+    if field.type == "boolean":
+        return "COALESCE(LOWER({}) IN ('1', 'true', 'yes'), FALSE)".format(value)
+    if field.type == "integer":
+        return "{}::integer".format(value)
+    if field.type in ("float", "monetary"):
+        return "{}::double precision".format(value)
+    if field.type == "date":
+        return "{}::date".format(value)
+    if field.type == "datetime":
+        return "{}::timestamp".format(value)
+    if field.type in ("char", "text", "selection"):
+        return "NULLIF(s.{}, '')".format(_quote(column))
+    raise ValueError("Field type {} can't be bulk loaded".format(field.type))
+
+
+def _read_header(content):
+    reader = csv.reader(io.StringIO(content.split("\n", 1)[0]))
+    return next(reader)
+
+
+def _prepare_columns(model, header):
+    """Map the CSV header to the model fields.
+
+    :return: tuple (columns, m2o_columns) where columns is a list of
+        (field, staging column) for simple fields and m2o_columns a list
+        of (field, staging column) for many2one fields given by XML id.
+    """
+    columns = []
+    m2o_columns = []
+    for name in header:
+        if name == "id":
+            continue
+        field_name = name[:-3] if name.endswith(":id") else name
+        field = model._fields.get(field_name)
+        if not field or not field.store or field.type not in LOADABLE_TYPES:
+            # extra columns like the NCMs list of NBM and CEST
+            continue
+        if field.type == "many2one":
+            if not name.endswith(":id"):
+                raise ValueError(
+                    "Many2one column {} must be given by XML id ({}:id)".format(
+                        name, name
+                    )
+                )
+            m2o_columns.append((field, name))
+        else:
+            columns.append((field, name))
+    return columns, m2o_columns
+
+
+def _prepare_defaults(model, header):
+    """Default values of the stored fields which are not in the file"""
+    header_fields = {name[:-3] if name.endswith(":id") else name for name in header}
+    missing_fields = [
+        name
+        for name, field in model._fields.items()
+        if field.store
+        and field.column_type
+        and not field.compute
+        and name not in header_fields
+        and name not in MAGIC_COLUMNS
+    ]
+    defaults = model.default_get(missing_fields)
+    return {
+        name: value
+        for name, value in defaults.items()
+        if model._fields[name].type in LOADABLE_TYPES
+    }
+
+
+def bulk_load_csv(
+    env,
+    module,
+    filename,
+    model_name=None,
+    noupdate=True,
+    pathname=None,
+    content=None,
+):
+    """Load a fiscal reference CSV file with COPY and set based SQL.
+
+    :param env: Odoo environment
+    :param module: module owning the XML ids of the file
+    :param filename: file name, relative to the module, the model name is
+        taken from it when model_name is not given (like convert_file)
+    :param model_name: name of the model to load
+    :param noupdate: noupdate flag of the created XML ids
+    :param pathname: absolute path of the file, to load a file which is
+        not shipped with the module (yearly NCM table update for instance)
+    :param content: CSV content, used instead of reading the file
+    :return: dict with the number of created, updated, unchanged and
+        missing (existing in the database but not in the file) records
+    """
+    start = time.perf_counter()
+    model_name = model_name or filename.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    model = env[model_name].sudo()
+    cr = env.cr
+    table = model._table
+
+    if content is None:
+        path = pathname or get_module_resource(module, *filename.split("/"))
+        with open(path, encoding="utf-8") as csv_file:
+            content = csv_file.read()
+
+    header = _read_header(content)
+    if "id" not in header:
+        raise ValueError("File {} has no id column".format(filename))
+
+    columns, m2o_columns = _prepare_columns(model, header)
+    defaults = _prepare_defaults(model, header)
+
+    # Staging table with the raw CSV content
+    staging = "bulk_load_{}".format(table)
+    cr.execute("DROP TABLE IF EXISTS {}".format(staging))
+    cr.execute(
+        "CREATE TEMPORARY TABLE {} ({}) ON COMMIT DROP".format(
+            staging, ", ".join("{} TEXT".format(_quote(c)) for c in header)
+        )
+    )
+    cr.copy_expert(
+        "COPY {} FROM STDIN WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')".format(
+            staging
+        ),
+        io.StringIO(content),
+    )
+    cr.execute(
+        """
+        ALTER TABLE {0}
+            ADD COLUMN xml_module VARCHAR,
+            ADD COLUMN xml_name VARCHAR,
+            ADD COLUMN res_id INTEGER,
+            ADD COLUMN is_new BOOLEAN DEFAULT FALSE,
+            ADD COLUMN to_sync BOOLEAN DEFAULT FALSE
+        """.format(
+            staging
+        )
+    )
+    cr.execute(
+        """
+        UPDATE {0} SET
+            xml_module = CASE WHEN POSITION('.' IN id) > 0
+                THEN SPLIT_PART(id, '.', 1) ELSE %(module)s END,
+            xml_name = CASE WHEN POSITION('.' IN id) > 0
+                THEN SUBSTRING(id FROM POSITION('.' IN id) + 1) ELSE id END
+        """.format(
+            staging
+        ),
+        {"module": module},
+    )
+
+    # Existing records, then ids for the new ones
+    cr.execute(
+        """
+        UPDATE {0} s SET res_id = imd.res_id
+        FROM ir_model_data imd
+        JOIN {1} t ON t.id = imd.res_id
+        WHERE imd.module = s.xml_module
+            AND imd.name = s.xml_name
+            AND imd.model = %(model)s
+        """.format(
+            staging, table
+        ),
+        {"model": model_name},
+    )
+    cr.execute(
+        """
+        UPDATE {0} SET
+            res_id = NEXTVAL('{1}_id_seq'),
+            is_new = TRUE,
+            to_sync = TRUE
+        WHERE res_id IS NULL
+        """.format(
+            staging, table
+        )
+    )
+
+    # Many2one columns given by XML id, the records of the file itself
+    # can be referenced (CNAE parents for instance)
+    for field, column in m2o_columns:
+        resolved = "{}_res_id".format(field.name)
+        cr.execute(
+            "ALTER TABLE {} ADD COLUMN {} INTEGER".format(staging, _quote(resolved))
+        )
+        cr.execute(
+            """
+            UPDATE {0} s SET {1} = imd.res_id
+            FROM ir_model_data imd
+            WHERE NULLIF(TRIM(s.{2}), '') IS NOT NULL
+                AND imd.model = %(comodel)s
+                AND imd.module = CASE WHEN POSITION('.' IN s.{2}) > 0
+                    THEN SPLIT_PART(s.{2}, '.', 1) ELSE %(module)s END
+                AND imd.name = CASE WHEN POSITION('.' IN s.{2}) > 0
+                    THEN SUBSTRING(s.{2} FROM POSITION('.' IN s.{2}) + 1)
+                    ELSE s.{2} END
+            """.format(
+                staging, _quote(resolved), _quote(column)
+            ),
+            {"comodel": field.comodel_name, "module": module},
+        )
+        if field.comodel_name == model_name:
+            cr.execute(
+                """
+                UPDATE {0} s SET {1} = p.res_id
+                FROM {0} p
+                WHERE s.{1} IS NULL
+                    AND NULLIF(TRIM(s.{2}), '') IS NOT NULL
+                    AND p.xml_module = CASE WHEN POSITION('.' IN s.{2}) > 0
+                        THEN SPLIT_PART(s.{2}, '.', 1) ELSE %(module)s END
+                    AND p.xml_name = CASE WHEN POSITION('.' IN s.{2}) > 0
+                        THEN SUBSTRING(s.{2} FROM POSITION('.' IN s.{2}) + 1)
+                        ELSE s.{2} END
+                """.format(
+                    staging, _quote(resolved), _quote(column)
+                ),
+                {"module": module},
+            )
+        cr.execute(
+            """
+            SELECT s.{1} FROM {0} s
+            WHERE NULLIF(TRIM(s.{1}), '') IS NOT NULL AND s.{2} IS NULL
+            LIMIT 1
+            """.format(
+                staging, _quote(column), _quote(resolved)
+            )
+        )
+        missing_ref = cr.fetchone()
+        if missing_ref:
+            raise ValueError(
+                "No matching record found for external id '{}' in field '{}'".format(
+                    missing_ref[0], field.string
+                )
+            )
+
+    # Values of the model columns
+    values = {}
+    params = {}
+    for field, column in columns:
+        values[field.name] = _cast_expression(field, column)
+    for field, column in m2o_columns:
+        values[field.name] = "s.{}".format(_quote("{}_res_id".format(field.name)))
+    for name, value in defaults.items():
+        param = "default_{}".format(name)
+        values[name] = "%({})s".format(param)
+        params[param] = value.id if isinstance(value, BaseModel) else value
+
+    code_unmasked = model._fields.get("code_unmasked")
+    if code_unmasked and code_unmasked.store and "code" in values:
+        # same result as erpbrasil.base.misc.punctuation_rm
+        values["code_unmasked"] = "REGEXP_REPLACE(s.code, '[^[:alnum:]]', '', 'g')"
+
+    field_names = list(values)
+    column_list = ", ".join(_quote(name) for name in field_names)
+    value_list = ", ".join(values[name] for name in field_names)
+    params.update({"uid": env.uid, "now": fields.Datetime.now()})
+
+    # Changed records
+    cr.execute(
+        """
+        WITH updated AS (
+            UPDATE {1} t SET ({2}, write_uid, write_date) = (
+                SELECT {3}, %(uid)s, %(now)s
+            )
+            FROM {0} s
+            WHERE t.id = s.res_id
+                AND NOT s.is_new
+                AND ({4}) IS DISTINCT FROM ({3})
+            RETURNING t.id
+        )
+        UPDATE {0} s SET to_sync = TRUE
+        FROM updated
+        WHERE s.res_id = updated.id
+        """.format(
+            staging,
+            table,
+            column_list,
+            value_list,
+            ", ".join("t.{}".format(_quote(name)) for name in field_names),
+        ),
+        params,
+    )
+    updated = cr.rowcount
+
+    # New records and their XML ids
+    cr.execute(
+        """
+        INSERT INTO {1} (id, {2}, create_uid, create_date, write_uid, write_date)
+        SELECT s.res_id, {3}, %(uid)s, %(now)s, %(uid)s, %(now)s
+        FROM {0} s
+        WHERE s.is_new
+        """.format(
+            staging, table, column_list, value_list
+        ),
+        params,
+    )
+    created = cr.rowcount
+    cr.execute(
+        """
+        INSERT INTO ir_model_data (
+            module, name, model, res_id, noupdate,
+            create_uid, create_date, write_uid, write_date)
+        SELECT s.xml_module, s.xml_name, %(model)s, s.res_id, %(noupdate)s,
+            %(uid)s, %(now)s, %(uid)s, %(now)s
+        FROM {0} s
+        WHERE s.is_new
+        ON CONFLICT (module, name) DO UPDATE SET res_id = EXCLUDED.res_id
+        """.format(
+            staging
+        ),
+        dict(params, model=model_name, noupdate=noupdate),
+    )
+
+    if "ncms" in header and "ncm_ids" in model._fields:
+        _bulk_link_ncms(env, model, staging)
+
+    cr.execute(
+        """
+        SELECT COUNT(*) FROM ir_model_data imd
+        WHERE imd.module = %(module)s AND imd.model = %(model)s
+            AND NOT EXISTS (
+                SELECT 1 FROM {0} s
+                WHERE s.xml_module = imd.module AND s.xml_name = imd.name)
+        """.format(
+            staging
+        ),
+        {"module": module, "model": model_name},
+    )
+    missing = cr.fetchone()[0]
+    cr.execute("SELECT COUNT(*) FROM {}".format(staging))
+    total = cr.fetchone()[0]
+    cr.execute("DROP TABLE {}".format(staging))
+
+    model.invalidate_cache()
+    env["ir.model.data"].clear_caches()
+
+    result = {
+        "created": created,
+        "updated": updated,
+        "unchanged": total - created - updated,
+        "missing": missing,
+    }
+    _logger.info(
+        "Bulk loaded %s from %s in %.2fs: %s",
+        model_name,
+        pathname or filename,
+        time.perf_counter() - start,
+        result,
+    )
+    return result
+
+
+def _bulk_link_ncms(env, model, staging):
+    """Fill the NCMs of NBM and CEST records from their ncms column, with
+    the same rules as tools.misc.domain_field_codes used by
+    action_search_ncms: full codes match exactly, shorter codes match
+    every NCM starting with them."""
+    field = model._fields["ncm_ids"]
+    cr = env.cr
+    cr.execute(
+        """
+        DELETE FROM {1} r
+        USING {0} s
+        WHERE r.{2} = s.res_id AND s.to_sync
+        """.format(
+            staging, field.relation, _quote(field.column1)
+        )
+    )
+    cr.execute(
+        """
+        INSERT INTO {1} ({2}, {3})
+        SELECT DISTINCT s.res_id, n.id
+        FROM {0} s
+        CROSS JOIN LATERAL UNNEST(
+            STRING_TO_ARRAY(REPLACE(s.ncms, '.', ''), ',')) AS c(code)
+        JOIN l10n_br_fiscal_ncm n ON (
+            (LENGTH(TRIM(c.code)) = 8 AND n.code_unmasked = TRIM(c.code))
+            OR (LENGTH(TRIM(c.code)) < 8
+                AND n.code_unmasked ILIKE TRIM(c.code) || '%'))
+        WHERE s.to_sync AND NULLIF(TRIM(c.code), '') IS NOT NULL
+        ON CONFLICT DO NOTHING
+        """.format(
+            staging, field.relation, _quote(field.column1), _quote(field.column2)
+        )
+    )
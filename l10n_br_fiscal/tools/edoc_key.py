@@ -0,0 +1,187 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+"""Bulk build and validation of the electronic document access keys.
+
+Same keys as ``erpbrasil.base.fiscal.edoc.ChaveEdoc`` (NF-e, NFC-e, CT-e,
+MDF-e...), built and checked over many keys at once: the key fields are
+formatted with one template, the check digits are computed on the key
+bytes with precomputed weights and the issuer CNPJ/CPF of a batch are
+validated once each. It only depends on the standard library, so it can
+be used from the data migration scripts as well::
+
+    from odoo.addons.l10n_br_fiscal.tools.edoc_key import build_keys, check_keys
+"""
+
+import re
+from operator import mul
+
+KEY_LENGTH = 44
+
+# Positions of the key fields
+KEY_STATE = slice(0, 2)
+KEY_ISSUER = slice(6, 20)
+KEY_MODEL = slice(20, 22)
+KEY_SERIE = slice(22, 25)
+KEY_NUMBER = slice(25, 34)
+
+# cUF AAMM CNPJ mod serie nNF tpEmis
+KEY_FIELDS_TEMPLATE = "{:0>2}{:0>4}{:0>14}{:0>2}{:0>3}{:0>9}{}"
+
+KEY_REGEX = re.compile(r"[0-9]{6}[A-Z0-9]{12}[0-9]{26}$")
+
+KEY_STATE_CODES = frozenset(
+    {
+        "11",
+        "12",
+        "13",
+        "14",
+        "15",
+        "16",
+        "17",
+        "21",
+        "22",
+        "23",
+        "24",
+        "25",
+        "26",
+        "27",
+        "28",
+        "29",
+        "31",
+        "32",
+        "33",
+        "35",
+        "41",
+        "42",
+        "43",
+        "50",
+        "51",
+        "52",
+        "53",
+    }
+)
+
+KEY_MODELS = frozenset({"55", "57", "58", "59", "63", "65", "67"})
+
+# NF-e and NFC-e series of the issuers identified by their CPF (910-969) or
+# by their CNPJ or CPF (890-899, NFA-e), 970-999 are not allowed
+KEY_NFE_MODELS = frozenset({"55", "65"})
+KEY_SERIES_CPF = range(910, 970)
+KEY_SERIES_CNPJ_CPF = range(890, 900)
+KEY_SERIE_MAX = 969
+
+# Modulo 11 weights 2 to 9 from the right of the 43 digits of the key
+KEY_WEIGHTS = tuple(2 + (42 - i) % 8 for i in range(KEY_LENGTH - 1))
+CNPJ_WEIGHTS = (
+    (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2),
+    (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2),
+)
+CPF_WEIGHTS = (tuple(range(10, 1, -1)), tuple(range(11, 1, -1)))
+
+# the characters count as their code - 48, that is the digit itself or the
+# value of the letters of the alphanumeric CNPJ (NT 2025.001)
+_KEY_OFFSET = 48 * sum(KEY_WEIGHTS)
+
+# cNF derived from the key fields by erpbrasil.base: the last 8 digits of
+# the sum of the ninth powers of the fields
+_CODE_POWERS = tuple(max(c - 48, 0) ** 9 for c in range(128))
+
+
+def key_check_digit(fields):
+    """Check digit (cDV) of the 43 first characters of a key"""
+    digit = 11 - (sum(map(mul, fields.encode(), KEY_WEIGHTS)) - _KEY_OFFSET) % 11
+    return 0 if digit >= 10 else digit
+
+
+def key_code(fields):
+    """Numeric code (cNF) of the 35 first characters of a key"""
+    return str(sum(map(_CODE_POWERS.__getitem__, fields.encode())))[-8:].zfill(8)
+
+
+def build_keys(values):
+    """Build the keys of the documents.
+
+    :param values: iterable of tuples (state IBGE code, AAMM, issuer CNPJ
+        or CPF without punctuation, model, serie, number, emission type),
+        the fields must be filled
+    :return: list of the 44 characters keys, in the order of values
+    """
+    template = KEY_FIELDS_TEMPLATE.format
+    keys = []
+    for value in values:
+        fields = template(*value)
+        fields += key_code(fields)
+        keys.append(fields + str(key_check_digit(fields)))
+    return keys
+
+
+def _check_cnpj(cnpj):
+    if cnpj == "0" * 14:
+        return False
+    return _modulo11_cnpj_cpf(cnpj, CNPJ_WEIGHTS)
+
+
+def _check_cpf(cpf):
+    if not cpf.isdigit() or cpf == cpf[0] * 11:
+        return False
+    return _modulo11_cnpj_cpf(cpf, CPF_WEIGHTS)
+
+
+def _modulo11_cnpj_cpf(value, weights):
+    size = len(weights[0])
+    for index, digit_weights in enumerate(weights):
+        total = sum(map(mul, value.encode(), digit_weights)) - 48 * sum(digit_weights)
+        remainder = total % 11
+        digit = 0 if remainder < 2 else 11 - remainder
+        if value[size + index] != str(digit):
+            return False
+    return True
+
+
+def check_keys(keys):
+    """Validate the keys of the documents.
+
+    :param keys: iterable of 44 characters keys
+    :return: dict {key: error message} of the invalid keys
+    """
+    errors = {}
+    checked_issuers = {}
+    match = KEY_REGEX.match
+    for key in keys:
+        if key in errors:
+            continue
+        if len(key) != KEY_LENGTH or not match(key):
+            errors[key] = "Invalid key format"
+            continue
+        if key[KEY_STATE] not in KEY_STATE_CODES:
+            errors[key] = "Invalid state code {}".format(key[KEY_STATE])
+            continue
+        model = key[KEY_MODEL]
+        if model not in KEY_MODELS:
+            errors[key] = "Invalid document model {}".format(model)
+            continue
+        issuer = key[KEY_ISSUER]
+        serie = int(key[KEY_SERIE])
+        if model in KEY_NFE_MODELS:
+            if serie > KEY_SERIE_MAX:
+                errors[key] = "Invalid serie {}".format(key[KEY_SERIE])
+                continue
+            if serie in KEY_SERIES_CPF:
+                issuer = issuer[3:]
+            elif serie in KEY_SERIES_CNPJ_CPF:
+                valid = checked_issuers.get(issuer)
+                if valid is None:
+                    valid = checked_issuers[issuer] = _check_cnpj(issuer)
+                if not valid:
+                    issuer = issuer[3:]
+        valid = checked_issuers.get(issuer)
+        if valid is None:
+            valid = checked_issuers[issuer] = (
+                _check_cnpj(issuer) if len(issuer) == 14 else _check_cpf(issuer)
+            )
+        if not valid:
+            errors[key] = "Invalid issuer CNPJ/CPF {}".format(issuer)
+            continue
+        if key_check_digit(key[:-1]) != int(key[-1]):
+            errors[key] = "Invalid check digit"
+    return errors
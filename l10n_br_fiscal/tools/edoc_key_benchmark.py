@@ -0,0 +1,72 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+"""Benchmark of the bulk build and validation of the access keys.
+
+Builds and validates ``count`` NF-e keys with :mod:`.edoc_key`, and with
+``erpbrasil.base`` ChaveEdoc one key at a time on a sample, e.g. from
+``odoo shell``::
+
+    from odoo.addons.l10n_br_fiscal.tools.edoc_key_benchmark import benchmark
+    benchmark(1000000)
+"""
+
+import logging
+import time
+
+from erpbrasil.base.fiscal.edoc import ChaveEdoc
+
+from .edoc_key import build_keys, check_keys
+
+_logger = logging.getLogger(__name__)
+
+
+def _values(count, state_code="35", cnpj="97231608000169"):
+    return [(state_code, "2101", cnpj, "55", "1", str(n), 1) for n in range(count)]
+
+
+def run(count=1000000):
+    """Build and validate count keys with the bulk functions.
+
+    :return: dict with the elapsed times and the keys per second
+    """
+    values = _values(count)
+    start = time.time()
+    keys = build_keys(values)
+    build_elapsed = time.time() - start
+    start = time.time()
+    errors = check_keys(keys)
+    check_elapsed = time.time() - start
+    return {
+        "build_elapsed": build_elapsed,
+        "check_elapsed": check_elapsed,
+        "keys_per_second": count / (build_elapsed + check_elapsed or 1),
+        "errors": len(errors),
+    }
+
+
+def run_chave_edoc(count=20000):
+    """Build and validate count keys one at a time with ChaveEdoc"""
+    values = _values(count)
+    start = time.time()
+    for state_code, year_month, cnpj, model, serie, number, emission in values:
+        key = ChaveEdoc(
+            ano_mes=year_month,
+            cnpj_emitente=cnpj,
+            codigo_uf=state_code,
+            forma_emissao=emission,
+            modelo_documento=model,
+            numero_documento=number,
+            numero_serie=serie,
+            validar=False,
+        ).chave
+        ChaveEdoc(chave=key, validar=True)
+    elapsed = time.time() - start
+    return {"elapsed": elapsed, "keys_per_second": count / (elapsed or 1)}
+
+
+def benchmark(count=1000000, sample=20000):
+    """Compare the bulk functions with ChaveEdoc"""
+    result = {"bulk": run(count), "chave_edoc": run_chave_edoc(sample)}
+    for key, value in result.items():
+        _logger.info("Access key benchmark (%s): %s", key, value)
+    return result
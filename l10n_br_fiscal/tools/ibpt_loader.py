@@ -0,0 +1,174 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+"""Offline loader of the IBPT "De Olho no Imposto" tables.
+
+IBPT publishes one CSV table per state (TabelaIBPTax<UF>...csv) with the
+estimated tax rates of every NCM (tipo 0) and NBS (tipo 1) code. The file
+is copied into a staging table and the estimates of the NCM and NBS of
+the database are replaced with set based SQL, then their estimated tax
+percents are recomputed with a single UPDATE per model.
+"""
+
+import io
+import logging
+
+_logger = logging.getLogger(__name__)
+
+IBPT_COLUMNS = (
+    "codigo",
+    "ex",
+    "tipo",
+    "descricao",
+    "nacionalfederal",
+    "importadosfederal",
+    "estadual",
+    "municipal",
+    "vigenciainicio",
+    "vigenciafim",
+    "chave",
+    "versao",
+    "fonte",
+)
+
+# IBPT table type of each model and its field in l10n_br_fiscal.tax.estimate
+IBPT_TYPES = {
+    "l10n_br_fiscal.ncm": ("0", "ncm_id"),
+    "l10n_br_fiscal.nbs": ("1", "nbs_id"),
+}
+
+
+def _decode(content):
+    if isinstance(content, bytes):
+        try:
+            content = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            # the official tables are ISO-8859-1 encoded
+            content = content.decode("iso-8859-1")
+    return content
+
+
+def recompute_estimates(env, model_name, ids=None, company=None):
+    """Set estimate_tax_national and estimate_tax_imported of the records
+    from their last tax estimate of the company with one UPDATE"""
+    model = env[model_name]
+    field = IBPT_TYPES[model_name][1]
+    company = company or env.company
+    query = """
+        UPDATE {table} t SET
+            estimate_tax_national = e.federal_taxes_national
+                + e.state_taxes + e.municipal_taxes,
+            estimate_tax_imported = e.federal_taxes_import
+                + e.state_taxes + e.municipal_taxes
+        FROM (
+            SELECT DISTINCT ON ({field})
+                {field},
+                COALESCE(federal_taxes_national, 0) AS federal_taxes_national,
+                COALESCE(federal_taxes_import, 0) AS federal_taxes_import,
+                COALESCE(state_taxes, 0) AS state_taxes,
+                COALESCE(municipal_taxes, 0) AS municipal_taxes
+            FROM l10n_br_fiscal_tax_estimate
+            WHERE {field} IS NOT NULL AND company_id = %(company_id)s
+            {ids_filter}
+            ORDER BY {field}, create_date DESC, id DESC
+        ) e
+        WHERE t.id = e.{field}
+    """.format(
+        table=model._table,
+        field=field,
+        ids_filter="AND {} IN %(ids)s".format(field) if ids else "",
+    )
+    env.cr.execute(query, {"company_id": company.id, "ids": tuple(ids or ())})
+    count = env.cr.rowcount
+    model.invalidate_cache(["estimate_tax_national", "estimate_tax_imported"], ids)
+    return count
+
+
+def load_ibpt_table(env, content, state, company=None):
+    """Replace the tax estimates of the state with the ones of an IBPT table.
+
+    :param env: Odoo environment
+    :param content: CSV content of the table (str or bytes)
+    :param state: res.country.state of the table
+    :param company: company of the estimates, the current one by default
+    :return: dict with the number of estimates loaded per model
+    """
+    company = company or env.company
+    cr = env.cr
+    content = _decode(content)
+
+    cr.execute("DROP TABLE IF EXISTS ibpt_table_staging")
+    cr.execute(
+        "CREATE TEMPORARY TABLE ibpt_table_staging ({}) ON COMMIT DROP".format(
+            ", ".join("{} TEXT".format(c) for c in IBPT_COLUMNS)
+        )
+    )
+    cr.copy_expert(
+        "COPY ibpt_table_staging ({}) FROM STDIN "
+        "WITH (FORMAT csv, HEADER true, DELIMITER ';')".format(
+            ", ".join(IBPT_COLUMNS)
+        ),
+        io.StringIO(content),
+    )
+
+    result = {}
+    for model_name, (ibpt_type, field) in IBPT_TYPES.items():
+        table = env[model_name]._table
+        # records of the table, exceptions (ex) are not handled by Odoo
+        cr.execute(
+            """
+            CREATE TEMPORARY TABLE ibpt_table_match ON COMMIT DROP AS
+            SELECT DISTINCT ON (t.id) t.id AS res_id, s.*
+            FROM ibpt_table_staging s
+            JOIN {table} t ON t.code_unmasked = s.codigo
+            WHERE s.tipo = %(tipo)s AND COALESCE(TRIM(s.ex), '') = ''
+            ORDER BY t.id
+            """.format(
+                table=table
+            ),
+            {"tipo": ibpt_type},
+        )
+        cr.execute(
+            """
+            DELETE FROM l10n_br_fiscal_tax_estimate e
+            USING ibpt_table_match m
+            WHERE e.{field} = m.res_id
+                AND e.state_id = %(state_id)s
+                AND e.company_id = %(company_id)s
+            """.format(
+                field=field
+            ),
+            {"state_id": state.id, "company_id": company.id},
+        )
+        cr.execute(
+            """
+            INSERT INTO l10n_br_fiscal_tax_estimate (
+                {field}, state_id, company_id, key, origin,
+                federal_taxes_national, federal_taxes_import,
+                state_taxes, municipal_taxes,
+                create_uid, create_date, write_uid, write_date)
+            SELECT
+                m.res_id, %(state_id)s, %(company_id)s,
+                LEFT(m.chave, 32), LEFT(m.fonte, 32),
+                REPLACE(m.nacionalfederal, ',', '.')::double precision,
+                REPLACE(m.importadosfederal, ',', '.')::double precision,
+                REPLACE(m.estadual, ',', '.')::double precision,
+                REPLACE(m.municipal, ',', '.')::double precision,
+                %(uid)s, now() at time zone 'UTC',
+                %(uid)s, now() at time zone 'UTC'
+            FROM ibpt_table_match m
+            RETURNING {field}
+            """.format(
+                field=field
+            ),
+            {"state_id": state.id, "company_id": company.id, "uid": env.uid},
+        )
+        ids = [row[0] for row in cr.fetchall()]
+        cr.execute("DROP TABLE ibpt_table_match")
+        env[model_name].invalidate_cache(["tax_estimate_ids"], ids)
+        if ids:
+            recompute_estimates(env, model_name, ids, company)
+        result[model_name] = len(ids)
+
+    env["l10n_br_fiscal.tax.estimate"].invalidate_cache()
+    _logger.info("IBPT table of %s loaded: %s", state.code, result)
+    return result
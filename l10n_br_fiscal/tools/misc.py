@@ -46,6 +46,16 @@ def domain_field_codes(
     return domain
 
 
+def cached_ref(env, xml_id):
+    """Like env.ref for reference data (tax groups, currencies...) but
+    without the existence query: the xml id is resolved by the registry
+    cache of ir.model.data, cleared when the xml ids change."""
+    res_model, res_id = env["ir.model.data"].xmlid_to_res_model_res_id(
+        xml_id, raise_if_not_found=True
+    )
+    return env[res_model].browse(res_id)
+
+
 def prepare_fake_certificate_vals(
     valid=True,
     passwd="123456",
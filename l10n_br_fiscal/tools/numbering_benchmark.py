@@ -0,0 +1,75 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+"""Contention benchmark of the document serie numbering.
+
+Each worker numbers its documents in its own transaction, holding it for
+``work`` seconds per document to stand for the confirmation of the
+document. With the no_gap sequence the workers wait for each other on
+the sequence row until they commit, with the number blocks they only
+lock it while their block is reserved.
+
+The numbers are committed, run it on a disposable database, e.g. from
+``odoo shell``::
+
+    from odoo.addons.l10n_br_fiscal.tools.numbering_benchmark import benchmark
+    benchmark(env.registry, env.ref("l10n_br_fiscal.document_55_serie_1").id)
+"""
+
+import logging
+import threading
+import time
+
+from odoo import SUPERUSER_ID, api
+
+_logger = logging.getLogger(__name__)
+
+
+def _worker(registry, serie_id, documents, work, use_blocks, numbers):
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        serie = env["l10n_br_fiscal.document.serie"].browse(serie_id)
+        block = serie.reserve_numbers(documents) if use_blocks else None
+        if block:
+            serie = serie.with_context(document_serie_blocks={serie_id: block.id})
+        for _i in range(documents):
+            numbers.append(serie.next_seq_number())
+            time.sleep(work)
+        if block:
+            block._close()
+
+
+def run(registry, serie_id, workers=8, documents=20, work=0.01, use_blocks=True):
+    """Number workers * documents documents with concurrent workers.
+
+    :return: dict with the elapsed time, the numbers per second and
+        whether all the numbers given are distinct
+    """
+    numbers = []
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(registry, serie_id, documents, work, use_blocks, numbers),
+        )
+        for _i in range(workers)
+    ]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    return {
+        "elapsed": elapsed,
+        "numbers_per_second": len(numbers) / elapsed if elapsed else 0.0,
+        "distinct": len(set(numbers)) == len(numbers) == workers * documents,
+    }
+
+
+def benchmark(registry, serie_id, workers=8, documents=20, work=0.01):
+    """Compare the no_gap sequence with the number blocks"""
+    result = {}
+    for use_blocks in (False, True):
+        key = "blocks" if use_blocks else "sequence"
+        result[key] = run(registry, serie_id, workers, documents, work, use_blocks)
+        _logger.info("Numbering benchmark (%s): %s", key, result[key])
+    return result
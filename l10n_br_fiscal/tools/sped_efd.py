@@ -0,0 +1,749 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+"""Streaming generator of the SPED EFD ICMS/IPI file.
+
+The documents of the period are selected once in a temporary table and
+every block is written from server side cursors, with the C190 and E110
+totals aggregated by SQL, so the memory used does not depend on the
+number of documents. The registers are written to the file as soon as
+they are read and counted for the closing block 9.
+"""
+
+import itertools
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter
+
+from erpbrasil.base.misc import punctuation_rm
+from psycopg2.extras import NamedTupleCursor
+
+from odoo import _
+from odoo.exceptions import UserError
+
+from ..constants.fiscal import (
+    DOCUMENT_ISSUER_COMPANY,
+    MODELO_FISCAL_01,
+    MODELO_FISCAL_04,
+    MODELO_FISCAL_NFE,
+    SITUACAO_EDOC_AUTORIZADA,
+    SITUACAO_EDOC_CANCELADA,
+    SITUACAO_EDOC_DENEGADA,
+    SITUACAO_EDOC_INUTILIZADA,
+    SITUACAO_FISCAL_CANCELADO,
+    SITUACAO_FISCAL_DENEGADO,
+    SITUACAO_FISCAL_INUTILIZADO,
+    SITUACAO_FISCAL_REGULAR,
+)
+
+# Layout version (COD_VER) by year of the period, the last one is used
+# for the following years
+EFD_LAYOUT_VERSIONS = {
+    2020: "014",
+    2021: "015",
+    2022: "016",
+    2023: "017",
+    2024: "018",
+}
+
+# Document models of the C100 register
+EFD_C100_MODELS = (MODELO_FISCAL_01, "1B", MODELO_FISCAL_04, MODELO_FISCAL_NFE)
+
+EFD_COD_SIT = {
+    SITUACAO_EDOC_AUTORIZADA: SITUACAO_FISCAL_REGULAR,
+    SITUACAO_EDOC_CANCELADA: SITUACAO_FISCAL_CANCELADO,
+    SITUACAO_EDOC_DENEGADA: SITUACAO_FISCAL_DENEGADO,
+    SITUACAO_EDOC_INUTILIZADA: SITUACAO_FISCAL_INUTILIZADO,
+}
+
+EFD_ITERSIZE = 2000
+
+# E116 COD_OR of the ICMS to pay of the own operations
+EFD_COD_OR_ICMS = "000"
+
+
+def efd_value(value, digits=2):
+    """Format a field of a register"""
+    if value is None or value is False:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (float, Decimal)):
+        return ("%.*f" % (digits, value)).replace(".", ",")
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.strftime("%d%m%Y")
+    return " ".join(str(value).replace("|", " ").split())
+
+
+class EfdWriter(object):
+    """Write the registers of an EFD file and count them by block and by
+    register for the closing registers (X990 and block 9)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.register_count = {}
+        self.block_count = 0
+        self.total_count = 0
+
+    def write(self, register, *values):
+        self.stream.write(
+            "|%s|%s|\r\n" % (register, "|".join(efd_value(v) for v in values))
+        )
+        self.register_count[register] = self.register_count.get(register, 0) + 1
+        self.block_count += 1
+        self.total_count += 1
+
+    def open_block(self, block, has_data):
+        self.write("%s001" % block, "0" if has_data else "1")
+
+    def close_block(self, block, extra_lines=0):
+        self.write("%s990" % block, self.block_count + 1 + extra_lines)
+        self.block_count = 0
+
+    def write_block_9(self):
+        self.open_block("9", True)
+        registers = sorted(self.register_count) + ["9900", "9990", "9999"]
+        counts = dict(self.register_count, **{"9990": 1, "9999": 1})
+        # one 9900 register for each register of the file
+        counts["9900"] = len(registers)
+        for register in registers:
+            self.write("9900", register, counts[register])
+        # the lines of the block 9 include the 9999 register
+        self.close_block("9", extra_lines=1)
+        self.write("9999", self.total_count + 1)
+
+
+class _DocumentRows(object):
+    """Rows of a query ordered by document_id, consumed document by
+    document while the C100 registers are written"""
+
+    def __init__(self, rows):
+        self._groups = itertools.groupby(rows, key=attrgetter("document_id"))
+        self._current = next(self._groups, None)
+
+    def pop(self, document_id):
+        while self._current and self._current[0] < document_id:
+            self._current = next(self._groups, None)
+        if self._current and self._current[0] == document_id:
+            rows = list(self._current[1])
+            self._current = next(self._groups, None)
+            return rows
+        return []
+
+
+class EfdIcmsIpi(object):
+    """SPED EFD ICMS/IPI file of a company for a period"""
+
+    def __init__(
+        self,
+        env,
+        company,
+        date_start,
+        date_stop,
+        icms_due_date=None,
+        icms_revenue_code=None,
+    ):
+        self.env = env
+        self.company = company
+        self.date_start = date_start
+        self.date_stop = date_stop
+        self.icms_due_date = icms_due_date
+        self.icms_revenue_code = icms_revenue_code
+        self._cursor_seq = itertools.count()
+
+    def _fetch(self, query, params=None):
+        """Iterate over the rows of a query with a server side cursor"""
+        cursor = self.env.cr._cnx.cursor(
+            "efd_icms_ipi_%s" % next(self._cursor_seq),
+            cursor_factory=NamedTupleCursor,
+        )
+        cursor.itersize = EFD_ITERSIZE
+        try:
+            cursor.execute(query, params or {})
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
+    def _fetchone(self, query, params=None):
+        self.env.cr.execute(query, params or {})
+        return self.env.cr.dictfetchone()
+
+    def _line_total_sql(self, alias="l"):
+        """SQL expression of the amount_total of a fiscal document line"""
+        line_model = self.env["l10n_br_fiscal.document.line"]
+        add_fields = " + ".join(
+            "COALESCE({}.{}, 0)".format(alias, f)
+            for f in line_model._add_fields_to_amount()
+        )
+        rm_fields = " - ".join(
+            "COALESCE({}.{}, 0)".format(alias, f)
+            for f in line_model._rm_fields_to_amount()
+        )
+        return (
+            "ROUND(CAST(COALESCE({a}.price_unit, 0) * COALESCE({a}.quantity, 0)"
+            " AS numeric), 2) - COALESCE({a}.discount_value, 0)"
+            " + COALESCE({a}.amount_tax_not_included, 0)"
+            " + {add} - {rm}".format(
+                a=alias, add=add_fields or "0", rm=rm_fields or "0"
+            )
+        )
+
+    def _prepare_documents(self):
+        """Select the documents of the period in the efd_document
+        temporary table used by all the registers of the file"""
+        self.env["l10n_br_fiscal.document"].flush()
+        self.env["l10n_br_fiscal.document.line"].flush()
+        cr = self.env.cr
+        cr.execute("DROP TABLE IF EXISTS efd_document")
+        cr.execute(
+            """
+            CREATE TEMPORARY TABLE efd_document ON COMMIT DROP AS
+            SELECT
+                d.id,
+                d.partner_id,
+                CASE WHEN d.fiscal_operation_type = 'in' THEN '0' ELSE '1' END
+                    AS ind_oper,
+                CASE WHEN d.issuer = %(issuer_company)s THEN '0' ELSE '1' END
+                    AS ind_emit,
+                d.document_type AS cod_mod,
+                CASE d.state_edoc {cod_sit} END AS cod_sit,
+                d.document_serie AS ser,
+                d.document_number AS num_doc,
+                d.document_key AS chv_nfe,
+                d.document_date AS dt_doc,
+                d.date_in_out AS dt_e_s
+            FROM l10n_br_fiscal_document d
+            WHERE d.company_id = %(company_id)s
+                AND d.active
+                AND d.document_type IN %(models)s
+                AND d.state_edoc IN %(states)s
+                AND COALESCE(d.date_in_out, d.document_date)
+                    BETWEEN %(date_start)s AND %(date_stop)s
+            """.format(
+                cod_sit=" ".join(
+                    "WHEN '{}' THEN '{}'".format(k, v) for k, v in EFD_COD_SIT.items()
+                )
+            ),
+            {
+                "issuer_company": DOCUMENT_ISSUER_COMPANY,
+                "company_id": self.company.id,
+                "models": EFD_C100_MODELS,
+                "states": tuple(EFD_COD_SIT),
+                "date_start": self.date_start,
+                "date_stop": self.date_stop,
+            },
+        )
+        cr.execute("ALTER TABLE efd_document ADD PRIMARY KEY (id)")
+        cr.execute("ANALYZE efd_document")
+
+    def _line_query(self, select, joins="", where="", group_by="", order_by="l.id"):
+        """Query of the lines of the regular documents, ordered by document"""
+        return """
+            SELECT {select}
+            FROM efd_document e
+            JOIN l10n_br_fiscal_document_line l ON l.document_id = e.id
+            LEFT JOIN l10n_br_fiscal_cfop cfop ON cfop.id = l.cfop_id
+            LEFT JOIN l10n_br_fiscal_cst icms_cst ON icms_cst.id = l.icms_cst_id
+            {joins}
+            WHERE e.cod_sit = %(regular)s {where}
+            {group_by}
+            ORDER BY e.id, {order_by}
+        """.format(
+            select=select,
+            joins=joins,
+            where=where,
+            group_by=group_by and "GROUP BY " + group_by,
+            order_by=order_by,
+        )
+
+    def generate(self, stream):
+        """Write the file to a text stream"""
+        self._prepare_documents()
+        writer = EfdWriter(stream)
+        self._write_block_0(writer)
+        self._write_empty_block(writer, "B")
+        self._write_block_c(writer)
+        self._write_empty_block(writer, "D")
+        self._write_block_e(writer)
+        for block in ("G", "H", "K"):
+            self._write_empty_block(writer, block)
+        self._write_block_1(writer)
+        writer.write_block_9()
+        return writer
+
+    def _write_empty_block(self, writer, block):
+        writer.open_block(block, False)
+        writer.close_block(block)
+
+    # Block 0
+
+    def _write_block_0(self, writer):
+        company = self.company
+        cnpj_cpf = punctuation_rm(company.cnpj_cpf or "")
+        writer.write(
+            "0000",
+            EFD_LAYOUT_VERSIONS.get(
+                self.date_start.year, EFD_LAYOUT_VERSIONS[max(EFD_LAYOUT_VERSIONS)]
+            ),
+            "0",  # original file
+            self.date_start,
+            self.date_stop,
+            company.legal_name or company.name,
+            cnpj_cpf if len(cnpj_cpf) == 14 else "",
+            cnpj_cpf if len(cnpj_cpf) == 11 else "",
+            company.state_id.code,
+            punctuation_rm(company.inscr_est or ""),
+            company.city_id.ibge_code,
+            punctuation_rm(company.inscr_mun or ""),
+            company.suframa,
+            "A",
+            "0" if company.is_industry else "1",
+        )
+        writer.open_block("0", True)
+        writer.write(
+            "0005",
+            company.name,
+            punctuation_rm(company.zip or ""),
+            company.street_name or company.street,
+            company.street_number,
+            company.street2,
+            company.district,
+            punctuation_rm(company.phone or ""),
+            "",
+            company.email,
+        )
+        if company.accountant_id:
+            self._write_0100(writer, company.accountant_id)
+        self._write_0150(writer)
+        self._write_0190(writer)
+        self._write_0200(writer)
+        writer.close_block("0")
+
+    def _write_0100(self, writer, accountant):
+        if not accountant.crc_code:
+            raise UserError(
+                _("The accountant %s has no CRC code.") % (accountant.name,)
+            )
+        cnpj_cpf = punctuation_rm(accountant.cnpj_cpf or "")
+        writer.write(
+            "0100",
+            accountant.legal_name or accountant.name,
+            cnpj_cpf if len(cnpj_cpf) == 11 else "",
+            accountant.crc_code,
+            cnpj_cpf if len(cnpj_cpf) == 14 else "",
+            punctuation_rm(accountant.zip or ""),
+            accountant.street_name or accountant.street,
+            accountant.street_number,
+            accountant.street2,
+            accountant.district,
+            punctuation_rm(accountant.phone or ""),
+            "",
+            accountant.email,
+            accountant.city_id.ibge_code,
+        )
+
+    def _write_0150(self, writer):
+        query = """
+            SELECT DISTINCT ON (p.id)
+                p.id, COALESCE(p.legal_name, p.name) AS name,
+                country.bc_code, p.cnpj_cpf, p.inscr_est, city.ibge_code,
+                p.suframa, COALESCE(p.street_name, p.street) AS street,
+                p.street_number, p.street2, p.district
+            FROM efd_document e
+            JOIN res_partner p ON p.id = e.partner_id
+            LEFT JOIN res_country country ON country.id = p.country_id
+            LEFT JOIN res_city city ON city.id = p.city_id
+            WHERE e.cod_sit = %(regular)s
+            ORDER BY p.id
+        """
+        for row in self._fetch(query, {"regular": SITUACAO_FISCAL_REGULAR}):
+            cnpj_cpf = punctuation_rm(row.cnpj_cpf or "")
+            writer.write(
+                "0150",
+                row.id,
+                row.name,
+                row.bc_code,
+                cnpj_cpf if len(cnpj_cpf) == 14 else "",
+                cnpj_cpf if len(cnpj_cpf) == 11 else "",
+                punctuation_rm(row.inscr_est or ""),
+                row.ibge_code,
+                row.suframa,
+                row.street,
+                row.street_number,
+                row.street2,
+                row.district,
+            )
+
+    def _write_0190(self, writer):
+        # units of the items of the C170 registers
+        query = """
+            SELECT DISTINCT ON (uom.id) uom.id, uom.code, uom.name
+            FROM efd_document e
+            JOIN l10n_br_fiscal_document_line l ON l.document_id = e.id
+            JOIN uom_uom uom ON uom.id = l.uom_id
+            WHERE e.cod_sit = %(regular)s AND e.ind_emit = '1'
+            ORDER BY uom.id
+        """
+        for row in self._fetch(query, {"regular": SITUACAO_FISCAL_REGULAR}):
+            writer.write("0190", row.code or row.id, row.name)
+
+    def _write_0200(self, writer):
+        query = """
+            SELECT DISTINCT ON (pp.id)
+                pp.id, pp.default_code, pt.name, pp.barcode,
+                uom.code AS uom_code, uom.id AS uom_id, l.fiscal_type,
+                ncm.code_unmasked AS ncm, cest.code_unmasked AS cest
+            FROM efd_document e
+            JOIN l10n_br_fiscal_document_line l ON l.document_id = e.id
+            JOIN product_product pp ON pp.id = l.product_id
+            JOIN product_template pt ON pt.id = pp.product_tmpl_id
+            LEFT JOIN uom_uom uom ON uom.id = l.uom_id
+            LEFT JOIN l10n_br_fiscal_ncm ncm ON ncm.id = l.ncm_id
+            LEFT JOIN l10n_br_fiscal_cest cest ON cest.id = l.cest_id
+            WHERE e.cod_sit = %(regular)s AND e.ind_emit = '1'
+            ORDER BY pp.id
+        """
+        for row in self._fetch(query, {"regular": SITUACAO_FISCAL_REGULAR}):
+            writer.write(
+                "0200",
+                row.default_code or row.id,
+                row.name,
+                row.barcode,
+                "",
+                row.uom_code or row.uom_id,
+                row.fiscal_type,
+                row.ncm,
+                "",
+                row.ncm and row.ncm[:2],
+                "",
+                "",
+                row.cest,
+            )
+
+    # Block C
+
+    def _write_block_c(self, writer):
+        self.env.cr.execute("SELECT EXISTS (SELECT 1 FROM efd_document)")
+        has_data = self.env.cr.fetchone()[0]
+        writer.open_block("C", has_data)
+        if has_data:
+            self._write_c100(writer)
+        writer.close_block("C")
+
+    def _c100_query(self):
+        return """
+            SELECT e.*, t.*
+            FROM efd_document e
+            LEFT JOIN (
+                SELECT
+                    l.document_id AS line_document_id,
+                    SUM({line_total}) AS vl_doc,
+                    SUM(COALESCE(l.discount_value, 0)) AS vl_desc,
+                    SUM(ROUND(CAST(COALESCE(l.price_unit, 0)
+                        * COALESCE(l.quantity, 0) AS numeric), 2)) AS vl_merc,
+                    SUM(COALESCE(l.freight_value, 0)) AS vl_frt,
+                    SUM(COALESCE(l.insurance_value, 0)) AS vl_seg,
+                    SUM(COALESCE(l.other_value, 0)) AS vl_out_da,
+                    SUM(COALESCE(l.icms_base, 0)) AS vl_bc_icms,
+                    SUM(COALESCE(l.icms_value, 0)) AS vl_icms,
+                    SUM(COALESCE(l.icmsst_base, 0)) AS vl_bc_icms_st,
+                    SUM(COALESCE(l.icmsst_value, 0)) AS vl_icms_st,
+                    SUM(COALESCE(l.ipi_value, 0)) AS vl_ipi,
+                    SUM(COALESCE(l.pis_value, 0)) AS vl_pis,
+                    SUM(COALESCE(l.cofins_value, 0)) AS vl_cofins
+                FROM efd_document d
+                JOIN l10n_br_fiscal_document_line l ON l.document_id = d.id
+                WHERE d.cod_sit = %(regular)s
+                GROUP BY l.document_id
+            ) t ON t.line_document_id = e.id
+            ORDER BY e.id
+        """.format(
+            line_total=self._line_total_sql()
+        )
+
+    def _c170_query(self):
+        # items are informed for the documents issued by third parties
+        return self._line_query(
+            """
+                e.id AS document_id, pp.default_code, pp.id AS product_id,
+                l.name, l.quantity, uom.code AS uom_code, uom.id AS uom_id,
+                ROUND(CAST(COALESCE(l.price_unit, 0)
+                    * COALESCE(l.quantity, 0) AS numeric), 2) AS vl_item,
+                l.discount_value,
+                COALESCE(l.icms_origin, '0') || COALESCE(icms_cst.code, '')
+                    AS cst_icms,
+                cfop.code AS cfop,
+                l.icms_base, l.icms_percent, l.icms_value,
+                l.icmsst_base, l.icmsst_percent, l.icmsst_value,
+                ipi_cst.code AS cst_ipi, guideline.code AS cod_enq,
+                l.ipi_base, l.ipi_percent, l.ipi_value,
+                pis_cst.code AS cst_pis,
+                l.pis_base, l.pis_percent, l.pis_value,
+                cofins_cst.code AS cst_cofins,
+                l.cofins_base, l.cofins_percent, l.cofins_value
+            """,
+            joins="""
+            LEFT JOIN product_product pp ON pp.id = l.product_id
+            LEFT JOIN uom_uom uom ON uom.id = l.uom_id
+            LEFT JOIN l10n_br_fiscal_cst ipi_cst ON ipi_cst.id = l.ipi_cst_id
+            LEFT JOIN l10n_br_fiscal_tax_ipi_guideline guideline
+                ON guideline.id = l.ipi_guideline_id
+            LEFT JOIN l10n_br_fiscal_cst pis_cst ON pis_cst.id = l.pis_cst_id
+            LEFT JOIN l10n_br_fiscal_cst cofins_cst
+                ON cofins_cst.id = l.cofins_cst_id
+            """,
+            where="AND e.ind_emit = '1'",
+        )
+
+    def _c190_query(self):
+        return self._line_query(
+            """
+                e.id AS document_id,
+                COALESCE(l.icms_origin, '0') || COALESCE(icms_cst.code, '')
+                    AS cst_icms,
+                cfop.code AS cfop,
+                COALESCE(l.icms_percent, 0) AS aliq_icms,
+                SUM({line_total}) AS vl_opr,
+                SUM(COALESCE(l.icms_base, 0)) AS vl_bc_icms,
+                SUM(COALESCE(l.icms_value, 0)) AS vl_icms,
+                SUM(COALESCE(l.icmsst_base, 0)) AS vl_bc_icms_st,
+                SUM(COALESCE(l.icmsst_value, 0)) AS vl_icms_st,
+                SUM(CASE WHEN COALESCE(l.icms_reduction, 0) > 0
+                    THEN ROUND(CAST(COALESCE(l.price_unit, 0)
+                        * COALESCE(l.quantity, 0) AS numeric), 2)
+                        - COALESCE(l.discount_value, 0) - COALESCE(l.icms_base, 0)
+                    ELSE 0 END) AS vl_red_bc,
+                SUM(COALESCE(l.ipi_value, 0)) AS vl_ipi
+            """.format(
+                line_total=self._line_total_sql()
+            ),
+            group_by="e.id, 2, 3, 4",
+            order_by="2, 3, 4",
+        )
+
+    def _write_c100(self, writer):
+        params = {"regular": SITUACAO_FISCAL_REGULAR}
+        c170_rows = _DocumentRows(self._fetch(self._c170_query(), params))
+        c190_rows = _DocumentRows(self._fetch(self._c190_query(), params))
+        for doc in self._fetch(self._c100_query(), params):
+            if doc.cod_sit != SITUACAO_FISCAL_REGULAR:
+                # only the identification of cancelled, denied and
+                # invalidated documents is informed
+                writer.write(
+                    "C100",
+                    doc.ind_oper,
+                    doc.ind_emit,
+                    "",
+                    doc.cod_mod,
+                    doc.cod_sit,
+                    doc.ser,
+                    doc.num_doc,
+                    doc.chv_nfe,
+                    *([""] * 20)
+                )
+                continue
+            writer.write(
+                "C100",
+                doc.ind_oper,
+                doc.ind_emit,
+                doc.partner_id,
+                doc.cod_mod,
+                doc.cod_sit,
+                doc.ser,
+                doc.num_doc,
+                doc.chv_nfe,
+                doc.dt_doc,
+                doc.dt_e_s or doc.dt_doc,
+                doc.vl_doc or 0.0,
+                "2",
+                doc.vl_desc or 0.0,
+                0.0,
+                doc.vl_merc or 0.0,
+                "0" if doc.vl_frt else "9",
+                doc.vl_frt or 0.0,
+                doc.vl_seg or 0.0,
+                doc.vl_out_da or 0.0,
+                doc.vl_bc_icms or 0.0,
+                doc.vl_icms or 0.0,
+                doc.vl_bc_icms_st or 0.0,
+                doc.vl_icms_st or 0.0,
+                doc.vl_ipi or 0.0,
+                doc.vl_pis or 0.0,
+                doc.vl_cofins or 0.0,
+                0.0,
+                0.0,
+            )
+            for num_item, line in enumerate(c170_rows.pop(doc.id), start=1):
+                self._write_c170(writer, num_item, line)
+            for line in c190_rows.pop(doc.id):
+                writer.write(
+                    "C190",
+                    line.cst_icms,
+                    line.cfop,
+                    line.aliq_icms or 0.0,
+                    line.vl_opr or 0.0,
+                    line.vl_bc_icms or 0.0,
+                    line.vl_icms or 0.0,
+                    line.vl_bc_icms_st or 0.0,
+                    line.vl_icms_st or 0.0,
+                    line.vl_red_bc or 0.0,
+                    line.vl_ipi or 0.0,
+                    "",
+                )
+
+    def _write_c170(self, writer, num_item, line):
+        writer.write(
+            "C170",
+            num_item,
+            line.default_code or line.product_id,
+            line.name,
+            efd_value(line.quantity or 0.0, 5),
+            line.uom_code or line.uom_id,
+            line.vl_item or 0.0,
+            line.discount_value or 0.0,
+            "0",
+            line.cst_icms,
+            line.cfop,
+            "",
+            line.icms_base or 0.0,
+            line.icms_percent or 0.0,
+            line.icms_value or 0.0,
+            line.icmsst_base or 0.0,
+            line.icmsst_percent or 0.0,
+            line.icmsst_value or 0.0,
+            "0",
+            line.cst_ipi,
+            line.cod_enq,
+            line.ipi_base or 0.0,
+            line.ipi_percent or 0.0,
+            line.ipi_value or 0.0,
+            line.cst_pis,
+            line.pis_base or 0.0,
+            efd_value(line.pis_percent or 0.0, 4),
+            "",
+            "",
+            line.pis_value or 0.0,
+            line.cst_cofins,
+            line.cofins_base or 0.0,
+            efd_value(line.cofins_percent or 0.0, 4),
+            "",
+            "",
+            line.cofins_value or 0.0,
+            "",
+            0.0,
+        )
+
+    # Block E
+
+    def _write_block_e(self, writer):
+        writer.open_block("E", True)
+        writer.write("E100", self.date_start, self.date_stop)
+        totals = self._fetchone(
+            """
+            SELECT
+                COALESCE(SUM(CASE WHEN LEFT(cfop.code, 1) IN ('5', '6', '7')
+                    THEN l.icms_value ELSE 0 END), 0) AS debits,
+                COALESCE(SUM(CASE WHEN LEFT(cfop.code, 1) IN ('1', '2', '3')
+                    THEN l.icms_value ELSE 0 END), 0) AS credits
+            FROM efd_document e
+            JOIN l10n_br_fiscal_document_line l ON l.document_id = e.id
+            LEFT JOIN l10n_br_fiscal_cfop cfop ON cfop.id = l.cfop_id
+            WHERE e.cod_sit = %(regular)s
+            """,
+            {"regular": SITUACAO_FISCAL_REGULAR},
+        )
+        debits = float(totals["debits"])
+        credits = float(totals["credits"])
+        balance = round(debits - credits, 2)
+        writer.write(
+            "E110",
+            debits,
+            0.0,
+            0.0,
+            0.0,
+            credits,
+            0.0,
+            0.0,
+            0.0,
+            0.0,
+            max(balance, 0.0),
+            0.0,
+            max(balance, 0.0),
+            max(-balance, 0.0),
+            0.0,
+        )
+        if balance > 0:
+            self._write_e116(writer, balance)
+        writer.close_block("E")
+
+    def _write_e116(self, writer, amount):
+        """Obligation of the ICMS to pay of the period, the E116 values
+        must add up to the VL_ICMS_RECOLHER of the E110"""
+        if not self.icms_due_date or not self.icms_revenue_code:
+            raise UserError(
+                _(
+                    "The period has ICMS to pay, inform the ICMS due date and "
+                    "revenue code of the closing."
+                )
+            )
+        writer.write(
+            "E116",
+            EFD_COD_OR_ICMS,
+            amount,
+            self.icms_due_date,
+            self.icms_revenue_code,
+            "",
+            "",
+            "",
+            "",
+            self.date_start.strftime("%m%Y"),
+        )
+
+    # Block 1
+
+    def _write_block_1(self, writer):
+        writer.open_block("1", True)
+        writer.write("1010", *(["N"] * 13))
+        writer.close_block("1")
+
+
+def efd_file_name(company, date_start):
+    return "EFD_ICMS_IPI_{}_{}.txt".format(
+        punctuation_rm(company.cnpj_cpf or ""), date_start.strftime("%Y%m")
+    )
+
+
+def generate_efd_icms_ipi(
+    env,
+    company,
+    date_start,
+    date_stop,
+    path,
+    icms_due_date=None,
+    icms_revenue_code=None,
+):
+    """Write the EFD ICMS/IPI file of the company for the period in the
+    path directory, return the file path"""
+    os.makedirs(path, exist_ok=True)
+    file_path = os.path.join(path, efd_file_name(company, date_start))
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(
+            tmp_path, "w", encoding="iso-8859-1", errors="replace", newline=""
+        ) as stream:
+            EfdIcmsIpi(
+                env,
+                company,
+                date_start,
+                date_stop,
+                icms_due_date=icms_due_date,
+                icms_revenue_code=icms_revenue_code,
+            ).generate(stream)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return file_path
@@ -5,3 +5,5 @@ from . import document_cancel_wizard
 from . import document_correction_wizard
 from . import document_status_wizard
 from . import invalidate_number_wizard
+from . import ibpt_table_wizard
+from . import document_mass_process_wizard
@@ -0,0 +1,243 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+MASS_PROCESS_OPERATION = [
+    ("confirm", "Confirm"),
+    ("send", "Send"),
+    ("confirm_send", "Confirm and Send"),
+]
+
+MASS_PROCESS_LINE_STATE = [
+    ("done", "Done"),
+    ("error", "Error"),
+]
+
+
+class DocumentMassProcessWizard(models.TransientModel):
+    """Confirm and send a large selection of fiscal documents.
+
+    The selection is processed by chunks committed independently. A chunk
+    is confirmed with one call, so its documents are numbered from one
+    block per serie and their access keys are built together, while their
+    XML export and signature are still done document by document; the
+    send of the confirmed chunks, waiting on the SEFAZ webservices, runs
+    in parallel workers with their own cursors. A document failing is
+    recorded in the result lines and the others are processed anyway.
+    """
+
+    _name = "l10n_br_fiscal.document.mass.process.wizard"
+    _description = "Fiscal Document Mass Process Wizard"
+
+    document_ids = fields.Many2many(
+        comodel_name="l10n_br_fiscal.document",
+        string="Fiscal Documents",
+        default=lambda self: self._default_document_ids(),
+    )
+
+    operation = fields.Selection(
+        selection=MASS_PROCESS_OPERATION,
+        required=True,
+        default="confirm_send",
+    )
+
+    chunk_size = fields.Integer(
+        required=True,
+        default=lambda self: int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_br_fiscal.mass_process_chunk_size", 50)
+        ),
+        help="Number of documents processed and committed together",
+    )
+
+    max_workers = fields.Integer(
+        string="Parallel Sends",
+        required=True,
+        default=lambda self: int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_br_fiscal.mass_process_workers", 4)
+        ),
+        help="Maximum number of chunks sent to the webservices at the same time",
+    )
+
+    state = fields.Selection(
+        selection=[("draft", "Draft"), ("done", "Done")],
+        default="draft",
+    )
+
+    line_ids = fields.One2many(
+        comodel_name="l10n_br_fiscal.document.mass.process.wizard.line",
+        inverse_name="wizard_id",
+        string="Results",
+        readonly=True,
+    )
+
+    done_count = fields.Integer(compute="_compute_counts")
+
+    error_count = fields.Integer(compute="_compute_counts")
+
+    @api.model
+    def _default_document_ids(self):
+        if self.env.context.get("active_model") == "l10n_br_fiscal.document":
+            return [(6, 0, self.env.context.get("active_ids", []))]
+        return False
+
+    @api.depends("line_ids.state")
+    def _compute_counts(self):
+        for wizard in self:
+            wizard.done_count = len(
+                wizard.line_ids.filtered(lambda line: line.state == "done")
+            )
+            wizard.error_count = len(wizard.line_ids) - wizard.done_count
+
+    @api.model
+    def _process_chunk(self, documents, method):
+        """Call the method on the chunk, then one by one when it fails to
+        isolate the failing documents. The number blocks of a confirmed
+        chunk are reserved once, the one by one retry takes its numbers
+        from the same blocks, and closed at the end of the chunk.
+
+        :return: dict {document_id: error message}
+        """
+        blocks = self.env["l10n_br_fiscal.document.serie.block"]
+        if method == "action_document_confirm":
+            blocks = documents._reserve_document_numbers()
+            documents = documents.with_context(
+                document_serie_blocks={
+                    block.document_serie_id.id: block.id for block in blocks
+                }
+            )
+        errors = {}
+        try:
+            with self.env.cr.savepoint():
+                getattr(documents, method)()
+        except Exception:
+            for document in documents:
+                try:
+                    with self.env.cr.savepoint():
+                        getattr(document, method)()
+                except Exception as e:
+                    _logger.error(
+                        "Mass %s error of %s: %s", method, document.display_name, e
+                    )
+                    errors[document.id] = str(e)
+        blocks._close()
+        return errors
+
+    def _process_chunks(self, documents, method, auto_commit):
+        errors = {}
+        for chunk in split_every(self.chunk_size, documents.ids, documents.browse):
+            errors.update(self._process_chunk(chunk, method))
+            if auto_commit:
+                self.env.cr.commit()
+        return errors
+
+    def _send_chunk_worker(self, document_ids):
+        """Send a chunk in its own cursor, committed when the send ends"""
+        with api.Environment.manage(), self.pool.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.env.context)
+            return env[self._name]._process_chunk(
+                env["l10n_br_fiscal.document"].browse(document_ids),
+                "action_document_send",
+            )
+
+    def _send_chunks(self, documents, auto_commit):
+        if not auto_commit or self.max_workers <= 1:
+            return self._process_chunks(documents, "action_document_send", auto_commit)
+        # the workers read the confirmed documents from their own cursors
+        self.env.cr.commit()
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for chunk_errors in executor.map(
+                self._send_chunk_worker, split_every(self.chunk_size, documents.ids)
+            ):
+                errors.update(chunk_errors)
+        documents.invalidate_cache()
+        return errors
+
+    def action_process(self, auto_commit=None):
+        self.ensure_one()
+        if self.chunk_size < 1 or self.max_workers < 1:
+            raise UserError(
+                _("The chunk size and the parallel sends must be positive.")
+            )
+        if not self.document_ids:
+            raise UserError(_("No fiscal document selected."))
+        if auto_commit is None:
+            auto_commit = not getattr(threading.currentThread(), "testing", False)
+        documents = self.document_ids
+        errors = {}
+        if self.operation in ("confirm", "confirm_send"):
+            errors.update(
+                self._process_chunks(documents, "action_document_confirm", auto_commit)
+            )
+        if self.operation in ("send", "confirm_send"):
+            errors.update(
+                self._send_chunks(
+                    documents.filtered(lambda d: d.id not in errors), auto_commit
+                )
+            )
+        documents.invalidate_cache()
+        self.write(
+            {
+                "state": "done",
+                "line_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "document_id": document.id,
+                            "state": "error" if document.id in errors else "done",
+                            "error": errors.get(document.id),
+                        },
+                    )
+                    for document in documents
+                ],
+            }
+        )
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }
+
+
+class DocumentMassProcessWizardLine(models.TransientModel):
+    _name = "l10n_br_fiscal.document.mass.process.wizard.line"
+    _description = "Fiscal Document Mass Process Wizard Line"
+
+    wizard_id = fields.Many2one(
+        comodel_name="l10n_br_fiscal.document.mass.process.wizard",
+        required=True,
+        ondelete="cascade",
+    )
+
+    document_id = fields.Many2one(
+        comodel_name="l10n_br_fiscal.document",
+        string="Fiscal Document",
+        readonly=True,
+    )
+
+    state_edoc = fields.Selection(
+        related="document_id.state_edoc",
+    )
+
+    state = fields.Selection(
+        selection=MASS_PROCESS_LINE_STATE,
+        string="Result",
+        readonly=True,
+    )
+
+    error = fields.Text(readonly=True)
@@ -0,0 +1,48 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+import base64
+
+from odoo import _, fields, models
+
+from ..tools.ibpt_loader import load_ibpt_table
+
+
+class IbptTableWizard(models.TransientModel):
+    _name = "l10n_br_fiscal.ibpt.table.wizard"
+    _description = "Load IBPT Table"
+
+    file = fields.Binary(
+        string="IBPT Table",
+        required=True,
+        help="CSV table published by IBPT for the state "
+        "(TabelaIBPTax<UF>...csv)",
+    )
+
+    state_id = fields.Many2one(
+        comodel_name="res.country.state",
+        string="State",
+        required=True,
+        default=lambda self: self.env.company.state_id,
+        domain=lambda self: [("country_id", "=", self.env.ref("base.br").id)],
+    )
+
+    result = fields.Text(
+        string="Result",
+        readonly=True,
+    )
+
+    def action_load(self):
+        self.ensure_one()
+        result = load_ibpt_table(
+            self.env, base64.b64decode(self.file), self.state_id, self.env.company
+        )
+        self.result = _("Tax estimates loaded: {} NCM, {} NBS").format(
+            result["l10n_br_fiscal.ncm"], result["l10n_br_fiscal.nbs"]
+        )
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }
@@ -16,8 +16,12 @@
         "l10n_br_coa",
     ],
     "data": [
+        "security/ir.model.access.csv",
+        "views/monthly_balance.xml",
+        "data/ir_cron.xml",
         "data/mis_report_styles.xml",
         "data/mis_report_bp.xml",
         "data/mis_report_dre.xml",
     ],
+    "post_init_hook": "post_init_hook",
 }
@@ -0,0 +1,10 @@
+# Copyright 2019 KMEE
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import SUPERUSER_ID, api
+
+
+def post_init_hook(cr, registry):
+    """Build the monthly balances of the moves posted before the install"""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env["l10n_br_mis_report.monthly.balance"]._rebuild()
@@ -0,0 +1,2 @@
+from . import monthly_balance
+from . import account_move
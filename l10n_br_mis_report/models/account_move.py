@@ -0,0 +1,60 @@
+# Copyright 2019 KMEE
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+# Journal item fields whose change moves a posted amount between balances
+BALANCE_KEY_FIELDS = (
+    "company_id",
+    "account_id",
+    "analytic_account_id",
+    "date",
+    "debit",
+    "credit",
+    "balance",
+)
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        moves = super().create(vals_list)
+        self.env["l10n_br_mis_report.monthly.balance"]._update_from_moves(
+            moves.filtered(lambda m: m.state == "posted")
+        )
+        return moves
+
+    def write(self, vals):
+        if "state" not in vals:
+            return super().write(vals)
+        monthly_balance = self.env["l10n_br_mis_report.monthly.balance"]
+        posting = vals["state"] == "posted"
+        moves = self.filtered(lambda m: (m.state == "posted") != posting)
+        if not posting:
+            monthly_balance._update_from_moves(moves, sign=-1)
+        result = super().write(vals)
+        if posting:
+            monthly_balance._update_from_moves(moves)
+        return result
+
+    def unlink(self):
+        self.env["l10n_br_mis_report.monthly.balance"]._update_from_moves(
+            self.filtered(lambda m: m.state == "posted"), sign=-1
+        )
+        return super().unlink()
+
+
+class AccountMoveLine(models.Model):
+    _inherit = "account.move.line"
+
+    def write(self, vals):
+        if not any(field in vals for field in BALANCE_KEY_FIELDS):
+            return super().write(vals)
+        monthly_balance = self.env["l10n_br_mis_report.monthly.balance"]
+        lines = self.filtered(lambda line: line.parent_state == "posted")
+        monthly_balance._update_from_lines(lines, sign=-1)
+        result = super().write(vals)
+        monthly_balance._update_from_lines(lines.exists())
+        return result
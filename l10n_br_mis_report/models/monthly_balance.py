@@ -0,0 +1,240 @@
+# Copyright 2019 KMEE
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Fields of the journal items that make up the monthly balances
+BALANCE_LINE_FIELDS = (
+    "company_id",
+    "account_id",
+    "analytic_account_id",
+    "date",
+    "debit",
+    "credit",
+    "balance",
+    "parent_state",
+)
+
+# Monthly balances of the posted journal items, the key of a balance is
+# (company_id, account_id, COALESCE(analytic_account_id, 0), date)
+MOVE_LINE_BALANCES = """
+    SELECT
+        aml.company_id,
+        aml.account_id,
+        aml.analytic_account_id,
+        date_trunc('month', aml.date)::date AS date,
+        SUM(aml.debit) AS debit,
+        SUM(aml.credit) AS credit,
+        SUM(aml.balance) AS balance
+    FROM account_move_line aml
+    WHERE aml.parent_state = 'posted' {where}
+    GROUP BY 1, 2, 3, 4
+    HAVING SUM(aml.debit) <> 0 OR SUM(aml.credit) <> 0
+"""
+
+
+class MonthlyBalance(models.Model):
+    """Debit, credit and balance of the posted journal items by company,
+    account, analytic account and month.
+
+    The balances are maintained incrementally when moves are posted or
+    leave the posted state, and can be used as the move lines source of
+    the MIS reports (BP and DRE) when their periods are whole months.
+    """
+
+    _name = "l10n_br_mis_report.monthly.balance"
+    _description = "Monthly Account Balance"
+    _order = "date desc, company_id, account_id"
+    _rec_name = "account_id"
+
+    company_id = fields.Many2one(
+        comodel_name="res.company",
+        string="Company",
+        readonly=True,
+        index=True,
+    )
+
+    company_currency_id = fields.Many2one(
+        comodel_name="res.currency",
+        related="company_id.currency_id",
+        string="Company Currency",
+        readonly=True,
+    )
+
+    account_id = fields.Many2one(
+        comodel_name="account.account",
+        string="Account",
+        readonly=True,
+        index=True,
+    )
+
+    analytic_account_id = fields.Many2one(
+        comodel_name="account.analytic.account",
+        string="Analytic Account",
+        readonly=True,
+        index=True,
+    )
+
+    date = fields.Date(
+        string="Month",
+        readonly=True,
+        index=True,
+        help="First day of the month of the balance",
+    )
+
+    debit = fields.Monetary(
+        currency_field="company_currency_id",
+        readonly=True,
+    )
+
+    credit = fields.Monetary(
+        currency_field="company_currency_id",
+        readonly=True,
+    )
+
+    balance = fields.Monetary(
+        currency_field="company_currency_id",
+        readonly=True,
+    )
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS {table}_key_uniq
+            ON {table} (
+                company_id, account_id, COALESCE(analytic_account_id, 0), date)
+            """.format(
+                table=self._table
+            )
+        )
+
+    def _insert_query(self, where):
+        return """
+            INSERT INTO {table} AS t (
+                company_id, account_id, analytic_account_id, date,
+                debit, credit, balance,
+                create_uid, create_date, write_uid, write_date)
+            SELECT
+                b.company_id, b.account_id, b.analytic_account_id, b.date,
+                %(sign)s * b.debit, %(sign)s * b.credit, %(sign)s * b.balance,
+                %(uid)s, now() at time zone 'UTC',
+                %(uid)s, now() at time zone 'UTC'
+            FROM ({balances}) b
+            ON CONFLICT (
+                company_id, account_id, COALESCE(analytic_account_id, 0), date)
+            DO UPDATE SET
+                debit = t.debit + EXCLUDED.debit,
+                credit = t.credit + EXCLUDED.credit,
+                balance = t.balance + EXCLUDED.balance,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            RETURNING t.id, t.debit, t.credit
+        """.format(
+            table=self._table, balances=MOVE_LINE_BALANCES.format(where=where)
+        )
+
+    @api.model
+    def _update_from_lines(self, lines, sign=1):
+        """Add (sign=1) or remove (sign=-1) the posted journal items to the
+        monthly balances, balances left empty are deleted"""
+        if not lines:
+            return
+        lines.flush(BALANCE_LINE_FIELDS)
+        self.env.cr.execute(
+            self._insert_query("AND aml.id IN %(line_ids)s"),
+            {"line_ids": tuple(lines.ids), "sign": sign, "uid": self.env.uid},
+        )
+        empty_ids = [
+            row[0] for row in self.env.cr.fetchall() if not row[1] and not row[2]
+        ]
+        if empty_ids:
+            self.env.cr.execute(
+                "DELETE FROM {} WHERE id IN %s".format(self._table),
+                (tuple(empty_ids),),
+            )
+        self.invalidate_cache()
+
+    @api.model
+    def _update_from_moves(self, moves, sign=1):
+        self._update_from_lines(moves.mapped("line_ids"), sign)
+
+    def _months_filter(self, alias, months):
+        if months is None:
+            return ""
+        return "AND ({alias}company_id, {date}) IN %(months)s".format(
+            alias=alias,
+            date="date_trunc('month', aml.date)::date" if alias else "date",
+        )
+
+    @api.model
+    def _rebuild(self, months=None):
+        """Rebuild the monthly balances from the journal items.
+
+        :param months: list of (company_id, first day of the month) to
+            rebuild, all the balances when None
+        """
+        if months is not None and not months:
+            return
+        self.env["account.move.line"].flush(BALANCE_LINE_FIELDS)
+        params = {"months": tuple(months or ()), "sign": 1, "uid": self.env.uid}
+        self.env.cr.execute(
+            "DELETE FROM {} WHERE TRUE {}".format(
+                self._table, self._months_filter("", months)
+            ),
+            params,
+        )
+        self.env.cr.execute(
+            self._insert_query(self._months_filter("aml.", months)), params
+        )
+        self.invalidate_cache()
+        _logger.info(
+            "%s monthly balances rebuilt for %s",
+            self.env.cr.rowcount,
+            "all the months" if months is None else months,
+        )
+
+    @api.model
+    def check_consistency(self, company_ids=None):
+        """Compare the monthly balances with the journal items.
+
+        :param company_ids: companies to check, all of them when None
+        :return: sorted list of the (company_id, date) months whose
+            balances differ from their posted journal items
+        """
+        self.env["account.move.line"].flush(BALANCE_LINE_FIELDS)
+        company_filter = "AND aml.company_id IN %(company_ids)s" if company_ids else ""
+        query = """
+            WITH stored AS (
+                SELECT company_id, account_id, analytic_account_id, date,
+                    debit, credit, balance
+                FROM {table}
+                WHERE TRUE {stored_filter}
+            ), computed AS ({balances})
+            SELECT DISTINCT company_id, date FROM (
+                (SELECT * FROM stored EXCEPT SELECT * FROM computed)
+                UNION ALL
+                (SELECT * FROM computed EXCEPT SELECT * FROM stored)
+            ) diff
+            ORDER BY company_id, date
+        """.format(
+            table=self._table,
+            stored_filter=company_filter.replace("aml.", ""),
+            balances=MOVE_LINE_BALANCES.format(where=company_filter),
+        )
+        self.env.cr.execute(query, {"company_ids": tuple(company_ids or ())})
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _cron_check_consistency(self, repair=True):
+        months = self.check_consistency()
+        if months:
+            _logger.warning(
+                "Monthly balances differ from the journal items for %s", months
+            )
+            if repair:
+                self._rebuild(months)
+        return months
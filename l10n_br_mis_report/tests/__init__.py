@@ -0,0 +1 @@
+from . import test_monthly_balance
@@ -0,0 +1,79 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import fields
+from odoo.tests import SavepointCase
+
+
+class TestMonthlyBalance(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.monthly_balance = cls.env["l10n_br_mis_report.monthly.balance"]
+        cls.account_1 = cls.env["account.account"].create(
+            dict(
+                code="X1010",
+                name="Bank - (test)",
+                user_type_id=cls.env.ref("account.data_account_type_liquidity").id,
+            )
+        )
+        cls.account_2 = cls.env["account.account"].create(
+            dict(
+                code="X1020",
+                name="Product Sales - (test)",
+                user_type_id=cls.env.ref("account.data_account_type_revenue").id,
+            )
+        )
+        cls.journal = cls.env["account.journal"].create(
+            dict(name="Miscellaneous - (test)", code="TMIS", type="general")
+        )
+        cls.date = fields.Date.to_date("2021-03-15")
+
+    def _create_move(self, amount):
+        return self.env["account.move"].create(
+            dict(
+                move_type="entry",
+                journal_id=self.journal.id,
+                date=self.date,
+                line_ids=[
+                    (0, 0, dict(account_id=self.account_1.id, debit=amount)),
+                    (0, 0, dict(account_id=self.account_2.id, credit=amount)),
+                ],
+            )
+        )
+
+    def _balance(self, account):
+        return self.monthly_balance.search(
+            [("account_id", "=", account.id), ("date", "=", "2021-03-01")]
+        )
+
+    def test_post_and_draft(self):
+        """Check the balances follow the posted moves"""
+        move_1 = self._create_move(100.0)
+        move_2 = self._create_move(50.0)
+        self.assertFalse(self._balance(self.account_1))
+
+        (move_1 | move_2).action_post()
+        self.assertEqual(self._balance(self.account_1).debit, 150.0)
+        self.assertEqual(self._balance(self.account_2).balance, -150.0)
+
+        move_2.button_draft()
+        self.assertEqual(self._balance(self.account_1).debit, 100.0)
+        move_1.button_draft()
+        self.assertFalse(self._balance(self.account_1))
+        self.assertFalse(self.monthly_balance.check_consistency([self.env.company.id]))
+
+    def test_check_consistency(self):
+        """Check the checker finds and the rebuild fixes the differences"""
+        move = self._create_move(100.0)
+        move.action_post()
+        balance = self._balance(self.account_1)
+        self.env.cr.execute(
+            "UPDATE l10n_br_mis_report_monthly_balance SET debit = 1 WHERE id = %s",
+            (balance.id,),
+        )
+        months = self.monthly_balance.check_consistency([move.company_id.id])
+        self.assertEqual(months, [(move.company_id.id, balance.date)])
+
+        self.monthly_balance._cron_check_consistency()
+        self.assertEqual(self._balance(self.account_1).debit, 100.0)
+        self.assertFalse(self.monthly_balance.check_consistency([self.env.company.id]))
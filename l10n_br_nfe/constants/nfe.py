@@ -7,6 +7,9 @@ NFE_VERSIONS = [("1.10", "1.10"), ("2.00", "2.00"), ("3.10", "3.10"), ("4.00", "
 NFE_VERSION_DEFAULT = "4.00"
 
 
+NFE_NAMESPACE = "http://www.portalfiscal.inf.br/nfe"
+
+
 NFE_ENVIRONMENTS = [("1", "Produção"), ("2", "Homologação")]
 
 
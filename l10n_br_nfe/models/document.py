@@ -2,9 +2,10 @@
 # Copyright 2019 KMEE INFORMATICA LTDA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-import base64
 import logging
+import os
 import re
+import zipfile
 from datetime import datetime
 from io import StringIO
 from unicodedata import normalize
@@ -42,12 +43,23 @@ from odoo.addons.l10n_br_fiscal.constants.fiscal import (
     SITUACAO_FISCAL_CANCELADO,
     SITUACAO_FISCAL_CANCELADO_EXTEMPORANEO,
 )
+from odoo.addons.l10n_br_fiscal.tools.edoc_key import check_keys
 from odoo.addons.spec_driven_model.models import spec_models
+from odoo.addons.spec_driven_model.models.spec_export import (
+    binding_to_etree,
+    etree_to_xml,
+)
+from odoo.addons.spec_driven_model.models.spec_import import (
+    IMPORT_CACHE_KEY,
+    ImportCache,
+    import_cache_preload,
+)
 
 from ..constants.nfe import (
     NFCE_DANFE_LAYOUTS,
     NFE_DANFE_LAYOUTS,
     NFE_ENVIRONMENTS,
+    NFE_NAMESPACE,
     NFE_TRANSMISSIONS,
     NFE_VERSIONS,
 )
@@ -377,10 +389,11 @@ class NFe(spec_models.StackedModel):
 
     def _serialize(self, edocs):
         edocs = super()._serialize(edocs)
-        for record in self.with_context({"lang": "pt_BR"}).filtered(
+        records = self.with_context({"lang": "pt_BR"}).filtered(
             filter_processador_edoc_nfe
-        ):
-            inf_nfe = record.export_ds()[0]
+        )
+        for inf_nfe_list in records.export_ds_batch():
+            inf_nfe = inf_nfe_list[0]
 
             tnfe = leiauteNFe.TNFe(infNFe=inf_nfe, infNFeSupl=None, Signature=None)
             tnfe.original_tagname_ = "NFe"
@@ -388,6 +401,18 @@ class NFe(spec_models.StackedModel):
 
         return edocs
 
+    def serialize_xml(self, pretty_print=False):
+        """Unsigned XML of the NF-e documents, {document: xml string},
+        exported in one batch"""
+        records = self.filtered(filter_processador_edoc_nfe)
+        edocs = records.serialize()
+        xml_files = self._bindings_to_xml(
+            edocs,
+            namespacedef='xmlns="%s"' % (NFE_NAMESPACE,),
+            pretty_print=pretty_print,
+        )
+        return dict(zip(records, xml_files))
+
     def _processador(self):
         if not self.company_id.certificate_nfe_id:
             raise UserError(_("Certificado não encontrado"))
@@ -408,15 +433,20 @@ class NFe(spec_models.StackedModel):
 
     def _document_export(self, pretty_print=True):
         super()._document_export()
+        # load the exported values of all the documents at once
+        self.with_context(lang="pt_BR").filtered(
+            filter_processador_edoc_nfe
+        )._prefetch_export()
         for record in self.filtered(filter_processador_edoc_nfe):
             record._export_fields_pagamentos()
             record._export_fields_faturas()
             edoc = record.serialize()[0]
 
             processador = record._processador()
-            xml_file = processador._generateds_to_string_etree(
-                edoc, pretty_print=pretty_print
-            )[0]
+            # build the tree straight from the bindings, the signer
+            # receives it without a string round trip
+            edoc_etree = binding_to_etree(edoc, namespace=NFE_NAMESPACE)
+            xml_file = etree_to_xml(edoc_etree, pretty_print=pretty_print)
             _logger.debug(xml_file)
             event_id = self.event_ids.create_event_save_xml(
                 company_id=self.company_id,
@@ -428,7 +458,7 @@ class NFe(spec_models.StackedModel):
                 document_id=self,
             )
             record.authorization_event_id = event_id
-            xml_assinado = processador.assina_raiz(edoc, edoc.infNFe.Id)
+            xml_assinado = processador.assina_raiz(edoc_etree, edoc.infNFe.Id)
             self._valida_xml(xml_assinado)
 
     def atualiza_status_nfe(self, infProt, xml_file):
@@ -557,16 +587,9 @@ class NFe(spec_models.StackedModel):
                     processo.protocolo.infProt, processo.processo_xml.decode("utf-8")
                 )
                 if processo.protocolo.infProt.cStat in AUTORIZADO:
-                    try:
-                        record.make_pdf()
-                    except Exception as e:
-                        # Não devemos interromper o fluxo
-                        # E dar rollback em um documento
-                        # autorizado, podendo perder dados.
-
-                        # Se der problema que apareça quando
-                        # o usuário clicar no gera PDF novamente.
-                        _logger.error("DANFE Error \n {}".format(e))
+                    # the DANFE is rendered later by the PDF renderer so
+                    # the authorization does not wait for it
+                    record._queue_pdf()
 
             elif processo.resposta.cStat == "225":
                 state = SITUACAO_EDOC_REJEITADA
@@ -639,12 +662,8 @@ class NFe(spec_models.StackedModel):
                 fields = [
                     f for f in comodel._fields if f.startswith(self._field_prefix)
                 ]
-                sub_tag_read = self.read(fields)[0]
-                if not any(
-                    v
-                    for k, v in sub_tag_read.items()
-                    if k.startswith(self._field_prefix)
-                ):
+                # read from the cache, the export prefetches these values
+                if not any(self[f] for f in fields if f in self._fields):
                     return False
 
         return super(NFe, self)._export_many2one(field_name, xsd_required, class_obj)
@@ -706,46 +725,149 @@ class NFe(spec_models.StackedModel):
         else:
             super(NFe, self)._build_many2one(comodel, vals, new_value, key, value, path)
 
+    @api.model
+    def _preload_nfe_import(self, inf_nfe_list):
+        """Resolve with a few searches the partners and products of many
+        infNFe bindings before building them (NCM, CEST and CST codes are
+        read from the cached code maps of the fiscal data)."""
+        cnpjs, cpfs, barcodes, codes = (set() for _i in range(4))
+        for inf_nfe in inf_nfe_list:
+            for party in (inf_nfe.emit, inf_nfe.dest):
+                if party is not None:
+                    cnpjs.add(party.CNPJ)
+                    cpfs.add(party.CPF)
+            for det in inf_nfe.det or []:
+                prod = det.prod
+                if prod.cEAN != "SEM GTIN":
+                    barcodes.add(prod.cEAN)
+                codes.add(prod.cProd)
+        partner_model = self.env["res.partner"]
+        import_cache_preload(partner_model, "nfe40_CNPJ", cnpjs)
+        import_cache_preload(partner_model, "nfe40_CPF", cpfs)
+        product_model = self.env["product.product"]
+        import_cache_preload(product_model, "barcode", barcodes)
+        import_cache_preload(product_model, "default_code", codes)
+
+    @api.model
+    def _read_nfe_files(self, path):
+        """Yield (file name, content) of the XML files of a directory or
+        of a zip file"""
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as nfe_zip:
+                for name in sorted(nfe_zip.namelist()):
+                    if name.lower().endswith(".xml"):
+                        yield name, nfe_zip.read(name)
+        else:
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(".xml"):
+                    with open(os.path.join(path, name), "rb") as xml_file:
+                        yield name, xml_file.read()
+
+    @api.model
+    def import_nfe_files(self, path, edoc_type="in", dry_run=False, chunk_size=100):
+        """Import the NF-e (or nfeProc) XML files of a directory or a zip file.
+
+        The files are processed by chunks: the partners, products and
+        fiscal codes of a chunk are resolved in bulk and the lookups are
+        cached for the whole import. A file that fails is rolled back and
+        reported without stopping the import.
+
+        :returns: {file name: fiscal document or error message}
+        """
+        cache = ImportCache()
+        model = self.env["nfe.40.infnfe"].with_context(
+            tracking_disable=True,
+            edoc_type=edoc_type,
+            lang="pt_BR",
+            **{IMPORT_CACHE_KEY: cache}
+        )
+        files = list(self._read_nfe_files(path))
+        result = {}
+        errors = 0
+        for index in range(0, len(files), chunk_size):
+            inf_nfes = []
+            for name, content in files[index : index + chunk_size]:
+                try:
+                    binding = nfe_sub.parseString(content, silence=True)
+                    # nfeProc files wrap the NFe with its protocol
+                    inf_nfes.append((name, getattr(binding, "NFe", binding).infNFe))
+                except Exception as e:
+                    result[name] = str(e)
+                    errors += 1
+
+            # the keys of the chunk are validated at once, before the build
+            keys = [
+                re.sub(r"^NFe", "", inf_nfe.Id or "") for _name, inf_nfe in inf_nfes
+            ]
+            key_errors = check_keys(keys)
+            if key_errors:
+                valid_inf_nfes = []
+                for (name, inf_nfe), key in zip(inf_nfes, keys):
+                    if key in key_errors:
+                        result[name] = _("Invalid key {}: {}").format(
+                            key, key_errors[key]
+                        )
+                        errors += 1
+                    else:
+                        valid_inf_nfes.append((name, inf_nfe))
+                inf_nfes = valid_inf_nfes
+
+            self.with_context(**{IMPORT_CACHE_KEY: cache})._preload_nfe_import(
+                [inf_nfe for _name, inf_nfe in inf_nfes]
+            )
+            for name, inf_nfe in inf_nfes:
+                try:
+                    with self.env.cr.savepoint():
+                        result[name] = model.build(inf_nfe, dry_run=dry_run)
+                except Exception as e:
+                    _logger.warning("NF-e import of %s failed: %s", name, e)
+                    result[name] = str(e)
+                    errors += 1
+                    # records matched or created by the file were rolled back,
+                    # their ids may also be in the code maps of the registry
+                    cache.records.clear()
+                    self.env["l10n_br_fiscal.ncm"].clear_caches()
+
+            _logger.info(
+                "NF-e import: %s/%s files processed, %s errors",
+                min(index + chunk_size, len(files)),
+                len(files),
+                errors,
+            )
+        return result
+
     def view_pdf(self):
         if not self.filtered(filter_processador_edoc_nfe):
             return super().view_pdf()
-        if not self.authorization_file_id or not self.file_report_id:
+        if (
+            not self.file_report_id
+            or not self.authorization_file_id
+            or self.pdf_pending
+        ):
             self.make_pdf()
         return self._target_new_tab(self.file_report_id)
 
+    def _get_danfe_xml(self):
+        event = self.authorization_event_id
+        if self.authorization_file_id:
+            return event._get_file_content(response=True)
+        return self.temp_xml_autorizacao(event._get_file_content())
+
     def make_pdf(self):
         if not self.filtered(filter_processador_edoc_nfe):
             return super().make_pdf()
+        self._render_pdf_batch()
 
-        file_pdf = self.file_report_id
-        self.file_report_id = False
-        file_pdf.unlink()
-
-        if self.authorization_file_id:
-            arquivo = self.authorization_file_id
-            xml_string = base64.b64decode(arquivo.datas).decode()
-        else:
-            arquivo = self.send_file_id
-            xml_string = base64.b64decode(arquivo.datas).decode()
-            xml_string = self.temp_xml_autorizacao(xml_string)
-
-        pdf = base.ImprimirXml.imprimir(
-            string_xml=xml_string, logo=self.company_id.logo
-            # output_dir=self.authorization_event_id.file_path
-        )
+    def _render_pdf_batch(self):
+        records = self.filtered(filter_processador_edoc_nfe)
+        super(NFe, self - records)._render_pdf_batch()
         # TODO: Alterar a opção output_dir para devolter também o arquivo do XML
         # no retorno, evitando a releitura do arquivo.
-        #"datas_fname": self.document_key + ".pdf",
-        self.file_report_id = self.env["ir.attachment"].create(
-            {
-                "name": self.document_key + ".pdf",
-                "res_model": self._name,
-                "res_id": self.id,
-                "datas": base64.b64encode(pdf),
-                "mimetype": "application/pdf",
-                "type": "binary",
-            }
-        )
+        for record in records:
+            pdf = base.ImprimirXml.imprimir(
+                string_xml=record._get_danfe_xml(), logo=record.company_id.logo
+            )
+            record._save_pdf(pdf, record.document_key + ".pdf")
 
     def temp_xml_autorizacao(self, xml_string):
         """ TODO: Migrate-me to erpbrasil.edoc.pdf ASAP"""
@@ -560,12 +560,8 @@ class NFeLine(spec_models.StackedModel):
                 fields = [
                     f for f in comodel._fields if f.startswith(self._field_prefix)
                 ]
-                sub_tag_read = self.read(fields)[0]
-                if not any(
-                    v
-                    for k, v in sub_tag_read.items()
-                    if k.startswith(self._field_prefix)
-                ):
+                # read from the cache, the export prefetches these values
+                if not any(self[f] for f in fields if f in self._fields):
                     return False
 
         return super()._export_many2one(field_name, xsd_required, class_obj)
@@ -607,17 +603,9 @@ class NFeLine(spec_models.StackedModel):
         if key == "nfe40_vUnCom":
             vals["price_unit"] = float(value)
         if key == "nfe40_NCM":
-            vals["ncm_id"] = (
-                self.env["l10n_br_fiscal.ncm"]
-                .search([("code_unmasked", "=", value)], limit=1)
-                .id
-            )
+            vals["ncm_id"] = self.env["l10n_br_fiscal.ncm"].get_by_code(value).id
         if key == "nfe40_CEST" and value:
-            vals["cest_id"] = (
-                self.env["l10n_br_fiscal.cest"]
-                .search([("code_unmasked", "=", value)], limit=1)
-                .id
-            )
+            vals["cest_id"] = self.env["l10n_br_fiscal.cest"].get_by_code(value).id
         if key == "nfe40_qCom":
             vals["quantity"] = float(value)
         if key == "nfe40_qTrib":
@@ -632,9 +620,7 @@ class NFeLine(spec_models.StackedModel):
             vals["cofins_percent"] = float(value or 0.00)
         if key == "nfe40_cEnq":
             vals["ipi_guideline_id"] = (
-                self.env["l10n_br_fiscal.tax.ipi.guideline"]
-                .search([("code_unmasked", "=", value)], limit=1)
-                .id
+                self.env["l10n_br_fiscal.tax.ipi.guideline"].get_by_code(value).id
             )
 
         return super()._build_attr(node, fields, vals, path, attr)
@@ -646,26 +632,20 @@ class NFeLine(spec_models.StackedModel):
         elif key == "nfe40_CST":
             if node.original_tagname_.startswith("ICMS"):
                 vals["icms_cst_id"] = (
-                    self.env["l10n_br_fiscal.cst"]
-                    .search([("code", "=", value), ("tax_domain", "=", "icms")])[0]
-                    .id
+                    self.env["l10n_br_fiscal.cst"].get_by_domain_code("icms", value).id
                 )
             if node.original_tagname_.startswith("IPI"):
                 vals["ipi_cst_id"] = (
-                    self.env["l10n_br_fiscal.cst"]
-                    .search([("code", "=", value), ("tax_domain", "=", "ipi")])[0]
-                    .id
+                    self.env["l10n_br_fiscal.cst"].get_by_domain_code("ipi", value).id
                 )
             if node.original_tagname_.startswith("PIS"):
                 vals["pis_cst_id"] = (
-                    self.env["l10n_br_fiscal.cst"]
-                    .search([("code", "=", value), ("tax_domain", "=", "pis")])[0]
-                    .id
+                    self.env["l10n_br_fiscal.cst"].get_by_domain_code("pis", value).id
                 )
             if node.original_tagname_.startswith("COFINS"):
                 vals["cofins_cst_id"] = (
                     self.env["l10n_br_fiscal.cst"]
-                    .search([("code", "=", value), ("tax_domain", "=", "cofins")])[0]
+                    .get_by_domain_code("cofins", value)
                     .id
                 )
         elif key == "nfe40_modBC":
@@ -713,10 +693,12 @@ class NFeLine(spec_models.StackedModel):
                     # ICMSxx fields
                     # TODO map icms_tax_id
                     if hasattr(icms, "CST") and icms.CST is not None:
-                        icms_vals["icms_cst_id"] = self.env.ref(
-                            "l10n_br_fiscal.cst_icms_%s" % (icms.CST,)
-                        ).id
-                        # TODO search + log if not found
+                        icms_vals["icms_cst_id"] = (
+                            self.env["l10n_br_fiscal.cst"]
+                            .get_by_domain_code("icms", icms.CST)
+                            .id
+                        )
+                        # TODO log if not found
                     if hasattr(icms, "modBC"):
                         icms_vals["icms_base_type"] = float(icms.modBC)
                     if hasattr(icms, "orig"):
@@ -730,9 +712,11 @@ class NFeLine(spec_models.StackedModel):
                     if hasattr(icms, "pRedBC"):
                         icms_vals["icms_reduction"] = float(icms.pRedBC)
                     if hasattr(icms, "motDesICMS") and icms.motDesICMS is not None:
-                        icms_vals["icms_relief_id"] = self.env.ref(
-                            "l10n_br_fiscal.icms_relief_%s" % (icms.motDesICMS,)
-                        ).id
+                        icms_vals["icms_relief_id"] = (
+                            self.env["l10n_br_fiscal.icms.relief"]
+                            .get_by_code(icms.motDesICMS, field="code")
+                            .id
+                        )
                     if hasattr(icms, "vICMSDeson") and icms.vICMSDeson is not None:
                         icms_vals["icms_relief_value"] = float(icms.vICMSDeson)
                     if hasattr(icms, "vICMSSubstituto"):
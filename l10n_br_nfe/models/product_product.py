@@ -32,9 +32,7 @@ class ProductProduct(models.Model):
 
         # NCM
         if parent_dict.get("nfe40_NCM"):
-            ncm = self.env["l10n_br_fiscal.ncm"].search(
-                [("code_unmasked", "=", parent_dict["nfe40_NCM"])], limit=1
-            )
+            ncm = self.env["l10n_br_fiscal.ncm"].get_by_code(parent_dict["nfe40_NCM"])
 
             values["ncm_id"] = ncm.id
 
@@ -8,3 +8,6 @@ from . import test_nfe_import
 from . import test_nfe_serialize
 from . import test_nfe_serialize_lc
 from . import test_nfe_serialize_sn
+from . import test_nfe_spec_view
+from . import test_nfe_serialize_batch
+from . import test_nfe_import_batch
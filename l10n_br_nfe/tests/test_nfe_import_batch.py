@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+import nfelib
+import pkg_resources
+
+from odoo.models import NewId
+from odoo.tests import SavepointCase
+
+from odoo.addons.spec_driven_model import hooks
+from odoo.addons.spec_driven_model.models.spec_import import (
+    IMPORT_CACHE_KEY,
+    ImportCache,
+    import_cache_preload,
+    import_cache_search,
+)
+
+NFE_FILE = "35180834128745000152550010000474281920007498-nfe.xml"
+
+
+class NFeImportBatchTest(SavepointCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        hooks.register_hook(
+            cls.env,
+            "l10n_br_nfe",
+            "odoo.addons.l10n_br_nfe_spec.models.v4_00.leiauteNFe",
+        )
+        resource_path = "/".join(
+            ("..", "tests", "nfe", "v4_00", "leiauteNFe", NFE_FILE)
+        )
+        cls.nfe_content = pkg_resources.resource_string(
+            nfelib.__name__, resource_path
+        )
+        cls.tmp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+        super().tearDownClass()
+
+    def test_import_cache(self):
+        cache = ImportCache()
+        ncm_model = self.env["l10n_br_fiscal.ncm"].with_context(
+            **{IMPORT_CACHE_KEY: cache}
+        )
+        ncm = ncm_model.search([], limit=1)
+        import_cache_preload(ncm_model, "code_unmasked", [ncm.code_unmasked, "0"])
+        self.assertEqual(
+            cache.records[("l10n_br_fiscal.ncm", (), "code_unmasked", "0")], False
+        )
+        with self.assertQueryCount(0):
+            self.assertEqual(
+                import_cache_search(ncm_model, "code_unmasked", ncm.code_unmasked),
+                ncm.id,
+            )
+            self.assertFalse(import_cache_search(ncm_model, "code_unmasked", "0"))
+        cache.invalidate_misses("l10n_br_fiscal.ncm")
+        self.assertNotIn(
+            ("l10n_br_fiscal.ncm", (), "code_unmasked", "0"), cache.records
+        )
+
+    def test_import_nfe_directory_dry_run(self):
+        with open(os.path.join(self.tmp_dir, NFE_FILE), "wb") as nfe_file:
+            nfe_file.write(self.nfe_content)
+        with open(os.path.join(self.tmp_dir, "invalid.xml"), "wb") as nfe_file:
+            nfe_file.write(b"<NFe>")
+        result = self.env["l10n_br_fiscal.document"].import_nfe_files(
+            self.tmp_dir, dry_run=True
+        )
+        nfe = result[NFE_FILE]
+        self.assertIsInstance(nfe.id, NewId)
+        self.assertEqual(nfe.partner_id.name, "Alimentos Ltda.")
+        self.assertIsInstance(result["invalid.xml"], str)
+
+    def test_import_nfe_zip(self):
+        zip_path = os.path.join(self.tmp_dir, "nfes.zip")
+        with zipfile.ZipFile(zip_path, "w") as nfe_zip:
+            nfe_zip.writestr(NFE_FILE, self.nfe_content)
+        result = self.env["l10n_br_fiscal.document"].import_nfe_files(zip_path)
+        nfe = result[NFE_FILE]
+        self.assertTrue(nfe.id)
+        self.assertEqual(nfe.line_ids[0].product_id.name, "QUINOA 100G (2X50G)")
+
+    def test_import_failure_clears_code_maps(self):
+        with open(os.path.join(self.tmp_dir, NFE_FILE), "wb") as nfe_file:
+            nfe_file.write(self.nfe_content)
+        ncm_model = self.env["l10n_br_fiscal.ncm"]
+
+        def build(inf_nfe, dry_run=False):
+            ncm_model.create({"name": "Imported NCM", "code": "9999.99.99"})
+            # the code map is filled with the id created by the file
+            self.assertTrue(ncm_model.get_by_code("99999999"))
+            raise ValueError("invalid file")
+
+        infnfe_class = type(self.env["nfe.40.infnfe"])
+        with mock.patch.object(infnfe_class, "build", side_effect=build):
+            result = self.env["l10n_br_fiscal.document"].import_nfe_files(
+                self.tmp_dir
+            )
+        self.assertEqual(result[NFE_FILE], "invalid file")
+        self.assertFalse(ncm_model.get_by_code("99999999"))
@@ -26,6 +26,10 @@ class TestNFeExport(TransactionCase):
             "odoo.addons.l10n_br_nfe_spec.models.v4_00.leiauteNFe",
         )
         self.nfe_list = []
+        # keep the stored XML uncompressed to diff it
+        self.env["ir.config_parameter"].set_param(
+            "l10n_br_fiscal.xml_compression", "none"
+        )
 
     def prepare_test_nfe(self, nfe):
         """
@@ -67,11 +71,14 @@ class TestNFeExport(TransactionCase):
             )
             nfe_id.nfe40_cNF = "06277716"
             nfe_id.with_context(lang="pt_BR")._document_export()
+            xml_blob = self.env["l10n_br_fiscal.xml.blob"]._from_attachment(
+                nfe_id.send_file_id
+            )
             output = os.path.join(
                 config["data_dir"],
                 "filestore",
                 self.cr.dbname,
-                nfe_id.send_file_id.store_fname,
+                xml_blob.attachment_id.store_fname,
             )
             _logger.info("XML file saved at %s" % (output,))
             nfe_id.company_id.country_id.name = "Brazil"  # clean mess
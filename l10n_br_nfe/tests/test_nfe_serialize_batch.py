@@ -0,0 +1,81 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+import time
+from datetime import datetime
+
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.spec_driven_model import hooks
+from odoo.addons.spec_driven_model.models.spec_export import (
+    binding_to_etree,
+    etree_to_xml,
+)
+
+from ..constants.nfe import NFE_NAMESPACE
+
+_logger = logging.getLogger(__name__)
+
+
+class TestNFeSerializeBatch(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        hooks.register_hook(
+            self.env,
+            "l10n_br_nfe",
+            "odoo.addons.l10n_br_nfe_spec.models.v4_00.leiauteNFe",
+        )
+        self.nfes = (
+            self.env.ref("l10n_br_nfe.demo_nfe_national_sale_for_same_state")
+            | self.env.ref("l10n_br_nfe.demo_nfe_natural_icms_18_red_51_11")
+            | self.env.ref("l10n_br_nfe.demo_nfe_natural_icms_7_resale")
+        )
+        for nfe in self.nfes:
+            for line in nfe.line_ids:
+                line._onchange_product_id_fiscal()
+                line._onchange_fiscal_operation_id()
+                line._onchange_fiscal_operation_line_id()
+            nfe.nfe40_detPag = [
+                (5, 0, 0),
+                (
+                    0,
+                    0,
+                    nfe._prepare_amount_financial(
+                        "0", "01", nfe.amount_financial_total
+                    ),
+                ),
+            ]
+            nfe.document_date = datetime(2020, 1, 1, 11, 0, 0)
+            nfe.date_in_out = datetime(2020, 1, 1, 11, 0, 0)
+
+    def test_serialize_batch(self):
+        """The batch export gives the same XML as the export one by one"""
+        expected = {}
+        for nfe in self.nfes:
+            expected.update(nfe.serialize_xml())
+        self.nfes.invalidate_cache()
+
+        start = time.perf_counter()
+        xml_files = self.nfes.serialize_xml()
+        _logger.info(
+            "%s NF-e serialized in batch in %.3fs",
+            len(self.nfes),
+            time.perf_counter() - start,
+        )
+        self.assertEqual(set(xml_files), set(self.nfes))
+        for nfe in self.nfes:
+            self.assertEqual(xml_files[nfe], expected[nfe])
+
+    def test_binding_to_etree(self):
+        """The lxml tree gives the same XML as the generateDS export"""
+        namespacedef = 'xmlns="%s"' % (NFE_NAMESPACE,)
+        for edoc in self.nfes.serialize():
+            edoc_etree = binding_to_etree(edoc, namespace=NFE_NAMESPACE)
+            for pretty_print in (False, True):
+                self.assertEqual(
+                    etree_to_xml(edoc_etree, pretty_print=pretty_print),
+                    self.env["l10n_br_fiscal.document"]._bindings_to_xml(
+                        [edoc], namespacedef=namespacedef, pretty_print=pretty_print
+                    )[0],
+                )
@@ -0,0 +1,56 @@
+# Copyright 2022 Akretion
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+import time
+
+from lxml import etree
+
+from odoo.tests import SavepointCase
+
+_logger = logging.getLogger(__name__)
+
+
+class NFeSpecView(SavepointCase):
+    def test_spec_tab_on_demand(self):
+        document_model = self.env["l10n_br_fiscal.document"]
+        arch = document_model.fields_view_get(view_type="form")["arch"]
+        self.assertFalse(etree.XML(arch).xpath("//page[@string='NFe']"))
+
+        res = document_model.with_context(spec_view=True).fields_view_get(
+            view_type="form"
+        )
+        doc = etree.XML(res["arch"])
+        self.assertTrue(doc.xpath("//page[@string='NFe']"))
+        self.assertIn("nfe40_natOp", res["fields"])
+        self.assertEqual(res["fields"]["nfe40_dest"]["views"], {})
+
+    def test_spec_fragment_cache(self):
+        document_model = self.env["l10n_br_fiscal.document"].with_context(
+            spec_view=True
+        )
+        first = document_model.fields_view_get(view_type="form")
+        second = document_model.fields_view_get(view_type="form")
+        self.assertEqual(first["arch"], second["arch"])
+        # the cached descriptions are copied, callers can't alter the cache
+        first["fields"]["nfe40_natOp"]["string"] = "Changed"
+        third = document_model.fields_view_get(view_type="form")
+        self.assertNotEqual(third["fields"]["nfe40_natOp"]["string"], "Changed")
+
+    def test_form_open_benchmark(self):
+        for model_name in ("l10n_br_fiscal.document", "l10n_br_fiscal.document.line"):
+            model = self.env[model_name].with_context(spec_view=True)
+            self.env[model_name].clear_caches()
+            start = time.perf_counter()
+            model.fields_view_get(view_type="form")
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            for _i in range(10):
+                model.fields_view_get(view_type="form")
+            warm = (time.perf_counter() - start) / 10
+            _logger.info(
+                "%s form with spec tab: %.3fs cold, %.3fs cached",
+                model_name,
+                cold,
+                warm,
+            )
@@ -1,8 +1,14 @@
 # Copyright 2021 Akretion (Raphaël Valyi <raphael.valyi@akretion.com>)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import json
+import logging
+import time
+
 from odoo.tests import SavepointCase
 
+_logger = logging.getLogger(__name__)
+
 
 class NFeStructure(SavepointCase):
     def test_inherited_fields(self):
@@ -112,8 +118,56 @@ class NFeStructure(SavepointCase):
     def test_m2o_force_stack(self):
         pass
 
+    def _check_stack_cache(self, model_name):
+        model_class = type(self.env[model_name])
+        cache_key = model_class._get_stack_cache_key(self.env.cr)
+        self.assertTrue(cache_key)
+
+        start = time.perf_counter()
+        stack = {
+            "classes": [],
+            "visited": [],
+            "stack_paths": [],
+            "stacking_points": [],
+        }
+        node = model_class._odoo_name_to_class(
+            model_class._stacked, model_class._spec_module
+        )
+        model_class._visit_stack(
+            node,
+            set(),
+            model_class._stacked.split(".")[-1],
+            self.env.registry,
+            self.env.cr,
+            stack=stack,
+        )
+        visit_time = time.perf_counter() - start
+        model_class._set_cached_stack(self.env.cr, cache_key, stack)
+
+        start = time.perf_counter()
+        classes = model_class._load_stack(self.env.registry, self.env.cr)
+        load_time = time.perf_counter() - start
+        _logger.info(
+            "%s stack computed in %.3fs, loaded from cache in %.3fs",
+            model_name,
+            visit_time,
+            load_time,
+        )
+        self.assertEqual([c._name for c in classes], stack["classes"])
+        self.assertTrue(set(classes).issubset(set(model_class.mro())))
+        self.assertEqual(
+            set(model_class._stacking_point_models),
+            set(model_class._stacking_points),
+        )
+        with open(model_class._get_stack_cache_file(cache_key)) as cache_file:
+            self.assertEqual(json.load(cache_file), json.loads(json.dumps(stack)))
+
     def test_doc_visit_stack(self):
-        pass
+        self._check_stack_cache("l10n_br_fiscal.document")
+        stacking_point = self.env["l10n_br_fiscal.document"]._stacking_points[
+            "nfe40_ide"
+        ]
+        self.assertEqual(stacking_point.comodel_name, "nfe.40.ide")
 
     def test_doc_line_visit_stack(self):
-        pass
+        self._check_stack_cache("l10n_br_fiscal.document.line")
@@ -23,6 +23,7 @@
     ],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "views/document_view.xml",
         "views/product_template_view.xml",
         "views/product_product_view.xml",
@@ -7,6 +7,43 @@ NFSE_ENVIRONMENTS = [("1", "Produção"), ("2", "Homologação")]
 NFSE_ENVIRONMENT_DEFAULT = "2"
 
 
+# maximum number of RPS in an EnviarLoteRps accepted by most ABRASF cities
+NFSE_LOT_SIZE_DEFAULT = 50
+
+
+# service data of the lines summed up in the single service of an RPS
+NFSE_SERVICE_AMOUNT_KEYS = (
+    "valor_servicos",
+    "valor_deducoes",
+    "valor_pis",
+    "valor_pis_retido",
+    "valor_cofins",
+    "valor_cofins_retido",
+    "valor_inss",
+    "valor_inss_retido",
+    "valor_ir",
+    "valor_ir_retido",
+    "valor_csll",
+    "valor_csll_retido",
+    "valor_iss",
+    "valor_iss_retido",
+    "outras_retencoes",
+    "base_calculo",
+    "valor_liquido_nfse",
+    "valor_desconto_incondicionado",
+)
+
+
+# service data the lines of an RPS must share
+NFSE_SERVICE_CODE_KEYS = (
+    "aliquota",
+    "item_lista_servico",
+    "codigo_tributacao_municipio",
+    "municipio_prestacao_servico",
+    "codigo_cnae",
+)
+
+
 OPERATION_NATURE = [
     ("1", "Tributação no município"),
     ("2", "Tributação fora do município"),
@@ -1,8 +1,8 @@
 # Copyright 2019 KMEE INFORMATICA LTDA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-import base64
 import logging
+from collections import defaultdict
 
 from erpbrasil.assinatura import certificado as cert
 from erpbrasil.base import misc
@@ -10,18 +10,26 @@ from erpbrasil.edoc.provedores.cidades import NFSeFactory
 from erpbrasil.transmissao import TransmissaoSOAP
 from requests import Session
 
-from odoo import fields, models
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
 
 from odoo.addons.l10n_br_fiscal.constants.fiscal import (
     EVENT_ENV_HML,
     EVENT_ENV_PROD,
     MODELO_FISCAL_NFSE,
     PROCESSADOR_OCA,
+    SITUACAO_EDOC_A_ENVIAR,
+    SITUACAO_EDOC_AUTORIZADA,
+    SITUACAO_EDOC_ENVIADA,
+    SITUACAO_EDOC_REJEITADA,
     TAX_FRAMEWORK_SIMPLES_ALL,
 )
 
 from ..constants.nfse import (
     NFSE_ENVIRONMENTS,
+    NFSE_LOT_SIZE_DEFAULT,
+    NFSE_SERVICE_AMOUNT_KEYS,
+    NFSE_SERVICE_CODE_KEYS,
     OPERATION_NATURE,
     RPS_TYPE,
     TAXATION_SPECIAL_REGIME,
@@ -72,6 +80,12 @@ class Document(models.Model):
         string="NFSe Environment",
         default=lambda self: self.env.company.nfse_environment,
     )
+    nfse_lot_protocol = fields.Char(
+        string="NFSe Lot Protocol",
+        readonly=True,
+        copy=False,
+        index=True,
+    )
 
     def _document_date(self):
         super()._document_date()
@@ -90,22 +104,26 @@ class Document(models.Model):
             filename = "NFS-e-" + self.document_number + ".pdf"
         else:
             filename = "RPS-" + self.rps_number + ".pdf"
+        self._save_pdf(pdf, filename)
 
-        vals_dict = {
-            "name": filename,
-            "datas_fname": filename,
-            "res_model": self._name,
-            "res_id": self.id,
-            "datas": base64.b64encode(pdf),
-            "mimetype": "application/pdf",
-            "type": "binary",
-        }
-        if self.file_report_id:
-            self.file_report_id.write(vals_dict)
-        else:
-            self.file_report_id = self.env["ir.attachment"].create(vals_dict)
+    def _nfse_processador_key(self):
+        company = self.company_id
+        return (
+            company.id,
+            company.partner_id.city_id.id,
+            self.nfse_environment,
+            company.certificate_nfe_id.id,
+        )
 
     def _processador_erpbrasil_nfse(self):
+        """Provider client (certificate, HTTP session and SOAP transport) of
+        the document. Within an export or a lot send, the client is shared
+        by the documents of the same company, city, environment and
+        certificate through the nfse_processadores context dict."""
+        processadores = self.env.context.get("nfse_processadores")
+        key = self._nfse_processador_key()
+        if processadores is not None and key in processadores:
+            return processadores[key]
         certificado = cert.Certificado(
             arquivo=self.company_id.certificate_nfe_id.file,
             senha=self.company_id.certificate_nfe_id.password,
@@ -113,7 +131,7 @@ class Document(models.Model):
         session = Session()
         session.verify = False
         transmissao = TransmissaoSOAP(certificado, session)
-        return NFSeFactory(
+        processador = NFSeFactory(
             transmissao=transmissao,
             ambiente=self.nfse_environment,
             cidade_ibge=int(self.company_id.partner_id.city_id.ibge_code),
@@ -122,32 +140,74 @@ class Document(models.Model):
                 self.company_id.partner_id.inscr_mun or ""
             ),
         )
+        if processadores is not None:
+            processadores[key] = processador
+        return processador
+
+    def _with_nfse_processadores(self):
+        if "nfse_processadores" in self.env.context:
+            return self
+        return self.with_context(nfse_processadores={})
 
     def _document_export(self, pretty_print=True):
         super(Document, self)._document_export()
-        for record in self.filtered(filter_processador_edoc_nfse):
+        documents = self.filtered(filter_processador_edoc_nfse)
+        for record in documents._with_nfse_processadores():
             edoc = record.serialize()[0]
             processador = record._processador_erpbrasil_nfse()
             xml_file = processador._generateds_to_string_etree(
                 edoc, pretty_print=pretty_print
             )[0]
-            event_id = self.event_ids.create_event_save_xml(
-                company_id=self.company_id,
+            event_id = record.event_ids.create_event_save_xml(
+                company_id=record.company_id,
                 environment=(
-                    EVENT_ENV_PROD if self.nfse_environment == "1" else EVENT_ENV_HML
+                    EVENT_ENV_PROD if record.nfse_environment == "1" else EVENT_ENV_HML
                 ),
                 event_type="0",
                 xml_file=xml_file,
-                document_id=self,
+                document_id=record,
             )
             _logger.debug(xml_file)
             record.authorization_event_id = event_id
-            record.make_pdf()
+            record._queue_pdf()
+
+    def _document_send(self):
+        """The NFS-e of the companies sending in lots are sent by the lot
+        scheduled action, or by the lot send of _nfse_send_lot"""
+        in_lot = self.browse()
+        if not self.env.context.get("nfse_lot_send"):
+            in_lot = self.filtered(
+                lambda d: filter_processador_edoc_nfse(d) and d.company_id.nfse_lot_mode
+            )
+            if in_lot:
+                _logger.info("%s NFS-e left to the lot send", len(in_lot))
+        return super(Document, self - in_lot)._document_send()
 
     def _prepare_dados_servico(self):
-        self.fiscal_line_ids.ensure_one()
-        result = {}
-        result.update(self.fiscal_line_ids.prepare_line_servico())
+        """Service data of the RPS. An RPS has a single service, the amounts
+        of its lines are summed up and the lines must share the service
+        codes and the ISSQN rate."""
+        if not self.fiscal_line_ids:
+            raise UserError(_("The RPS %s has no service line.") % self.rps_number)
+        lines_values = [line.prepare_line_servico() for line in self.fiscal_line_ids]
+        result = dict(lines_values[0])
+        for values in lines_values[1:]:
+            if any(values[key] != result[key] for key in NFSE_SERVICE_CODE_KEYS):
+                raise UserError(
+                    _(
+                        "The lines of the RPS %s must have the same service, "
+                        "city taxation code, CNAE and ISSQN rate."
+                    )
+                    % self.rps_number
+                )
+            for key in NFSE_SERVICE_AMOUNT_KEYS:
+                result[key] = round(result[key] + values[key], 2)
+            if values["iss_retido"] == "1":
+                result["iss_retido"] = "1"
+        if len(lines_values) > 1:
+            result["discriminacao"] = "\n".join(
+                values["discriminacao"] for values in lines_values
+            )[:2000]
         result.update(self.company_id.prepare_company_servico())
 
         return result
@@ -191,6 +251,176 @@ class Document(models.Model):
             "total_recebido": self.amount_total,
         }
 
+    def _prepare_lote_rps_batch(self):
+        """Values of a lot with all the RPS of self, which must share the
+        same company"""
+        company = self.company_id
+        company.ensure_one()
+        rps_numbers = self.mapped("rps_number")
+        return {
+            "cnpj": misc.punctuation_rm(company.partner_id.cnpj_cpf),
+            "inscricao_municipal": misc.punctuation_rm(
+                company.partner_id.inscr_mun or ""
+            )
+            or None,
+            "id": "lote%s-%s" % (rps_numbers[0], rps_numbers[-1]),
+            "quantidade_rps": len(self),
+            "lista_rps": [record._prepare_lote_rps() for record in self],
+        }
+
+    def _nfse_lot_groups(self):
+        """Split the RPS of self in lots of the same company, city and
+        environment, respecting the lot size accepted by the city"""
+        lot_size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_br_nfse.lot_size", NFSE_LOT_SIZE_DEFAULT)
+        )
+        groups = defaultdict(lambda: self.browse())
+        for record in self.filtered(filter_processador_edoc_nfse):
+            key = (
+                record.company_id,
+                record.company_id.partner_id.city_id,
+                record.nfse_environment,
+            )
+            groups[key] |= record
+        for records in groups.values():
+            for index in range(0, len(records), lot_size):
+                yield records[index : index + lot_size]
+
+    def _nfse_send_lot(self, processador):
+        """Send the RPS of self in a single EnviarLoteRps and return the
+        protocol of the lot, or False when the RPS were processed at once.
+
+        Override it in the NFS-e provider modules supporting the lot
+        services, using _prepare_lote_rps_batch. By default each RPS is
+        sent on its own, as a lot of one RPS, by the document send.
+        """
+        for record in self.with_context(nfse_lot_send=True):
+            record._document_send()
+        return False
+
+    def _nfse_lot_status(self, processador, protocol):
+        """Query the status of the lot of the RPS of self.
+
+        Override it with _nfse_send_lot in the NFS-e provider modules. It
+        should return None while the lot is being processed, else a dict
+        {rps_number: result} where result has the keys status_code,
+        message, protocol_date, protocol_number, xml and, when the RPS
+        was authorized, document_number and verify_code. By default no
+        lot is sent, so there is no result to wait for.
+        """
+        return None
+
+    def _nfse_send_lot_group(self):
+        """Send a lot given by _nfse_lot_groups"""
+        protocol = self._nfse_send_lot(self[0]._processador_erpbrasil_nfse())
+        if protocol:
+            self.write({"nfse_lot_protocol": protocol})
+            self._change_state(SITUACAO_EDOC_ENVIADA)
+            _logger.info("NFS-e lot %s sent with %s RPS", protocol, len(self))
+
+    def action_nfse_send_lot(self):
+        """Send the RPS to be sent in lots instead of one request per RPS"""
+        to_send = self.filtered(lambda d: d.state_edoc == SITUACAO_EDOC_A_ENVIAR)
+        for lot in to_send._with_nfse_processadores()._nfse_lot_groups():
+            lot._nfse_send_lot_group()
+
+    def _nfse_lots(self):
+        """The RPS of self sent in lots, by lot protocol"""
+        lots = defaultdict(lambda: self.browse())
+        for record in self.filtered(
+            lambda d: d.state_edoc == SITUACAO_EDOC_ENVIADA and d.nfse_lot_protocol
+        ):
+            lots[record.nfse_lot_protocol] |= record
+        return lots
+
+    def _nfse_check_lot(self, protocol):
+        """Update the RPS of the lot self once it is processed"""
+        results = self._nfse_lot_status(self[0]._processador_erpbrasil_nfse(), protocol)
+        if results is not None:
+            self._nfse_lot_distribute(results)
+
+    def action_nfse_lot_status(self):
+        """Fetch the result of the sent lots and update their documents"""
+        lots = self._with_nfse_processadores()._nfse_lots()
+        for protocol, lot in lots.items():
+            lot._nfse_check_lot(protocol)
+
+    def _nfse_lot_distribute(self, results):
+        """Update each RPS of a processed lot with its own result"""
+        for record in self:
+            result = results.get(record.rps_number)
+            if not result:
+                record.write(
+                    {
+                        "nfse_lot_protocol": False,
+                        "edoc_error_message": _("RPS not found in the lot result."),
+                    }
+                )
+                record._change_state(SITUACAO_EDOC_REJEITADA)
+                continue
+            vals = {
+                "nfse_lot_protocol": False,
+                "status_code": result.get("status_code"),
+                "status_name": result.get("message"),
+            }
+            if result.get("document_number"):
+                vals.update(
+                    {
+                        "document_number": result["document_number"],
+                        "verify_code": result.get("verify_code"),
+                        "edoc_error_message": False,
+                    }
+                )
+                record.write(vals)
+                if record.authorization_event_id:
+                    record.authorization_event_id.set_done(
+                        status_code=result.get("status_code"),
+                        response=result.get("message"),
+                        protocol_date=result.get("protocol_date"),
+                        protocol_number=result.get("protocol_number"),
+                        file_response_xml=result.get("xml") or "",
+                    )
+                record._change_state(SITUACAO_EDOC_AUTORIZADA)
+            else:
+                vals["edoc_error_message"] = result.get("message")
+                record.write(vals)
+                record._change_state(SITUACAO_EDOC_REJEITADA)
+
+    @api.model
+    def _cron_nfse_send_lots(self):
+        """Send the pending RPS of the companies sending in lots, a failing
+        lot is logged and left to the next run"""
+        documents = self.search(
+            [
+                ("state_edoc", "=", SITUACAO_EDOC_A_ENVIAR),
+                ("document_type_id.code", "=", MODELO_FISCAL_NFSE),
+                ("company_id.nfse_lot_mode", "=", True),
+            ]
+        )
+        for lot in documents._with_nfse_processadores()._nfse_lot_groups():
+            try:
+                with self.env.cr.savepoint():
+                    lot._nfse_send_lot_group()
+            except Exception as e:
+                _logger.error("NFS-e lot of %s RPS not sent: %s", len(lot), e)
+
+    @api.model
+    def _cron_nfse_lot_status(self):
+        documents = self.search(
+            [
+                ("state_edoc", "=", SITUACAO_EDOC_ENVIADA),
+                ("nfse_lot_protocol", "!=", False),
+            ]
+        )
+        for protocol, lot in documents._with_nfse_processadores()._nfse_lots().items():
+            try:
+                with self.env.cr.savepoint():
+                    lot._nfse_check_lot(protocol)
+            except Exception as e:
+                _logger.error("NFS-e lot %s not checked: %s", protocol, e)
+
     def convert_type_nfselib(self, class_object, object_filed, value):
         if value is None:
             return value
@@ -30,6 +30,12 @@ class ResCompany(models.Model):
     nfse_website = fields.Char(
         string="NFSe Website",
     )
+    nfse_lot_mode = fields.Boolean(
+        string="Send NFSe in Lots",
+        help="Send the pending RPS in lots by a scheduled action instead of"
+        " one request per RPS. With a provider without lot services the RPS"
+        " are still sent one by one by the scheduled action.",
+    )
     city_taxation_code_id = fields.Many2many(
         comodel_name="l10n_br_fiscal.city.taxation.code", string="City Taxation Code"
     )
@@ -1 +1,2 @@
 from . import test_fiscal_document_nfse_common
+from . import test_nfse_lot
@@ -0,0 +1,124 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from unittest import mock
+
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.l10n_br_fiscal.constants.fiscal import (
+    PROCESSADOR_OCA,
+    SITUACAO_EDOC_A_ENVIAR,
+    SITUACAO_EDOC_AUTORIZADA,
+    SITUACAO_EDOC_ENVIADA,
+    SITUACAO_EDOC_REJEITADA,
+)
+
+
+class TestNFSeLot(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        nfse = self.env.ref("l10n_br_fiscal.demo_nfse_same_state")
+        self.company = self.env.ref("l10n_br_base.empresa_simples_nacional")
+        self.company.processador_edoc = PROCESSADOR_OCA
+        self.company.partner_id.city_id = self.env.ref("l10n_br_base.city_3132404")
+        nfse.company_id = self.company
+        self.documents = nfse
+        for rps_number in ("51", "52"):
+            self.documents |= nfse.copy({"rps_number": rps_number})
+        self.documents.write({"state_edoc": SITUACAO_EDOC_A_ENVIAR})
+        self.env["ir.config_parameter"].set_param("l10n_br_nfse.lot_size", "2")
+        self.document_class = type(self.env["l10n_br_fiscal.document"])
+
+    def test_nfse_lot(self):
+        lots = []
+
+        def send_lot(documents, processador):
+            lot = documents._prepare_lote_rps_batch()
+            self.assertEqual(lot["quantidade_rps"], len(documents))
+            lots.append(documents)
+            return "PROT%s" % (len(lots),)
+
+        def lot_status(documents, processador, protocol):
+            results = {}
+            for document in documents:
+                if document.rps_number == "52":
+                    results[document.rps_number] = {
+                        "status_code": "E4",
+                        "message": "RPS rejected",
+                    }
+                else:
+                    results[document.rps_number] = {
+                        "status_code": "100",
+                        "message": "Authorized",
+                        "document_number": "9" + document.rps_number,
+                        "verify_code": "ABC" + document.rps_number,
+                    }
+            return results
+
+        with mock.patch.object(
+            self.document_class, "_processador_erpbrasil_nfse", return_value=None
+        ), mock.patch.object(
+            self.document_class, "_nfse_send_lot", send_lot
+        ), mock.patch.object(
+            self.document_class, "_nfse_lot_status", lot_status
+        ):
+            self.documents.action_nfse_send_lot()
+            self.assertEqual([len(lot) for lot in lots], [2, 1])
+            self.assertEqual(
+                set(self.documents.mapped("state_edoc")), {SITUACAO_EDOC_ENVIADA}
+            )
+            self.assertEqual(
+                set(self.documents.mapped("nfse_lot_protocol")), {"PROT1", "PROT2"}
+            )
+
+            self.documents._cron_nfse_lot_status()
+
+        for document in self.documents:
+            self.assertFalse(document.nfse_lot_protocol)
+            if document.rps_number == "52":
+                self.assertEqual(document.state_edoc, SITUACAO_EDOC_REJEITADA)
+                self.assertEqual(document.edoc_error_message, "RPS rejected")
+            else:
+                self.assertEqual(document.state_edoc, SITUACAO_EDOC_AUTORIZADA)
+                self.assertEqual(document.document_number, "9" + document.rps_number)
+                self.assertEqual(document.verify_code, "ABC" + document.rps_number)
+
+    def test_nfse_lot_default(self):
+        """Check the RPS of a company sending in lots are only sent by the
+        lot send, one by one with a shared client when the provider has no
+        lot services"""
+        self.company.nfse_lot_mode = True
+        sent = []
+
+        def eletronic_document_send(documents):
+            documents._processador_erpbrasil_nfse()
+            sent.append(documents)
+
+        module = "odoo.addons.l10n_br_nfse.models.document"
+        with mock.patch(module + ".cert.Certificado"), mock.patch(
+            module + ".TransmissaoSOAP"
+        ), mock.patch(module + ".NFSeFactory") as nfse_factory, mock.patch.object(
+            self.document_class, "_eletronic_document_send", eletronic_document_send
+        ):
+            self.documents.action_document_send()
+            self.assertFalse(sent)
+
+            self.documents._cron_nfse_send_lots()
+        self.assertEqual([len(documents) for documents in sent], [1, 1, 1])
+        self.assertEqual(sum(sent, self.documents.browse()), self.documents)
+        self.assertEqual(nfse_factory.call_count, 1)
+        self.assertFalse(any(self.documents.mapped("nfse_lot_protocol")))
+
+    def test_prepare_dados_servico_lines(self):
+        """Check the service amounts of the lines of an RPS are summed up"""
+        document = self.documents[0]
+        line = document.fiscal_line_ids[0]
+        line_values = line.prepare_line_servico()
+        line.copy({"document_id": document.id})
+        result = document._prepare_dados_servico()
+        self.assertEqual(
+            result["valor_servicos"], round(2 * line_values["valor_servicos"], 2)
+        )
+        self.assertEqual(
+            result["discriminacao"],
+            "\n".join([line_values["discriminacao"]] * 2),
+        )
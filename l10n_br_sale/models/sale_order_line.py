@@ -230,3 +230,7 @@ class SaleOrderLine(models.Model):
     @api.onchange("fiscal_operation_line_id")
     def _onchange_fiscal_operation_line_id(self):
         super()._onchange_fiscal_operation_line_id()
+
+    @api.model
+    def _get_fiscal_recompute_fields(self):
+        return super()._get_fiscal_recompute_fields() + ["tax_id"]
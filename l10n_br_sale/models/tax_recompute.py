@@ -0,0 +1,23 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+from odoo import api, models
+
+
+class TaxRecompute(models.Model):
+    _inherit = "l10n_br_fiscal.tax.recompute"
+
+    @api.model
+    def _get_recompute_targets(self):
+        targets = super()._get_recompute_targets()
+        targets["sale.order.line"] = [("order_id.state", "in", ("draft", "sent"))]
+        return targets
+
+
+class TaxRecomputeLine(models.Model):
+    _inherit = "l10n_br_fiscal.tax.recompute.line"
+
+    @api.model
+    def _get_document_name(self, line):
+        if line._name == "sale.order.line":
+            return line.order_id.display_name
+        return super()._get_document_name(line)
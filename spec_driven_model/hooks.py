@@ -106,11 +106,7 @@ def get_remaining_spec_models(cr, registry, module_name, spec_module):
         base_class = registry[model]
         # 2nd StackedModel classes, that we will visit
         if hasattr(base_class, "_stacked"):
-            node = SpecModel._odoo_name_to_class(base_class._stacked, spec_module)
-
-            base_class._visit_stack(
-                node, injected_classes, base_class._stacked.split(".")[-1], registry, cr
-            )
+            injected_classes.update(base_class._load_stack(registry, cr))
 
     all_spec_models = {
         c._name
@@ -1,6 +1,6 @@
 from . import spec_mixin
 
-# from . import spec_view
+from . import spec_view
 from . import spec_models
 from . import spec_import
 from . import spec_export
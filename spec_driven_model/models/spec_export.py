@@ -2,12 +2,152 @@
 # License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 import logging
 import sys
+from collections import namedtuple
+from copy import deepcopy
+from functools import lru_cache
 from io import StringIO
 
-from odoo import api, fields, models
+from lxml import etree
+
+from odoo import api, fields, models, tools
 
 _logger = logging.getLogger(__name__)
 
+# export plan of a model for a binding class:
+# xsd_fields: the xsd fields of the spec class, in the spec class order
+# items: {xsd_field: ExportPlanItem} for the fields with a binding member
+ExportPlan = namedtuple("ExportPlan", "binding_class, xsd_fields, items")
+ExportPlanItem = namedtuple(
+    "ExportPlanItem",
+    "field_name, binding_attr, kind, comodel_name, member_spec, in_fields",
+)
+
+
+@lru_cache(maxsize=None)
+def _get_float_format(data_type):
+    """'%.2f' for a TDec_1302 xsd type for instance"""
+    digits = "".join(filter(lambda x: x.isdigit(), data_type))[-2:]
+    return "%.{}f".format(digits)
+
+
+def _binding_to_xml(binding_instance, namespacedef=None, pretty_print=False):
+    """XML string of a binding instance"""
+    output = StringIO()
+    if namespacedef:
+        binding_instance.export(
+            output, 0, namespacedef_=namespacedef, pretty_print=pretty_print
+        )
+    else:
+        binding_instance.export(output, 0, pretty_print=pretty_print)
+    contents = output.getvalue()
+    output.close()
+    return contents
+
+
+# xsd base types not exported as strings by generateDS
+BINDING_FORMATTERS = {
+    "xs:integer": "gds_format_integer",
+    "xs:int": "gds_format_integer",
+    "xs:long": "gds_format_integer",
+    "xs:short": "gds_format_integer",
+    "xs:byte": "gds_format_integer",
+    "xs:nonNegativeInteger": "gds_format_integer",
+    "xs:positiveInteger": "gds_format_integer",
+    "xs:unsignedInt": "gds_format_integer",
+    "xs:unsignedShort": "gds_format_integer",
+    "xs:unsignedByte": "gds_format_integer",
+    "xs:decimal": "gds_format_decimal",
+    "xs:float": "gds_format_float",
+    "xs:double": "gds_format_double",
+    "xs:boolean": "gds_format_boolean",
+}
+
+
+@lru_cache(maxsize=None)
+def _get_binding_attributes(binding_class):
+    """Names of the members written as XML attributes by the binding class,
+    in the order generateDS writes them: generateDS declares the xsd
+    attributes with a MemberSpec_ whose child_attrs only has their use."""
+    attributes = []
+    for klass in reversed(binding_class.__mro__):
+        for member_spec in klass.__dict__.get("member_data_items_", []):
+            child_attrs = member_spec.child_attrs
+            if (
+                isinstance(child_attrs, dict)
+                and "use" in child_attrs
+                and member_spec.name not in attributes
+            ):
+                attributes.append(member_spec.name)
+    return tuple(attributes)
+
+
+def _format_binding_value(binding_instance, member_spec, value):
+    """Text of a simple value, formatted like generateDS does"""
+    data_type = member_spec.data_type
+    if isinstance(data_type, list):
+        data_type = data_type[-1]
+    formatter = BINDING_FORMATTERS.get(data_type)
+    if formatter:
+        return getattr(binding_instance, formatter)(value)
+    if not value:
+        return ""
+    return value if isinstance(value, str) else "%s" % (value,)
+
+
+def _build_binding_element(binding_instance, element):
+    binding_class = type(binding_instance)
+    attributes = _get_binding_attributes(binding_class)
+    for name in attributes:
+        value = getattr(binding_instance, name, None)
+        if value is not None:
+            element.set(name, value if isinstance(value, str) else "%s" % (value,))
+
+    namespace = etree.QName(element).namespace
+    for member_spec in binding_class.member_data_items_:
+        name = member_spec.name
+        if name in attributes:
+            continue
+        value = getattr(binding_instance, name, None)
+        if value is None:
+            continue
+        if name == "valueOf_":
+            element.text = _format_binding_value(binding_instance, member_spec, value)
+            continue
+        tag = "{%s}%s" % (namespace, name) if namespace else name
+        for item in value if isinstance(value, list) else [value]:
+            if item is None:
+                continue
+            child = etree.SubElement(element, tag)
+            if hasattr(item, "member_data_items_"):
+                _build_binding_element(item, child)
+            else:
+                child.text = _format_binding_value(binding_instance, member_spec, item)
+
+
+def binding_to_etree(binding_instance, tag=None, namespace=None):
+    """Build the lxml element of a binding instance directly from its
+    members, without exporting it to a string and parsing it back.
+
+    The element serializes to the same XML as the generateDS export.
+    """
+    if tag is None:
+        tag = binding_instance.original_tagname_ or type(binding_instance).__name__
+    if namespace:
+        element = etree.Element("{%s}%s" % (namespace, tag), nsmap={None: namespace})
+    else:
+        element = etree.Element(tag)
+    _build_binding_element(binding_instance, element)
+    return element
+
+
+def etree_to_xml(element, pretty_print=False):
+    """XML string of an element, indented like the generateDS export"""
+    if pretty_print:
+        element = deepcopy(element)
+        etree.indent(element, space="    ")
+        return etree.tostring(element, encoding=str) + "\n"
+    return etree.tostring(element, encoding=str)
+
 
 class AbstractSpecMixin(models.AbstractModel):
     _inherit = "spec.mixin"
@@ -39,6 +179,42 @@ class AbstractSpecMixin(models.AbstractModel):
             spec_classes.append(c)
         return spec_classes
 
+    @api.model
+    @tools.ormcache("class_name")
+    def _get_export_plan(self, class_name):
+        """Compile the export plan of the spec class for the current model.
+
+        What only depends on the model and the binding class (xsd fields,
+        binding members, field kinds) is computed once per registry
+        instead of once per exported record.
+        """
+        class_obj = self.env[class_name]
+        binding_class = self._get_binding_class(class_obj)
+        binding_class_spec = {i.name: i for i in binding_class.member_data_items_}
+        xsd_fields = []
+        items = {}
+        for field_name, field in class_obj._fields.items():
+            if (
+                not field.name.startswith(class_obj._field_prefix)
+                or "_choice" in field.name
+            ):
+                continue
+            xsd_fields.append(field_name)
+            binding_attr = field_name.replace(class_obj._field_prefix, "")
+            member_spec = binding_class_spec.get(binding_attr)
+            if not member_spec:
+                # this can happen with a o2m generated foreign key for instance
+                continue
+            items[field_name] = ExportPlanItem(
+                field_name,
+                binding_attr,
+                field.type,
+                field.comodel_name,
+                member_spec,
+                field_name in self._fields,
+            )
+        return ExportPlan(binding_class, tuple(xsd_fields), items)
+
     @api.model
     def _print_xml(self, binding_instance):
         if not binding_instance:
@@ -59,30 +235,26 @@ class AbstractSpecMixin(models.AbstractModel):
         sub binding instances already properly instanciated.
         """
         self.ensure_one()
-        binding_class = self._get_binding_class(class_obj)
-        binding_class_spec = {i.name: i for i in binding_class.member_data_items_}
+        plan_items = self._get_export_plan(class_obj._name).items
+        stacking_points = self._stacking_points
 
         for xsd_field in xsd_fields:
-            if not xsd_field:
-                continue
-            if (
-                not self._fields.get(xsd_field)
-            ) and xsd_field not in self._stacking_points.keys():
+            item = plan_items.get(xsd_field)
+            if item is None:
                 continue
-            field_spec_name = xsd_field.replace(class_obj._field_prefix, "")
-            if not binding_class_spec.get(field_spec_name):
-                # this can happen with a o2m generated foreign key for instance
+            # stacking points can be changed during the export
+            stacked = xsd_field in stacking_points
+            if not item.in_fields and not stacked:
                 continue
-            member_spec = binding_class_spec[field_spec_name]
-            field_data = self._export_field(xsd_field, class_obj, member_spec)
-            if xsd_field in self._stacking_points.keys():
+            field_data = self._export_field(xsd_field, class_obj, item.member_spec)
+            if stacked:
                 if not field_data:
                     # stacked nested tags are skipped if empty
                     continue
-            elif not self[xsd_field] and not field_data:
+            elif not field_data and not self[xsd_field]:
                 continue
 
-            export_dict[field_spec_name] = field_data
+            export_dict[item.binding_attr] = field_data
 
     def _export_field(self, xsd_field, class_obj, member_spec):
         """
@@ -101,23 +273,23 @@ class AbstractSpecMixin(models.AbstractModel):
                 if field.comodel_name not in self._get_spec_classes():
                     return False
             return self._export_many2one(xsd_field, xsd_required, class_obj)
-        elif self._fields[xsd_field].type == "one2many":
+
+        field_type = self._fields[xsd_field].type
+        if field_type == "one2many":
             return self._export_one2many(xsd_field, class_obj)
-        elif self._fields[xsd_field].type == "datetime" and self[xsd_field]:
+        value = self[xsd_field]
+        if field_type == "datetime" and value:
             return self._export_datetime(xsd_field)
-        elif self._fields[xsd_field].type == "date" and self[xsd_field]:
+        elif field_type == "date" and value:
             return self._export_date(xsd_field)
-        elif (
-            self._fields[xsd_field].type in ("float", "monetary")
-            and self[xsd_field] is not False
-        ):
+        elif field_type in ("float", "monetary") and value is not False:
             return self._export_float_monetary(
                 xsd_field, member_spec, class_obj, xsd_required
             )
-        elif type(self[xsd_field]) == str:
-            return self[xsd_field].strip()
+        elif type(value) == str:
+            return value.strip()
         else:
-            return self[xsd_field]
+            return value
 
     def _export_many2one(self, field_name, xsd_required, class_obj=None):
         self.ensure_one()
@@ -143,9 +315,7 @@ class AbstractSpecMixin(models.AbstractModel):
     def _export_float_monetary(self, field_name, member_spec, class_obj, xsd_required):
         self.ensure_one()
         if member_spec.data_type[0]:
-            TDec = "".join(filter(lambda x: x.isdigit(), member_spec.data_type[0]))[-2:]
-            my_format = "%.{}f".format(TDec)
-            return str(my_format % self[field_name])
+            return str(_get_float_format(member_spec.data_type[0]) % self[field_name])
         else:
             raise NotImplementedError
 
@@ -179,19 +349,12 @@ class AbstractSpecMixin(models.AbstractModel):
                 class_name = self._name
 
         class_obj = self.env[class_name]
-
-        xsd_fields = (
-            i
-            for i in class_obj._fields
-            if class_obj._fields[i].name.startswith(class_obj._field_prefix)
-            and "_choice" not in class_obj._fields[i].name
-        )
+        plan = self._get_export_plan(class_name)
 
         kwargs = {}
-        binding_class = self._get_binding_class(class_obj)
-        self._export_fields(xsd_fields, class_obj, export_dict=kwargs)
+        self._export_fields(list(plan.xsd_fields), class_obj, export_dict=kwargs)
         if kwargs:
-            binding_instance = binding_class(**kwargs)
+            binding_instance = plan.binding_class(**kwargs)
             return binding_instance
 
     def export_xml(self, print_xml=True):
@@ -216,3 +379,79 @@ class AbstractSpecMixin(models.AbstractModel):
     def export_ds(self):
         self.ensure_one()
         return self.export_xml(print_xml=False)
+
+    def export_ds_batch(self):
+        """export_ds of all the records, in the records order.
+
+        The exported values of the records and of their related records
+        are loaded in batch first, so the export of each record works
+        from the cache.
+        """
+        if hasattr(self, "_stacked"):
+            self._prefetch_export()
+        else:
+            for class_name in self._get_spec_classes():
+                self._prefetch_export(class_name)
+        return [record.export_ds() for record in self]
+
+    def _prefetch_export(self, class_name=False, visited=None):
+        """Load the stored values exported with the class_name spec class
+        (and the classes stacked in it) for all the records at once, then
+        do the same for their many2one and one2many related records."""
+        if not self:
+            return
+        if not class_name:
+            if hasattr(self, "_stacked"):
+                class_name = self._stacked
+            else:
+                class_name = self._name
+        if visited is None:
+            visited = set()
+        key = (self._name, class_name, tuple(self.ids))
+        if key in visited:
+            return
+        visited.add(key)
+
+        items = {}
+        class_names = [class_name]
+        seen_classes = set()
+        while class_names:
+            current_class = class_names.pop()
+            if current_class in seen_classes:
+                continue
+            seen_classes.add(current_class)
+            plan = self._get_export_plan(current_class)
+            for field_name, item in plan.items.items():
+                if field_name in self._stacking_points:
+                    class_names.append(self._stacking_points[field_name].comodel_name)
+                elif item.in_fields:
+                    items[field_name] = item
+
+        missing = []
+        for field_name in items:
+            field = self._fields[field_name]
+            if not field.store:
+                continue
+            if next(self.env.cache.get_missing_ids(self, field), None) is not None:
+                missing.append(field_name)
+        if missing:
+            self.filtered("id").read(missing, load=False)
+
+        for field_name, item in items.items():
+            if item.kind not in ("many2one", "one2many"):
+                continue
+            related_records = self.mapped(field_name)
+            if hasattr(related_records, "_prefetch_export"):
+                related_records._prefetch_export(item.comodel_name, visited)
+
+    @api.model
+    def _bindings_to_xml(
+        self, binding_instances, namespacedef=None, pretty_print=False
+    ):
+        """XML strings of the binding instances, serialized in the current
+        process: a process pool forked from an Odoo worker would share its
+        database connection and locks."""
+        return [
+            _binding_to_xml(binding_instance, namespacedef, pretty_print)
+            for binding_instance in binding_instances
+        ]
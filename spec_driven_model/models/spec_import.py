@@ -14,6 +14,64 @@ _logger = logging.getLogger(__name__)
 
 tz_datetime = re.compile(r".*[-+]0[0-9]:00$")
 
+IMPORT_CACHE_KEY = "spec_import_cache"
+
+
+class ImportCache(object):
+    """Lookups of an import session, shared by all the nodes of all the
+    imported files. Pass it in the context under IMPORT_CACHE_KEY to
+    share it across several build calls.
+
+    records: {(model, domain, key, value): record id or False if not found}
+    defaults: {model: default values of build_attrs}
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.defaults = {}
+
+    def invalidate_misses(self, model_name):
+        """Records of model_name were created, forget the failed lookups"""
+        for cache_key in [
+            k for k, v in self.records.items() if k[0] == model_name and not v
+        ]:
+            del self.records[cache_key]
+
+
+def import_cache_search(model, key, value, domain=None):
+    """Id of the first model record with key = value (False if none),
+    memoized in the import session cache of the context if any."""
+    cache = model._context.get(IMPORT_CACHE_KEY)
+    cache_key = (model._name, tuple(domain or ()), key, value)
+    if cache is not None and cache_key in cache.records:
+        return cache.records[cache_key]
+    match_ids = model.search((domain or []) + [(key, "=", value)])
+    if len(match_ids) > 1:
+        _logger.warning("!! WARNING more than 1 record found!!")
+    rec_id = match_ids[:1].id
+    if cache is not None:
+        cache.records[cache_key] = rec_id
+    return rec_id
+
+
+def import_cache_preload(model, key, values, domain=None):
+    """Resolve many values of a key with a single search and store the
+    matches (or their absence) in the import session cache."""
+    cache = model._context.get(IMPORT_CACHE_KEY)
+    if cache is None:
+        return
+    prefix = (model._name, tuple(domain or ()), key)
+    values = {v for v in values if v and prefix + (v,) not in cache.records}
+    if not values:
+        return
+    for value in values:
+        cache.records[prefix + (value,)] = False
+    # reversed so the first record of the search order wins, like in
+    # import_cache_search
+    records = model.search((domain or []) + [(key, "in", list(values))])
+    for record in reversed(records):
+        cache.records[prefix + (record[key],)] = record.id
+
 
 class AbstractSpecMixin(models.AbstractModel):
     """
@@ -43,11 +101,15 @@ class AbstractSpecMixin(models.AbstractModel):
         """
         model_name = SpecModel._get_concrete(self._name) or self._name
         model = self.env[model_name]
+        if self._context.get(IMPORT_CACHE_KEY) is None:
+            model = model.with_context(**{IMPORT_CACHE_KEY: ImportCache()})
         attrs = model.with_context(dry_run=dry_run).build_attrs(node)
         if dry_run:
             return model.new(attrs)
         else:
-            return model.create(attrs)
+            record = model.create(attrs)
+            model._context[IMPORT_CACHE_KEY].invalidate_misses(model_name)
+            return record
 
     @api.model
     def build_attrs(self, node, path=""):
@@ -56,14 +118,20 @@ class AbstractSpecMixin(models.AbstractModel):
         sub-element. Iterates over the binding fields to populate the Odoo fields.
         """
         fields = self._fields
-        # no default image for easier debugging
-        vals = self.default_get(
-            [
-                f
-                for f, v in fields.items()
-                if v.type not in ["binary", "integer", "float", "monetary"]
-            ]
-        )
+        cache = self._context.get(IMPORT_CACHE_KEY)
+        if cache is not None and self._name in cache.defaults:
+            vals = dict(cache.defaults[self._name])
+        else:
+            # no default image for easier debugging
+            vals = self.default_get(
+                [
+                    f
+                    for f, v in fields.items()
+                    if v.type not in ["binary", "integer", "float", "monetary"]
+                ]
+            )
+            if cache is not None:
+                cache.defaults[self._name] = dict(vals)
         # TODO deal with default values but take them from self._context
         # if path == '':
         #    vals.update(defaults)
@@ -254,15 +322,14 @@ class AbstractSpecMixin(models.AbstractModel):
             if rec_dict.get(key):
                 # TODO enable to build criteria using parent_dict
                 # such as state_id when searching for a city
-                if hasattr(model, "_nfe_extra_domain"):
-                    domain = model._nfe_extra_domain + [(key, "=", rec_dict.get(key))]
-                else:
-                    domain = [(key, "=", rec_dict.get(key))]
-                match_ids = model.search(domain)
-                if match_ids:
-                    if len(match_ids) > 1:
-                        _logger.warning("!! WARNING more than 1 record found!!")
-                    return match_ids[0].id
+                rec_id = import_cache_search(
+                    model,
+                    key,
+                    rec_dict.get(key),
+                    getattr(model, "_nfe_extra_domain", None),
+                )
+                if rec_id:
+                    return rec_id
         return False
 
     @api.model
@@ -299,4 +366,7 @@ class AbstractSpecMixin(models.AbstractModel):
                     .create(create_dict)
                     .id
                 )
+            cache = self._context.get(IMPORT_CACHE_KEY)
+            if cache is not None:
+                cache.invalidate_misses(model._name)
         return rec_id
@@ -2,14 +2,38 @@
 # License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 
 import collections
+import hashlib
+import json
 import logging
+import os
 import sys
+import tempfile
 from inspect import getmembers, isclass
 
-from odoo import SUPERUSER_ID, _, api, models
+from odoo import SUPERUSER_ID, _, api, models, tools
 
 _logger = logging.getLogger(__name__)
 
+# in process cache of the StackedModel stacks: {(model, cache key): stack}
+_stack_cache = {}
+# sha256 of the source of the Python modules: {module name: hexdigest}
+_source_hashes = {}
+
+# class attributes the stack of a StackedModel depends on
+STACK_ATTRIBUTES = ("_spec_module", "_stacked", "_stack_skip", "_force_stack_paths")
+
+
+def _source_hash(module_name):
+    if module_name not in _source_hashes:
+        with open(sys.modules[module_name].__file__, "rb") as source:
+            _source_hashes[module_name] = hashlib.sha256(source.read()).hexdigest()
+    return _source_hashes[module_name]
+
+
+def _get_stack_cache_dir():
+    """Directory of the stacks cached between the server processes"""
+    return os.path.join(tools.config["data_dir"], "spec_driven_model", "stacks")
+
 
 class SpecModel(models.AbstractModel):
     """When you inherit this Model, then your model becomes concrete just like
@@ -197,7 +221,7 @@ class SpecModel(models.AbstractModel):
             from .. import hooks  # importing here avoids loop
 
             hooks.register_hook(self.env, self._odoo_module, self._spec_module)
-            self.env.registry.load_key = True
+            setattr(self.env.registry, load_key, True)
         return res
 
 
@@ -228,18 +252,150 @@ class StackedModel(SpecModel):
     _force_stack_paths = ()
     _stacking_points = {}
 
+    # {stacking point field name: spec model declaring it}
+    _stacking_point_models = {}
+
     @classmethod
     def _build_model(cls, pool, cr):
         # inject all stacked m2o as inherited classes
         if cls._stacked:
             _logger.info("building StackedModel %s %s" % (cls._name, cls))
-            node = cls._odoo_name_to_class(cls._stacked, cls._spec_module)
-            classes = set()
-            cls._visit_stack(node, classes, cls._stacked.split(".")[-1], pool, cr)
+            classes = cls._load_stack(pool, cr)
             for klass in [c for c in classes if c not in cls.__bases__]:
                 cls.__bases__ = (klass,) + cls.__bases__
+            # the stacking point fields are bound to the registry being
+            # built in _setup_fields
+            for name in cls._stacking_point_models:
+                cls._stacking_points[name] = None
         return super(StackedModel, cls)._build_model(pool, cr)
 
+    @api.model
+    def _setup_fields(self):
+        res = super()._setup_fields()
+        cls = type(self)
+        for name, model_name in cls._stacking_point_models.items():
+            if cls._stacking_points.get(name) is None:
+                cls._stacking_points[name] = self.env[model_name]._fields.get(name)
+        return res
+
+    @classmethod
+    def _get_stack_cache_key(cls, cr):
+        """
+        The stack only depends on the installed modules, on the spec module,
+        on the stacking attributes of the model and on the source of the
+        classes declaring them. Returns None when the stack should be
+        recomputed (modules being updated or dev mode).
+        """
+        if tools.config.get("dev_mode"):
+            return None
+        cr.execute(
+            "SELECT name, state, latest_version FROM ir_module_module "
+            "WHERE state in ('installed', 'to install', 'to upgrade', 'to remove') "
+            "ORDER BY name"
+        )
+        modules = cr.fetchall()
+        if any(state != "installed" for _name, state, _version in modules):
+            return None
+        class_modules = sorted(
+            {
+                klass.__module__
+                for klass in cls.__mro__
+                if any(attr in vars(klass) for attr in STACK_ATTRIBUTES)
+            }
+        )
+        key = json.dumps(
+            [
+                [(name, version) for name, _state, version in modules],
+                _source_hash(cls._spec_module),
+                [(name, _source_hash(name)) for name in class_modules],
+                cls._name,
+                cls._stacked,
+                sorted(cls._stack_skip),
+                sorted(cls._force_stack_paths),
+            ]
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def _get_stack_cache_file(cls, cache_key):
+        return os.path.join(_get_stack_cache_dir(), "%s.json" % (cache_key,))
+
+    @classmethod
+    def _get_cached_stack(cls, cr, cache_key):
+        """Stack of the cache key, from the process memory or from the
+        cache directory shared by the server processes"""
+        stack = _stack_cache.get((cls._name, cache_key))
+        if stack is None:
+            try:
+                with open(cls._get_stack_cache_file(cache_key)) as cache_file:
+                    stack = json.load(cache_file)
+            except (OSError, ValueError):
+                return None
+            _stack_cache[(cls._name, cache_key)] = stack
+        return stack
+
+    @classmethod
+    def _set_cached_stack(cls, cr, cache_key, stack):
+        _stack_cache[(cls._name, cache_key)] = stack
+        cache_dir = _get_stack_cache_dir()
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # written to a temporary file and renamed, so a concurrent
+            # worker never reads a partial stack
+            fd, path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump(stack, cache_file)
+            os.replace(path, cls._get_stack_cache_file(cache_key))
+        except OSError as e:
+            _logger.warning("Could not store the stack of %s: %s", cls._name, e)
+
+    @classmethod
+    def _load_stack(cls, registry, cr):
+        """
+        Return the spec classes to stack in the model. Walking the spec tree
+        with _visit_stack is slow, so the computed stack is cached and
+        replayed for as long as its cache key is unchanged.
+        """
+        cache_key = cls._get_stack_cache_key(cr)
+        stack = cls._get_cached_stack(cr, cache_key) if cache_key else None
+        if stack is None:
+            stack = {
+                "classes": [],
+                "visited": [],
+                "stack_paths": [],
+                "stacking_points": [],
+            }
+            node = cls._odoo_name_to_class(cls._stacked, cls._spec_module)
+            cls._visit_stack(
+                node, set(), cls._stacked.split(".")[-1], registry, cr, stack=stack
+            )
+            if cache_key:
+                cls._set_cached_stack(cr, cache_key, stack)
+        else:
+            cls._replay_stack(stack)
+        cls._stacking_point_models = dict(stack["stacking_points"])
+        spec_classes = cls._get_spec_classes_by_name()
+        return [spec_classes[name] for name in stack["classes"]]
+
+    @classmethod
+    def _get_spec_classes_by_name(cls):
+        return {
+            getattr(c, "_name", None): c
+            for _name, c in cls.spec_module_classes(cls._spec_module)
+        }
+
+    @classmethod
+    def _replay_stack(cls, stack):
+        """Apply the side effects of _visit_stack from a cached stack."""
+        spec_classes = cls._get_spec_classes_by_name()
+        for name in stack["visited"]:
+            spec_classes[name]._description = None
+            SpecModel._map_concrete(name, cls._name, quiet=True)
+        for name, path in stack["stack_paths"]:
+            spec_classes[name]._stack_path = path
+        for name, _model_name in stack["stacking_points"]:
+            cls._stacking_points.setdefault(name, None)
+
     @api.model
     def _add_field(self, name, field):
         for cls in type(self).mro():
@@ -248,13 +404,21 @@ class StackedModel(SpecModel):
                     return
         return super()._add_field(name, field)
 
+    @classmethod
+    def _add_stacked_class(cls, klass, classes, stack):
+        classes.add(klass)
+        if stack is not None and klass._name not in stack["classes"]:
+            stack["classes"].append(klass._name)
+
     @classmethod  # TODO rename with _
-    def _visit_stack(cls, node, classes, path, registry, cr):
+    def _visit_stack(cls, node, classes, path, registry, cr, stack=None):
         """Pre-order traversal of the stacked models tree.
         1. This method is used to dynamically inherit all the spec models
         stacked together from an XML hierarchy.
         2. It is also useful to generate an automatic view of the spec fields.
         3. Finally it is used when exporting as XML.
+        When a stack dict is given, the traversal is recorded in it so it
+        can be replayed by _replay_stack.
         """
         # We are removing the description of the node
         # to avoid translations error
@@ -278,7 +442,9 @@ class StackedModel(SpecModel):
             SpecModel._map_concrete(node._name, cls._name, quiet=True)
             # _logger.info("%s> <%s>  <<-- %s" % (
             #     indent, path.split('.')[-1], node._name))
-        classes.add(node)
+        cls._add_stacked_class(node, classes, stack)
+        if stack is not None:
+            stack["visited"].append(node._name)
         fields = collections.OrderedDict()
         env = api.Environment(cr, SUPERUSER_ID, {})
         # this is required when you don't start odoo with -i (update)
@@ -308,7 +474,7 @@ class StackedModel(SpecModel):
             child_concrete = SpecModel._get_concrete(child._name)
             field_path = name.replace(registry[node._name]._field_prefix, "")
             if path + "." + field_path in cls._force_stack_paths:
-                classes.add(child)
+                cls._add_stacked_class(child, classes, stack)
 
             if f["type"] == "one2many":
                 # _logger.info("%s    \u2261 <%s> %s" % (
@@ -329,7 +495,10 @@ class StackedModel(SpecModel):
                 # field.args['_stack_path'] = path  TODO
                 child_path = "%s.%s" % (path, field_path)
                 cls._stacking_points[name] = registry[node._name]._fields.get(name)
-                cls._visit_stack(child, classes, child_path, registry, cr)
+                if stack is not None:
+                    stack["stack_paths"].append((child._name, path))
+                    stack["stacking_points"].append((name, node._name))
+                cls._visit_stack(child, classes, child_path, registry, cr, stack)
             # else:
             #     if child_concrete:
             #         _logger.info("%s    - <%s>  -->%s " % (
@@ -6,7 +6,7 @@ import logging
 from lxml import etree
 from lxml.builder import E
 
-from odoo import api, models
+from odoo import api, models, tools
 from odoo.osv.orm import setup_modifiers
 
 _logger = logging.getLogger(__name__)
@@ -22,70 +22,105 @@ class SpecViewMixin(models.AbstractModel):
     def fields_view_get(
         self, view_id=None, view_type="form", toolbar=False, submenu=False
     ):
+        # the spec tab is only injected on demand (see action_open_spec_view)
+        if (
+            view_type != "form"
+            or not self._context.get("spec_view")
+            or self._context.get("no_subcall")
+        ):
+            return super().fields_view_get(view_id, view_type, toolbar, submenu)
         res = super(SpecViewMixin, self.with_context(no_subcall=True)).fields_view_get(
-            view_id, view_type, toolbar
+            view_id, view_type, toolbar, submenu
         )
-        # _logger.info("+++++++++++++++", self, type(self), self._context)
-        if self._context.get("no_subcall"):
-            return res
         # TODO collect class ancestors of StackedModel kind and
         # extract the different XSD schemas injected. Then add a tab/page
         # per schema unless context specify some specific schemas.
 
-        # TODO override only if special dev or fiscal group or if spec_class in
-        # context
         # TODO allow special XML placeholders to be replaced by proper fragment
-        if view_type == "form":
-            doc = etree.XML(res["arch"])
-            fields = []
-            if len(doc.xpath("//notebook")) > 0:
-                arch, fields = self._build_spec_fragment()
-                # arch.set("col", "4") TODO ex res.partner
-                node = doc.xpath("//notebook")[0]
-                page = E.page(string=self._spec_tab_name)
-                page.append(arch)
-                node.insert(1000, page)
-            elif len(doc.xpath("//sheet")) > 0:
-                arch, fields = self._build_spec_fragment()
-                node = doc.xpath("//sheet")[0]
-                arch.set("string", self._spec_tab_name)
-                arch.set("col", "2")  # TODO ex fleet
-                if res["name"] == "default":
-                    # we replace the default view by our own
-                    # _logger.info("Defaulttttttt view:")
-                    # _logger.info(etree.tostring(node, pretty_print=True).decode())
-                    for c in node.getchildren():
-                        node.remove(c)
-                    arch = arch.getchildren()[0]
-                    arch.set("col", "4")
-                    node.insert(1000, arch)
-                    # _logger.info("Specccccccccc View:")
-                    # _logger.info(etree.tostring(node, pretty_print=True).decode())
-                else:
-                    node.insert(1000, arch)
-            elif len(doc.xpath("//form")) > 0:  # ex invoice.line
-                arch, fields = self._build_spec_fragment()
-                node = doc.xpath("//form")[0]
-                arch.set("string", self._spec_tab_name)
-                arch.set("col", "2")
+        doc = etree.XML(res["arch"])
+        fields = {}
+        if len(doc.xpath("//notebook")) > 0:
+            arch, fields = self._get_spec_fragment()
+            # arch.set("col", "4") TODO ex res.partner
+            node = doc.xpath("//notebook")[0]
+            page = E.page(string=self._spec_tab_name)
+            page.append(arch)
+            node.insert(1000, page)
+        elif len(doc.xpath("//sheet")) > 0:
+            arch, fields = self._get_spec_fragment()
+            node = doc.xpath("//sheet")[0]
+            arch.set("string", self._spec_tab_name)
+            arch.set("col", "2")  # TODO ex fleet
+            if res["name"] == "default":
+                # we replace the default view by our own
+                for c in node.getchildren():
+                    node.remove(c)
+                arch = arch.getchildren()[0]
+                arch.set("col", "4")
+                node.insert(1000, arch)
+            else:
                 node.insert(1000, arch)
+        elif len(doc.xpath("//form")) > 0:  # ex invoice.line
+            arch, fields = self._get_spec_fragment()
+            node = doc.xpath("//form")[0]
+            arch.set("string", self._spec_tab_name)
+            arch.set("col", "2")
+            node.insert(1000, arch)
 
-            # print("VIEW IS NOW:")
-            # print(etree.tostring(doc, pretty_print=True).decode())
-            for field_name in fields:
-                if not self.fields_get().get(field_name):
-                    continue
-                field = self.fields_get()[field_name]
-                if field["type"] in ["one2many", "many2one"]:
-                    field["views"] = {}  # no inline views
-                res["fields"][field_name] = field
-                field_nodes = doc.xpath("//field[@name='%s']" % (field_name,))
-                for field_node in field_nodes:
-                    setup_modifiers(field_node, field)
-
-            res["arch"] = etree.tostring(doc)
+        for field_node in doc.xpath("//field[@name]"):
+            field = fields.get(field_node.get("name"))
+            if field is None:
+                continue
+            res["fields"][field_node.get("name")] = field
+            setup_modifiers(field_node, field)
+
+        res["arch"] = etree.tostring(doc)
         return res
 
+    def action_open_spec_view(self):
+        """Open the record form with the spec tab"""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "name": self._spec_tab_name,
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "current",
+            "context": dict(self._context, spec_view=True),
+        }
+
+    @api.model
+    def _get_spec_fragment(self):
+        """Return the spec fragment arch and the descriptions of its fields.
+
+        Building the fragment walks the whole XSD structure, so it is
+        done once per model, language and user groups.
+        """
+        arch, fields = self._get_spec_fragment_cached(
+            self._context.get("spec_class"),
+            tuple(self.env.user.groups_id.ids),
+        )
+        return (
+            etree.XML(arch),
+            {name: dict(field) for name, field in fields.items()},
+        )
+
+    @api.model
+    @tools.ormcache("self.env.lang", "spec_class", "group_ids")
+    def _get_spec_fragment_cached(self, spec_class, group_ids):
+        arch, field_names = self._build_spec_fragment()
+        descriptions = self.fields_get(field_names)
+        fields = {}
+        for field_name in field_names:
+            field = descriptions.get(field_name)
+            if not field:
+                continue
+            if field["type"] in ["one2many", "many2one"]:
+                field["views"] = {}  # no inline views
+            fields[field_name] = field
+        return etree.tostring(arch), fields
+
     @api.model
     def _build_spec_fragment(self, container=None):
         if container is None:
@@ -128,7 +163,6 @@ class SpecViewMixin(models.AbstractModel):
         # _logger.info(etree.tostring(container, pretty_print=True).decode())
         return container, fields
 
-    # TODO cache!!
     # TODO pass schema arg (nfe_, nfse_)
     # TODO required only if visible
     @api.model
@@ -253,7 +287,7 @@ class SpecViewMixin(models.AbstractModel):
             field_tag.set("required", "True")
 
         if field.type in ("one2many", "many2many", "text", "html"):
-            if self.fields_get(field_name)[field_name].get("related"):
+            if getattr(self._fields.get(field_name), "related", None):
                 # avoid cluttering the view with large related fields
                 return
             field_tag.set("colspan", "4")
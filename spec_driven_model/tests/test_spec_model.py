@@ -1,12 +1,18 @@
 # Copyright 2021 Akretion - Raphael Valyi <raphael.valyi@akretion.com>
 # License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl-3.0.en.html).
 
+import logging
+import time
+
 from odoo_test_helper import FakeModelLoader
 
 from odoo.models import NewId
 from odoo.tests import SavepointCase
 
 from ..hooks import get_remaining_spec_models
+from ..models.spec_export import _get_binding_attributes
+
+_logger = logging.getLogger(__name__)
 
 
 class TestSpecModel(SavepointCase, FakeModelLoader):
@@ -144,3 +150,60 @@ class TestSpecModel(SavepointCase, FakeModelLoader):
             imported_po.partner_id.id, self.env.ref("base.res_partner_1").id
         )
         self.assertEqual(imported_po.order_line[0].name, "Some product desc")
+
+    def test_export_plan(self):
+        po_model = self.env["fake.purchase.order"]
+        plan = po_model._get_export_plan("poxsd.10.purchaseorder")
+        self.assertIs(plan, po_model._get_export_plan("poxsd.10.purchaseorder"))
+        self.assertIn("poxsd10_orderDate", plan.xsd_fields)
+        self.assertEqual(plan.items["poxsd10_orderDate"].binding_attr, "orderDate")
+        # stacked m2o are not fields of the stacked model
+        self.assertFalse(plan.items["poxsd10_items"].in_fields)
+
+        line_plan = self.env["fake.purchase.order.line"]._get_export_plan(
+            "poxsd.10.item"
+        )
+        # the o2m foreign key has no binding member
+        self.assertIn("poxsd10_item_Items_id", line_plan.xsd_fields)
+        self.assertNotIn("poxsd10_item_Items_id", line_plan.items)
+        self.assertEqual(line_plan.items["poxsd10_USPrice"].kind, "monetary")
+
+    def test_binding_attributes(self):
+        """The xsd attributes are read from the binding member specs"""
+        from . import purchase_order_lib
+
+        self.assertEqual(
+            _get_binding_attributes(purchase_order_lib.PurchaseOrderType),
+            ("orderDate", "confirmDate"),
+        )
+        self.assertEqual(
+            _get_binding_attributes(purchase_order_lib.USAddress), ("country",)
+        )
+
+    def test_export_benchmark(self):
+        po = self.env["fake.purchase.order"].create(
+            {
+                "name": "PO XSD",
+                "partner_id": self.env.ref("base.res_partner_1").id,
+                "dest_address_id": self.env.ref("base.res_partner_1").id,
+            }
+        )
+        self.env["fake.purchase.order.line"].create(
+            [
+                {
+                    "name": "Product %s" % (i,),
+                    "product_qty": i + 1,
+                    "price_unit": 13,
+                    "order_id": po.id,
+                }
+                for i in range(900)
+            ]
+        )
+        po.invalidate_cache()
+        start = time.perf_counter()
+        po_binding = po._build_generateds()
+        _logger.info(
+            "PO with 900 lines exported in %.3fs", time.perf_counter() - start
+        )
+        self.assertEqual(len(po_binding.items.item), 900)
+        self.assertEqual(po_binding.items.item[899].productName, "Product 899")